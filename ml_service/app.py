@@ -9,11 +9,18 @@ This service provides machine learning capabilities for:
 - Pattern recognition and classification
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import numpy as np
 import pandas as pd
+import codecs
+import io
+import json
 import logging
+import shutil
+import tempfile
+import time
+from contextlib import closing, nullcontext
 from datetime import datetime
 import os
 import sys
@@ -24,12 +31,21 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from models.sequence_analyzer import SequenceAnalyzer
 from models.structure_predictor import StructurePredictor
 from models.disease_predictor import DiseasePredictor
+from models.batch_analysis import BatchAnalyzer, ANALYSIS_TYPES
 
 # Import new services
 from langchain_service.molecular_chain import MolecularAnalysisChain
 from docking_service.docking_engine import DockingEngine
+from docking_service.virtual_screening import VirtualScreener, parse_ligand_library, LIBRARY_FORMATS
+from docking_service.results_store import ResultsStore
+from docking_service.descriptor_table import compute_descriptor_table, prefilter_library
+from docking_service.similarity_index import SimilarityIndexStore
+from docking_service.deduplication import duplicate_report
+from utils.smiles import SmilesError
 from utils.sequence_utils import validate_sequence, clean_sequence
-from utils.file_utils import parse_fasta, parse_pdb
+from utils.file_utils import parse_fasta, iter_fasta, parse_pdb
+from utils.contact_map import compute_contact_map
+from utils.job_queue import JobQueue, QueueFull, FINISHED_STATES, SUCCEEDED, CANCELLED
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -54,12 +70,25 @@ sequence_analyzer = SequenceAnalyzer()
 structure_predictor = StructurePredictor()
 disease_predictor = DiseasePredictor()
 
+# Process pool for /analyze/batch; single-sequence batches reuse the models above
+batch_analyzer = BatchAnalyzer(local_models={'comprehensive': sequence_analyzer,
+                                             'structure': structure_predictor,
+                                             'disease': disease_predictor})
+
 # Initialize LangChain molecular analysis chain
 print("🧠 Loading LangChain molecular analysis chain...")
 molecular_chain = MolecularAnalysisChain()
 
-# Initialize docking engine
-docking_engine = DockingEngine()
+# Initialize docking engine; finished runs and screens are archived in the results store
+results_store = ResultsStore()
+docking_engine = DockingEngine(results_store=results_store)
+similarity_indexes = SimilarityIndexStore()
+
+# Background job queue for long-running docking and analysis requests
+job_queue = JobQueue(max_workers=int(os.environ.get('JOB_WORKERS', 4)))
+
+# Seconds a finished analysis job's result stays available for polling
+ANALYSIS_RESULT_TTL = float(os.environ.get('ANALYSIS_RESULT_TTL', 3600))
 
 # Get LangChain status and display
 try:
@@ -120,34 +149,79 @@ def health_check():
         ]
     })
 
-@app.route('/analyze/sequence', methods=['POST'])
-def analyze_sequence():
-    """Advanced sequence analysis using ML models with LangChain enhancement"""
-    try:
-        data = request.get_json()
+def _validate_analysis_request(analysis: str, data: dict):
+    """Error message for an invalid sequence, structure, disease or batch request body, or None"""
+    if analysis == 'batch':
+        if not data or 'sequences' not in data:
+            return 'Sequences array is required'
+        if not isinstance(data['sequences'], list):
+            return 'Sequences must be an array'
+        if data.get('max_concurrency') is not None:
+            try:
+                if int(data['max_concurrency']) < 1:
+                    return 'max_concurrency must be at least 1'
+            except (TypeError, ValueError):
+                return 'max_concurrency must be an integer'
+        return None
+
+    if not data or 'sequence' not in data:
+        return {'structure': 'Protein sequence is required',
+                'disease': 'Gene sequence is required'}.get(analysis, 'Sequence is required')
+    if analysis == 'sequence':
+        validation = validate_sequence(clean_sequence(data['sequence']), data.get('sequence_type', 'DNA'))
+        if not validation['valid']:
+            return f'Invalid sequence: {validation["error"]}'
+    return None
 
-        if not data or 'sequence' not in data:
-            return jsonify({'error': 'Sequence is required'}), 400
+def _job_phase(job, name: str):
+    """Time a step of an analysis job; no-op for synchronous requests"""
+    return job.phase(name) if job is not None else nullcontext()
 
-        sequence = clean_sequence(data['sequence'])
-        sequence_type = data.get('sequence_type', 'DNA')
+def _execute_sequence_analysis(data: dict, job=None) -> dict:
+    """Analyze a validated sequence; shared by /analyze/sequence and analysis jobs"""
+    sequence = clean_sequence(data['sequence'])
+    sequence_type = data.get('sequence_type', 'DNA')
 
-        validation = validate_sequence(sequence, sequence_type)
-        if not validation['valid']:
-            return jsonify({'error': f'Invalid sequence: {validation["error"]}'}), 400
-
-        # Perform basic ML analysis
+    # Perform basic ML analysis
+    with _job_phase(job, 'analysis'):
         basic_analysis = sequence_analyzer.analyze(sequence)
+    if job is not None:
+        job.check()
 
-        # Enhance with LangChain molecular analysis
+    # Enhance with LangChain molecular analysis
+    with _job_phase(job, 'enhancement'):
         enhanced_result = molecular_chain.analyze_sequence(sequence, sequence_type, basic_analysis)
 
+    return {
+        'data': enhanced_result,
+        'basic_analysis': basic_analysis,
+        'langchain_enhanced': 'llm_enhancement' in enhanced_result,
+        'analysis_method': enhanced_result.get('analysis_method', 'unknown')
+    }
+
+def _execute_structure_prediction(data: dict, job=None) -> dict:
+    """Predict the structure of a protein sequence; shared by /predict/structure and analysis jobs"""
+    with _job_phase(job, 'prediction'):
+        return structure_predictor.predict(clean_sequence(data['sequence']), data.get('method', 'alphafold'))
+
+def _execute_disease_prediction(data: dict, job=None) -> dict:
+    """Predict disease associations of a gene sequence; shared by /predict/disease and analysis jobs"""
+    with _job_phase(job, 'prediction'):
+        return disease_predictor.predict(clean_sequence(data['sequence']), data.get('disease_type', 'general'))
+
+@app.route('/analyze/sequence', methods=['POST'])
+def analyze_sequence():
+    """Advanced sequence analysis using ML models with LangChain enhancement"""
+    try:
+        data = request.get_json()
+
+        error = _validate_analysis_request('sequence', data)
+        if error:
+            return jsonify({'error': error}), 400
+
         return jsonify({
             'success': True,
-            'data': enhanced_result,
-            'basic_analysis': basic_analysis,
-            'langchain_enhanced': 'llm_enhancement' in enhanced_result,
-            'analysis_method': enhanced_result.get('analysis_method', 'unknown'),
+            **_execute_sequence_analysis(data),
             'timestamp': datetime.now().isoformat()
         })
 
@@ -160,19 +234,14 @@ def predict_structure():
     """Predict 3D protein structure"""
     try:
         data = request.get_json()
-        
-        if not data or 'sequence' not in data:
-            return jsonify({'error': 'Protein sequence is required'}), 400
-        
-        sequence = clean_sequence(data['sequence'])
-        method = data.get('method', 'alphafold')
-        
-        # Predict structure using ML models
-        structure_result = structure_predictor.predict(sequence, method)
-        
+
+        error = _validate_analysis_request('structure', data)
+        if error:
+            return jsonify({'error': error}), 400
+
         return jsonify({
             'success': True,
-            'data': structure_result,
+            'data': _execute_structure_prediction(data),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -180,24 +249,63 @@ def predict_structure():
         logger.error(f"Structure prediction error: {str(e)}")
         return jsonify({'error': f'Structure prediction failed: {str(e)}'}), 500
 
+@app.route('/predict/contacts', methods=['POST'])
+def predict_contacts():
+    """Residue contact map and distance matrix for a predicted or uploaded structure"""
+    try:
+        data = request.get_json()
+
+        if not data or ('pdb_content' not in data and 'sequence' not in data):
+            return jsonify({'error': 'PDB content or protein sequence is required'}), 400
+
+        if data.get('pdb_content'):
+            pdb_content = data['pdb_content']
+            source = 'uploaded'
+        else:
+            sequence = clean_sequence(data['sequence'])
+            structure_result = structure_predictor.predict(sequence, data.get('method', 'alphafold'))
+            pdb_content = structure_result.get('pdb_string')
+            if not pdb_content:
+                return jsonify({'error': 'Prediction method did not produce coordinates'}), 400
+            source = 'predicted'
+
+        contact_result = compute_contact_map(
+            pdb_content,
+            cutoff=float(data.get('cutoff', 8.0)),
+            atom=data.get('atom', 'CA'),
+            min_separation=int(data.get('min_separation', 0)),
+            output_format=data.get('format', 'list'),
+            include_matrix=bool(data.get('include_matrix', False)),
+            matrix_size=int(data.get('matrix_size', 256)),
+            matrix_reduce=data.get('matrix_reduce', 'mean')
+        )
+        contact_result['source'] = source
+
+        return jsonify({
+            'success': True,
+            'data': contact_result,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': f'Invalid contact map request: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Contact map error: {str(e)}")
+        return jsonify({'error': f'Contact map computation failed: {str(e)}'}), 500
+
 @app.route('/predict/disease', methods=['POST'])
 def predict_disease():
     """Predict gene-disease associations"""
     try:
         data = request.get_json()
-        
-        if not data or 'sequence' not in data:
-            return jsonify({'error': 'Gene sequence is required'}), 400
-        
-        sequence = clean_sequence(data['sequence'])
-        disease_type = data.get('disease_type', 'general')
-        
-        # Predict disease associations
-        disease_result = disease_predictor.predict(sequence, disease_type)
-        
+
+        error = _validate_analysis_request('disease', data)
+        if error:
+            return jsonify({'error': error}), 400
+
         return jsonify({
             'success': True,
-            'data': disease_result,
+            'data': _execute_disease_prediction(data),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -205,54 +313,110 @@ def predict_disease():
         logger.error(f"Disease prediction error: {str(e)}")
         return jsonify({'error': f'Disease prediction failed: {str(e)}'}), 500
 
+# Sequences read per window when batch results are streamed as NDJSON
+STREAM_WINDOW = 256
+
+# Streamed uploads are spooled in memory up to this size, then to disk
+UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024
+
+def _wants_stream(options) -> bool:
+    """NDJSON streaming requested by ?stream=true, a 'stream' field or Accept: application/x-ndjson"""
+    value = request.args.get('stream', options.get('stream') if options else None)
+    if isinstance(value, str):
+        value = value.lower() in ('1', 'true', 'yes')
+    return bool(value) or request.accept_mimetypes.best == 'application/x-ndjson'
+
+def _stream_results(results, stats, summary):
+    """
+    NDJSON response with one {'type': 'result', ...} line per sequence as it
+    finishes and a final {'type': 'summary', ...} line
+
+    Results are produced only as the client reads them, so a slow client
+    holds back the batch instead of buffering output on the server.
+    """
+    start = time.perf_counter()
+
+    def generate():
+        try:
+            for result in results:
+                result['type'] = 'result'
+                yield json.dumps(result) + '\n'
+            yield json.dumps(dict(summary, type='summary', stats=stats,
+                                  elapsed=round(time.perf_counter() - start, 4),
+                                  timestamp=datetime.now().isoformat())) + '\n'
+        except Exception as e:
+            logger.error(f"Batch streaming error: {str(e)}")
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _batch_analysis_type(data: dict) -> str:
+    analysis_type = data.get('analysis_type', 'comprehensive')
+    return analysis_type if analysis_type in ANALYSIS_TYPES else 'comprehensive'
+
+def _execute_batch_analysis(data: dict, job) -> dict:
+    """
+    Analyze a validated batch as a job, reporting the fraction of sequences
+    finished as progress; results are returned in request order
+    """
+    analysis_type = _batch_analysis_type(data)
+    total = max(1, len(data['sequences']))
+    step = max(1, total // 100)
+    stats = {}
+    results = []
+
+    results_iter = batch_analyzer.iter_results(data['sequences'], analysis_type,
+                                               sequence_type=data.get('sequence_type'),
+                                               max_concurrency=data.get('max_concurrency'),
+                                               stats=stats, window=STREAM_WINDOW)
+    # Closing the iterator on cancel or timeout drops its queued work units
+    with job.phase('analysis'), closing(results_iter):
+        for result in results_iter:
+            results.append(result)
+            job.check()
+            if len(results) % step == 0:
+                job.set_progress(len(results) / total, f'{len(results)}/{total} sequences analyzed')
+
+    results.sort(key=lambda result: result['index'])
+    return {'analysis_type': analysis_type, 'results': results, 'stats': stats}
+
 @app.route('/analyze/batch', methods=['POST'])
 def batch_analysis():
-    """Batch analysis of multiple sequences"""
+    """
+    Batch analysis of multiple sequences
+
+    Sequences are validated against their sequence_type (per item, or the
+    batch default), identical sequences are analyzed once, and the work is
+    spread over the batch process pool. Optional max_concurrency limits the
+    work units this batch keeps in flight. With stream=true results are
+    sent as NDJSON lines as they finish (see _stream_results).
+    """
     try:
         data = request.get_json()
-        
-        if not data or 'sequences' not in data:
-            return jsonify({'error': 'Sequences array is required'}), 400
-        
-        sequences = data['sequences']
-        analysis_type = data.get('analysis_type', 'comprehensive')
-        
-        results = []
-        
-        for i, seq_data in enumerate(sequences):
-            try:
-                sequence = clean_sequence(seq_data.get('sequence', ''))
-                
-                if validate_sequence(sequence):
-                    if analysis_type == 'structure':
-                        result = structure_predictor.predict(sequence)
-                    elif analysis_type == 'disease':
-                        result = disease_predictor.predict(sequence)
-                    else:
-                        result = sequence_analyzer.analyze(sequence)
-                    
-                    results.append({
-                        'index': i,
-                        'success': True,
-                        'data': result
-                    })
-                else:
-                    results.append({
-                        'index': i,
-                        'success': False,
-                        'error': 'Invalid sequence format'
-                    })
-                    
-            except Exception as e:
-                results.append({
-                    'index': i,
-                    'success': False,
-                    'error': str(e)
-                })
+
+        error = _validate_analysis_request('batch', data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        analysis_type = _batch_analysis_type(data)
+
+        if _wants_stream(data):
+            stats = {}
+            results = batch_analyzer.iter_results(data['sequences'], analysis_type,
+                                                  sequence_type=data.get('sequence_type'),
+                                                  max_concurrency=data.get('max_concurrency'),
+                                                  stats=stats, window=STREAM_WINDOW)
+            return _stream_results(results, stats, {'success': True, 'analysis_type': analysis_type})
+
+        batch = batch_analyzer.analyze(data['sequences'], analysis_type,
+                                       sequence_type=data.get('sequence_type'),
+                                       max_concurrency=data.get('max_concurrency'))
         
         return jsonify({
             'success': True,
-            'results': results,
+            'results': batch['results'],
+            'stats': batch['stats'],
+            'elapsed': batch['elapsed'],
             'timestamp': datetime.now().isoformat()
         })
         
@@ -262,7 +426,13 @@ def batch_analysis():
 
 @app.route('/upload/file', methods=['POST'])
 def upload_file():
-    """Upload and analyze sequence files"""
+    """
+    Upload and analyze sequence files
+
+    With stream=true (query or form field) FASTA and plain sequence files
+    are read record by record and analyzed on the batch process pool, with
+    results sent as NDJSON lines (see _stream_results).
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
@@ -271,6 +441,26 @@ def upload_file():
         
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
+
+        if _wants_stream(request.form):
+            if file.filename.lower().endswith('.pdb'):
+                return jsonify({'error': 'Streaming is supported for FASTA and plain sequence files'}), 400
+            # The request's upload stream is closed once this view returns,
+            # so copy it to a spool the response reads and closes when done
+            spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+            shutil.copyfileobj(file.stream, spool)
+            spool.seek(0)
+            if file.filename.lower().endswith(('.fasta', '.fa', '.fas')):
+                sequences = iter_fasta(codecs.getreader('utf-8')(spool, errors='replace'))
+            else:
+                sequences = iter([{'id': 'sequence_1', 'sequence': clean_sequence(spool.read().decode('utf-8'))}])
+            stats = {}
+            results = batch_analyzer.iter_results(sequences, 'comprehensive',
+                                                  sequence_type=request.form.get('sequence_type'),
+                                                  stats=stats, window=STREAM_WINDOW)
+            response = _stream_results(results, stats, {'success': True, 'filename': file.filename})
+            response.call_on_close(spool.close)
+            return response
         
         # Read file content
         content = file.read().decode('utf-8')
@@ -360,21 +550,23 @@ def prepare_docking():
     try:
         data = request.get_json()
 
-        if not data or 'protein_data' not in data or 'ligand_smiles' not in data:
-            return jsonify({'error': 'Protein data and ligand SMILES are required'}), 400
+        if not data or 'ligand_smiles' not in data or not (data.get('protein_data') or data.get('receptor_id')):
+            return jsonify({'error': 'Protein data (or receptor ID) and ligand SMILES are required'}), 400
 
-        protein_data = data['protein_data']
+        protein_data = data.get('protein_data')
         ligand_smiles = data['ligand_smiles']
         ligand_name = data.get('ligand_name', 'ligand')
 
-        # Prepare protein
-        protein_result = docking_engine.prepare_protein(protein_data)
+        # Prepare protein (reused from the receptor cache when already prepared)
+        protein_result = docking_engine.prepare_protein(protein_data, receptor_id=data.get('receptor_id'))
         if not protein_result['success']:
             return jsonify({'error': f'Protein preparation failed: {protein_result["error"]}'}), 400
 
-        # Prepare ligand
-        ligand_result = docking_engine.prepare_ligand(ligand_smiles, ligand_name)
+        # Prepare ligand in the same job workspace as the protein
+        workspace_id = protein_result['workspace_id']
+        ligand_result = docking_engine.prepare_ligand(ligand_smiles, ligand_name, workspace_id=workspace_id)
         if not ligand_result['success']:
+            docking_engine.release_workspace(workspace_id)
             return jsonify({'error': f'Ligand preparation failed: {ligand_result["error"]}'}), 400
 
         return jsonify({
@@ -382,6 +574,8 @@ def prepare_docking():
             'data': {
                 'protein': protein_result,
                 'ligand': ligand_result,
+                'workspace_id': workspace_id,
+                'receptor_id': protein_result['receptor_id'],
                 'ready_for_docking': True
             },
             'timestamp': datetime.now().isoformat()
@@ -391,53 +585,609 @@ def prepare_docking():
         logger.error(f"Docking preparation error: {str(e)}")
         return jsonify({'error': f'Docking preparation failed: {str(e)}'}), 500
 
+def _validate_docking_request(data: dict):
+    """Error message for an invalid docking request body, or None"""
+    if not data or 'binding_site' not in data:
+        return 'Binding site is required'
+    if not data.get('workspace_id') and not all(field in data for field in ['protein_pdbqt', 'ligand_pdbqt']):
+        return 'Workspace ID or protein and ligand PDBQT are required'
+    return None
+
+def _execute_docking(data: dict, job=None) -> dict:
+    """Dock and analyze a validated request; shared by /docking/run and docking jobs"""
+    protein_pdbqt = data.get('protein_pdbqt')
+    ligand_pdbqt = data.get('ligand_pdbqt')
+    binding_site = data['binding_site']
+    exhaustiveness = data.get('exhaustiveness', 8)
+
+    # Perform docking
+    docking_result = docking_engine.perform_docking(
+        protein_pdbqt, ligand_pdbqt, binding_site, exhaustiveness,
+        workspace_id=data.get('workspace_id'), job=job
+    )
+
+    if not docking_result['success']:
+        raise RuntimeError(f'Docking failed: {docking_result["error"]}')
+
+    # Get AI analysis of docking results
+    protein_info = {'file': protein_pdbqt, 'workspace_id': docking_result.get('workspace_id')}
+    ligand_info = {'file': ligand_pdbqt, 'workspace_id': docking_result.get('workspace_id')}
+    ai_analysis = molecular_chain.analyze_docking(
+        protein_info, ligand_info, docking_result
+    )
+
+    return {
+        'docking_results': docking_result.get('results', []),
+        'ai_analysis': ai_analysis,
+        'binding_site': binding_site,
+        'parameters': {
+            'exhaustiveness': exhaustiveness
+        },
+        'workspace_id': docking_result.get('workspace_id'),
+        'mock': docking_result.get('mock', False)
+    }
+
+# Analysis request type -> (job kind, executor)
+ANALYSIS_JOBS = {
+    'sequence': ('sequence_analysis', _execute_sequence_analysis),
+    'structure': ('structure_prediction', _execute_structure_prediction),
+    'disease': ('disease_prediction', _execute_disease_prediction),
+    'batch': ('batch_analysis', _execute_batch_analysis)
+}
+ANALYSIS_JOB_KINDS = tuple(kind for kind, _ in ANALYSIS_JOBS.values())
+
+job_queue.register('docking', lambda params, job: _execute_docking(params, job))
+for _kind, _executor in ANALYSIS_JOBS.values():
+    job_queue.register(_kind, lambda params, job, executor=_executor: executor(params, job))
+job_queue.recover()
+
+def _job_status_response(job_id: str, kinds: tuple):
+    """Status, progress and timing breakdown of a job of one of the given kinds"""
+    status = job_queue.status(job_id)
+    if status is None or status['kind'] not in kinds:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+
+    return jsonify({
+        'success': True,
+        'data': status,
+        'timestamp': datetime.now().isoformat()
+    })
+
+def _job_result_response(job_id: str, kinds: tuple):
+    """Result of a finished job; 409 while it is still queued or running"""
+    job = job_queue.result(job_id)
+    if job is None or job['kind'] not in kinds:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+    if job['status'] not in FINISHED_STATES:
+        return jsonify({'error': f'Job is {job["status"]}', 'data': job['job']}), 409
+    if job['status'] != SUCCEEDED:
+        return jsonify({'success': False, 'error': job['error'] or f'Job {job["status"]}',
+                        'data': job['job']}), 200
+
+    return jsonify({
+        'success': True,
+        'data': job['result'],
+        'job': job['job'],
+        'timestamp': datetime.now().isoformat()
+    })
+
+def _job_cancel_response(job_id: str, kinds: tuple):
+    """
+    Cancel a queued or running job of one of the given kinds
+
+    Any worker process can take the request: a running job is flagged in
+    the job database and stops once the process running it notices, so
+    'status' may still read 'running' with 'cancel_requested' set.
+    """
+    status = job_queue.status(job_id)
+    if status is None or status['kind'] not in kinds:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+
+    outcome = job_queue.cancel(job_id)
+    status = job_queue.status(job_id) or status
+    return jsonify({
+        'success': outcome == CANCELLED,
+        'data': {'job_id': job_id, 'status': status['status'], 'cancel_requested': status['cancel_requested']},
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/docking/run', methods=['POST'])
 def run_docking():
     """Perform molecular docking"""
     try:
         data = request.get_json()
 
-        required_fields = ['protein_pdbqt', 'ligand_pdbqt', 'binding_site']
-        if not data or not all(field in data for field in required_fields):
-            return jsonify({'error': 'Protein PDBQT, ligand PDBQT, and binding site are required'}), 400
+        error = _validate_docking_request(data)
+        if error:
+            return jsonify({'error': error}), 400
 
-        protein_pdbqt = data['protein_pdbqt']
-        ligand_pdbqt = data['ligand_pdbqt']
-        binding_site = data['binding_site']
-        exhaustiveness = data.get('exhaustiveness', 8)
+        return jsonify({
+            'success': True,
+            'data': _execute_docking(data),
+            'timestamp': datetime.now().isoformat()
+        })
 
-        # Perform docking
-        docking_result = docking_engine.perform_docking(
-            protein_pdbqt, ligand_pdbqt, binding_site, exhaustiveness
-        )
+    except Exception as e:
+        logger.error(f"Docking execution error: {str(e)}")
+        return jsonify({'error': f'Docking execution failed: {str(e)}'}), 500
 
-        if not docking_result['success']:
-            return jsonify({'error': f'Docking failed: {docking_result["error"]}'}), 500
+@app.route('/docking/jobs', methods=['POST'])
+def submit_docking_job():
+    """Queue a docking run and return its job ID immediately"""
+    try:
+        data = request.get_json()
 
-        # Get AI analysis of docking results
-        protein_info = {'file': protein_pdbqt}
-        ligand_info = {'file': ligand_pdbqt}
-        ai_analysis = molecular_chain.analyze_docking(
-            protein_info, ligand_info, docking_result
-        )
+        error = _validate_docking_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        job_id = job_queue.submit('docking', data, timeout=data.get('timeout'))
+        return jsonify({
+            'success': True,
+            'data': job_queue.status(job_id),
+            'timestamp': datetime.now().isoformat()
+        }), 202
+
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"Docking job submission error: {str(e)}")
+        return jsonify({'error': f'Docking job submission failed: {str(e)}'}), 500
+
+@app.route('/docking/jobs/<job_id>', methods=['GET'])
+def docking_job_status(job_id):
+    """Status and progress of a docking job"""
+    return _job_status_response(job_id, ('docking',))
+
+@app.route('/docking/jobs/<job_id>/result', methods=['GET'])
+def docking_job_result(job_id):
+    """Result of a finished docking job"""
+    return _job_result_response(job_id, ('docking',))
+
+@app.route('/docking/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_docking_job(job_id):
+    """Cancel a queued or running docking job; running Vina processes are killed"""
+    return _job_cancel_response(job_id, ('docking',))
+
+@app.route('/analysis/jobs', methods=['POST'])
+def submit_analysis_job():
+    """
+    Queue a sequence, structure, disease or batch analysis and return its
+    job ID immediately
+
+    The body is the request the synchronous endpoint takes plus 'type'
+    ('sequence', 'structure', 'disease' or 'batch'), with optional
+    'timeout' and 'ttl' (seconds the finished result is kept, default
+    $ANALYSIS_RESULT_TTL).
+    """
+    try:
+        data = request.get_json()
 
+        analysis = (data or {}).get('type')
+        if analysis not in ANALYSIS_JOBS:
+            return jsonify({'error': f'Analysis type must be one of {list(ANALYSIS_JOBS)}'}), 400
+        error = _validate_analysis_request(analysis, data)
+        if error:
+            return jsonify({'error': error}), 400
+        try:
+            ttl = float(data.get('ttl', ANALYSIS_RESULT_TTL))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ttl must be a number of seconds'}), 400
+
+        job_id = job_queue.submit(ANALYSIS_JOBS[analysis][0], data, timeout=data.get('timeout'),
+                                  ttl=max(0.0, ttl))
+        return jsonify({
+            'success': True,
+            'data': job_queue.status(job_id),
+            'timestamp': datetime.now().isoformat()
+        }), 202
+
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"Analysis job submission error: {str(e)}")
+        return jsonify({'error': f'Analysis job submission failed: {str(e)}'}), 500
+
+@app.route('/analysis/jobs/<job_id>', methods=['GET'])
+def analysis_job_status(job_id):
+    """Status, progress and timing breakdown of an analysis job"""
+    return _job_status_response(job_id, ANALYSIS_JOB_KINDS)
+
+@app.route('/analysis/jobs/<job_id>/progress', methods=['GET'])
+def analysis_job_progress(job_id):
+    """Lightweight progress poll for an analysis job"""
+    status = job_queue.status(job_id)
+    if status is None or status['kind'] not in ANALYSIS_JOB_KINDS:
+        return jsonify({'error': f'Unknown or expired job: {job_id}'}), 404
+
+    return jsonify({
+        'success': True,
+        'data': {key: status[key] for key in ('job_id', 'status', 'progress', 'message', 'elapsed')},
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/analysis/jobs/<job_id>/result', methods=['GET'])
+def analysis_job_result(job_id):
+    """Result of a finished analysis job"""
+    return _job_result_response(job_id, ANALYSIS_JOB_KINDS)
+
+@app.route('/analysis/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_analysis_job(job_id):
+    """Cancel a queued or running analysis job from any worker; a running batch stops submitting work"""
+    return _job_cancel_response(job_id, ANALYSIS_JOB_KINDS)
+
+@app.route('/docking/screen', methods=['POST'])
+def screen_ligands():
+    """Dock a ligand library against one receptor, streaming results as NDJSON"""
+    try:
+        data = request.get_json()
+
+        if not data or 'binding_site' not in data:
+            return jsonify({'error': 'Binding site is required'}), 400
+        if 'ligands' not in data and 'library' not in data:
+            return jsonify({'error': 'Ligands or a ligand library is required'}), 400
+        if data.get('rank_by', 'affinity') not in ('affinity', 'rescored_affinity'):
+            return jsonify({'error': "rank_by must be 'affinity' or 'rescored_affinity'"}), 400
+
+        workspace_id = data.get('workspace_id')
+        release_receptor = False
+        if workspace_id:
+            if docking_engine.workspaces.get(workspace_id) is None:
+                return jsonify({'error': f'Unknown or expired docking workspace: {workspace_id}'}), 404
+        elif data.get('protein_data') or data.get('receptor_id'):
+            # Prepare the receptor once up front so failures are reported before streaming
+            protein_result = docking_engine.prepare_protein(data.get('protein_data'),
+                                                            receptor_id=data.get('receptor_id'))
+            if not protein_result['success']:
+                return jsonify({'error': f'Protein preparation failed: {protein_result["error"]}'}), 400
+            workspace_id = protein_result['workspace_id']
+            release_receptor = True
+        else:
+            return jsonify({'error': 'Protein data, receptor ID or workspace ID is required'}), 400
+
+        library_format = data.get('library_format', 'smi')
+        if library_format.lower() not in LIBRARY_FORMATS:
+            if release_receptor:
+                docking_engine.release_workspace(workspace_id)
+            return jsonify({'error': f'Unsupported library format: {library_format}'}), 400
+        ligands = parse_ligand_library(data.get('ligands', data.get('library')), library_format)
+
+        # Optional descriptor prefilter, applied lazily as the library streams
+        prefilter = data.get('prefilter')
+        if prefilter:
+            options = prefilter if isinstance(prefilter, dict) else {}
+            ligands = prefilter_library(ligands, lipinski=options.get('lipinski', True),
+                                        veber=options.get('veber', True),
+                                        max_lipinski_violations=options.get('max_lipinski_violations', 1),
+                                        ranges=options.get('ranges'))
+
+        try:
+            # Worker count is clamped to the CPU budget inside the screener
+            screener = VirtualScreener(
+                docking_engine,
+                max_workers=data.get('max_workers'),
+                cpu_per_job=data.get('cpu_per_job', 1),
+                top_k=data.get('top_k', 10),
+                rank_by=data.get('rank_by', 'affinity')
+            )
+        except (TypeError, ValueError) as e:
+            if release_receptor:
+                docking_engine.release_workspace(workspace_id)
+            return jsonify({'error': f'Invalid screening options: {str(e)}'}), 400
+
+        def generate():
+            try:
+                for item in screener.screen(ligands, data['binding_site'], workspace_id=workspace_id,
+                                            exhaustiveness=data.get('exhaustiveness', 8),
+                                            release_workspace=release_receptor,
+                                            store=results_store if data.get('store', True) else None,
+                                            campaign_name=data.get('campaign_name'),
+                                            deduplicate=data.get('deduplicate', True)):
+                    yield json.dumps(item) + '\n'
+            except Exception as e:
+                logger.error(f"Virtual screening error: {str(e)}")
+                yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logger.error(f"Virtual screening error: {str(e)}")
+        return jsonify({'error': f'Virtual screening failed: {str(e)}'}), 500
+
+def _request_processes(data: dict) -> int:
+    """Worker process count from a request body, clamped to the host's cores (ValueError if invalid)"""
+    try:
+        processes = int(data.get('processes', 1))
+    except (TypeError, ValueError):
+        raise ValueError('processes must be an integer')
+    return min(max(1, processes), os.cpu_count() or 1)
+
+@app.route('/ligands/descriptors', methods=['POST'])
+def ligand_descriptors():
+    """Columnar descriptor table and Lipinski / Veber filter results for a ligand library"""
+    try:
+        data = request.get_json()
+
+        if not data or ('ligands' not in data and 'library' not in data):
+            return jsonify({'error': 'Ligands or a ligand library is required'}), 400
+        library_format = data.get('library_format', 'smi')
+        if library_format.lower() not in LIBRARY_FORMATS:
+            return jsonify({'error': f'Unsupported library format: {library_format}'}), 400
+
+        ligands = parse_ligand_library(data.get('ligands', data.get('library')), library_format)
+        table = compute_descriptor_table(ligands, processes=_request_processes(data))
+        passed = table.filter_mask(lipinski=data.get('lipinski', True), veber=data.get('veber', True),
+                                   max_lipinski_violations=data.get('max_lipinski_violations', 1),
+                                   ranges=data.get('ranges'))
+
+        columns = table.to_dict()
+        columns['passed'] = passed.tolist()
         return jsonify({
             'success': True,
             'data': {
-                'docking_results': docking_result.get('results', []),
-                'ai_analysis': ai_analysis,
-                'binding_site': binding_site,
-                'parameters': {
-                    'exhaustiveness': exhaustiveness
-                },
-                'mock': docking_result.get('mock', False)
+                'columns': columns,
+                'summary': table.summary(),
+                'passed': int(passed.sum())
             },
             'timestamp': datetime.now().isoformat()
         })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Docking execution error: {str(e)}")
-        return jsonify({'error': f'Docking execution failed: {str(e)}'}), 500
+        logger.error(f"Descriptor calculation error: {str(e)}")
+        return jsonify({'error': f'Descriptor calculation failed: {str(e)}'}), 500
+
+@app.route('/ligands/deduplicate', methods=['POST'])
+def deduplicate_ligands():
+    """Drop repeated compounds (same canonical SMILES) from a ligand library and report duplicate groups"""
+    try:
+        data = request.get_json()
+
+        if not data or ('ligands' not in data and 'library' not in data):
+            return jsonify({'error': 'Ligands or a ligand library is required'}), 400
+        library_format = data.get('library_format', 'smi')
+        if library_format.lower() not in LIBRARY_FORMATS:
+            return jsonify({'error': f'Unsupported library format: {library_format}'}), 400
+
+        ligands = parse_ligand_library(data.get('ligands', data.get('library')), library_format)
+        report = duplicate_report(ligands, processes=_request_processes(data),
+                                  isomeric=data.get('isomeric', True),
+                                  max_groups=int(data.get('max_groups', 100)))
+        return jsonify({
+            'success': True,
+            'data': report,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Deduplication error: {str(e)}")
+        return jsonify({'error': f'Deduplication failed: {str(e)}'}), 500
+
+@app.route('/ligands/similarity/indexes', methods=['GET', 'POST'])
+def similarity_indexes_endpoint():
+    """List fingerprint similarity indexes (GET) or build one from a ligand library (POST)"""
+    try:
+        if request.method == 'GET':
+            return jsonify({
+                'success': True,
+                'data': {'indexes': similarity_indexes.list()},
+                'timestamp': datetime.now().isoformat()
+            })
+
+        data = request.get_json()
+        if not data or ('ligands' not in data and 'library' not in data):
+            return jsonify({'error': 'Ligands or a ligand library is required'}), 400
+        library_format = data.get('library_format', 'smi')
+        if library_format.lower() not in LIBRARY_FORMATS:
+            return jsonify({'error': f'Unsupported library format: {library_format}'}), 400
+
+        ligands = parse_ligand_library(data.get('ligands', data.get('library')), library_format)
+        index = similarity_indexes.create(ligands, name=data.get('name'),
+                                          kind=data.get('kind', 'circular'),
+                                          n_bits=int(data.get('n_bits', 2048)),
+                                          processes=_request_processes(data))
+        return jsonify({
+            'success': True,
+            'data': index.info(),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Similarity index error: {str(e)}")
+        return jsonify({'error': f'Similarity index build failed: {str(e)}'}), 500
+
+@app.route('/ligands/similarity/search', methods=['POST'])
+def similarity_search():
+    """Most similar library compounds to a query SMILES"""
+    try:
+        data = request.get_json()
+
+        if not data or 'index_id' not in data or 'smiles' not in data:
+            return jsonify({'error': 'index_id and smiles are required'}), 400
+        index = similarity_indexes.get(data['index_id'])
+        if index is None:
+            return jsonify({'error': f"Unknown similarity index: {data['index_id']}"}), 404
+
+        hits = index.search(data['smiles'], k=min(int(data.get('k', 10)), 1000),
+                            threshold=float(data.get('threshold', 0.0)))
+        return jsonify({
+            'success': True,
+            'data': {'index_id': data['index_id'], 'query': data['smiles'], 'hits': hits},
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except (SmilesError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Similarity search error: {str(e)}")
+        return jsonify({'error': f'Similarity search failed: {str(e)}'}), 500
+
+def _query_limit(default: int, maximum: int) -> int:
+    """Positive ?limit= query argument, capped at maximum (ValueError if invalid)"""
+    try:
+        limit = int(request.args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, maximum)
+
+@app.route('/docking/results/top', methods=['GET'])
+def get_top_results():
+    """Best stored results for a receptor or screening campaign"""
+    try:
+        receptor_id = request.args.get('receptor_id')
+        campaign_id = request.args.get('campaign_id')
+        if not receptor_id and not campaign_id:
+            return jsonify({'error': 'receptor_id or campaign_id is required'}), 400
+        limit = _query_limit(10, 1000)
+
+        hits = results_store.top_ligands(receptor_id, limit=limit, campaign_id=campaign_id,
+                                         distinct=request.args.get('distinct', 'true').lower() == 'true')
+        return jsonify({
+            'success': True,
+            'data': {'receptor_id': receptor_id, 'campaign_id': campaign_id, 'results': hits},
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Results query error: {str(e)}")
+        return jsonify({'error': f'Results query failed: {str(e)}'}), 500
+
+@app.route('/docking/results/ligand', methods=['GET'])
+def get_ligand_results():
+    """All stored results for a ligand, by SMILES or name"""
+    try:
+        smiles = request.args.get('smiles')
+        name = request.args.get('name')
+        if not smiles and not name:
+            return jsonify({'error': 'smiles or name is required'}), 400
+
+        results = results_store.results_for_ligand(smiles, name, request.args.get('receptor_id'),
+                                                   limit=_query_limit(100, 1000))
+        return jsonify({
+            'success': True,
+            'data': {'smiles': smiles, 'name': name, 'results': results},
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Results query error: {str(e)}")
+        return jsonify({'error': f'Results query failed: {str(e)}'}), 500
+
+@app.route('/docking/campaigns', methods=['GET'])
+def list_campaigns():
+    """Recent screening campaigns, optionally for one receptor"""
+    try:
+        campaigns = results_store.list_campaigns(request.args.get('receptor_id'),
+                                                 limit=_query_limit(50, 500))
+        return jsonify({
+            'success': True,
+            'data': campaigns,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Campaign listing error: {str(e)}")
+        return jsonify({'error': f'Campaign listing failed: {str(e)}'}), 500
+
+@app.route('/docking/campaigns/<campaign_id>', methods=['GET'])
+def get_campaign(campaign_id):
+    """A stored screening campaign with its top hits"""
+    try:
+        campaign = results_store.get_campaign(campaign_id)
+        if campaign is None:
+            return jsonify({'error': f'Unknown campaign: {campaign_id}'}), 404
+
+        campaign['top_hits'] = results_store.top_ligands(campaign['receptor_hash'], campaign_id=campaign_id,
+                                                         limit=_query_limit(10, 1000))
+        return jsonify({
+            'success': True,
+            'data': campaign,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Campaign lookup error: {str(e)}")
+        return jsonify({'error': f'Campaign lookup failed: {str(e)}'}), 500
+
+@app.route('/docking/poses/<digest>', methods=['GET'])
+def get_pose_blob(digest):
+    """Archived pose file (PDBQT) by content digest"""
+    try:
+        data = results_store.get_blob(digest)
+        if data is None:
+            return jsonify({'error': f'Unknown pose file: {digest}'}), 404
+        return Response(data, mimetype='chemical/x-pdbqt')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Pose lookup error: {str(e)}")
+        return jsonify({'error': f'Pose lookup failed: {str(e)}'}), 500
+
+@app.route('/docking/receptors/<receptor_id>', methods=['GET'])
+def get_prepared_receptor(receptor_id):
+    """Look up a cached receptor preparation by handle"""
+    try:
+        if not docking_engine.receptor_cache.is_receptor_id(receptor_id):
+            return jsonify({'error': 'Invalid receptor ID'}), 400
+
+        entry = docking_engine.receptor_cache.get(receptor_id)
+        if entry is None:
+            return jsonify({'error': f'Unknown or evicted receptor: {receptor_id}'}), 404
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'receptor_id': receptor_id,
+                'protein_format': entry.get('protein_format'),
+                'validation': entry.get('validation'),
+                'binding_sites': entry.get('binding_sites'),
+                'created_at': datetime.fromtimestamp(entry['created_at']).isoformat()
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Receptor lookup error: {str(e)}")
+        return jsonify({'error': f'Receptor lookup failed: {str(e)}'}), 500
+
+@app.route('/docking/release', methods=['POST'])
+def release_docking_workspace():
+    """Release a docking workspace handle and its files"""
+    try:
+        data = request.get_json()
+
+        if not data or 'workspace_id' not in data:
+            return jsonify({'error': 'Workspace ID is required'}), 400
+
+        release_result = docking_engine.release_workspace(data['workspace_id'])
+        if not release_result['success']:
+            return jsonify({'error': release_result['error']}), 404
+
+        return jsonify({
+            'success': True,
+            'data': release_result,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Workspace release error: {str(e)}")
+        return jsonify({'error': f'Workspace release failed: {str(e)}'}), 500
 
 @app.route('/analyze/langchain', methods=['POST'])
 def langchain_analysis():
@@ -715,7 +1465,7 @@ def models_info():
             'structure_predictor': {
                 'name': 'Protein Structure Predictor',
                 'version': '1.0.0',
-                'capabilities': ['3d_structure', 'secondary_structure', 'confidence_scoring'],
+                'capabilities': ['3d_structure', 'secondary_structure', 'confidence_scoring', 'contact_maps'],
                 'accuracy': 0.87
             },
             'disease_predictor': {
@@ -734,7 +1484,7 @@ def models_info():
             'docking_engine': {
                 'name': 'Molecular Docking Engine',
                 'version': '1.0.0',
-                'capabilities': ['protein_ligand_docking', 'binding_affinity', 'drug_design'],
+                'capabilities': ['protein_ligand_docking', 'binding_affinity', 'drug_design', 'virtual_screening', 'async_jobs', 'results_store', 'ligand_descriptors', 'similarity_search', 'ligand_deduplication'],
                 'accuracy': 0.80,
                 'method': 'autodock_vina'
             }
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cavity detection benchmark
+
+Builds globular synthetic receptors with one pocket carved into the surface,
+times detect_pockets and reports how far the top pocket lies from the carved
+one. Results are printed as JSON.
+
+Usage:
+    python benchmarks/cavity_detection_benchmark.py [--sizes 2000 10000 30000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cavity_detection import detect_pockets, SCIPY_AVAILABLE
+
+# Lattice spacing giving roughly protein heavy-atom density with packed atoms
+LATTICE_SPACING = 2.7
+CARBON_RADIUS = 1.7
+
+
+def synthetic_receptor(num_atoms: int, pocket_radius: float = 6.0,
+                       seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Jittered lattice filling a sphere, minus a spherical pocket on the +x surface"""
+    rng = np.random.default_rng(seed)
+    radius = (3.0 * num_atoms * LATTICE_SPACING ** 3 / (4.0 * np.pi)) ** (1.0 / 3.0)
+    axis = np.arange(-radius, radius + LATTICE_SPACING, LATTICE_SPACING)
+    points = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+    points = points + rng.normal(0.0, 0.3, points.shape)
+    points = points[np.linalg.norm(points, axis=1) < radius]
+
+    pocket = np.array([radius - 0.6 * pocket_radius, 0.0, 0.0])
+    points = points[np.linalg.norm(points - pocket, axis=1) > pocket_radius]
+    return points, pocket
+
+
+def run_benchmark(num_atoms: int, repeats: int = 3) -> Dict[str, Any]:
+    coords, pocket = synthetic_receptor(num_atoms)
+    radii = np.full(len(coords), CARBON_RADIUS)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pockets = detect_pockets(coords, radii)
+        timings.append(time.perf_counter() - start)
+
+    top = pockets[0] if pockets else None
+    return {
+        'num_atoms': int(len(coords)),
+        'detect_s': min(timings),
+        'num_pockets': len(pockets),
+        'top_pocket_volume': top['volume'] if top else None,
+        'top_pocket_error_A': (round(float(np.linalg.norm(np.array([top['x'], top['y'], top['z']]) - pocket)), 2)
+                               if top else None)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2_000, 10_000, 30_000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = [run_benchmark(size, args.repeats) for size in args.sizes]
+    print(json.dumps({'benchmark': 'cavity_detection', 'scipy': SCIPY_AVAILABLE, 'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Conformer generation benchmark
+
+Times distance-geometry embedding and force-field refinement of drug-like
+molecules at several conformer batch sizes, then a small library across
+process pools, and checks the geometry of the results (bond length error,
+stereocenters kept, aromatic ring planarity). Results are printed as JSON.
+
+Usage:
+    python benchmarks/conformer_benchmark.py [--conformers 1 10 50] [--processes 1 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.conformers import embed_molecule, embed_batch, _Topology, _Terms, _chiral_signs
+from utils.smiles import parse_smiles
+
+MOLECULES = [
+    'CC(=O)Oc1ccccc1C(=O)O',
+    'Cn1cnc2c1c(=O)n(C)c(=O)n2C',
+    'CC(C)Cc1ccc(cc1)[C@@H](C)C(=O)O',
+    'N[C@@H](Cc1ccccc1)C(=O)O',
+    'COc1ccc2[nH]cc(CCN)c2c1',
+    'CN1CCC[C@H]1c1cccnc1',
+    'O=S(=O)(N)c1ccc(N)cc1',
+    'C[C@H]1CC[C@@H](O)CC1',
+]
+
+
+def geometry_report(smiles: str, num_conformers: int) -> Dict[str, Any]:
+    graph = parse_smiles(smiles)
+    conformers = embed_molecule(graph, num_conformers, seed=0)
+    topology = _Topology(graph)
+    terms = _Terms(topology, graph)
+    x = conformers.coordinates
+    bonds = conformers.bond_atoms
+    lengths = np.linalg.norm(x[:, bonds[:, 0]] - x[:, bonds[:, 1]], axis=2)
+
+    aromatic = np.flatnonzero(conformers.aromatic)
+    planarity = 0.0
+    if len(aromatic):
+        ring = x[:, aromatic] - x[:, aromatic].mean(axis=1, keepdims=True)
+        planarity = float(np.linalg.svd(ring, compute_uv=False)[:, 2].max() / np.sqrt(len(aromatic)))
+    stereo = bool((_chiral_signs(x, terms) > 0).all()) if len(terms.chiral_sign) else True
+    return {'smiles': smiles, 'atoms': conformers.num_atoms,
+            'max_bond_error': round(float(np.abs(lengths - topology.bond_length).max()), 4),
+            'stereo_kept': stereo, 'aromatic_plane_rms': round(planarity, 4),
+            'converged': int(conformers.converged.sum())}
+
+
+def time_batch_sizes(sizes: List[int]) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        start = time.perf_counter()
+        for smiles in MOLECULES:
+            embed_molecule(smiles, size, seed=0)
+        elapsed = time.perf_counter() - start
+        results.append({'conformers_per_molecule': size, 'wall_s': round(elapsed, 3),
+                        'conformers_per_s': round(size * len(MOLECULES) / elapsed, 1)})
+    return results
+
+
+def time_processes(counts: List[int], library: int, num_conformers: int) -> List[Dict[str, Any]]:
+    molecules = [MOLECULES[i % len(MOLECULES)] for i in range(library)]
+    results = []
+    for processes in counts:
+        start = time.perf_counter()
+        embedded = embed_batch(molecules, num_conformers, processes=processes, seed=0)
+        elapsed = time.perf_counter() - start
+        results.append({'processes': processes, 'molecules': library, 'wall_s': round(elapsed, 3),
+                        'molecules_per_s': round(library / elapsed, 2),
+                        'failed': sum(1 for conformers, _ in embedded if conformers is None)})
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--conformers', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--library', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    report = {
+        'benchmark': 'conformer_generation',
+        'cpu_count': os.cpu_count(),
+        'geometry': [geometry_report(smiles, 10) for smiles in MOLECULES],
+        'batch_sizes': time_batch_sizes(args.conformers),
+        'process_pool': time_processes(sorted(set(args.processes)), args.library, 10)
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Ligand deduplication benchmark
+
+Times canonical SMILES generation on drug-like molecules written in several
+equivalent spellings, CompactHashSet inserts of random 64-bit key hashes,
+and the in-memory versus external (sorted run merge) passes over a SMILES
+library file with repeats. Results are printed as JSON.
+
+Usage:
+    python benchmarks/dedupe_benchmark.py [--hashes 1000000 10000000] [--library 20000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.canonical import canonical_smiles
+from docking_service.deduplication import CompactHashSet, iter_unique, dedupe_library_file
+from docking_service.descriptor_table import open_library
+
+# Each row spells one compound several ways
+SPELLINGS = [
+    ['CC(=O)Oc1ccccc1C(=O)O', 'OC(=O)c1ccccc1OC(C)=O', 'CC(=O)OC1=CC=CC=C1C(O)=O'],
+    ['CN1C=NC2=C1C(=O)N(C(=O)N2C)C', 'Cn1cnc2c1c(=O)n(C)c(=O)n2C'],
+    ['COc1ccc2[nH]cc(CCN)c2c1', 'NCCc1c[nH]c2ccc(OC)cc12'],
+    ['N[C@@H](Cc1ccccc1)C(=O)O', 'OC(=O)[C@H](Cc1ccccc1)N'],
+    ['C1CCC(CC1)NC(=O)c1ccncc1', 'O=C(NC1CCCCC1)c1ccncc1'],
+]
+
+
+def time_hash_set(size: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(1, np.iinfo(np.int64).max, size, dtype=np.int64).astype(np.uint64)
+    seen = CompactHashSet()
+    start = time.perf_counter()
+    for offset in range(0, size, 100_000):
+        block = hashes[offset:offset + 100_000]
+        seen.add(block, np.arange(offset, offset + len(block)))
+    elapsed = time.perf_counter() - start
+    return {'hashes': size, 'insert_s': round(elapsed, 3), 'inserts_per_s': round(size / elapsed, 1),
+            'table_bytes': seen.nbytes}
+
+
+def time_library(size: int) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix='dedupe_bench_')
+    try:
+        path = os.path.join(directory, 'library.smi')
+        flat = [smiles for row in SPELLINGS for smiles in row]
+        # Distinct compounds (alkyl chain variants) interleaved with repeated spellings
+        with open(path, 'w') as f:
+            for i in range(size):
+                smiles = flat[i % len(flat)] if i % 3 else 'C' * (1 + i % 40) + 'O'
+                f.write(f"{smiles} mol_{i}\n")
+
+        results: Dict[str, Any] = {'ligands': size}
+        stats: Dict[str, int] = {}
+        start = time.perf_counter()
+        unique = sum(1 for _ in iter_unique(open_library(path), stats=stats))
+        results['in_memory_s'] = round(time.perf_counter() - start, 3)
+        results['unique'] = unique
+
+        start = time.perf_counter()
+        external = sum(1 for _ in dedupe_library_file(path, directory=directory, run_size=max(1, size // 8)))
+        results['external_s'] = round(time.perf_counter() - start, 3)
+        results['external_matches'] = external == unique
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hashes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--library', type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    spellings = [smiles for row in SPELLINGS for smiles in row] * 200
+    start = time.perf_counter()
+    keys = [canonical_smiles(smiles) for smiles in spellings]
+    canonical_rate = len(spellings) / (time.perf_counter() - start)
+
+    report = {
+        'benchmark': 'deduplication',
+        'canonical_smiles_per_s': round(canonical_rate, 1),
+        'spellings_agree': all(len({canonical_smiles(s) for s in row}) == 1 for row in SPELLINGS),
+        'distinct_keys': len(set(keys)),
+        'hash_set': [time_hash_set(size) for size in args.hashes],
+        'library': time_library(args.library)
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Docking pipeline benchmark
+
+Drives DockingEngine through receptor preparation, ligand preparation,
+Vina execution and output parsing using the fake_vina.py stand-in, for
+several library sizes and worker pool sizes. Reports throughput, latency
+percentiles, peak temporary disk usage and peak RSS as JSON so runs can be
+compared over time.
+
+Usage:
+    python benchmarks/docking_benchmark.py [--ligands 1 10 1000] [--workers 1 4]
+        [--sleep 0.05] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+
+from docking_service.docking_engine import DockingEngine
+from docking_service.receptor_cache import ReceptorCache
+from docking_service.virtual_screening import VirtualScreener
+
+FAKE_VINA = os.path.join(BENCHMARK_DIR, 'fake_vina.py')
+
+# Small drug-like SMILES cycled to build libraries of any size
+LIBRARY_SMILES = [
+    'CC(=O)Oc1ccccc1C(=O)O', 'CN1C=NC2=C1C(=O)N(C(=O)N2C)C', 'CC(C)Cc1ccc(cc1)C(C)C(=O)O',
+    'c1ccc2c(c1)cccc2O', 'CC(=O)Nc1ccc(O)cc1', 'O=C(O)c1ccccc1O', 'CCN(CC)CCOC(=O)c1ccc(N)cc1',
+    'COc1ccc2[nH]cc(CCN)c2c1', 'C1CCC(CC1)NC(=O)c1ccncc1', 'OC(=O)CCc1ccc(cc1)N'
+]
+
+BINDING_SITE = {'x': 0.0, 'y': 0.0, 'z': 0.0, 'size_x': 20.0, 'size_y': 20.0, 'size_z': 20.0}
+
+
+def synthetic_receptor(num_residues: int = 150, seed: int = 0) -> str:
+    """PDB text for a compact poly-alanine blob around the origin"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    serial = 1
+    for residue in range(1, num_residues + 1):
+        center = rng.normal(0.0, 9.0, 3)
+        for name, element in (('N', 'N'), ('CA', 'C'), ('C', 'C'), ('O', 'O'), ('CB', 'C')):
+            x, y, z = center + rng.normal(0.0, 0.8, 3)
+            lines.append(f"ATOM  {serial:5d}  {name:<3s} ALA A{residue:4d}    "
+                         f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           {element:>2s}")
+            serial += 1
+    return '\n'.join(lines) + '\nEND\n'
+
+
+def directory_size(path: str) -> int:
+    """Total size of regular files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _max_rss_bytes(who: int) -> int:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return int(rss if platform.system() == 'Darwin' else rss * 1024)
+
+
+def run_scenario(engine: DockingEngine, workspace_id: str, num_ligands: int, workers: int,
+                 temp_root: str) -> Dict[str, Any]:
+    ligands = [{'name': f'ligand_{i + 1}', 'smiles': LIBRARY_SMILES[i % len(LIBRARY_SMILES)]}
+               for i in range(num_ligands)]
+    screener = VirtualScreener(engine, max_workers=workers, cpu_per_job=1)
+
+    latencies = []
+    failed = 0
+    peak_disk = directory_size(temp_root)
+    start = time.perf_counter()
+    # The library repeats LIBRARY_SMILES, so deduplication would dock only ten ligands
+    for item in screener.screen(ligands, BINDING_SITE, workspace_id=workspace_id, deduplicate=False):
+        if item['type'] != 'result':
+            continue
+        if item.get('success'):
+            latencies.append(item['elapsed'])
+        else:
+            failed += 1
+        peak_disk = max(peak_disk, directory_size(temp_root))
+    wall = time.perf_counter() - start
+
+    return {
+        'ligands': num_ligands,
+        'workers': workers,
+        'succeeded': len(latencies),
+        'failed': failed,
+        'wall_s': round(wall, 4),
+        'jobs_per_s': round(num_ligands / wall, 3) if wall > 0 else None,
+        'latency_p50_s': round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+        'latency_p99_s': round(float(np.percentile(latencies, 99)), 4) if latencies else None,
+        'peak_temp_disk_bytes': peak_disk,
+        'peak_rss_bytes': _max_rss_bytes(resource.RUSAGE_SELF),
+        'children_peak_rss_bytes': _max_rss_bytes(resource.RUSAGE_CHILDREN)
+    }
+
+
+def run_benchmark(ligand_counts: List[int], pool_sizes: List[int]) -> Dict[str, Any]:
+    # Every temporary file (engine and worker workspaces) lands under one root
+    temp_root = tempfile.mkdtemp(prefix='geneinsight_docking_bench_')
+    previous_tmpdir = os.environ.get('TMPDIR')
+    os.environ['TMPDIR'] = temp_root
+    tempfile.tempdir = None
+
+    try:
+        engine = DockingEngine(vina_executable=FAKE_VINA,
+                               receptor_cache=ReceptorCache(os.path.join(temp_root, 'receptors')))
+        start = time.perf_counter()
+        receptor = engine.prepare_protein(synthetic_receptor())
+        prepare_s = time.perf_counter() - start
+        if not receptor['success']:
+            raise RuntimeError(f"Receptor preparation failed: {receptor['error']}")
+
+        results = [run_scenario(engine, receptor['workspace_id'], count, workers, temp_root)
+                   for count in ligand_counts for workers in pool_sizes]
+        engine.cleanup()
+        return {'receptor_prepare_s': round(prepare_s, 4), 'results': results}
+
+    finally:
+        if previous_tmpdir is None:
+            os.environ.pop('TMPDIR', None)
+        else:
+            os.environ['TMPDIR'] = previous_tmpdir
+        tempfile.tempdir = None
+        shutil.rmtree(temp_root, ignore_errors=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ligands', type=int, nargs='+', default=[1, 10, 1000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--sleep', type=float, default=0.05, help='Seconds each fake Vina run takes')
+    parser.add_argument('--modes', type=int, default=9, help='Poses written per fake Vina run')
+    parser.add_argument('--atoms', type=int, default=24, help='Ligand atoms per pose')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    os.environ['FAKE_VINA_SLEEP'] = str(args.sleep)
+    os.environ['FAKE_VINA_MODES'] = str(args.modes)
+    os.environ['FAKE_VINA_ATOMS'] = str(args.atoms)
+
+    report = {
+        'benchmark': 'docking_pipeline',
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': {'sleep_s': args.sleep, 'modes': args.modes, 'atoms': args.atoms},
+    }
+    report.update(run_benchmark(args.ligands, args.workers))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Stand-in AutoDock Vina executable for benchmarks
+
+Accepts the command line DockingEngine passes to Vina, sleeps for a
+configurable time and writes a multi-MODEL output PDBQT and a log, so the
+docking pipeline can be timed end to end without Vina installed.
+
+Configuration (environment variables):
+    FAKE_VINA_SLEEP   Seconds to sleep per run (default 0.05)
+    FAKE_VINA_MODES   Poses written per run (default 9)
+    FAKE_VINA_ATOMS   Ligand atoms per pose (default 24)
+    FAKE_VINA_FAIL    Fraction of runs that exit with an error (default 0)
+"""
+
+import hashlib
+import os
+import random
+import sys
+import time
+
+VERSION = 'AutoDock Vina v1.2.5 (benchmark stand-in)'
+
+# AutoDock atom types cycled through for the synthetic ligand
+ATOM_TYPES = ['C', 'C', 'A', 'A', 'N', 'OA', 'C', 'NA', 'C', 'OA', 'S', 'C']
+
+
+def _option(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
+
+
+def write_poses(path, center, num_modes, num_atoms, rng):
+    """Write num_modes poses of one ligand scattered around the box center"""
+    template = [(rng.gauss(0, 2.0), rng.gauss(0, 2.0), rng.gauss(0, 2.0)) for _ in range(num_atoms)]
+    with open(path, 'w') as f:
+        affinity = -rng.uniform(7.0, 11.0)
+        for mode in range(1, num_modes + 1):
+            shift = [c + rng.gauss(0, 1.5 * (mode > 1)) for c in center]
+            f.write(f"MODEL {mode}\n")
+            f.write(f"REMARK VINA RESULT: {affinity:9.3f} {0.0 if mode == 1 else rng.uniform(1, 4):10.3f} "
+                    f"{0.0 if mode == 1 else rng.uniform(2, 8):10.3f}\n")
+            for i, (x, y, z) in enumerate(template):
+                atom_type = ATOM_TYPES[i % len(ATOM_TYPES)]
+                f.write(f"HETATM{i + 1:5d}  {atom_type[0]}{i % 100:<2d} UNL     1    "
+                        f"{x + shift[0]:8.3f}{y + shift[1]:8.3f}{z + shift[2]:8.3f}  1.00  0.00     0.000 "
+                        f"{atom_type:<2s}\n")
+            f.write("TORSDOF 4\nENDMDL\n")
+            affinity += rng.uniform(0.1, 0.6)
+
+
+def main(args):
+    if '--version' in args:
+        print(VERSION)
+        return 0
+
+    output_file = _option(args, '--out')
+    log_file = _option(args, '--log')
+    ligand_file = _option(args, '--ligand', '')
+    if not output_file:
+        print("ERROR: --out is required", file=sys.stderr)
+        return 1
+
+    center = [float(_option(args, f'--center_{axis}', 0.0)) for axis in 'xyz']
+
+    # Deterministic per ligand and box so repeated benchmark runs write identical output
+    seed = hashlib.sha256(f"{os.path.basename(ligand_file)}:{center}".encode()).hexdigest()
+    rng = random.Random(seed)
+
+    time.sleep(float(os.environ.get('FAKE_VINA_SLEEP', 0.05)))
+    if rng.random() < float(os.environ.get('FAKE_VINA_FAIL', 0.0)):
+        print("ERROR: simulated Vina failure", file=sys.stderr)
+        return 1
+
+    write_poses(output_file, center, int(os.environ.get('FAKE_VINA_MODES', 9)),
+                int(os.environ.get('FAKE_VINA_ATOMS', 24)), rng)
+    if log_file:
+        with open(log_file, 'w') as f:
+            f.write(f"{VERSION}\nWriting output ... done.\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+SDF / MOL2 reader benchmark
+
+Writes a synthetic 3D library (embedded drug-like molecules repeated with
+new names) as SDF and MOL2, then times streaming reads serially and across
+process pools, checks that parallel byte-range parsing returns the same
+records in the same order, and reports the peak resident memory of the
+reading process. Results are printed as JSON.
+
+Usage:
+    python benchmarks/molfile_benchmark.py [--records 20000] [--processes 1 4]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.conformers import embed_molecule
+from utils.molfile import MoleculeWriter, read_molecules, ligand_entry
+
+MOLECULES = [
+    'CC(=O)Oc1ccccc1C(=O)O',
+    'Cn1cnc2c1c(=O)n(C)c(=O)n2C',
+    'CC(C)Cc1ccc(cc1)[C@@H](C)C(=O)O',
+    'N[C@@H](Cc1ccccc1)C(=O)O',
+    'COc1ccc2[nH]cc(CCN)c2c1',
+    'CN1CCC[C@H]1c1cccnc1',
+    'O=S(=O)(N)c1ccc(N)cc1',
+    'C/C=C/C(=O)OC',
+]
+
+
+def write_library(directory: str, records: int) -> Dict[str, str]:
+    templates = []
+    for i, smiles in enumerate(MOLECULES):
+        path = os.path.join(directory, f'template_{i}.sdf')
+        with open(path, 'w') as f:
+            f.write(embed_molecule(smiles, 1, seed=i).to_sdf())
+        templates.append(next(read_molecules(path))[0])
+
+    paths = {}
+    for file_format in ('sdf', 'mol2'):
+        paths[file_format] = os.path.join(directory, f'library.{file_format}')
+        with MoleculeWriter(paths[file_format]) as writer:
+            for i in range(records):
+                record = templates[i % len(templates)]
+                record.name = f'mol_{i}'
+                writer.write(record)
+    return paths
+
+
+def time_reads(path: str, counts: List[int]) -> List[Dict[str, Any]]:
+    results, reference = [], None
+    size = os.path.getsize(path)
+    for processes in counts:
+        start = time.perf_counter()
+        entries = list(read_molecules(path, processes=processes, chunk_bytes=1024 * 1024, transform=ligand_entry))
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = entries
+        results.append({'processes': processes, 'records': len(entries), 'wall_s': round(elapsed, 3),
+                        'records_per_s': round(len(entries) / elapsed, 1),
+                        'mb_per_s': round(size / elapsed / 1e6, 2),
+                        'matches_serial': entries == reference,
+                        'unreadable': sum(1 for entry in entries if not entry['smiles'])})
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=20_000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='molfile_bench_')
+    try:
+        paths = write_library(directory, args.records)
+        counts = sorted(set(args.processes))
+        report = {
+            'benchmark': 'molfile',
+            'cpu_count': os.cpu_count(),
+            'file_mb': {fmt: round(os.path.getsize(path) / 1e6, 2) for fmt, path in paths.items()},
+            'sdf': time_reads(paths['sdf'], counts),
+            'mol2': time_reads(paths['mol2'], counts),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Fingerprint similarity search benchmark
+
+Builds popcount-sorted indexes of synthetic sparse 2048-bit fingerprints
+(15-70 bits set, like circular fingerprints of drug-like molecules), then
+times top-K queries with and without a similarity threshold. Also times
+circular fingerprint generation for real SMILES. Results are printed as JSON.
+
+Usage:
+    python benchmarks/similarity_benchmark.py [--sizes 100000 1000000 3000000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.smiles import parse_smiles
+from utils.fingerprints import circular_fingerprints, popcount_rows, DEFAULT_BITS, _BITWISE_COUNT
+from docking_service.similarity_index import SimilarityIndex
+
+SMILES = ['CC(=O)Oc1ccccc1C(=O)O', 'CN1C=NC2=C1C(=O)N(C(=O)N2C)C', 'COc1ccc2[nH]cc(CCN)c2c1',
+          'C1CCC(CC1)NC(=O)c1ccncc1', 'CCN(CC)CCOC(=O)c1ccc(N)cc1']
+
+
+def synthetic_index(size: int, seed: int = 0) -> SimilarityIndex:
+    rng = np.random.default_rng(seed)
+    words = DEFAULT_BITS // 64
+    packed = np.zeros((size, words), dtype=np.uint64)
+    num_bits = rng.integers(15, 70, size)
+    for j in range(70):
+        rows = np.flatnonzero(j < num_bits)
+        bits = rng.integers(0, DEFAULT_BITS, len(rows))
+        np.bitwise_or.at(packed, (rows, bits >> 6), np.uint64(1) << (bits & 63).astype(np.uint64))
+    counts = popcount_rows(packed).astype(np.int16)
+    order = np.argsort(counts, kind='stable')
+    names = np.arange(size).astype(str)
+    return SimilarityIndex(packed[order], counts[order], names, names,
+                           {'kind': 'circular', 'n_bits': DEFAULT_BITS, 'radius': 2})
+
+
+def run_benchmark(size: int, queries: int, k: int) -> Dict[str, Any]:
+    index = synthetic_index(size)
+    rng = np.random.default_rng(1)
+    results: Dict[str, Any] = {'compounds': size}
+    for threshold in (0.0, 0.6):
+        timings = []
+        for _ in range(queries):
+            query = index.fingerprints[rng.integers(size)]
+            start = time.perf_counter()
+            index.search_rows(query, k=k, threshold=threshold)
+            timings.append(time.perf_counter() - start)
+        results[f'query_threshold_{threshold}_median_s'] = round(float(np.median(timings)), 4)
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000])
+    parser.add_argument('--queries', type=int, default=5)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    graphs = [parse_smiles(SMILES[i % len(SMILES)]) for i in range(20_000)]
+    start = time.perf_counter()
+    circular_fingerprints(graphs)
+    fingerprint_rate = len(graphs) / (time.perf_counter() - start)
+
+    report = {
+        'benchmark': 'similarity_search',
+        'native_popcount': _BITWISE_COUNT is not None,
+        'circular_fingerprints_per_s': round(fingerprint_rate, 1),
+        'results': [run_benchmark(size, args.queries, args.k) for size in args.sizes]
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
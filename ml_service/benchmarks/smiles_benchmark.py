@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+SMILES parsing and descriptor benchmark
+
+Builds a library by cycling drug-like SMILES, parses it with
+parse_smiles_batch and computes descriptors in vectorized chunks, then
+reports compounds per second and the projected time for a million-compound
+library. Results are printed as JSON.
+
+Usage:
+    python benchmarks/smiles_benchmark.py [--sizes 10000 100000] [--processes 1 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.smiles import parse_smiles_batch
+from utils.mol_properties import compute_descriptors, concatenate_graphs
+
+LIBRARY_SMILES = [
+    'CC(=O)Oc1ccccc1C(=O)O', 'CN1C=NC2=C1C(=O)N(C(=O)N2C)C', 'CC(C)Cc1ccc(cc1)C(C)C(=O)O',
+    'COc1ccc2[nH]cc(CCN)c2c1', 'C1CCC(CC1)NC(=O)c1ccncc1', 'CCN(CC)CCOC(=O)c1ccc(N)cc1',
+    'O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC', 'Clc1ccc2c(c1)C(=NCC(=O)N2C)c1ccccc1',
+    'CC1(C)S[C@@H]2[C@H](NC(=O)Cc3ccccc3)C(=O)N2[C@H]1C(=O)O', 'c1ccc2c(c1)ccc1ccccc12',
+    'C[N+](C)(C)CCOC(C)=O', 'OC[C@H]1OC(O)[C@H](O)[C@@H](O)[C@@H]1O'
+]
+
+DESCRIPTOR_CHUNK = 10_000
+
+
+def run_benchmark(size: int, processes: int) -> Dict[str, Any]:
+    library = [LIBRARY_SMILES[i % len(LIBRARY_SMILES)] for i in range(size)]
+
+    start = time.perf_counter()
+    parsed = parse_smiles_batch(library, processes=processes)
+    parse_s = time.perf_counter() - start
+
+    graphs = [graph for graph in parsed['graphs'] if graph is not None]
+    start = time.perf_counter()
+    for offset in range(0, len(graphs), DESCRIPTOR_CHUNK):
+        compute_descriptors(concatenate_graphs(graphs[offset:offset + DESCRIPTOR_CHUNK]))
+    descriptor_s = time.perf_counter() - start
+
+    total = parse_s + descriptor_s
+    return {
+        'compounds': size,
+        'processes': processes,
+        'errors': len(parsed['errors']),
+        'parse_s': round(parse_s, 3),
+        'descriptor_s': round(descriptor_s, 3),
+        'compounds_per_s': round(size / total, 1),
+        'projected_1m_s': round(1_000_000 * total / size, 1)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1])
+    args = parser.parse_args(argv)
+
+    results = [run_benchmark(size, processes) for size in args.sizes for processes in args.processes]
+    print(json.dumps({'benchmark': 'smiles_parsing', 'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
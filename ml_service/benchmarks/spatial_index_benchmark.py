@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Spatial index benchmark
+
+Builds SpatialIndex over synthetic protein-density point clouds and times
+radius, k-nearest and all-pairs queries. Results are printed as JSON.
+
+Usage:
+    python benchmarks/spatial_index_benchmark.py [--sizes 10000 100000 500000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.spatial_index import SpatialIndex, SCIPY_AVAILABLE
+
+# Heavy-atom number density of folded proteins (atoms per cubic Å)
+PROTEIN_ATOM_DENSITY = 0.07
+
+
+def synthetic_structure(num_atoms: int, seed: int = 0) -> np.ndarray:
+    """Uniformly fill a sphere at protein atom density"""
+    rng = np.random.default_rng(seed)
+    radius = (3.0 * num_atoms / (4.0 * np.pi * PROTEIN_ATOM_DENSITY)) ** (1.0 / 3.0)
+    directions = rng.normal(size=(num_atoms, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    radii = radius * rng.random(num_atoms) ** (1.0 / 3.0)
+    return directions * radii[:, None]
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_benchmark(num_atoms: int, method: str, cutoff: float = 5.0,
+                  num_queries: int = 1000, k: int = 8) -> Dict[str, Any]:
+    """Time index build and queries for one structure size"""
+    coords = synthetic_structure(num_atoms)
+    queries = coords[np.random.default_rng(1).choice(num_atoms, min(num_queries, num_atoms), replace=False)]
+
+    result = {'num_atoms': num_atoms, 'method': method, 'cutoff': cutoff}
+
+    start = time.perf_counter()
+    index = SpatialIndex(coords, cell_size=cutoff, method=method)
+    result['build_s'] = time.perf_counter() - start
+
+    pairs = {}
+    result['radius_query_s'] = _timed(lambda: index.query_radius(queries, cutoff))
+    result['knn_query_s'] = _timed(lambda: index.query_knn(queries, k))
+    result['pairs_within_s'] = _timed(lambda: pairs.setdefault('pairs', index.pairs_within(cutoff)))
+    result['num_pairs'] = int(len(pairs['pairs'][0]))
+    result['num_queries'] = len(queries)
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 100_000, 500_000])
+    parser.add_argument('--cutoff', type=float, default=5.0)
+    parser.add_argument('--methods', nargs='+', default=None,
+                        help="Index methods to compare (default: grid, plus kdtree when SciPy is installed)")
+    args = parser.parse_args(argv)
+
+    methods = args.methods or (['grid', 'kdtree'] if SCIPY_AVAILABLE else ['grid'])
+    results = [run_benchmark(size, method, cutoff=args.cutoff)
+               for size in args.sizes for method in methods]
+
+    print(json.dumps({'benchmark': 'spatial_index', 'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
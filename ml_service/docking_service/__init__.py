@@ -10,12 +10,42 @@ This module provides molecular docking capabilities including:
 
 from .docking_engine import DockingEngine
 from .ligand_processor import LigandProcessor
+from .workspace import WorkspaceManager, DockingWorkspace
+from .receptor_cache import ReceptorCache
+from .results_store import ResultsStore
+from .vina_locator import locate_vina
+from .vina_scoring import VinaScorer
+from .pose_analysis import parse_pdbqt_poses, cluster_poses
+from .virtual_screening import VirtualScreener, parse_ligand_library
+from .descriptor_table import DescriptorTable, compute_descriptor_table, prefilter_library
+from .similarity_index import SimilarityIndex, SimilarityIndexStore, build_index
+from .deduplication import CompactHashSet, dedupe_ligands, dedupe_library_file, duplicate_report
 # from .result_analyzer import DockingResultAnalyzer
 # from .visualization import DockingVisualizer
 
 __all__ = [
     'DockingEngine',
     'LigandProcessor',
+    'WorkspaceManager',
+    'DockingWorkspace',
+    'ReceptorCache',
+    'ResultsStore',
+    'locate_vina',
+    'VinaScorer',
+    'parse_pdbqt_poses',
+    'cluster_poses',
+    'VirtualScreener',
+    'parse_ligand_library',
+    'DescriptorTable',
+    'compute_descriptor_table',
+    'prefilter_library',
+    'SimilarityIndex',
+    'SimilarityIndexStore',
+    'build_index',
+    'CompactHashSet',
+    'dedupe_ligands',
+    'dedupe_library_file',
+    'duplicate_report',
     # 'DockingResultAnalyzer',
     # 'DockingVisualizer'
 ]
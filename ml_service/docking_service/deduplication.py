@@ -0,0 +1,438 @@
+"""
+Ligand Library Deduplication
+
+This module removes repeated compounds from ligand libraries before docking:
+- Canonical SMILES keys (see utils.canonical) computed chunk by chunk,
+  optionally in worker processes
+- 64-bit BLAKE2b hashes of the keys held in a compact open-addressing
+  NumPy hash set (16 bytes per slot) that streams the library in one pass
+- External mode for libraries whose unique set does not fit in memory:
+  sorted (hash, index) runs spilled to disk, block-merged, and a second
+  pass over the file that skips the duplicates
+- Duplicate group reports (canonical SMILES, first occurrence, repeats)
+
+Unparseable SMILES are never merged with valid compounds; they are keyed by
+their raw text, so only verbatim repeats of the same invalid string collapse.
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from utils.canonical import try_canonical_smiles
+from utils.parallel import bounded_imap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (hash, index) pairs per sorted run in external mode (16 bytes each)
+DEFAULT_RUN_SIZE = 4_000_000
+
+# Pairs read from each run per merge step
+MERGE_BLOCK = 65536
+
+# Duplicate groups kept in reports; counts always cover the whole library
+DEFAULT_MAX_GROUPS = 100
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def key_hash(key: str) -> int:
+    """Nonzero 64-bit BLAKE2b hash of a deduplication key"""
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+def _key_chunk(smiles: List[str], isomeric: bool = True) -> Tuple[List[Optional[str]], np.ndarray]:
+    """Canonical SMILES (None if invalid) and key hashes for one chunk"""
+    canonical: List[Optional[str]] = []
+    hashes = np.empty(len(smiles), dtype=np.uint64)
+    for i, text in enumerate(smiles):
+        key, _ = try_canonical_smiles(text, isomeric)
+        canonical.append(key)
+        hashes[i] = key_hash(key if key is not None else '\0' + str(text).strip())
+    return canonical, hashes
+
+
+def _normalized(ligands: Iterable[Any]) -> Iterator[Dict[str, str]]:
+    for index, ligand in enumerate(ligands):
+        if not isinstance(ligand, dict):
+            ligand = {'name': f'ligand_{index + 1}', 'smiles': str(ligand)}
+        yield ligand
+
+
+def iter_keyed_chunks(ligands: Iterable[Any], processes: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      isomeric: bool = True) -> Iterator[Tuple[List[Dict[str, str]], List[Optional[str]], np.ndarray]]:
+    """
+    Canonicalize a ligand stream chunk by chunk, in library order
+
+    Args:
+        ligands: {'name', 'smiles'} dictionaries or plain SMILES strings
+        processes: Worker processes; 1 computes in the calling process
+        chunk_size: Ligands per chunk
+        isomeric: Keep stereo and isotopes in the keys (stereoisomers stay distinct)
+
+    Yields:
+        (ligand dicts, canonical SMILES, uint64 key hashes) per chunk
+    """
+    def chunks() -> Iterator[List[Dict[str, str]]]:
+        chunk: List[Dict[str, str]] = []
+        for ligand in _normalized(ligands):
+            chunk.append(ligand)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if processes <= 1:
+        for chunk in chunks():
+            canonical, hashes = _key_chunk([ligand.get('smiles', '') for ligand in chunk], isomeric)
+            yield chunk, canonical, hashes
+        return
+
+    # Results come back in order, so a tee of the chunk stream pairs each
+    # chunk with its keys (the tee only buffers the chunks in flight)
+    pending, submitted = itertools.tee(chunks())
+    tasks = (([ligand.get('smiles', '') for ligand in chunk], isomeric) for chunk in submitted)
+    with Pool(processes) as pool:
+        for chunk, (canonical, hashes) in zip(pending, bounded_imap(pool, _key_chunk, tasks)):
+            yield chunk, canonical, hashes
+
+
+class CompactHashSet:
+    """
+    Open-addressing hash set of nonzero uint64 hashes, each mapped to the
+    index of its first occurrence
+
+    Keys and values live in two flat NumPy arrays probed linearly; whole
+    chunks are inserted with vectorized probing rounds.
+    """
+
+    def __init__(self, capacity: int = 1 << 16, max_load: float = 0.5):
+        self.max_load = max_load
+        self.size = 0
+        self._allocate(max(16, 1 << int(np.ceil(np.log2(max(capacity, 1))))))
+
+    def _allocate(self, slots: int):
+        self.keys = np.zeros(slots, dtype=np.uint64)
+        self.values = np.zeros(slots, dtype=np.int64)
+        self.mask = np.uint64(slots - 1)
+        self.shift = np.uint64(64 - int(np.log2(slots)))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.values.nbytes
+
+    def _slots(self, hashes: np.ndarray) -> np.ndarray:
+        # Fibonacci hashing spreads clustered hash values over the table
+        return ((hashes * _GOLDEN) >> self.shift).astype(np.int64)
+
+    def _grow(self, needed: int):
+        slots = len(self.keys)
+        while needed > slots * self.max_load:
+            slots *= 2
+        if slots == len(self.keys):
+            return
+        occupied = self.keys != 0
+        keys, values = self.keys[occupied], self.values[occupied]
+        self._allocate(slots)
+        self.size = 0
+        self._insert_unique(keys, values)
+
+    def _insert_unique(self, hashes: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Insert distinct hashes; returns the stored first index of each"""
+        first = np.empty(len(hashes), dtype=np.int64)
+        pending = np.arange(len(hashes))
+        slots = self._slots(hashes)
+        mask = int(self.mask)
+        while len(pending):
+            slot = slots[pending]
+            stored = self.keys[slot]
+            found = stored == hashes[pending]
+            first[pending[found]] = self.values[slot[found]]
+
+            empty = np.flatnonzero(stored == 0)
+            # Several pending hashes can probe the same empty slot; the first one wins
+            _, winners = np.unique(slot[empty], return_index=True)
+            claim = empty[winners]
+            self.keys[slot[claim]] = hashes[pending[claim]]
+            self.values[slot[claim]] = indices[pending[claim]]
+            first[pending[claim]] = indices[pending[claim]]
+            self.size += len(claim)
+
+            settled = found
+            settled[claim] = True
+            pending = pending[~settled]
+            slots[pending] = (slots[pending] + 1) & mask
+        return first
+
+    def add(self, hashes: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """
+        Insert a chunk of hashes with their library indices
+
+        Returns:
+            (N,) first-occurrence index of every hash; entries equal to their
+            own index are first occurrences
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        indices = np.asarray(indices, dtype=np.int64)
+        if not len(hashes):
+            return np.empty(0, dtype=np.int64)
+        unique, first_position, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        self._grow(self.size + len(unique))
+        return self._insert_unique(unique, indices[first_position])[inverse.reshape(-1)]
+
+
+class _GroupReport:
+    """Duplicate counts plus the first max_groups duplicate groups"""
+
+    def __init__(self, groups: Optional[List[Dict[str, Any]]], max_groups: int):
+        self.groups = groups
+        self.max_groups = max_groups
+        self.by_first: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, first: int, index: int, ligand: Dict[str, str], canonical: Optional[str]):
+        if self.groups is None:
+            return
+        group = self.by_first.get(first)
+        if group is None:
+            if len(self.groups) >= self.max_groups:
+                return
+            group = {'canonical_smiles': canonical, 'first_index': first, 'duplicates': []}
+            self.by_first[first] = group
+            self.groups.append(group)
+        group['duplicates'].append({'index': index, 'name': ligand.get('name'), 'smiles': ligand.get('smiles')})
+
+
+def _start_stats(stats: Optional[Dict[str, int]]):
+    if stats is not None:
+        stats.update({'total': 0, 'unique': 0, 'duplicates': 0, 'invalid': 0})
+
+
+def _count(stats: Optional[Dict[str, int]], canonical: List[Optional[str]], duplicates: int):
+    if stats is not None:
+        stats['total'] += len(canonical)
+        stats['invalid'] += canonical.count(None)
+        stats['duplicates'] += duplicates
+        stats['unique'] += len(canonical) - duplicates
+
+
+def iter_unique(ligands: Iterable[Any], processes: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                isomeric: bool = True, stats: Optional[Dict[str, int]] = None,
+                groups: Optional[List[Dict[str, Any]]] = None,
+                max_groups: int = DEFAULT_MAX_GROUPS) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Stream the first occurrence of every compound with its library index
+
+    Args:
+        ligands: {'name', 'smiles'} dictionaries or plain SMILES strings
+        processes, chunk_size, isomeric: See iter_keyed_chunks
+        stats: Optional dictionary updated in place with 'total', 'unique',
+            'duplicates' and 'invalid' counts
+        groups: Optional list extended in place with duplicate groups
+            {'canonical_smiles', 'first_index', 'duplicates': [{'index', 'name', 'smiles'}]}
+        max_groups: Most groups recorded in groups (the first found to repeat)
+
+    Yields:
+        (library index, ligand dict) of first occurrences, in library order
+    """
+    _start_stats(stats)
+    report = _GroupReport(groups, max_groups)
+    seen = CompactHashSet()
+    offset = 0
+    for chunk, canonical, hashes in iter_keyed_chunks(ligands, processes, chunk_size, isomeric):
+        indices = np.arange(offset, offset + len(chunk))
+        first = seen.add(hashes, indices)
+        repeated = first != indices
+        _count(stats, canonical, int(repeated.sum()))
+        for i, ligand in enumerate(chunk):
+            if repeated[i]:
+                report.add(int(first[i]), offset + i, ligand, canonical[i])
+            else:
+                yield offset + i, ligand
+        offset += len(chunk)
+
+
+def dedupe_ligands(ligands: Iterable[Any], **kwargs) -> Iterator[Dict[str, str]]:
+    """Stream the first occurrence of every compound (see iter_unique for options)"""
+    for _, ligand in iter_unique(ligands, **kwargs):
+        yield ligand
+
+
+def _write_run(pairs: List[np.ndarray], directory: str, number: int) -> str:
+    run = np.concatenate(pairs)
+    run = run[np.lexsort((run[:, 1], run[:, 0]))]
+    path = os.path.join(directory, f'run_{number:05d}.npy')
+    np.save(path, run)
+    return path
+
+
+def _merge_runs(paths: List[str], block: int = MERGE_BLOCK) -> Iterator[np.ndarray]:
+    """
+    Merge sorted (hash, index) runs into one sorted stream of blocks
+
+    Each step takes, from every run's buffered block, the pairs up to the
+    smallest buffered tail pair; no later pair can sort before that bound.
+    """
+    runs = [np.load(path, mmap_mode='r') for path in paths]
+    buffers = [np.asarray(run[:block]) for run in runs]
+    positions = [len(buffer) for buffer in buffers]
+
+    while True:
+        live = [i for i, buffer in enumerate(buffers) if len(buffer)]
+        if not live:
+            return
+        bound = min((tuple(buffers[i][-1]) for i in live))
+        taken = []
+        for i in live:
+            buffer = buffers[i]
+            take = (buffer[:, 0] < bound[0]) | ((buffer[:, 0] == bound[0]) & (buffer[:, 1] <= bound[1]))
+            count = int(take.sum())   # a prefix, since the buffer is sorted
+            taken.append(buffer[:count])
+            buffers[i] = buffer[count:]
+            if not len(buffers[i]) and positions[i] < len(runs[i]):
+                buffers[i] = np.asarray(runs[i][positions[i]:positions[i] + block])
+                positions[i] += len(buffers[i])
+        merged = np.concatenate(taken)
+        yield merged[np.lexsort((merged[:, 1], merged[:, 0]))]
+
+
+def external_duplicates(ligands: Iterable[Any], directory: Optional[str] = None,
+                        run_size: int = DEFAULT_RUN_SIZE, processes: int = 1,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE, isomeric: bool = True,
+                        max_groups: int = DEFAULT_MAX_GROUPS) -> Dict[str, Any]:
+    """
+    First pass of external deduplication: find repeated compounds with
+    memory bounded by run_size
+
+    Args:
+        ligands: {'name', 'smiles'} dictionaries or plain SMILES strings
+        directory: Scratch directory for sorted runs (a temporary one if omitted)
+        run_size: (hash, index) pairs sorted in memory per run
+        processes, chunk_size, isomeric: See iter_keyed_chunks
+        max_groups: Duplicate groups whose members are listed (those with
+            the smallest first indices)
+
+    Returns:
+        {'total', 'invalid', 'duplicates': sorted int64 indices of repeats,
+        'first_of': {repeat index: first index} for the listed groups}
+    """
+    scratch = tempfile.mkdtemp(prefix='dedupe_', dir=directory)
+    try:
+        paths, pending, buffered = [], [], 0
+        total = invalid = 0
+        for chunk, canonical, hashes in iter_keyed_chunks(ligands, processes, chunk_size, isomeric):
+            pending.append(np.stack([hashes.view(np.int64), np.arange(total, total + len(chunk))], axis=1))
+            total += len(chunk)
+            invalid += canonical.count(None)
+            buffered += len(chunk)
+            if buffered >= run_size:
+                paths.append(_write_run(pending, scratch, len(paths)))
+                pending, buffered = [], 0
+        if pending:
+            paths.append(_write_run(pending, scratch, len(paths)))
+
+        duplicates: List[np.ndarray] = []
+        # Groups with the smallest first indices, as in-memory deduplication reports them
+        listed: Dict[int, List[int]] = {}
+        carry_hash, carry_first = None, -1
+        for block in _merge_runs(paths):
+            hashes, indices = block[:, 0], block[:, 1]
+            # A group starts at every hash change; the block head may continue the previous block's group
+            starts = np.ones(len(block), dtype=bool)
+            starts[1:] = hashes[1:] != hashes[:-1]
+            starts[0] = hashes[0] != carry_hash
+            # Pairs sort by (hash, index), so a group's first pair is its first occurrence
+            group_first = np.append(carry_first, indices[starts])[np.cumsum(starts)]
+            repeats = ~starts
+            duplicates.append(indices[repeats])
+            for index, first in zip(indices[repeats].tolist(), group_first[repeats].tolist()):
+                if first not in listed:
+                    if len(listed) >= max_groups:
+                        last = max(listed)
+                        if first > last:
+                            continue
+                        del listed[last]
+                    listed[first] = []
+                listed[first].append(index)
+            carry_hash, carry_first = hashes[-1], int(group_first[-1])
+
+        repeated = np.sort(np.concatenate(duplicates)) if duplicates else np.empty(0, dtype=np.int64)
+        first_of = {index: first for first, members in listed.items() for index in members}
+        return {'total': total, 'invalid': invalid, 'duplicates': repeated, 'first_of': first_of}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def dedupe_library_file(path: str, library_format: Optional[str] = None, directory: Optional[str] = None,
+                        run_size: int = DEFAULT_RUN_SIZE, processes: int = 1,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE, isomeric: bool = True,
+                        stats: Optional[Dict[str, int]] = None, groups: Optional[List[Dict[str, Any]]] = None,
+                        max_groups: int = DEFAULT_MAX_GROUPS) -> Iterator[Dict[str, str]]:
+    """
+    Two-pass external deduplication of a SMILES or SDF library file
+
+    Memory holds one run of (hash, index) pairs and the sorted repeat
+    indices rather than a hash set of every unique compound.
+
+    Args:
+        path: Library file
+        library_format: 'smi', 'sdf' or 'mol2'; inferred from the extension if omitted
+        directory, run_size: See external_duplicates
+        processes, chunk_size, isomeric, stats, groups, max_groups: See iter_unique
+
+    Yields:
+        First occurrences in file order
+    """
+    from .descriptor_table import open_library
+
+    found = external_duplicates(open_library(path, library_format), directory, run_size,
+                                processes, chunk_size, isomeric, max_groups)
+    repeated = found['duplicates']
+    if stats is not None:
+        stats.update({'total': found['total'], 'invalid': found['invalid'],
+                      'duplicates': len(repeated), 'unique': found['total'] - len(repeated)})
+    report = _GroupReport(groups, max_groups)
+    first_of = found['first_of']
+    wanted_first = set(first_of.values())
+    canonical_of: Dict[int, Optional[str]] = {}
+
+    cursor = 0
+    for index, ligand in enumerate(_normalized(open_library(path, library_format))):
+        if index in wanted_first:
+            canonical_of[index], _ = try_canonical_smiles(ligand.get('smiles', ''), isomeric)
+        if cursor < len(repeated) and repeated[cursor] == index:
+            cursor += 1
+            if index in first_of:
+                first = first_of[index]
+                report.add(first, index, ligand, canonical_of.get(first))
+            continue
+        yield ligand
+
+
+def duplicate_report(ligands: Iterable[Any], processes: int = 1, isomeric: bool = True,
+                     max_groups: int = DEFAULT_MAX_GROUPS) -> Dict[str, Any]:
+    """
+    Deduplicate a library in memory and summarize it
+
+    Returns:
+        Counts from iter_unique plus 'groups' and the 'unique' ligand list
+    """
+    stats: Dict[str, Any] = {}
+    groups: List[Dict[str, Any]] = []
+    unique = [dict(ligand, index=index) for index, ligand in
+              iter_unique(ligands, processes=processes, isomeric=isomeric, stats=stats,
+                          groups=groups, max_groups=max_groups)]
+    return dict(stats, groups=groups, ligands=unique)
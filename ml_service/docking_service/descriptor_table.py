@@ -0,0 +1,270 @@
+"""
+Columnar Descriptor Tables for Ligand Libraries
+
+This module computes molecular descriptors for whole ligand libraries:
+- Libraries streamed from lists, SMILES/SDF/MOL2 content or files
+- Chunks parsed and described in worker processes; only NumPy columns
+  travel back to the parent
+- DescriptorTable with one typed column per descriptor, optional Arrow export
+- Vectorized Lipinski / Veber / range filters over the table
+- Streaming prefilter that never materializes the full library, for
+  cutting multi-million compound libraries down before docking
+"""
+
+import logging
+import os
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from utils.smiles import try_parse_smiles
+from utils.parallel import bounded_imap
+from utils.mol_properties import compute_descriptors, concatenate_graphs, LIPINSKI_LIMITS
+from utils.molfile import FORMAT_EXTENSIONS, read_molecules, ligand_entry
+from .virtual_screening import parse_ligand_library
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Column dtypes; float columns are NaN and integer columns -1 for invalid SMILES
+DESCRIPTOR_COLUMNS = {
+    'molecular_weight': np.float32, 'logp': np.float32, 'tpsa': np.float32,
+    'hbd': np.int16, 'hba': np.int16, 'rotatable_bonds': np.int16, 'ring_count': np.int16,
+    'aromatic_rings': np.int16, 'atom_count': np.int16, 'formal_charge': np.int16,
+    'lipinski_violations': np.int8
+}
+
+# Veber et al., J. Med. Chem. 2002
+VEBER_LIMITS = {'rotatable_bonds': 10, 'tpsa': 140.0}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _describe_chunk(chunk: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+    """Parse one chunk of (name, smiles) pairs and compute its descriptor columns"""
+    graphs = []
+    valid = np.zeros(len(chunk), dtype=bool)
+    for i, (_, smiles) in enumerate(chunk):
+        graph, _ = try_parse_smiles(smiles)
+        if graph is not None:
+            graphs.append(graph)
+            valid[i] = True
+
+    descriptors = compute_descriptors(concatenate_graphs(graphs))
+    columns: Dict[str, np.ndarray] = {
+        'name': np.array([name for name, _ in chunk], dtype=object),
+        'smiles': np.array([smiles for _, smiles in chunk], dtype=object),
+        'valid': valid
+    }
+    for name, dtype in DESCRIPTOR_COLUMNS.items():
+        column = np.full(len(chunk), np.nan if np.dtype(dtype).kind == 'f' else -1, dtype=dtype)
+        column[valid] = descriptors[name]
+        columns[name] = column
+    return columns
+
+
+def _chunks(ligands: Iterable[Dict[str, str]], chunk_size: int) -> Iterator[List[Tuple[str, str]]]:
+    chunk: List[Tuple[str, str]] = []
+    for ligand in ligands:
+        chunk.append((ligand.get('name', ''), ligand.get('smiles', '')))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_descriptor_chunks(ligands: Iterable[Dict[str, str]], processes: int = 1,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator['DescriptorTable']:
+    """
+    Describe a ligand stream chunk by chunk, in library order
+
+    Args:
+        ligands: {'name', 'smiles'} dictionaries (see parse_ligand_library)
+        processes: Worker processes; 1 computes in the calling process.
+            At most two chunks per worker are in flight, so the input is
+            read only as fast as tables are consumed
+        chunk_size: Ligands per chunk
+
+    Yields:
+        DescriptorTable per chunk
+    """
+    if processes <= 1:
+        for chunk in _chunks(ligands, chunk_size):
+            yield DescriptorTable(_describe_chunk(chunk))
+        return
+
+    with Pool(processes) as pool:
+        for columns in bounded_imap(pool, _describe_chunk, ((chunk,) for chunk in _chunks(ligands, chunk_size))):
+            yield DescriptorTable(columns)
+
+
+def compute_descriptor_table(ligands: Iterable[Dict[str, str]], processes: int = 1,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'DescriptorTable':
+    """Describe a whole ligand library into one DescriptorTable"""
+    return DescriptorTable.concatenate(list(iter_descriptor_chunks(ligands, processes, chunk_size)))
+
+
+def open_library(path: str, library_format: Optional[str] = None, processes: int = 1) -> Iterator[Dict[str, str]]:
+    """
+    Stream {'name', 'smiles'} entries from a SMILES, SDF or MOL2 file
+
+    Args:
+        path: Library file; SDF and MOL2 files may be gzip-compressed
+        library_format: 'smi', 'sdf' or 'mol2'; inferred from the extension if omitted
+        processes: Worker processes parsing SDF / MOL2 records by byte range
+    """
+    if library_format is None:
+        stem = path[:-3] if path.lower().endswith('.gz') else path
+        library_format = FORMAT_EXTENSIONS.get(os.path.splitext(stem)[1].lower(), 'smi')
+    if library_format.lower() in ('sdf', 'mol2'):
+        entries = read_molecules(path, library_format.lower(), processes=processes, transform=ligand_entry)
+        for index, entry in enumerate(entries, 1):
+            yield {'name': entry['name'] or f'ligand_{index}', 'smiles': entry['smiles']}
+        return
+    with open(path) as f:
+        yield from parse_ligand_library(f, library_format)
+
+
+def prefilter_library(ligands: Iterable[Dict[str, str]], lipinski: bool = True, veber: bool = True,
+                      max_lipinski_violations: int = 1, ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+                      processes: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the ligands that pass descriptor filters
+
+    Args:
+        ligands: {'name', 'smiles'} dictionaries
+        lipinski, veber, max_lipinski_violations, ranges: See DescriptorTable.filter_mask
+        processes, chunk_size: See iter_descriptor_chunks
+        stats: Optional dictionary updated in place with 'total', 'invalid'
+            and 'passed' counts
+
+    Yields:
+        {'name', 'smiles'} dictionaries of passing ligands
+    """
+    if stats is not None:
+        stats.update({'total': 0, 'invalid': 0, 'passed': 0})
+    for table in iter_descriptor_chunks(ligands, processes, chunk_size):
+        mask = table.filter_mask(lipinski=lipinski, veber=veber,
+                                 max_lipinski_violations=max_lipinski_violations, ranges=ranges)
+        if stats is not None:
+            stats['total'] += len(table)
+            stats['invalid'] += int((~table['valid']).sum())
+            stats['passed'] += int(mask.sum())
+        for index in np.flatnonzero(mask):
+            yield {'name': table['name'][index], 'smiles': table['smiles'][index]}
+
+
+class DescriptorTable:
+    """
+    Columnar descriptor table: 'name', 'smiles' and 'valid' columns plus one
+    typed NumPy column per entry of DESCRIPTOR_COLUMNS
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+
+    @classmethod
+    def concatenate(cls, tables: List['DescriptorTable']) -> 'DescriptorTable':
+        if not tables:
+            return cls(_describe_chunk([]))
+        return cls({name: np.concatenate([table.columns[name] for table in tables])
+                    for name in tables[0].columns})
+
+    def __len__(self) -> int:
+        return len(self.columns['valid'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+
+    def lipinski_mask(self, max_violations: int = 1) -> np.ndarray:
+        """Valid molecules with at most max_violations rule-of-five violations"""
+        violations = sum((self.columns[name] > limit).astype(np.int8) for name, limit in LIPINSKI_LIMITS.items())
+        return self.columns['valid'] & (violations <= max_violations)
+
+    def veber_mask(self, max_rotatable_bonds: int = VEBER_LIMITS['rotatable_bonds'],
+                   max_tpsa: float = VEBER_LIMITS['tpsa']) -> np.ndarray:
+        """Valid molecules with at most max_rotatable_bonds and TPSA <= max_tpsa"""
+        return (self.columns['valid'] & (self.columns['rotatable_bonds'] <= max_rotatable_bonds)
+                & (self.columns['tpsa'] <= max_tpsa))
+
+    def range_mask(self, ranges: Dict[str, Tuple[Optional[float], Optional[float]]]) -> np.ndarray:
+        """Valid molecules whose columns fall inside inclusive (low, high) bounds; None leaves a side open"""
+        mask = self.columns['valid'].copy()
+        for name, (low, high) in ranges.items():
+            if name not in DESCRIPTOR_COLUMNS:
+                raise ValueError(f"Unknown descriptor: {name}")
+            if low is not None:
+                mask &= self.columns[name] >= low
+            if high is not None:
+                mask &= self.columns[name] <= high
+        return mask
+
+    def filter_mask(self, lipinski: bool = True, veber: bool = True, max_lipinski_violations: int = 1,
+                    ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> np.ndarray:
+        """Combined boolean mask of the selected filters (invalid SMILES never pass)"""
+        mask = self.columns['valid'].copy()
+        if lipinski:
+            mask &= self.lipinski_mask(max_lipinski_violations)
+        if veber:
+            mask &= self.veber_mask()
+        if ranges:
+            mask &= self.range_mask(ranges)
+        return mask
+
+    def select(self, mask: np.ndarray) -> 'DescriptorTable':
+        """New table with the rows where mask is true (or the given row indices)"""
+        return DescriptorTable({name: column[mask] for name, column in self.columns.items()})
+
+    def summary(self) -> Dict[str, Any]:
+        """Row counts plus mean / min / max of each descriptor over valid rows"""
+        valid = self.columns['valid']
+        stats: Dict[str, Any] = {'rows': len(self), 'valid': int(valid.sum())}
+        if valid.any():
+            for name in DESCRIPTOR_COLUMNS:
+                values = self.columns[name][valid].astype(np.float64)
+                stats[name] = {'mean': round(float(values.mean()), 3),
+                               'min': round(float(values.min()), 3),
+                               'max': round(float(values.max()), 3)}
+        return stats
+
+    def to_dict(self, decimals: int = 3) -> Dict[str, List[Any]]:
+        """Column-oriented JSON-friendly dictionary (NaN becomes None)"""
+        result: Dict[str, List[Any]] = {}
+        for name, column in self.columns.items():
+            if column.dtype.kind == 'f':
+                rounded = np.round(column.astype(np.float64), decimals)
+                result[name] = [None if np.isnan(value) else float(value) for value in rounded]
+            else:
+                result[name] = column.tolist()
+        return result
+
+    def to_arrow(self):
+        """pyarrow.Table with the same columns"""
+        if not ARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is not installed")
+        return pa.table({name: pa.array(column.tolist() if column.dtype == object else column)
+                         for name, column in self.columns.items()})
+
+    def save(self, path: str):
+        """Write the table to a compressed .npz file"""
+        arrays = {name: column.astype(str) if column.dtype == object else column
+                  for name, column in self.columns.items()}
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'DescriptorTable':
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name].astype(object) if data[name].dtype.kind == 'U' else data[name]
+                        for name in data.files})
@@ -8,9 +8,11 @@ This module provides the core docking functionality including:
 - Result processing and scoring
 """
 
+import copy
+import hashlib
 import os
 import tempfile
-import subprocess
+import time
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
@@ -19,61 +21,133 @@ import numpy as np
 import json
 from pathlib import Path
 
+from utils.sasa import delta_sasa_batch, structure_arrays
+from utils.voxel_grid import occupancy_grid, pack_grid, unpack_grid
+from utils.cavity_detection import detect_pockets
+from utils.job_queue import TTLRegistry, JobCancelled, JobTimeout, run_cancellable
+from utils.conformers import ConformerSet
+from .workspace import WorkspaceManager, safe_filename
+from .receptor_cache import ReceptorCache, link_or_copy
+from .results_store import ResultsStore
+from .ligand_processor import LigandProcessor
+from .vina_locator import locate_vina
+from .vina_scoring import VinaScorer, assign_xs_types, rigid_pose_search
+from .pose_analysis import parse_pdbqt_poses, cluster_poses, rmsd_from_best, CLUSTER_RMSD
+
 logger = logging.getLogger(__name__)
 
+# Upper bound on a single Vina run (seconds)
+VINA_TIMEOUT = 300
+
+# Recent docking results kept in memory
+RESULT_REGISTRY_SIZE = 256
+RESULT_REGISTRY_TTL = 3600
+
+# Receptor scorers kept in memory for rescoring
+SCORER_CACHE_SIZE = 8
+
+# Conformers embedded per ligand; the lowest-energy one is docked
+LIGAND_CONFORMERS = 4
+
+# Binding modes reported when Vina is not available
+MOCK_NUM_MODES = 5
+
+# Rigid-search poses kept per reported mode before clustering
+MOCK_POSES_PER_MODE = 4
+
 class DockingEngine:
     """Core molecular docking engine using AutoDock Vina"""
     
-    def __init__(self, vina_executable: Optional[str] = None):
-        self.vina_executable = vina_executable or self._find_vina_executable()
+    def __init__(self, vina_executable: Optional[str] = None,
+                 receptor_cache: Optional[ReceptorCache] = None,
+                 results_store: Optional[ResultsStore] = None,
+                 ligand_processor: Optional[LigandProcessor] = None):
+        # Vina is located lazily on first use so constructing the engine
+        # (at service import time) never runs subprocesses
+        self._vina_executable = vina_executable
+        self._vina_version = None
+        self._vina_resolved = vina_executable is not None
         self.temp_dir = tempfile.mkdtemp(prefix="geneinsight_docking_")
-        self.docking_results = {}
-        
-    def _find_vina_executable(self) -> str:
-        """Find AutoDock Vina executable"""
-        possible_paths = [
-            'vina',
-            '/usr/local/bin/vina',
-            '/opt/vina/bin/vina',
-            'autodock_vina'
-        ]
-        
-        for path in possible_paths:
-            try:
-                result = subprocess.run([path, '--help'], 
-                                      capture_output=True, text=True, timeout=10)
-                if result.returncode == 0:
-                    logger.info(f"Found Vina executable: {path}")
-                    return path
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                continue
-        
-        logger.warning("AutoDock Vina not found. Using mock docking.")
-        return None
-    
-    def prepare_protein(self, protein_data: str, protein_format: str = 'pdb') -> Dict[str, Any]:
-        """Prepare protein structure for docking"""
+        self.workspaces = WorkspaceManager(self.temp_dir)
+        self.receptor_cache = receptor_cache or ReceptorCache()
+        self.docking_results = TTLRegistry(RESULT_REGISTRY_SIZE, RESULT_REGISTRY_TTL)
+        self._scorers = TTLRegistry(SCORER_CACHE_SIZE, RESULT_REGISTRY_TTL)
+        # Docking results are archived here when set (None keeps them in memory only)
+        self.results_store = results_store
+        # Ligand contexts keyed by canonical SMILES: any spelling of a compound
+        # prepared recently reuses its descriptors and conformers
+        self.ligand_processor = ligand_processor or LigandProcessor()
+
+    @property
+    def vina_executable(self) -> Optional[str]:
+        """Path of the Vina executable, or None when docking runs in mock mode"""
+        if not self._vina_resolved:
+            info = locate_vina()
+            if info:
+                self._vina_executable = info['path']
+                self._vina_version = info['version']
+            self._vina_resolved = True
+        return self._vina_executable
+
+    @vina_executable.setter
+    def vina_executable(self, path: Optional[str]):
+        self._vina_executable = path
+        self._vina_version = None
+        self._vina_resolved = True
+
+    def get_vina_info(self) -> Dict[str, Any]:
+        """Vina availability, path and version (triggers discovery if needed)"""
+        path = self.vina_executable
+        return {'available': path is not None, 'path': path, 'version': self._vina_version}
+
+    def prepare_protein(self, protein_data: Optional[str], protein_format: str = 'pdb',
+                        workspace_id: Optional[str] = None,
+                        receptor_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Prepare protein structure for docking
+
+        Files are written to the given workspace, or to a new one whose ID is
+        returned as the handle for subsequent ligand preparation and docking.
+        Prepared receptors are cached by content; the returned receptor_id can
+        be passed instead of protein_data to reuse a cached preparation.
+        """
         try:
-            protein_file = os.path.join(self.temp_dir, f"protein.{protein_format}")
-            
-            # Save protein data to file
-            with open(protein_file, 'w') as f:
-                f.write(protein_data)
-            
-            # Basic protein validation
-            validation_result = self._validate_protein_structure(protein_file)
-            
-            # Convert to PDBQT format (simplified - in real implementation use MGLTools)
-            pdbqt_file = os.path.join(self.temp_dir, "protein.pdbqt")
-            self._convert_to_pdbqt(protein_file, pdbqt_file, is_protein=True)
-            
-            return {
-                'success': True,
-                'protein_file': protein_file,
-                'pdbqt_file': pdbqt_file,
-                'validation': validation_result,
-                'binding_sites': self._identify_binding_sites(protein_file)
-            }
+            if receptor_id:
+                cached = self.receptor_cache.get(receptor_id)
+                if cached is None:
+                    raise ValueError(f"Unknown or evicted receptor: {receptor_id}")
+            elif protein_data:
+                receptor_id = self.receptor_cache.receptor_id(protein_data, protein_format)
+                cached = self.receptor_cache.get(receptor_id)
+            else:
+                raise ValueError("Protein data or a receptor ID is required")
+
+            with self.workspaces.session(workspace_id, prefix='dock') as workspace:
+                if cached is None:
+                    cached = self._prepare_receptor(protein_data, protein_format, receptor_id, workspace)
+                    from_cache = False
+                else:
+                    from_cache = True
+
+                workspace.metadata['receptor_id'] = receptor_id
+
+                # Workspaces get hard links so cache eviction never affects a running job
+                for key in ('protein_file', 'protein_pdbqt'):
+                    path = workspace.file_path(os.path.basename(cached['files'][key]))
+                    if not os.path.exists(path):
+                        link_or_copy(cached['files'][key], path)
+                    workspace.register_file(key, path)
+
+                return {
+                    'success': True,
+                    'workspace_id': workspace.workspace_id,
+                    'receptor_id': receptor_id,
+                    'cached': from_cache,
+                    'protein_file': workspace.files['protein_file'],
+                    'pdbqt_file': workspace.files['protein_pdbqt'],
+                    'validation': cached['validation'],
+                    'binding_sites': cached['binding_sites']
+                }
             
         except Exception as e:
             logger.error(f"Protein preparation failed: {e}")
@@ -81,43 +155,102 @@ class DockingEngine:
                 'success': False,
                 'error': str(e)
             }
+
+    def _prepare_receptor(self, protein_data: str, protein_format: str, receptor_id: str,
+                          workspace) -> Dict[str, Any]:
+        """Run the full receptor preparation in a workspace and publish it to the cache"""
+        protein_file = workspace.file_path(f"protein.{safe_filename(protein_format, 'pdb')}")
+
+        # Save protein data to file
+        with open(protein_file, 'w') as f:
+            f.write(protein_data)
+
+        # Basic protein validation
+        validation_result = self._validate_protein_structure(protein_file)
+
+        # Convert to PDBQT format (simplified - in real implementation use MGLTools)
+        pdbqt_file = workspace.file_path("protein.pdbqt")
+        self._convert_to_pdbqt(protein_file, pdbqt_file, is_protein=True)
+
+        # The occupancy grid is shared by pocket detection and the cache
+        coords, radii, _ = structure_arrays(protein_data)
+        grid = occupancy_grid(coords, radii) if len(coords) else None
+        binding_sites = self._identify_binding_sites(protein_file, grid)
+
+        arrays = {}
+        if grid is not None:
+            arrays = {'atom_coords': coords.astype(np.float32), 'atom_radii': radii.astype(np.float32)}
+            arrays.update(pack_grid(grid))
+
+        return self.receptor_cache.put(
+            receptor_id,
+            {'protein_file': protein_file, 'protein_pdbqt': pdbqt_file},
+            {'protein_format': protein_format, 'validation': validation_result,
+             'binding_sites': binding_sites},
+            arrays
+        )
+
+    def get_receptor_grids(self, receptor_id: str) -> Dict[str, Any]:
+        """Cached atom arrays and occupancy grid of a prepared receptor"""
+        arrays = self.receptor_cache.load_arrays(receptor_id)
+        if 'grid_occupied' in arrays:
+            arrays['grid'] = unpack_grid(arrays)
+        return arrays
     
-    def prepare_ligand(self, ligand_smiles: str, ligand_name: str = "ligand") -> Dict[str, Any]:
-        """Prepare ligand for docking (simplified version without RDKit)"""
-        try:
-            # Basic SMILES validation
-            if not ligand_smiles or not isinstance(ligand_smiles, str):
-                raise ValueError("Invalid SMILES string")
+    def prepare_ligand(self, ligand_smiles: str, ligand_name: str = "ligand",
+                       workspace_id: Optional[str] = None,
+                       conformers: Optional[ConformerSet] = None) -> Dict[str, Any]:
+        """
+        Prepare ligand for docking: embed 3D conformers and write the
+        lowest-energy one as SDF and PDBQT
 
-            ligand_smiles = ligand_smiles.strip()
-            if len(ligand_smiles) < 2:
-                raise ValueError("SMILES string too short")
+        Conformers come from the ligand processor's context for the compound,
+        embedded once per canonical SMILES (and seeded from it), so every
+        spelling of a ligand gets the same coordinates.
 
-            # Mock molecular properties calculation
-            properties = self._calculate_ligand_properties_mock(ligand_smiles)
+        Args:
+            conformers: Precomputed conformers of this SMILES (e.g. from
+                embed_batch), skipping the embedding step
+        """
+        try:
+            # Canonical context of the compound (raises SmilesError, a ValueError)
+            context = self.ligand_processor.ligand_context(ligand_smiles)
+            ligand_smiles = ligand_smiles.strip()
+            properties = dict(context.properties)
+            if conformers is None:
+                # Shallow copy: the cached set is shared, only the title differs
+                conformers = copy.copy(context.conformers(LIGAND_CONFORMERS))
+                conformers.name = ligand_name
+            best = conformers.best()
 
-            # Create mock files
-            sdf_file = os.path.join(self.temp_dir, f"{ligand_name}.sdf")
-            pdbqt_file = os.path.join(self.temp_dir, f"{ligand_name}.pdbqt")
+            with self.workspaces.session(workspace_id, prefix='ligand') as workspace:
+                file_stem = safe_filename(ligand_name)
+                sdf_file = workspace.file_path(f"{file_stem}.sdf")
+                pdbqt_file = workspace.file_path(f"{file_stem}.pdbqt")
 
-            # Create mock SDF file
-            with open(sdf_file, 'w') as f:
-                f.write(f"# Mock SDF file for {ligand_name}\n")
-                f.write(f"# SMILES: {ligand_smiles}\n")
+                with open(sdf_file, 'w') as f:
+                    f.write(conformers.to_sdf([best]))
+                with open(pdbqt_file, 'w') as f:
+                    f.write(conformers.to_pdbqt(best))
 
-            # Convert to PDBQT format
-            self._convert_to_pdbqt(sdf_file, pdbqt_file, is_protein=False)
+                workspace.register_file('ligand_sdf', sdf_file)
+                workspace.register_file('ligand_pdbqt', pdbqt_file)
+                workspace.metadata['ligand_smiles'] = ligand_smiles
+                workspace.metadata['ligand_name'] = ligand_name
 
-            return {
-                'success': True,
-                'ligand_name': ligand_name,
-                'smiles': ligand_smiles,
-                'sdf_file': sdf_file,
-                'pdbqt_file': pdbqt_file,
-                'properties': properties,
-                'mol_weight': properties.get('molecular_weight', 0),
-                'num_atoms': properties.get('atom_count', 0)
-            }
+                return {
+                    'success': True,
+                    'workspace_id': workspace.workspace_id,
+                    'ligand_name': ligand_name,
+                    'smiles': ligand_smiles,
+                    'canonical_smiles': context.canonical_smiles,
+                    'sdf_file': sdf_file,
+                    'pdbqt_file': pdbqt_file,
+                    'properties': properties,
+                    'mol_weight': properties.get('molecular_weight', 0),
+                    'num_atoms': properties.get('atom_count', 0),
+                    'conformer_energy': round(float(conformers.energies[best]), 4)
+                }
             
         except Exception as e:
             logger.error(f"Ligand preparation failed: {e}")
@@ -126,51 +259,100 @@ class DockingEngine:
                 'error': str(e)
             }
     
-    def perform_docking(self, protein_pdbqt: str, ligand_pdbqt: str, 
+    def perform_docking(self, protein_pdbqt: Optional[str], ligand_pdbqt: Optional[str],
                        binding_site: Dict[str, float], 
-                       exhaustiveness: int = 8) -> Dict[str, Any]:
-        """Perform molecular docking using AutoDock Vina"""
+                       exhaustiveness: int = 8,
+                       workspace_id: Optional[str] = None,
+                       cpu: Optional[int] = None,
+                       job=None, cancel_event=None) -> Dict[str, Any]:
+        """
+        Perform molecular docking using AutoDock Vina
+
+        Output files go to the job's workspace, so concurrent runs never
+        overwrite each other. When workspace_id is given, missing receptor or
+        ligand paths are taken from the files registered during preparation.
+        cpu limits the threads Vina uses for this run. When called from the job
+        queue, job is its JobContext: Vina is killed on cancellation or when
+        the job deadline passes, and the exception propagates to the queue.
+        Outside the queue, setting cancel_event (a threading or
+        multiprocessing Event) kills Vina the same way.
+        """
         try:
-            if not self.vina_executable:
-                return self._mock_docking_result(protein_pdbqt, ligand_pdbqt, binding_site)
-            
-            output_file = os.path.join(self.temp_dir, "docking_result.pdbqt")
-            log_file = os.path.join(self.temp_dir, "docking.log")
-            
-            # Prepare Vina command
-            vina_cmd = [
-                self.vina_executable,
-                '--receptor', protein_pdbqt,
-                '--ligand', ligand_pdbqt,
-                '--out', output_file,
-                '--log', log_file,
-                '--center_x', str(binding_site['x']),
-                '--center_y', str(binding_site['y']),
-                '--center_z', str(binding_site['z']),
-                '--size_x', str(binding_site.get('size_x', 20)),
-                '--size_y', str(binding_site.get('size_y', 20)),
-                '--size_z', str(binding_site.get('size_z', 20)),
-                '--exhaustiveness', str(exhaustiveness)
-            ]
-            
-            # Run docking
-            logger.info(f"Running docking command: {' '.join(vina_cmd)}")
-            result = subprocess.run(vina_cmd, capture_output=True, text=True, timeout=300)
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"Vina failed: {result.stderr}")
-            
-            # Parse results
-            docking_results = self._parse_vina_output(log_file, output_file)
-            
-            return {
-                'success': True,
-                'results': docking_results,
-                'output_file': output_file,
-                'log_file': log_file,
-                'command': ' '.join(vina_cmd)
-            }
-            
+            start = time.perf_counter()
+            with self.workspaces.session(workspace_id, prefix='run') as workspace:
+                protein_pdbqt = protein_pdbqt or workspace.files.get('protein_pdbqt')
+                ligand_pdbqt = ligand_pdbqt or workspace.files.get('ligand_pdbqt')
+                if not protein_pdbqt or not ligand_pdbqt:
+                    raise ValueError("Receptor and ligand PDBQT files are required")
+
+                if not self.vina_executable:
+                    result = self._mock_docking_result(protein_pdbqt, ligand_pdbqt, binding_site, workspace)
+                    result['workspace_id'] = workspace.workspace_id
+                    result['elapsed'] = round(time.perf_counter() - start, 4)
+                    self.docking_results.put(workspace.workspace_id, result)
+                    self._archive_result(result, workspace, protein_pdbqt, ligand_pdbqt, binding_site, exhaustiveness)
+                    return result
+
+                output_file = workspace.file_path("docking_result.pdbqt")
+                log_file = workspace.file_path("docking.log")
+
+                # Prepare Vina command
+                vina_cmd = [
+                    self.vina_executable,
+                    '--receptor', protein_pdbqt,
+                    '--ligand', ligand_pdbqt,
+                    '--out', output_file,
+                    '--log', log_file,
+                    '--center_x', str(binding_site['x']),
+                    '--center_y', str(binding_site['y']),
+                    '--center_z', str(binding_site['z']),
+                    '--size_x', str(binding_site.get('size_x', 20)),
+                    '--size_y', str(binding_site.get('size_y', 20)),
+                    '--size_z', str(binding_site.get('size_z', 20)),
+                    '--exhaustiveness', str(exhaustiveness)
+                ]
+                if cpu:
+                    vina_cmd += ['--cpu', str(cpu)]
+
+                # Run docking
+                logger.info(f"Running docking command: {' '.join(vina_cmd)}")
+                if job is not None:
+                    result = job.run(vina_cmd, timeout=VINA_TIMEOUT)
+                else:
+                    result = run_cancellable(vina_cmd, timeout=VINA_TIMEOUT, cancel_event=cancel_event)
+
+                if result.returncode != 0:
+                    raise RuntimeError(f"Vina failed: {result.stderr}")
+
+                # Parse every pose, rescore in-process and keep one per binding mode
+                poses = parse_pdbqt_poses(output_file)
+                rescored = self._rescore(poses, workspace, protein_pdbqt)
+                docking_results = self._summarize_poses(poses, rescored=rescored)
+                buried_surface = None
+                if docking_results:
+                    buried_surface = self._pose_buried_surface(poses, docking_results[0]['pose_index'],
+                                                               workspace, protein_pdbqt)
+                workspace.register_file('docking_output', output_file)
+                workspace.register_file('docking_log', log_file)
+
+                result = {
+                    'success': True,
+                    'workspace_id': workspace.workspace_id,
+                    'results': docking_results,
+                    'num_poses': int(len(poses['affinities'])),
+                    'output_file': output_file,
+                    'log_file': log_file,
+                    'command': ' '.join(vina_cmd),
+                    'elapsed': round(time.perf_counter() - start, 4)
+                }
+                if buried_surface:
+                    result['buried_surface'] = buried_surface
+                self.docking_results.put(workspace.workspace_id, result)
+                self._archive_result(result, workspace, protein_pdbqt, ligand_pdbqt, binding_site, exhaustiveness)
+                return result
+
+        except (JobCancelled, JobTimeout):
+            raise
         except Exception as e:
             logger.error(f"Docking failed: {e}")
             return {
@@ -178,6 +360,53 @@ class DockingEngine:
                 'error': str(e)
             }
     
+    def _archive_result(self, result: Dict[str, Any], workspace, protein_pdbqt: str, ligand_pdbqt: str,
+                        binding_site: Dict[str, float], exhaustiveness: int):
+        """Record a finished docking run in the results store, if one is configured"""
+        if self.results_store is None:
+            return
+        try:
+            # Ligands prepared in their own workspace carry the SMILES there
+            ligand_workspace = workspace
+            if 'ligand_smiles' not in workspace.metadata:
+                ligand_workspace = self.workspaces.get(os.path.basename(os.path.dirname(ligand_pdbqt))) or workspace
+
+            receptor_hash = workspace.metadata.get('receptor_id')
+            if not receptor_hash:
+                with open(protein_pdbqt, 'r') as f:
+                    receptor_hash = self.receptor_cache.receptor_id(f.read(), 'pdbqt')
+
+            output_file = result.get('output_file')
+            if output_file and os.path.exists(output_file):
+                with open(output_file, 'rb') as f:
+                    result['pose_blob'] = self.results_store.put_blob(f.read())
+
+            modes = result.get('results', [])
+            rescored = [mode['rescored_affinity'] for mode in modes if 'rescored_affinity' in mode]
+            self.results_store.record({
+                'name': ligand_workspace.metadata.get('ligand_name'),
+                'smiles': ligand_workspace.metadata.get('ligand_smiles'),
+                'best_affinity': min((mode['affinity'] for mode in modes), default=None),
+                'best_rescored_affinity': min(rescored) if rescored else None,
+                'results': modes,
+                'pose_blob': result.get('pose_blob'),
+                'elapsed': result.get('elapsed'),
+                'mock': result.get('mock', False)
+            }, receptor_hash, binding_site, exhaustiveness)
+        except Exception as e:
+            logger.warning(f"Could not archive docking result: {e}")
+
+    def get_docking_result(self, workspace_id: str) -> Optional[Dict[str, Any]]:
+        """Most recent docking result of a workspace, if still held in the registry"""
+        return self.docking_results.get(workspace_id)
+
+    def release_workspace(self, workspace_id: str) -> Dict[str, Any]:
+        """Release a workspace handle; files are removed once no run is using them"""
+        if self.workspaces.get(workspace_id) is None:
+            return {'success': False, 'error': f'Unknown or expired workspace: {workspace_id}'}
+        self.workspaces.unpin(workspace_id)
+        return {'success': True, 'workspace_id': workspace_id}
+    
     def _validate_protein_structure(self, protein_file: str) -> Dict[str, Any]:
         """Basic protein structure validation"""
         try:
@@ -201,55 +430,42 @@ class DockingEngine:
                 'error': str(e)
             }
     
-    def _identify_binding_sites(self, protein_file: str) -> List[Dict[str, float]]:
-        """Identify potential binding sites (simplified implementation)"""
-        # In a real implementation, this would use cavity detection algorithms
-        # For now, return a default binding site at the center of the protein
+    def _identify_binding_sites(self, protein_file: str,
+                                grid: Optional[Dict[str, Any]] = None) -> List[Dict[str, float]]:
+        """
+        Identify potential binding sites with grid-based cavity detection
+
+        Pockets are ranked by volume and buriedness; if none are found the
+        whole protein is boxed around its centroid.
+        """
+        try:
+            with open(protein_file, 'r') as f:
+                coords, radii, _ = structure_arrays(f.read())
+            if len(coords) == 0:
+                raise ValueError("No atoms found in protein structure")
+
+            pockets = detect_pockets(coords, radii, grid=grid)
+            if pockets:
+                return pockets
+
+            center = coords.mean(axis=0)
+            size = np.clip(coords.max(axis=0) - coords.min(axis=0), 10.0, 30.0)
+        except Exception as e:
+            logger.warning(f"Cavity detection failed: {e}")
+            center = np.zeros(3)
+            size = np.full(3, 20.0)
+
         return [{
             'name': 'default_site',
-            'x': 0.0,
-            'y': 0.0,
-            'z': 0.0,
-            'size_x': 20.0,
-            'size_y': 20.0,
-            'size_z': 20.0,
-            'confidence': 0.8
+            'x': round(float(center[0]), 3),
+            'y': round(float(center[1]), 3),
+            'z': round(float(center[2]), 3),
+            'size_x': round(float(size[0]), 1),
+            'size_y': round(float(size[1]), 1),
+            'size_z': round(float(size[2]), 1),
+            'confidence': 0.3
         }]
     
-    def _calculate_ligand_properties_mock(self, smiles: str) -> Dict[str, float]:
-        """Calculate molecular properties for drug-likeness assessment (mock version)"""
-        # Simple estimation based on SMILES string
-        atom_count = len([c for c in smiles if c.isupper()])
-
-        return {
-            'molecular_weight': atom_count * 12.5,  # Rough estimate
-            'logp': len(smiles) * 0.1 - 2.0,  # Mock LogP
-            'hbd': smiles.count('O') + smiles.count('N'),
-            'hba': smiles.count('O') + smiles.count('N'),
-            'tpsa': atom_count * 5.0,  # Mock TPSA
-            'rotatable_bonds': smiles.count('-'),
-            'aromatic_rings': smiles.count('c'),
-            'atom_count': atom_count,
-            'lipinski_violations': self._count_lipinski_violations_mock(smiles)
-        }
-    
-    def _count_lipinski_violations_mock(self, smiles: str) -> int:
-        """Count Lipinski Rule of Five violations (mock version)"""
-        violations = 0
-        atom_count = len([c for c in smiles if c.isupper()])
-
-        mw = atom_count * 12.5
-        logp = len(smiles) * 0.1 - 2.0
-        hbd = smiles.count('O') + smiles.count('N')
-        hba = smiles.count('O') + smiles.count('N')
-
-        if mw > 500: violations += 1
-        if logp > 5: violations += 1
-        if hbd > 5: violations += 1
-        if hba > 10: violations += 1
-
-        return violations
-    
     def _convert_to_pdbqt(self, input_file: str, output_file: str, is_protein: bool):
         """Convert structure to PDBQT format (simplified)"""
         # In a real implementation, this would use MGLTools or similar
@@ -258,46 +474,220 @@ class DockingEngine:
             f.write(f"# Mock PDBQT file for {'protein' if is_protein else 'ligand'}\n")
             f.write(f"# Generated from: {input_file}\n")
     
-    def _parse_vina_output(self, log_file: str, output_file: str) -> List[Dict[str, Any]]:
-        """Parse AutoDock Vina output"""
-        results = []
-        
+    def calculate_buried_surface(self, protein_data: str, ligand_poses: List[str]) -> Dict[str, Any]:
+        """Buried solvent accessible surface (delta SASA) for ligand poses in the receptor"""
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            
-            # Parse binding affinities from log
-            lines = log_content.split('\n')
-            for i, line in enumerate(lines):
-                if 'REMARK VINA RESULT:' in line:
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        results.append({
-                            'mode': len(results) + 1,
-                            'affinity': float(parts[3]),
-                            'rmsd_lb': float(parts[4]) if len(parts) > 4 else 0.0,
-                            'rmsd_ub': float(parts[5]) if len(parts) > 5 else 0.0
-                        })
-            
-            return results
-            
+            if not ligand_poses:
+                raise ValueError("At least one ligand pose is required")
+
+            surfaces = delta_sasa_batch(protein_data, ligand_poses)
+            return {
+                'success': True,
+                'poses': surfaces,
+                'best_pose': int(np.argmax([s.get('delta_sasa', 0.0) for s in surfaces]))
+            }
+
         except Exception as e:
-            logger.error(f"Failed to parse Vina output: {e}")
-            return []
+            logger.error(f"Buried surface calculation failed: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
     
-    def _mock_docking_result(self, protein_pdbqt: str, ligand_pdbqt: str, 
-                           binding_site: Dict[str, float]) -> Dict[str, Any]:
-        """Generate mock docking results when Vina is not available"""
+    def _pose_buried_surface(self, poses: Dict[str, Any], pose_index: int, workspace=None,
+                             receptor_file: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        delta SASA of one parsed pose in the receptor (see delta_sasa_batch),
+        or None when it cannot be computed
+
+        As for scoring, the workspace's original receptor PDB is preferred
+        over receptor_file.
+        """
+        if workspace is not None and workspace.files.get('protein_file'):
+            receptor_file = workspace.files['protein_file']
+        try:
+            with open(receptor_file, 'r') as f:
+                receptor = f.read()
+            ligand = {'atoms': [
+                {'x': float(x), 'y': float(y), 'z': float(z), 'element': atom_type, 'atom_name': name}
+                for (x, y, z), atom_type, name in zip(poses['coords'][pose_index], poses['types'], poses['names'])
+            ]}
+            surface = delta_sasa_batch(receptor, [ligand])[0]
+            if 'error' in surface:
+                return None
+            surface['pose_index'] = int(pose_index)
+            return surface
+        except Exception as e:
+            logger.warning(f"Buried surface unavailable: {e}")
+            return None
+
+    def get_scorer(self, workspace=None, receptor_file: Optional[str] = None) -> VinaScorer:
+        """
+        Vina-like scorer for a workspace's receptor (cached per receptor)
+
+        The workspace's original PDB is preferred over receptor_file since it
+        carries residue names used for hydrogen-bond typing.
+        """
+        if workspace is not None and workspace.files.get('protein_file'):
+            receptor_file = workspace.files['protein_file']
+        if not receptor_file:
+            raise ValueError("No receptor available for scoring")
+
+        key = (workspace.metadata.get('receptor_id') if workspace is not None else None) or receptor_file
+        scorer = self._scorers.get(key)
+        if scorer is None:
+            with open(receptor_file, 'r') as f:
+                scorer = VinaScorer.from_structure(f.read())
+            self._scorers.put(key, scorer)
+        return scorer
+
+    def score_poses(self, ligand_pdbqt_content: str, workspace_id: Optional[str] = None,
+                    receptor_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Score every MODEL of a ligand PDBQT against a receptor in-process
+
+        Args:
+            ligand_pdbqt_content: Ligand PDBQT text with one or more poses
+            workspace_id: Workspace holding the prepared receptor
+            receptor_file: Receptor PDB/PDBQT path when no workspace is used
+        """
+        try:
+            workspace = self.workspaces.get(workspace_id) if workspace_id else None
+            if workspace_id and workspace is None:
+                raise KeyError(f"Unknown or expired docking workspace: {workspace_id}")
+            scorer = self.get_scorer(workspace, receptor_file)
+
+            poses = parse_pdbqt_poses(ligand_pdbqt_content)
+            if poses['coords'].size == 0:
+                raise ValueError("Ligand has no atoms to score")
+
+            ligand_types = assign_xs_types(poses['types'], poses['coords'][0])
+            scores = scorer.score_poses(poses['coords'], ligand_types, poses['torsdof'], return_terms=True)
+            return {
+                'success': True,
+                'affinities': np.round(scores['affinity'], 3).tolist(),
+                'terms': {name: np.round(values, 4).tolist() for name, values in scores['terms'].items()}
+            }
+
+        except Exception as e:
+            logger.error(f"Pose scoring failed: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _rescore(self, poses: Dict[str, Any], workspace, protein_pdbqt: str) -> Optional[np.ndarray]:
+        """In-process Vina-like affinities of parsed poses, or None when scoring is unavailable"""
+        if poses['coords'].size == 0:
+            return None
+        try:
+            scorer = self.get_scorer(workspace, protein_pdbqt)
+            ligand_types = assign_xs_types(poses['types'], poses['coords'][0])
+            return scorer.score_poses(poses['coords'], ligand_types, poses['torsdof'])['affinity']
+        except Exception as e:
+            logger.warning(f"Pose rescoring unavailable: {e}")
+            return None
+
+    def _summarize_poses(self, poses: Dict[str, Any], rescored: Optional[np.ndarray] = None,
+                         max_modes: Optional[int] = None, decimals: int = 3) -> List[Dict[str, Any]]:
+        """
+        One result per binding mode: poses are clustered by symmetry-aware
+        RMSD and the best-scored pose of each cluster is reported
+        """
+        affinities = poses['affinities']
+        if len(affinities) == 0:
+            return []
+
+        clusters = cluster_poses(poses['coords'], affinities, poses['types'], CLUSTER_RMSD, max_modes)
+        representatives = clusters['representatives']
+
+        # Vina records RMSD to its best pose; fill it in when the input did not
+        lower, upper = poses['rmsd_lb'], poses['rmsd_ub']
+        if np.isnan(lower).any() or np.isnan(upper).any():
+            order = np.argsort(affinities, kind='stable')
+            lower, upper = np.empty(len(affinities)), np.empty(len(affinities))
+            lower[order], upper[order] = rmsd_from_best(poses['coords'][order], poses['types'])
+
+        results = []
+        for mode, (pose, size) in enumerate(zip(representatives, clusters['sizes']), start=1):
+            entry = {
+                'mode': mode,
+                'affinity': round(float(affinities[pose]), decimals),
+                'rmsd_lb': round(float(lower[pose]), decimals),
+                'rmsd_ub': round(float(upper[pose]), decimals),
+                'pose_index': int(pose),
+                'cluster_size': int(size)
+            }
+            if rescored is not None:
+                entry['rescored_affinity'] = round(float(rescored[pose]), 2)
+            results.append(entry)
+        return results
+
+    def _mock_docking_result(self, protein_pdbqt: str, ligand_pdbqt: str,
+                           binding_site: Dict[str, float], workspace=None) -> Dict[str, Any]:
+        """
+        Docking results when Vina is not available
+
+        Results are deterministic for a given receptor, ligand and box. If the
+        ligand file carries coordinates, a rigid pose search is scored with
+        the Vina-like function; otherwise affinities are drawn from a
+        generator seeded by the inputs.
+        """
+        metadata = workspace.metadata if workspace is not None else {}
+        identity = {'receptor': metadata.get('receptor_id'), 'ligand': metadata.get('ligand_smiles')}
+        digest = hashlib.sha256(json.dumps(binding_site, sort_keys=True, default=str).encode())
+        contents = {}
+        for key, path in (('receptor', protein_pdbqt), ('ligand', ligand_pdbqt)):
+            try:
+                with open(path, 'r') as f:
+                    contents[key] = f.read()
+            except (OSError, TypeError):
+                contents[key] = str(path)
+            # Mock PDBQT files embed workspace paths, so prefer stable identities
+            digest.update((identity[key] or contents[key]).encode())
+        seed = int.from_bytes(digest.digest()[:8], 'little')
+
+        ligand = parse_pdbqt_poses(contents['ligand'], max_poses=1)
+        if ligand['coords'].size > 0:
+            try:
+                scorer = self.get_scorer(workspace, protein_pdbqt)
+                ligand_coords = ligand['coords'][0]
+                ligand_types = assign_xs_types(ligand['types'], ligand_coords)
+                coords, affinities = rigid_pose_search(scorer, ligand_coords, ligand_types, binding_site,
+                                                       ligand['torsdof'],
+                                                       num_modes=MOCK_NUM_MODES * MOCK_POSES_PER_MODE,
+                                                       seed=seed)
+                nan = np.full(len(affinities), np.nan)
+                poses = dict(ligand, coords=coords, affinities=affinities, rmsd_lb=nan, rmsd_ub=nan)
+                modes = self._summarize_poses(poses, max_modes=MOCK_NUM_MODES, decimals=1)
+                result = {
+                    'success': True,
+                    'results': modes,
+                    'num_poses': int(len(affinities)),
+                    'output_file': 'mock_output.pdbqt',
+                    'log_file': 'mock_log.txt',
+                    'mock': True,
+                    'scoring': 'vina_like_rigid',
+                    'binding_site': binding_site
+                }
+                buried_surface = self._pose_buried_surface(poses, modes[0]['pose_index'], workspace, protein_pdbqt) if modes else None
+                if buried_surface:
+                    result['buried_surface'] = buried_surface
+                return result
+            except Exception as e:
+                logger.warning(f"Rigid pose scoring unavailable, using seeded mock results: {e}")
+
+        rng = np.random.default_rng(seed)
         mock_results = []
-        
+
         # Generate multiple binding modes with different affinities
-        for i in range(5):
-            affinity = -8.5 + np.random.normal(0, 1.5)  # Random affinity around -8.5
+        for i in range(MOCK_NUM_MODES):
+            affinity = -8.5 + rng.normal(0, 1.5)  # Seeded affinity around -8.5
             mock_results.append({
                 'mode': i + 1,
                 'affinity': round(affinity, 1),
-                'rmsd_lb': round(np.random.uniform(0, 2), 1),
-                'rmsd_ub': round(np.random.uniform(2, 4), 1)
+                'rmsd_lb': round(rng.uniform(0, 2), 1),
+                'rmsd_ub': round(rng.uniform(2, 4), 1)
             })
         
         # Sort by affinity (most negative = best)
@@ -309,14 +699,14 @@ class DockingEngine:
             'output_file': 'mock_output.pdbqt',
             'log_file': 'mock_log.txt',
             'mock': True,
+            'scoring': 'seeded_mock',
             'binding_site': binding_site
         }
     
     def cleanup(self):
         """Clean up temporary files"""
         try:
-            import shutil
-            shutil.rmtree(self.temp_dir)
+            self.workspaces.cleanup_all()
             logger.info("Temporary files cleaned up")
         except Exception as e:
             logger.warning(f"Failed to clean up temporary files: {e}")
@@ -2,245 +2,444 @@
 Ligand Processing Module for Molecular Docking
 
 This module provides ligand preparation and processing capabilities:
-- SMILES string validation and parsing
+- SMILES string validation and parsing into molecular graphs
+- SDF / MOL2 structure file reading
 - 3D conformer generation
 - Molecular property calculation
 - Drug-likeness assessment
+- Per-compound preparation contexts in a bounded LRU cache keyed by
+  canonical SMILES, so each step runs once per compound
+- Library-wide descriptor tables and Lipinski / Veber prefilters
+- Canonical SMILES and duplicate removal across libraries
+- Fingerprints and similarity search over ligand libraries
 """
 
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator
+
+from utils.smiles import SmilesError, parse_smiles, try_parse_smiles, parse_smiles_batch
+from utils.mol_properties import molecular_properties, batch_properties
+from utils.canonical import canonical_smiles
+from utils.conformers import ConformerSet, embed_molecule, smiles_seed
+from utils.molfile import iter_molecules, record_smiles
+from utils.fingerprints import fingerprints, fingerprint_info, DEFAULT_BITS, DEFAULT_RADIUS
+from .descriptor_table import DescriptorTable, compute_descriptor_table, prefilter_library, DEFAULT_CHUNK_SIZE
+from .similarity_index import SimilarityIndex, build_index
+from .deduplication import dedupe_ligands
 
 logger = logging.getLogger(__name__)
 
+# Upper limit on conformers generated per request
+MAX_CONFORMERS = 50
+
+# Conformers embedded by prepare_for_docking
+DEFAULT_CONFORMERS = 10
+
+# Compounds kept in the preparation cache, and conformer sets kept per compound
+CONTEXT_CACHE_SIZE = 1024
+CONFORMER_SETS_PER_CONTEXT = 2
+
+# Drug-likeness by Lipinski violations (0, 1, 2, more)
+DRUG_LIKENESS_LEVELS = [
+    ("Excellent drug-like properties", 0.9, "Compound shows excellent drug-like characteristics"),
+    ("Good drug-like properties", 0.7, "Minor optimization may improve drug-likeness"),
+    ("Moderate drug-like properties", 0.5, "Significant optimization needed for drug development"),
+    ("Poor drug-like properties", 0.3, "Major structural modifications required"),
+]
+
+
+class LigandContext:
+    """
+    Preparation state of one compound
+
+    Built from the canonical SMILES, so every spelling of a compound shares
+    the same graph, descriptors, atom order and conformer seed. Descriptors,
+    drug-likeness and conformers are computed on first use and kept.
+    """
+
+    def __init__(self, canonical: str):
+        self.canonical_smiles = canonical
+        self.graph = parse_smiles(canonical)
+        self._properties: Optional[Dict[str, Any]] = None
+        self._drug_assessment: Optional[Dict[str, Any]] = None
+        self._conformers: 'OrderedDict[Tuple[int, int], ConformerSet]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def validation(self, smiles: str) -> Dict[str, Any]:
+        """validate_smiles result for one spelling of the compound"""
+        graph = self.graph
+        return {
+            'valid': True,
+            'smiles': smiles,
+            'length': len(smiles),
+            'num_atoms': int(graph.heavy_atoms().sum()),
+            'num_bonds': graph.num_bonds,
+            'num_rings': graph.num_rings,
+            'num_components': graph.num_components,
+            'formula': graph.formula(),
+            'canonical_smiles': self.canonical_smiles
+        }
+
+    @property
+    def properties(self) -> Dict[str, Any]:
+        if self._properties is None:
+            self._properties = molecular_properties(self.graph)
+        return self._properties
+
+    @property
+    def drug_assessment(self) -> Dict[str, Any]:
+        if self._drug_assessment is None:
+            properties = self.properties
+            violations = properties['lipinski_violations']
+            assessment, score, recommendation = DRUG_LIKENESS_LEVELS[min(violations, len(DRUG_LIKENESS_LEVELS) - 1)]
+            self._drug_assessment = {
+                'assessment': assessment,
+                'drug_likeness_score': score,
+                'lipinski_violations': violations,
+                'recommendation': recommendation,
+                'properties': properties
+            }
+        return self._drug_assessment
+
+    def conformers(self, num_conformers: int, seed: Optional[int] = None) -> ConformerSet:
+        """Embedded conformers (seed derived from the canonical SMILES by default)"""
+        key = (num_conformers, smiles_seed(self.canonical_smiles) if seed is None else seed)
+        with self._lock:
+            conformers = self._conformers.get(key)
+            if conformers is not None:
+                self._conformers.move_to_end(key)
+                return conformers
+        conformers = embed_molecule(self.graph, key[0], seed=key[1])
+        with self._lock:
+            self._conformers[key] = conformers
+            while len(self._conformers) > CONFORMER_SETS_PER_CONTEXT:
+                self._conformers.popitem(last=False)
+        return conformers
+
+
 class LigandProcessor:
     """Process and prepare ligands for molecular docking"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = CONTEXT_CACHE_SIZE):
+        """
+        Args:
+            cache_size: Compounds whose LigandContext is kept (LRU); 0 disables the cache
+        """
         self.supported_formats = ['smiles', 'sdf', 'mol2', 'pdb']
-        
+        self.cache_size = cache_size
+        self._contexts: 'OrderedDict[str, LigandContext]' = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def ligand_context(self, smiles: str) -> LigandContext:
+        """
+        Shared preparation context of a compound, from the cache when any
+        spelling of it was prepared recently
+
+        Raises:
+            SmilesError: If the SMILES cannot be parsed
+        """
+        key = canonical_smiles(parse_smiles(smiles))
+        with self._contexts_lock:
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+                self.cache_hits += 1
+                return context
+            self.cache_misses += 1
+        context = LigandContext(key)
+        if self.cache_size > 0:
+            with self._contexts_lock:
+                context = self._contexts.setdefault(key, context)
+                self._contexts.move_to_end(key)
+                while len(self._contexts) > self.cache_size:
+                    self._contexts.popitem(last=False)
+        return context
+
+    def cache_info(self) -> Dict[str, int]:
+        """Preparation cache size and hit / miss counts"""
+        with self._contexts_lock:
+            return {'size': len(self._contexts), 'max_size': self.cache_size,
+                    'hits': self.cache_hits, 'misses': self.cache_misses}
+
+    def clear_cache(self):
+        with self._contexts_lock:
+            self._contexts.clear()
+
+    def _context_or_error(self, smiles: str) -> Tuple[Optional[LigandContext], Optional[str]]:
+        if not smiles or not isinstance(smiles, str):
+            return None, 'Empty or invalid SMILES string'
+        try:
+            return self.ligand_context(smiles), None
+        except SmilesError as e:
+            return None, str(e)
+
     def validate_smiles(self, smiles: str) -> Dict[str, Any]:
-        """Validate SMILES string format"""
+        """Validate SMILES string by parsing it into a molecular graph"""
         try:
-            # Basic SMILES validation patterns
             if not smiles or not isinstance(smiles, str):
                 return {'valid': False, 'error': 'Empty or invalid SMILES string'}
-            
-            smiles = smiles.strip()
-            
-            # Check for basic SMILES characters
-            valid_chars = set('CNOPSFClBrI[]()=#+-.0123456789@/\\')
-            if not all(c in valid_chars for c in smiles):
-                return {'valid': False, 'error': 'Invalid characters in SMILES string'}
-            
-            # Check for balanced brackets
-            if smiles.count('[') != smiles.count(']'):
-                return {'valid': False, 'error': 'Unbalanced brackets in SMILES'}
-            
-            if smiles.count('(') != smiles.count(')'):
-                return {'valid': False, 'error': 'Unbalanced parentheses in SMILES'}
-            
-            # Basic structure validation
-            if len(smiles) < 2:
-                return {'valid': False, 'error': 'SMILES string too short'}
-            
-            return {
-                'valid': True,
-                'smiles': smiles,
-                'length': len(smiles),
-                'estimated_atoms': self._estimate_atom_count(smiles)
-            }
-            
+
+            return self.ligand_context(smiles).validation(smiles)
+
+        except SmilesError as e:
+            return {'valid': False, 'error': str(e), 'position': e.position}
         except Exception as e:
             logger.error(f"SMILES validation error: {e}")
             return {'valid': False, 'error': str(e)}
-    
-    def _estimate_atom_count(self, smiles: str) -> int:
-        """Estimate number of atoms from SMILES string"""
-        # Simple estimation based on character patterns
-        atom_chars = re.findall(r'[CNOPSF]|Cl|Br', smiles)
-        return len(atom_chars)
-    
+
     def calculate_molecular_properties(self, smiles: str) -> Dict[str, Any]:
-        """Calculate molecular properties from SMILES (simplified version)"""
+        """Calculate molecular properties from the SMILES molecular graph"""
         try:
-            validation = self.validate_smiles(smiles)
-            if not validation['valid']:
-                return {'error': validation['error']}
-            
-            # Simplified property calculations (in real implementation, use RDKit)
-            estimated_atoms = validation['estimated_atoms']
-            
-            # Rough estimates based on SMILES patterns
-            properties = {
-                'estimated_molecular_weight': estimated_atoms * 12.5,  # Rough average
-                'estimated_logp': self._estimate_logp(smiles),
-                'estimated_hbd': smiles.count('O') + smiles.count('N'),  # Simplified
-                'estimated_hba': smiles.count('O') + smiles.count('N'),  # Simplified
-                'rotatable_bonds': smiles.count('-') + smiles.count('='),  # Very rough
-                'aromatic_rings': smiles.count('c'),  # Simplified
-                'atom_count': estimated_atoms
-            }
-            
-            # Calculate Lipinski violations
-            properties['lipinski_violations'] = self._calculate_lipinski_violations(properties)
-            
-            return properties
-            
+            context, error = self._context_or_error(smiles)
+            if context is None:
+                return {'error': error}
+            return dict(context.properties)
+
         except Exception as e:
             logger.error(f"Property calculation error: {e}")
             return {'error': str(e)}
-    
-    def _estimate_logp(self, smiles: str) -> float:
-        """Rough LogP estimation from SMILES"""
-        # Very simplified LogP estimation
-        carbon_count = smiles.count('C') + smiles.count('c')
-        oxygen_count = smiles.count('O')
-        nitrogen_count = smiles.count('N')
-        
-        # Rough formula (not accurate, just for demo)
-        logp = (carbon_count * 0.5) - (oxygen_count * 1.5) - (nitrogen_count * 0.8)
-        return round(logp, 2)
-    
-    def _calculate_lipinski_violations(self, properties: Dict[str, Any]) -> int:
-        """Calculate Lipinski Rule of Five violations"""
-        violations = 0
-        
-        if properties.get('estimated_molecular_weight', 0) > 500:
-            violations += 1
-        if properties.get('estimated_logp', 0) > 5:
-            violations += 1
-        if properties.get('estimated_hbd', 0) > 5:
-            violations += 1
-        if properties.get('estimated_hba', 0) > 10:
-            violations += 1
-            
-        return violations
-    
+
+    def calculate_properties_batch(self, smiles_list: List[str], processes: int = 1) -> List[Dict[str, Any]]:
+        """
+        Calculate molecular properties for many SMILES
+
+        Args:
+            smiles_list: SMILES strings
+            processes: Worker processes used for parsing
+
+        Returns:
+            One property dictionary per input, or {'error': ...} for invalid SMILES
+        """
+        parsed = parse_smiles_batch(smiles_list, processes=processes)
+        graphs = [graph for graph in parsed['graphs'] if graph is not None]
+        computed = iter(batch_properties(graphs))
+        return [next(computed) if graph is not None else {'error': parsed['errors'][index]}
+                for index, graph in enumerate(parsed['graphs'])]
+
+    def describe_library(self, ligands: Iterable[Dict[str, str]], processes: int = 1,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> DescriptorTable:
+        """
+        Compute a columnar descriptor table for a whole ligand library
+
+        Args:
+            ligands: {'name', 'smiles'} dictionaries (see parse_ligand_library)
+            processes: Worker processes for parsing and descriptors
+            chunk_size: Ligands per worker chunk
+
+        Returns:
+            DescriptorTable with one row per ligand
+        """
+        return compute_descriptor_table(ligands, processes=processes, chunk_size=chunk_size)
+
+    def filter_library(self, ligands: Iterable[Dict[str, str]], lipinski: bool = True, veber: bool = True,
+                       max_lipinski_violations: int = 1, processes: int = 1,
+                       stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the ligands passing Lipinski / Veber filters (see prefilter_library)"""
+        return prefilter_library(ligands, lipinski=lipinski, veber=veber,
+                                 max_lipinski_violations=max_lipinski_violations,
+                                 processes=processes, stats=stats)
+
+    def read_structures(self, content: str, file_format: str = 'sdf',
+                        max_records: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Read the molecules of SDF or MOL2 file content
+
+        Args:
+            content: File content
+            file_format: 'sdf' or 'mol2'
+            max_records: Stop after this many records (all when None)
+
+        Returns:
+            Per-record name, SMILES, atom / bond counts and data fields, with
+            the errors of records that could not be read
+        """
+        try:
+            file_format = file_format.lower()
+            if file_format not in ('sdf', 'mol2'):
+                return {'error': f"Unsupported structure format: {file_format}"}
+
+            molecules, errors = [], []
+            for index, (record, error) in enumerate(iter_molecules(content.splitlines(), file_format)):
+                if max_records is not None and index >= max_records:
+                    break
+                if record is None:
+                    errors.append({'index': index, 'error': error})
+                    continue
+                try:
+                    smiles = record_smiles(record)
+                except ValueError as e:
+                    errors.append({'index': index, 'name': record.name, 'error': str(e)})
+                    continue
+                molecules.append({'index': index, 'name': record.name, 'smiles': smiles,
+                                  'num_atoms': record.num_atoms, 'num_bonds': record.num_bonds,
+                                  'properties': record.properties})
+            return {'success': True, 'format': file_format, 'num_molecules': len(molecules),
+                    'molecules': molecules, 'errors': errors}
+
+        except Exception as e:
+            logger.error(f"Structure file reading error: {e}")
+            return {'error': str(e)}
+
+    def canonicalize_smiles(self, smiles: str, isomeric: bool = True) -> Dict[str, Any]:
+        """Canonical SMILES of one ligand (identical for every spelling of the compound)"""
+        try:
+            graph, error = try_parse_smiles(smiles) if isinstance(smiles, str) else (None, 'Invalid SMILES string')
+            if graph is None:
+                return {'error': error}
+            return {'smiles': smiles, 'canonical_smiles': canonical_smiles(graph, isomeric)}
+
+        except Exception as e:
+            logger.error(f"Canonicalization error: {e}")
+            return {'error': str(e)}
+
+    def deduplicate_library(self, ligands: Iterable[Any], processes: int = 1, isomeric: bool = True,
+                            stats: Optional[Dict[str, int]] = None,
+                            groups: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, str]]:
+        """Stream the first occurrence of every compound (see deduplication.iter_unique)"""
+        return dedupe_ligands(ligands, processes=processes, isomeric=isomeric, stats=stats, groups=groups)
+
+    def calculate_fingerprint(self, smiles: str, kind: str = 'circular', n_bits: int = DEFAULT_BITS,
+                              radius: int = DEFAULT_RADIUS) -> Dict[str, Any]:
+        """
+        Hashed fingerprint of one ligand
+
+        Args:
+            smiles: Ligand SMILES
+            kind: 'circular' (Morgan-like, radius bonds) or 'path' (linear paths)
+            n_bits: Fingerprint length, a multiple of 64
+
+        Returns:
+            Dictionary with the packed uint64 words and the on-bit indices
+        """
+        try:
+            graph, error = try_parse_smiles(smiles) if isinstance(smiles, str) else (None, 'Invalid SMILES string')
+            if graph is None:
+                return {'error': error}
+            packed = fingerprints([graph], kind=kind, n_bits=n_bits, radius=radius)[0]
+            info = fingerprint_info(packed, kind, n_bits)
+            info['packed'] = packed
+            return info
+
+        except Exception as e:
+            logger.error(f"Fingerprint calculation error: {e}")
+            return {'error': str(e)}
+
+    def build_similarity_index(self, ligands: Iterable[Dict[str, str]], directory: Optional[str] = None,
+                               kind: str = 'circular', n_bits: int = DEFAULT_BITS,
+                               processes: int = 1) -> SimilarityIndex:
+        """
+        Fingerprint a ligand library into a similarity index
+
+        Args:
+            ligands: {'name', 'smiles'} dictionaries
+            directory: Save (and memory-map) the index here; in memory if omitted
+            kind, n_bits: Fingerprint options
+            processes: Worker processes for fingerprinting
+        """
+        if directory:
+            return build_index(ligands, directory, kind=kind, n_bits=n_bits, processes=processes)
+        return SimilarityIndex.build(ligands, kind=kind, n_bits=n_bits, processes=processes)
+
+    def find_similar(self, smiles: str, index: SimilarityIndex, k: int = 10,
+                     threshold: float = 0.0) -> Dict[str, Any]:
+        """Top-k library compounds by Tanimoto similarity to a query SMILES"""
+        try:
+            hits = index.search(smiles, k=k, threshold=threshold)
+            return {'success': True, 'query': smiles, 'hits': hits}
+
+        except SmilesError as e:
+            return {'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f"Similarity search error: {e}")
+            return {'success': False, 'error': str(e)}
+
     def assess_drug_likeness(self, smiles: str) -> Dict[str, Any]:
         """Assess drug-likeness of the compound"""
         try:
-            properties = self.calculate_molecular_properties(smiles)
-            if 'error' in properties:
-                return properties
-            
-            violations = properties['lipinski_violations']
-            
-            # Drug-likeness assessment
-            if violations == 0:
-                assessment = "Excellent drug-like properties"
-                score = 0.9
-                recommendation = "Compound shows excellent drug-like characteristics"
-            elif violations == 1:
-                assessment = "Good drug-like properties"
-                score = 0.7
-                recommendation = "Minor optimization may improve drug-likeness"
-            elif violations == 2:
-                assessment = "Moderate drug-like properties"
-                score = 0.5
-                recommendation = "Significant optimization needed for drug development"
-            else:
-                assessment = "Poor drug-like properties"
-                score = 0.3
-                recommendation = "Major structural modifications required"
-            
-            return {
-                'assessment': assessment,
-                'drug_likeness_score': score,
-                'lipinski_violations': violations,
-                'recommendation': recommendation,
-                'properties': properties
-            }
-            
+            context, error = self._context_or_error(smiles)
+            if context is None:
+                return {'error': error}
+            return dict(context.drug_assessment)
+
         except Exception as e:
             logger.error(f"Drug-likeness assessment error: {e}")
             return {'error': str(e)}
-    
-    def generate_conformers(self, smiles: str, num_conformers: int = 10) -> Dict[str, Any]:
-        """Generate 3D conformers for the ligand (mock implementation)"""
+
+    def generate_conformers(self, smiles: str, num_conformers: int = DEFAULT_CONFORMERS,
+                            seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate 3D conformers by distance-geometry embedding and force-field refinement
+
+        Conformers are reported in energy order with their heavy-atom RMSD to
+        the lowest-energy one; 'sdf' holds all of them and 'pdbqt' the best.
+        The seed defaults to one derived from the canonical SMILES so results
+        repeat for every spelling of the compound.
+        """
         try:
-            validation = self.validate_smiles(smiles)
-            if not validation['valid']:
-                return {'error': validation['error']}
-            
-            # Mock conformer generation
-            conformers = []
-            for i in range(min(num_conformers, 10)):
-                conformers.append({
-                    'id': i + 1,
-                    'energy': -50.0 + (i * 2.5),  # Mock energy values
-                    'rmsd': i * 0.5,
-                    'coordinates': f"mock_conformer_{i+1}.sdf"
-                })
-            
-            return {
-                'success': True,
-                'num_conformers': len(conformers),
-                'conformers': conformers,
-                'lowest_energy': min(conf['energy'] for conf in conformers),
-                'method': 'mock_generation'
-            }
-            
+            context, error = self._context_or_error(smiles)
+            if context is None:
+                return {'error': error}
+
+            conformers = context.conformers(min(max(num_conformers, 1), MAX_CONFORMERS), seed)
+            return _conformer_report(conformers)
+
         except Exception as e:
             logger.error(f"Conformer generation error: {e}")
             return {'error': str(e)}
-    
-    def optimize_geometry(self, smiles: str, method: str = 'mmff') -> Dict[str, Any]:
-        """Optimize molecular geometry (mock implementation)"""
+
+    def optimize_geometry(self, smiles: str, method: str = 'distance_geometry',
+                          seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Embed one conformer and minimize it under the internal force field
+
+        Only the bundled force field is available (no MMFF/UFF without
+        RDKit); the method name is reported back as given.
+        """
         try:
-            validation = self.validate_smiles(smiles)
-            if not validation['valid']:
-                return {'error': validation['error']}
-            
-            # Mock geometry optimization
-            return {
-                'success': True,
-                'method': method,
-                'initial_energy': -45.2,
-                'final_energy': -52.8,
-                'energy_change': -7.6,
-                'converged': True,
-                'iterations': 25,
-                'optimized_structure': 'mock_optimized.sdf'
-            }
-            
+            context, error = self._context_or_error(smiles)
+            if context is None:
+                return {'error': error}
+
+            return _optimization_report(context.conformers(1, seed), 0, method)
+
         except Exception as e:
             logger.error(f"Geometry optimization error: {e}")
             return {'error': str(e)}
-    
+
     def prepare_for_docking(self, smiles: str, ligand_name: str = "ligand") -> Dict[str, Any]:
-        """Complete ligand preparation pipeline for docking"""
+        """
+        Complete ligand preparation pipeline for docking
+
+        All steps share one LigandContext: the SMILES is parsed and validated
+        once, descriptors are computed once, and the optimization step reports
+        the lowest-energy member of the conformer set instead of embedding a
+        separate conformer. Repeated compounds are served from the cache.
+        """
         try:
             # Step 1: Validate SMILES
-            validation = self.validate_smiles(smiles)
-            if not validation['valid']:
-                return {'success': False, 'error': validation['error']}
-            
-            # Step 2: Calculate properties
-            properties = self.calculate_molecular_properties(smiles)
-            if 'error' in properties:
-                return {'success': False, 'error': properties['error']}
-            
-            # Step 3: Assess drug-likeness
-            drug_assessment = self.assess_drug_likeness(smiles)
-            if 'error' in drug_assessment:
-                return {'success': False, 'error': drug_assessment['error']}
-            
-            # Step 4: Generate conformers
-            conformers = self.generate_conformers(smiles)
-            if 'error' in conformers:
-                return {'success': False, 'error': conformers['error']}
-            
-            # Step 5: Optimize geometry
-            optimization = self.optimize_geometry(smiles)
-            if 'error' in optimization:
-                return {'success': False, 'error': optimization['error']}
-            
+            context, error = self._context_or_error(smiles)
+            if context is None:
+                return {'success': False, 'error': error}
+            validation = context.validation(smiles)
+
+            # Steps 2-3: Properties and drug-likeness
+            properties = dict(context.properties)
+            drug_assessment = dict(context.drug_assessment)
+
+            # Steps 4-5: Conformers, the best of which is the optimized geometry
+            conformer_set = context.conformers(DEFAULT_CONFORMERS)
+            conformers = _conformer_report(conformer_set)
+            optimization = _optimization_report(conformer_set, conformer_set.best(), 'distance_geometry')
+
             return {
                 'success': True,
                 'ligand_name': ligand_name,
                 'smiles': smiles,
+                'canonical_smiles': context.canonical_smiles,
                 'validation': validation,
                 'properties': properties,
                 'drug_assessment': drug_assessment,
@@ -248,7 +447,7 @@ class LigandProcessor:
                 'optimization': optimization,
                 'ready_for_docking': True,
                 'preparation_summary': {
-                    'molecular_weight': properties.get('estimated_molecular_weight', 0),
+                    'molecular_weight': properties.get('molecular_weight', 0),
                     'lipinski_violations': drug_assessment.get('lipinski_violations', 0),
                     'drug_likeness_score': drug_assessment.get('drug_likeness_score', 0),
                     'num_conformers': conformers.get('num_conformers', 0),
@@ -289,3 +488,31 @@ class LigandProcessor:
                 'description': 'Simple sugar molecule'
             }
         ]
+
+
+def _conformer_report(conformers: ConformerSet) -> Dict[str, Any]:
+    summary = conformers.summary()
+    return {
+        'success': True,
+        'num_conformers': len(summary),
+        'num_atoms': conformers.num_atoms,
+        'conformers': summary,
+        'lowest_energy': summary[0]['energy'],
+        'sdf': conformers.to_sdf(),
+        'pdbqt': conformers.to_pdbqt(),
+        'method': 'distance_geometry'
+    }
+
+
+def _optimization_report(conformers: ConformerSet, index: int, method: str) -> Dict[str, Any]:
+    initial, final = float(conformers.initial_energies[index]), float(conformers.energies[index])
+    return {
+        'success': True,
+        'method': method,
+        'initial_energy': round(initial, 4),
+        'final_energy': round(final, 4),
+        'energy_change': round(final - initial, 4),
+        'converged': bool(conformers.converged[index]),
+        'iterations': int(conformers.iterations),
+        'optimized_structure': conformers.to_sdf([index])
+    }
@@ -0,0 +1,348 @@
+"""
+Docking Pose Parsing and Clustering
+
+This module turns Vina output into arrays and reduces it to distinct poses:
+- Streaming parser for multi-MODEL PDBQT into (poses, atoms, 3) arrays with
+  per-pose affinity and RMSD records
+- Symmetry-aware RMSD (atoms matched to the nearest atom of the same type,
+  as in Vina's rmsd_lb) computed for whole pose blocks at once
+- Greedy leader clustering that keeps the best-scored pose of each cluster
+"""
+
+import io
+import os
+import logging
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Poses closer than this (Å) belong to the same binding mode (Vina default)
+CLUSTER_RMSD = 2.0
+
+# Poses parsed per yielded batch
+POSE_BATCH_SIZE = 4096
+
+# Upper bound on floats in one pairwise distance block
+MAX_BLOCK_ELEMENTS = 8_000_000
+
+# Candidate poses compared against the representatives per clustering step
+CLUSTER_BLOCK = 512
+
+_VINA_RESULT = 'REMARK VINA RESULT:'
+
+
+def _iter_lines(source: Any) -> Iterator[str]:
+    """Lines from a path, an open text file or PDBQT content"""
+    if hasattr(source, 'read'):
+        yield from source
+    elif isinstance(source, str) and '\n' not in source and os.path.exists(source):
+        with open(source, 'r') as f:
+            yield from f
+    else:
+        yield from io.StringIO(source)
+
+
+def _pose_batch(coord_text: List[str], records: List[Tuple[float, float, float]], num_atoms: int,
+                names: List[str], types: List[str], num_torsions: int) -> Dict[str, Any]:
+    # Fixed-width fields convert in one call instead of one float() per value
+    buffer = ''.join(coord_text).encode('ascii')
+    coords = np.frombuffer(buffer, dtype='S8').astype(np.float64).astype(np.float32)
+    records = np.array(records, dtype=np.float64).reshape(-1, 3)
+    return {
+        'coords': coords.reshape(len(records), num_atoms, 3),
+        'affinities': records[:, 0],
+        'rmsd_lb': records[:, 1],
+        'rmsd_ub': records[:, 2],
+        'names': names,
+        'types': types,
+        'torsdof': num_torsions
+    }
+
+
+def iter_pose_batches(source: Any, batch_size: int = POSE_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a multi-MODEL PDBQT as batches of pose arrays
+
+    Only the coordinate columns of each pose are kept, so memory stays
+    proportional to batch_size regardless of file size. Content without
+    MODEL records is treated as a single pose.
+
+    Args:
+        source: File path, open text file or PDBQT content
+        batch_size: Poses per yielded batch
+
+    Yields:
+        Dictionaries with 'coords' (P, A, 3) float32, 'affinities',
+        'rmsd_lb', 'rmsd_ub' (P,) (NaN when not recorded), and the atom
+        'names', 'types' and 'torsdof' of the first pose
+    """
+    names: List[str] = []
+    types: List[str] = []
+    num_atoms = None
+    num_torsions = 0
+    coord_text: List[str] = []
+    records: List[Tuple[float, float, float]] = []
+    pose_text: List[str] = []
+    record = (np.nan, np.nan, np.nan)
+    first_pose = True
+
+    def finish_pose():
+        nonlocal num_atoms, first_pose, pose_text, record
+        if not pose_text:
+            return
+        if num_atoms is None:
+            num_atoms = len(pose_text)
+        elif len(pose_text) != num_atoms:
+            raise ValueError(f"Pose {len(records) + 1} has {len(pose_text)} atoms, expected {num_atoms}")
+        coord_text.extend(pose_text)
+        records.append(record)
+        pose_text = []
+        record = (np.nan, np.nan, np.nan)
+        first_pose = False
+
+    for line in _iter_lines(source):
+        if line.startswith(('ATOM  ', 'HETATM')):
+            pose_text.append(line[30:54].ljust(24))
+            if first_pose:
+                names.append(line[12:16].strip())
+                types.append(line[77:79].strip() or line[76:78].strip() or line[12:16].strip()[:1])
+        elif line.startswith('MODEL'):
+            finish_pose()
+        elif line.startswith('ENDMDL'):
+            finish_pose()
+            if len(records) >= batch_size:
+                yield _pose_batch(coord_text, records, num_atoms, names, types, num_torsions)
+                coord_text, records = [], []
+        elif line.startswith(_VINA_RESULT):
+            values = line[len(_VINA_RESULT):].split()
+            try:
+                record = tuple(float(values[i]) if i < len(values) else np.nan for i in range(3))
+            except ValueError:
+                record = (np.nan, np.nan, np.nan)
+        elif line.startswith('TORSDOF') and first_pose:
+            try:
+                num_torsions = int(line.split()[1])
+            except (IndexError, ValueError):
+                num_torsions = 0
+
+    finish_pose()
+    if records:
+        yield _pose_batch(coord_text, records, num_atoms, names, types, num_torsions)
+
+
+def parse_pdbqt_poses(source: Any, max_poses: Optional[int] = None) -> Dict[str, Any]:
+    """
+    All poses of a multi-MODEL PDBQT (see iter_pose_batches)
+
+    Args:
+        source: File path, open text file or PDBQT content
+        max_poses: Stop after this many poses
+
+    Returns:
+        A single batch holding every pose; 'coords' has shape (0, 0, 3)
+        when the input has no atoms
+    """
+    batches = []
+    count = 0
+    for batch in iter_pose_batches(source):
+        batches.append(batch)
+        count += len(batch['affinities'])
+        if max_poses is not None and count >= max_poses:
+            break
+
+    if not batches:
+        return {'coords': np.zeros((0, 0, 3), dtype=np.float32), 'affinities': np.zeros(0),
+                'rmsd_lb': np.zeros(0), 'rmsd_ub': np.zeros(0), 'names': [], 'types': [], 'torsdof': 0}
+
+    poses = dict(batches[0])
+    for key in ('coords', 'affinities', 'rmsd_lb', 'rmsd_ub'):
+        poses[key] = np.concatenate([batch[key] for batch in batches])[:max_poses]
+    return poses
+
+
+def _type_groups(types: Optional[List[str]], num_atoms: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Atoms with a unique type, and index groups of interchangeable atoms"""
+    if types is None or len(types) != num_atoms:
+        return np.arange(num_atoms), []
+    _, inverse, counts = np.unique(np.asarray(types), return_inverse=True, return_counts=True)
+    unique = np.nonzero(counts[inverse] == 1)[0]
+    groups = [np.nonzero(inverse == t)[0] for t in np.nonzero(counts > 1)[0]]
+    return unique, groups
+
+
+def pose_rmsd(poses_a: Any, poses_b: Any, types: Optional[List[str]] = None,
+              symmetric: bool = True) -> np.ndarray:
+    """
+    Pairwise RMSD between two sets of poses of the same ligand
+
+    With symmetric=True and atom types given, each atom is matched to the
+    nearest atom of the same type in the other pose (both directions, the
+    larger is kept), so ring flips and equivalent oxygens do not inflate
+    the RMSD. Atoms with a unique type use the direct distance, computed
+    for all pairs at once as one matrix product.
+
+    Computation stays in the inputs' precision: float32 poses (as parsed)
+    carry about 1e-3 Å of rounding in the expansion, which is fine for
+    clustering; pass float64 where exact small values matter.
+
+    Args:
+        poses_a: (P, A, 3) or (A, 3) coordinates
+        poses_b: (Q, A, 3) or (A, 3) coordinates
+        types: Per-atom types defining interchangeable atoms
+        symmetric: Match equivalent atoms instead of atom order
+
+    Returns:
+        (P, Q) RMSD matrix in Å
+    """
+    a = np.asarray(poses_a)
+    b = np.asarray(poses_b)
+    dtype = np.result_type(a.dtype, b.dtype, np.float32)
+    a = a.astype(dtype, copy=False)
+    b = b.astype(dtype, copy=False)
+    a = a[None] if a.ndim == 2 else a
+    b = b[None] if b.ndim == 2 else b
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(f"Pose shapes differ: {a.shape[1:]} vs {b.shape[1:]}")
+    num_atoms = a.shape[1]
+    if num_atoms == 0:
+        return np.zeros((len(a), len(b)))
+
+    unique, groups = _type_groups(types, num_atoms) if symmetric else (np.arange(num_atoms), [])
+
+    # Centering on a shared point keeps the float32 expansions below accurate
+    shift = b.reshape(-1, 3).mean(axis=0)
+    a = a - shift
+    b = b - shift
+
+    # |x - y|^2 = |x|^2 + |y|^2 - 2 x.y summed over the directly matched atoms
+    flat_a = a[:, unique].reshape(len(a), -1)
+    flat_b = b[:, unique].reshape(len(b), -1)
+    total = ((flat_a ** 2).sum(axis=1)[:, None] + (flat_b ** 2).sum(axis=1)[None, :]
+             - 2.0 * flat_a @ flat_b.T)
+
+    for group in groups:
+        k = len(group)
+        ga = a[:, group].reshape(-1, 3)
+        gb = b[:, group].reshape(-1, 3)
+        norm_b = (gb ** 2).sum(axis=1)
+        rows = max(1, MAX_BLOCK_ELEMENTS // max(1, len(b) * k * k))
+        for start in range(0, len(a), rows):
+            block = ga[start * k:(start + rows) * k]
+            # (rows, k, Q, k) squared distances between interchangeable atoms as one matrix product
+            dist_sq = ((block ** 2).sum(axis=1)[:, None] + norm_b[None, :] - 2.0 * block @ gb.T)
+            dist_sq = dist_sq.reshape(-1, k, len(b), k)
+            forward = dist_sq.min(axis=3).sum(axis=1)
+            backward = dist_sq.min(axis=1).sum(axis=2)
+            total[start:start + rows] += np.maximum(forward, backward)
+
+    return np.sqrt(np.maximum(total, 0.0) / num_atoms)
+
+
+def _nearest_representative(poses: np.ndarray, representatives: np.ndarray, types: Optional[List[str]],
+                            symmetric: bool, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest representative of each pose and its RMSD"""
+    # Plain RMSD bounds the symmetric one from above, so poses it already
+    # places within threshold skip the more expensive symmetric pass
+    distances = pose_rmsd(poses, representatives, symmetric=False)
+    nearest = distances.argmin(axis=1)
+    best = distances[np.arange(len(poses)), nearest]
+    if symmetric and types is not None:
+        rest = np.nonzero(best > threshold)[0]
+        if len(rest):
+            exact = pose_rmsd(poses[rest], representatives, types, symmetric=True)
+            nearest[rest] = exact.argmin(axis=1)
+            best[rest] = exact[np.arange(len(rest)), nearest[rest]]
+    return nearest, best
+
+
+def cluster_poses(coords: Any, scores: Optional[Any] = None, types: Optional[List[str]] = None,
+                  threshold: float = CLUSTER_RMSD, max_clusters: Optional[int] = None,
+                  symmetric: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Greedy leader clustering of poses by RMSD
+
+    Poses are visited best score first; a pose within threshold of an
+    existing representative joins it, otherwise it starts a new cluster.
+    Candidates are compared against all representatives in blocks, so the
+    cost is one vectorized RMSD block per CLUSTER_BLOCK poses rather than
+    a Python loop over pose pairs. The symmetry-aware RMSD is only
+    evaluated for poses that plain RMSD does not already place within
+    threshold, which keeps millions of poses cheap.
+
+    Args:
+        coords: (P, A, 3) pose coordinates
+        scores: (P,) scores, lower is better (default: input order)
+        types: Per-atom types for symmetry-aware RMSD
+        threshold: Cluster radius in Å
+        max_clusters: Once reached, remaining poses join their nearest cluster
+        symmetric: Use symmetry-aware RMSD
+
+    Returns:
+        'labels' (P,) cluster index per pose, 'representatives' pose index of
+        each cluster (best first) and 'sizes' member count per cluster
+    """
+    coords = np.asarray(coords, dtype=np.float32)
+    num_poses = len(coords)
+    labels = np.full(num_poses, -1, dtype=np.int64)
+    if num_poses == 0:
+        return {'labels': labels, 'representatives': np.zeros(0, dtype=np.int64),
+                'sizes': np.zeros(0, dtype=np.int64)}
+
+    if scores is None:
+        order = np.arange(num_poses)
+    else:
+        order = np.argsort(np.nan_to_num(np.asarray(scores, dtype=np.float64), nan=np.inf), kind='stable')
+
+    representatives: List[int] = []
+    for start in range(0, num_poses, CLUSTER_BLOCK):
+        candidates = order[start:start + CLUSTER_BLOCK]
+
+        if representatives:
+            nearest, distances = _nearest_representative(coords[candidates], coords[representatives],
+                                                         types, symmetric, threshold)
+            joined = distances <= threshold
+            if max_clusters is not None and len(representatives) >= max_clusters:
+                joined[:] = True
+            labels[candidates[joined]] = nearest[joined]
+            candidates = candidates[~joined]
+        if len(candidates) == 0:
+            continue
+
+        # New leaders within the block, resolved on its small internal matrix
+        internal = pose_rmsd(coords[candidates], coords[candidates], types, symmetric) <= threshold
+        pending = np.ones(len(candidates), dtype=bool)
+        for i in range(len(candidates)):
+            if not pending[i]:
+                continue
+            if max_clusters is not None and len(representatives) >= max_clusters:
+                break
+            members = pending & internal[i]
+            members[i] = True
+            labels[candidates[members]] = len(representatives)
+            representatives.append(int(candidates[i]))
+            pending &= ~members
+
+        if pending.any():
+            leftovers = candidates[pending]
+            labels[leftovers] = _nearest_representative(coords[leftovers], coords[representatives],
+                                                        types, symmetric, threshold)[0]
+
+    representatives = np.array(representatives, dtype=np.int64)
+    return {
+        'labels': labels,
+        'representatives': representatives,
+        'sizes': np.bincount(labels, minlength=len(representatives))
+    }
+
+
+def rmsd_from_best(coords: Any, types: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Vina-style (rmsd_lb, rmsd_ub) of each pose relative to the first one"""
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) == 0:
+        return np.zeros(0), np.zeros(0)
+    lower = pose_rmsd(coords, coords[:1], types, symmetric=True)[:, 0]
+    # Direct differences: exactly zero for the reference pose itself
+    upper = np.sqrt(((coords - coords[:1]) ** 2).sum(axis=2).mean(axis=1))
+    return lower, upper
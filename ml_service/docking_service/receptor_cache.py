@@ -0,0 +1,258 @@
+"""
+Persistent Cache of Prepared Receptors
+
+This module stores the output of receptor preparation keyed by content hash
+so the same protein is only prepared once:
+- Receptor handles derived from the structure content and preparation version
+- One directory per receptor with PDB/PDBQT files, metadata and grids
+- Atomic publication so concurrent processes can share the cache
+- Least-recently-used eviction bounded by entry count and disk size
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when preparation output changes so stale entries are not reused
+RECEPTOR_CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'geneinsight', 'receptors')
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+METADATA_FILE = 'metadata.json'
+GRIDS_FILE = 'grids.npz'
+
+_RECEPTOR_ID = re.compile(r'^rec-[0-9a-f]{32}$')
+
+
+def link_or_copy(source: str, destination: str) -> str:
+    """Hard-link a file into place, copying when linking is not possible"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+    return destination
+
+
+class ReceptorCache:
+    """Content-addressed on-disk store of prepared receptors"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Cache root (default: $GENEINSIGHT_RECEPTOR_CACHE or ~/.cache/geneinsight/receptors)
+            max_entries: Maximum number of cached receptors
+            max_bytes: Maximum total size of cached files
+        """
+        self.cache_dir = cache_dir or os.environ.get('GENEINSIGHT_RECEPTOR_CACHE', DEFAULT_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def receptor_id(protein_data: str, protein_format: str = 'pdb') -> str:
+        """Handle for a receptor: hash of its content, format and preparation version"""
+        digest = hashlib.sha256(f"{RECEPTOR_CACHE_VERSION}:{protein_format.lower()}:".encode())
+        digest.update(protein_data.encode())
+        return f"rec-{digest.hexdigest()[:32]}"
+
+    @staticmethod
+    def is_receptor_id(value: Any) -> bool:
+        return isinstance(value, str) and bool(_RECEPTOR_ID.match(value))
+
+    def _entry_dir(self, receptor_id: str) -> str:
+        if not self.is_receptor_id(receptor_id):
+            raise ValueError(f"Invalid receptor handle: {receptor_id}")
+        return os.path.join(self.cache_dir, receptor_id)
+
+    def get(self, receptor_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a prepared receptor and mark it as recently used
+
+        Returns:
+            Stored metadata with absolute file paths, or None on a miss
+        """
+        entry = self._read(receptor_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        # The metadata mtime is the LRU timestamp shared by all processes
+        try:
+            os.utime(os.path.join(self._entry_dir(receptor_id), METADATA_FILE))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def _read(self, receptor_id: str) -> Optional[Dict[str, Any]]:
+        entry_dir = self._entry_dir(receptor_id)
+        try:
+            with open(os.path.join(entry_dir, METADATA_FILE), 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        entry['files'] = {key: os.path.join(entry_dir, name) for key, name in entry['files'].items()}
+        if not all(os.path.exists(path) for path in entry['files'].values()):
+            return None
+        return entry
+
+    def put(self, receptor_id: str, files: Dict[str, str], metadata: Dict[str, Any],
+            arrays: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+        """
+        Store a prepared receptor
+
+        Files are staged in a private directory and published with a single
+        rename, so readers never observe a partial entry. If another process
+        published the same receptor first, its entry is kept.
+
+        Args:
+            receptor_id: Handle from receptor_id()
+            files: Logical key -> path of each prepared file
+            metadata: JSON-serializable preparation results
+            arrays: Optional NumPy arrays (grids, atom arrays) stored as .npz
+
+        Returns:
+            The published entry in the same form as get()
+        """
+        entry_dir = self._entry_dir(receptor_id)
+        staging = tempfile.mkdtemp(prefix=f".{receptor_id}-", dir=self.cache_dir)
+        try:
+            stored_files = {}
+            for key, path in files.items():
+                name = os.path.basename(path)
+                shutil.copy2(path, os.path.join(staging, name))
+                stored_files[key] = name
+            if arrays:
+                np.savez_compressed(os.path.join(staging, GRIDS_FILE), **arrays)
+                stored_files['grids'] = GRIDS_FILE
+
+            entry = dict(metadata)
+            entry.update({
+                'receptor_id': receptor_id,
+                'version': RECEPTOR_CACHE_VERSION,
+                'created_at': time.time(),
+                'files': stored_files
+            })
+            with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+                json.dump(entry, f)
+
+            try:
+                os.rename(staging, entry_dir)
+            except OSError:
+                # Published concurrently by another worker
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.evict(keep=receptor_id)
+        entry = self._read(receptor_id)
+        if entry is None:
+            raise RuntimeError(f"Receptor {receptor_id} could not be stored in the cache")
+        return entry
+
+    def load_arrays(self, receptor_id: str) -> Dict[str, np.ndarray]:
+        """Arrays stored with a receptor (empty when none were stored)"""
+        path = os.path.join(self._entry_dir(receptor_id), GRIDS_FILE)
+        if not os.path.exists(path):
+            return {}
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+
+    def remove(self, receptor_id: str) -> bool:
+        """Delete a cached receptor; returns whether it existed"""
+        entry_dir = self._entry_dir(receptor_id)
+        if not os.path.isdir(entry_dir):
+            return False
+        self._delete(entry_dir)
+        return True
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Cached receptors with size and last-used time, most recent first"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not self.is_receptor_id(name):
+                continue
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(entry_dir, METADATA_FILE))
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            except OSError:
+                continue
+            result.append({'receptor_id': name, 'last_used': last_used, 'size_bytes': size})
+        result.sort(key=lambda entry: entry['last_used'], reverse=True)
+        return result
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Drop least-recently-used receptors until the cache is within its limits
+
+        Args:
+            keep: Receptor that must survive (typically the one just stored)
+
+        Returns:
+            Evicted receptor handles
+        """
+        with self._lock:
+            entries = self.entries()
+            total = sum(entry['size_bytes'] for entry in entries)
+            count = len(entries)
+            evicted = []
+            for entry in reversed(entries):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                if entry['receptor_id'] == keep:
+                    continue
+                self._delete(os.path.join(self.cache_dir, entry['receptor_id']))
+                evicted.append(entry['receptor_id'])
+                count -= 1
+                total -= entry['size_bytes']
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} cached receptor(s)")
+        return evicted
+
+    def clear(self):
+        """Remove every cached receptor"""
+        for entry in self.entries():
+            self._delete(os.path.join(self.cache_dir, entry['receptor_id']))
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self.entries()
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': len(entries),
+            'size_bytes': sum(entry['size_bytes'] for entry in entries),
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _delete(self, entry_dir: str):
+        # Rename first so readers never see a half-deleted entry; workspaces
+        # hold hard links, so files already in use are unaffected
+        trash = f"{entry_dir}.deleting-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(entry_dir, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
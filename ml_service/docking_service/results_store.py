@@ -0,0 +1,349 @@
+"""
+Persistent Docking Results Store
+
+This module keeps docking outcomes across restarts so past screens can be
+queried instead of re-docked:
+- SQLite table of per-ligand results (receptor hash, ligand, box,
+  exhaustiveness, scores, timings) indexed for "top ligands for a receptor"
+  and "all results for a ligand" lookups
+- Screening campaigns whose results are inserted in batched transactions
+- Content-addressed, compressed blob directory for pose files, shared
+  safely between processes
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, List, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'geneinsight', 'results')
+DATABASE_FILE = 'results.sqlite3'
+BLOB_DIR = 'blobs'
+
+# Results buffered per campaign before one batched insert
+DEFAULT_BATCH_SIZE = 500
+
+# Rows scanned per distinct ligand when collecting top hits
+TOP_SCAN_FACTOR = 4
+
+_BLOB_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+_RESULT_COLUMNS = ('campaign_id', 'receptor_hash', 'ligand_name', 'smiles', 'binding_site', 'exhaustiveness',
+                   'best_affinity', 'best_rescored_affinity', 'modes', 'pose_blob', 'elapsed', 'mock',
+                   'created_at')
+
+
+def write_blob(blob_dir: str, data: bytes) -> str:
+    """
+    Store bytes under their SHA-256 digest (gzip-compressed)
+
+    Writes go to a temporary file that is renamed into place, so concurrent
+    writers of the same content never expose a partial blob. Safe to call
+    from worker processes without a database connection.
+
+    Returns:
+        Hex digest identifying the blob
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    directory = os.path.join(blob_dir, digest[:2])
+    path = os.path.join(directory, digest[2:])
+    if os.path.exists(path):
+        return digest
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6))
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest
+
+
+class ResultsStore:
+    """SQLite-backed archive of docking results and pose blobs"""
+
+    def __init__(self, root: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            root: Store directory (default: $GENEINSIGHT_RESULTS_DIR or ~/.cache/geneinsight/results)
+            batch_size: Campaign results buffered per insert transaction
+        """
+        self.root = root or os.environ.get('GENEINSIGHT_RESULTS_DIR', DEFAULT_RESULTS_DIR)
+        self.blob_dir = os.path.join(self.root, BLOB_DIR)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.db_path = os.path.join(self.root, DATABASE_FILE)
+        self.batch_size = max(1, int(batch_size))
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[tuple]] = {}
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    campaign_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    receptor_hash TEXT NOT NULL,
+                    binding_site TEXT NOT NULL,
+                    exhaustiveness INTEGER,
+                    params TEXT,
+                    num_results INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    result_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign_id TEXT,
+                    receptor_hash TEXT NOT NULL,
+                    ligand_name TEXT,
+                    smiles TEXT,
+                    binding_site TEXT NOT NULL,
+                    exhaustiveness INTEGER,
+                    best_affinity REAL,
+                    best_rescored_affinity REAL,
+                    modes TEXT,
+                    pose_blob TEXT,
+                    elapsed REAL,
+                    mock INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL
+                )''')
+            # Top-N per receptor reads the index in affinity order and stops early
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_receptor_affinity '
+                               'ON results (receptor_hash, best_affinity)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_campaign_affinity '
+                               'ON results (campaign_id, best_affinity)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_smiles ON results (smiles, created_at)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_ligand_name ON results (ligand_name, created_at)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS campaigns_receptor ON campaigns (receptor_hash, created_at)')
+
+    def put_blob(self, data: Any) -> str:
+        """Store a pose file (bytes or text) and return its digest"""
+        return write_blob(self.blob_dir, data.encode() if isinstance(data, str) else data)
+
+    def get_blob(self, digest: str) -> Optional[bytes]:
+        """Decompressed blob content, or None when unknown"""
+        if not _BLOB_DIGEST.match(digest or ''):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        try:
+            with open(os.path.join(self.blob_dir, digest[:2], digest[2:]), 'rb') as f:
+                return gzip.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def begin_campaign(self, receptor_hash: str, binding_site: Dict[str, float],
+                       exhaustiveness: Optional[int] = None, name: Optional[str] = None,
+                       params: Optional[Dict[str, Any]] = None) -> str:
+        """Register a screening campaign and return its ID"""
+        campaign_id = f"cmp-{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO campaigns (campaign_id, name, receptor_hash, binding_site, exhaustiveness, params, '
+                'created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (campaign_id, name, receptor_hash, json.dumps(binding_site, sort_keys=True), exhaustiveness,
+                 json.dumps(params or {}), time.time())
+            )
+            self._pending[campaign_id] = []
+        return campaign_id
+
+    def _row(self, result: Dict[str, Any], receptor_hash: str, binding_site: Dict[str, float],
+             exhaustiveness: Optional[int], campaign_id: Optional[str]) -> tuple:
+        return (
+            campaign_id,
+            receptor_hash,
+            result.get('name') or result.get('ligand_name'),
+            result.get('smiles'),
+            json.dumps(binding_site, sort_keys=True),
+            exhaustiveness,
+            result.get('best_affinity'),
+            result.get('best_rescored_affinity'),
+            json.dumps(result.get('results', [])),
+            result.get('pose_blob'),
+            result.get('elapsed'),
+            int(bool(result.get('mock', False))),
+            time.time()
+        )
+
+    def _insert(self, rows: List[tuple]):
+        placeholders = ', '.join('?' for _ in _RESULT_COLUMNS)
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO results ({', '.join(_RESULT_COLUMNS)}) VALUES ({placeholders})", rows
+                )
+                campaigns: Dict[str, int] = {}
+                for row in rows:
+                    if row[0]:
+                        campaigns[row[0]] = campaigns.get(row[0], 0) + 1
+                self._conn.executemany('UPDATE campaigns SET num_results = num_results + ? WHERE campaign_id = ?',
+                                       [(count, campaign_id) for campaign_id, count in campaigns.items()])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def record(self, result: Dict[str, Any], receptor_hash: str, binding_site: Dict[str, float],
+               exhaustiveness: Optional[int] = None) -> None:
+        """Insert a single docking result outside any campaign"""
+        self._insert([self._row(result, receptor_hash, binding_site, exhaustiveness, None)])
+
+    def add_campaign_results(self, campaign_id: str, results: Iterable[Dict[str, Any]]) -> int:
+        """
+        Buffer results of a campaign, flushing every batch_size rows
+
+        Returns:
+            Number of results accepted
+        """
+        campaign = self.get_campaign(campaign_id)
+        if campaign is None:
+            raise KeyError(f"Unknown campaign: {campaign_id}")
+
+        rows = [self._row(result, campaign['receptor_hash'], campaign['binding_site'],
+                          campaign['exhaustiveness'], campaign_id)
+                for result in results if result.get('success')]
+        with self._lock:
+            buffer = self._pending.setdefault(campaign_id, [])
+            buffer.extend(rows)
+            flush = len(buffer) >= self.batch_size
+            if flush:
+                self._pending[campaign_id] = []
+        if flush:
+            self._insert(buffer)
+        return len(rows)
+
+    def flush(self, campaign_id: str):
+        """Write any buffered results of a campaign"""
+        with self._lock:
+            buffer = self._pending.get(campaign_id, [])
+            self._pending[campaign_id] = []
+        if buffer:
+            self._insert(buffer)
+
+    def finish_campaign(self, campaign_id: str):
+        """Flush buffered results and mark the campaign as finished"""
+        self.flush(campaign_id)
+        with self._lock:
+            self._pending.pop(campaign_id, None)
+            self._conn.execute('UPDATE campaigns SET finished_at = ? WHERE campaign_id = ?',
+                               (time.time(), campaign_id))
+
+    @staticmethod
+    def _result(row: sqlite3.Row) -> Dict[str, Any]:
+        result = dict(row)
+        result['binding_site'] = json.loads(result['binding_site'])
+        result['modes'] = json.loads(result['modes']) if result['modes'] else []
+        result['mock'] = bool(result['mock'])
+        return result
+
+    def top_ligands(self, receptor_hash: str, limit: int = 10, campaign_id: Optional[str] = None,
+                    distinct: bool = True) -> List[Dict[str, Any]]:
+        """
+        Best-scoring results for a receptor (or one campaign), best first
+
+        Rows are read from the affinity index in order; with distinct=True
+        only the best result of each ligand is kept, and the scan stops as
+        soon as limit ligands are found.
+        """
+        if limit < 1:
+            return []
+        if campaign_id:
+            query = ('SELECT * FROM results WHERE campaign_id = ? AND best_affinity IS NOT NULL '
+                     'ORDER BY best_affinity LIMIT ?')
+            key = campaign_id
+        else:
+            query = ('SELECT * FROM results WHERE receptor_hash = ? AND best_affinity IS NOT NULL '
+                     'ORDER BY best_affinity LIMIT ?')
+            key = receptor_hash
+
+        scan = limit if not distinct else limit * TOP_SCAN_FACTOR
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (key, scan)).fetchall()
+            hits, seen = [], set()
+            for row in rows:
+                ligand = row['smiles'] or row['ligand_name']
+                if distinct and ligand in seen:
+                    continue
+                seen.add(ligand)
+                hits.append(self._result(row))
+                if len(hits) >= limit:
+                    return hits
+            # Fewer rows than requested means the index is exhausted
+            if len(rows) < scan:
+                return hits
+            scan *= TOP_SCAN_FACTOR
+
+    def results_for_ligand(self, smiles: Optional[str] = None, name: Optional[str] = None,
+                           receptor_hash: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """All stored results for a ligand (by SMILES or name), newest first"""
+        if not smiles and not name:
+            raise ValueError("A ligand SMILES or name is required")
+        column, value = ('smiles', smiles) if smiles else ('ligand_name', name)
+        query = f'SELECT * FROM results WHERE {column} = ?'
+        params: List[Any] = [value]
+        if receptor_hash:
+            query += ' AND receptor_hash = ?'
+            params.append(receptor_hash)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._result(row) for row in rows]
+
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM campaigns WHERE campaign_id = ?', (campaign_id,)).fetchone()
+        if row is None:
+            return None
+        campaign = dict(row)
+        campaign['binding_site'] = json.loads(campaign['binding_site'])
+        campaign['params'] = json.loads(campaign['params']) if campaign['params'] else {}
+        return campaign
+
+    def list_campaigns(self, receptor_hash: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent campaigns, optionally for one receptor"""
+        query = 'SELECT campaign_id FROM campaigns'
+        params: List[Any] = []
+        if receptor_hash:
+            query += ' WHERE receptor_hash = ?'
+            params.append(receptor_hash)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(query, params).fetchall()]
+        return [self.get_campaign(campaign_id) for campaign_id in ids]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            num_results = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            num_campaigns = self._conn.execute('SELECT COUNT(*) FROM campaigns').fetchone()[0]
+            pending = sum(len(rows) for rows in self._pending.values())
+        return {
+            'root': self.root,
+            'results': num_results,
+            'campaigns': num_campaigns,
+            'pending': pending
+        }
+
+    def close(self):
+        for campaign_id in list(self._pending):
+            self.flush(campaign_id)
+        with self._lock:
+            self._conn.close()
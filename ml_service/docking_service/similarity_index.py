@@ -0,0 +1,344 @@
+"""
+Fingerprint Similarity Index for Ligand Libraries
+
+This module answers "which library compounds are similar to this hit":
+- Packed uint64 fingerprints stored in .npy files, memory-mapped on load
+- Rows sorted by popcount, so the Tanimoto bound min(a, b) / max(a, b)
+  turns each query into a walk outward from the query's own bit count
+  that stops as soon as no remaining row can beat the threshold or the
+  current K-th best hit
+- Blocked, vectorized popcount Tanimoto over the surviving rows
+- Streaming builds for libraries larger than memory
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from utils.smiles import parse_smiles, try_parse_smiles
+from utils.parallel import bounded_imap
+from utils.fingerprints import (fingerprints, popcount_rows, DEFAULT_BITS, DEFAULT_RADIUS,
+                                DEFAULT_PATH_LENGTH, FINGERPRINT_KINDS)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'geneinsight', 'fingerprints')
+
+FINGERPRINT_FILE = 'fingerprints.npy'
+COUNTS_FILE = 'counts.npy'
+NAMES_FILE = 'names.npy'
+SMILES_FILE = 'smiles.npy'
+META_FILE = 'meta.json'
+
+# Rows compared per vectorized Tanimoto block
+SEARCH_BLOCK = 65536
+BUILD_CHUNK = 5000
+
+
+def _fingerprint_chunk(task: Tuple[List[Tuple[str, str]], Dict[str, Any]]) -> Tuple[np.ndarray, List[str], List[str], int]:
+    """Fingerprint one chunk of (name, smiles); invalid SMILES are dropped"""
+    chunk, options = task
+    graphs, names, smiles_list = [], [], []
+    for name, smiles in chunk:
+        graph, _ = try_parse_smiles(smiles)
+        if graph is not None:
+            graphs.append(graph)
+            names.append(name)
+            smiles_list.append(graph.smiles)
+    packed = fingerprints(graphs, **options)
+    return packed, names, smiles_list, len(chunk) - len(graphs)
+
+
+class SimilarityIndex:
+    """
+    Popcount-sorted fingerprint matrix with names and SMILES per row
+
+    Build with SimilarityIndex.build (in memory) or build_index (streamed to
+    a directory); load saved indexes with SimilarityIndex.load.
+    """
+
+    def __init__(self, fingerprints: np.ndarray, counts: np.ndarray, names: np.ndarray, smiles: np.ndarray,
+                 meta: Dict[str, Any], path: Optional[str] = None):
+        self.fingerprints = fingerprints
+        self.counts = counts
+        self.names = names
+        self.smiles = smiles
+        self.meta = meta
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Fingerprint options used for this index (also used for queries)"""
+        options = {'kind': self.meta['kind'], 'n_bits': self.meta['n_bits']}
+        if self.meta['kind'] == 'circular':
+            options['radius'] = self.meta['radius']
+        else:
+            options['max_length'] = self.meta['max_length']
+        return options
+
+    @staticmethod
+    def make_meta(kind: str, n_bits: int, radius: int, max_length: int) -> Dict[str, Any]:
+        if kind not in FINGERPRINT_KINDS:
+            raise ValueError(f"Unknown fingerprint kind: {kind}")
+        meta = {'kind': kind, 'n_bits': n_bits, 'created_at': datetime.now().isoformat()}
+        if kind == 'circular':
+            meta['radius'] = radius
+        else:
+            meta['max_length'] = max_length
+        return meta
+
+    @classmethod
+    def build(cls, ligands: Iterable[Dict[str, str]], kind: str = 'circular', n_bits: int = DEFAULT_BITS,
+              radius: int = DEFAULT_RADIUS, max_length: int = DEFAULT_PATH_LENGTH,
+              processes: int = 1) -> 'SimilarityIndex':
+        """Build an in-memory index from {'name', 'smiles'} dictionaries"""
+        meta = cls.make_meta(kind, n_bits, radius, max_length)
+        packed_chunks, names, smiles, invalid = [], [], [], 0
+        for packed, chunk_names, chunk_smiles, chunk_invalid in _iter_fingerprint_chunks(ligands, meta, processes):
+            packed_chunks.append(packed)
+            names.extend(chunk_names)
+            smiles.extend(chunk_smiles)
+            invalid += chunk_invalid
+
+        packed = np.concatenate(packed_chunks) if packed_chunks else np.zeros((0, n_bits // 64), dtype=np.uint64)
+        counts = popcount_rows(packed).astype(np.int16)
+        order = np.argsort(counts, kind='stable')
+        meta.update({'size': len(order), 'invalid': invalid})
+        return cls(packed[order], counts[order], np.array(names, dtype=object)[order],
+                   np.array(smiles, dtype=object)[order], meta)
+
+    def save(self, directory: str):
+        """Write the index to a directory of .npy files"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, FINGERPRINT_FILE), np.ascontiguousarray(self.fingerprints))
+        np.save(os.path.join(directory, COUNTS_FILE), self.counts)
+        np.save(os.path.join(directory, NAMES_FILE), np.asarray(self.names).astype(str))
+        np.save(os.path.join(directory, SMILES_FILE), np.asarray(self.smiles).astype(str))
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump(self.meta, f)
+        self.path = directory
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'SimilarityIndex':
+        """Open a saved index; fingerprints, names and SMILES are memory-mapped when mmap is true"""
+        mode = 'r' if mmap else None
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(np.load(os.path.join(directory, FINGERPRINT_FILE), mmap_mode=mode),
+                   np.load(os.path.join(directory, COUNTS_FILE)),
+                   np.load(os.path.join(directory, NAMES_FILE), mmap_mode=mode),
+                   np.load(os.path.join(directory, SMILES_FILE), mmap_mode=mode),
+                   meta, path=directory)
+
+    def query_fingerprint(self, smiles: str) -> np.ndarray:
+        """Packed fingerprint of a query SMILES with this index's options (raises SmilesError)"""
+        return fingerprints([parse_smiles(smiles)], **self.options)[0]
+
+    def search(self, query: Any, k: int = 10, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Top-k most similar library compounds
+
+        Args:
+            query: SMILES string or packed fingerprint
+            k: Maximum number of hits
+            threshold: Minimum Tanimoto similarity
+
+        Returns:
+            Hits sorted by decreasing similarity:
+            {'index', 'name', 'smiles', 'similarity'}
+        """
+        fingerprint = self.query_fingerprint(query) if isinstance(query, str) else np.asarray(query, np.uint64)
+        rows, scores = self.search_rows(fingerprint, k, threshold)
+        return [{'index': int(row), 'name': str(self.names[row]), 'smiles': str(self.smiles[row]),
+                 'similarity': round(float(score), 4)} for row, score in zip(rows, scores)]
+
+    def search_rows(self, fingerprint: np.ndarray, k: int = 10,
+                    threshold: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """search returning (row indices, similarities) arrays"""
+        if k <= 0 or len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query_count = int(popcount_rows(fingerprint[None, :])[0])
+        if query_count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Rows whose count can reach the threshold form one contiguous slice
+        low, high = 0, len(self)
+        if threshold > 0:
+            low = int(np.searchsorted(self.counts, np.ceil(threshold * query_count - 1e-9), 'left'))
+            high = int(np.searchsorted(self.counts, np.floor(query_count / threshold + 1e-9), 'right'))
+
+        # Walk outward from the query count, taking the side with the higher bound
+        down = up = int(np.searchsorted(self.counts, query_count, 'left'))
+        down, up = max(min(down, high), low), max(min(up, high), low)
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        floor = threshold
+
+        while down > low or up < high:
+            bound_down = self.counts[down - 1] / query_count if down > low else -1.0
+            bound_up = query_count / self.counts[up] if up < high and self.counts[up] > 0 else -1.0
+            if max(bound_down, bound_up) < floor:
+                break
+            if bound_up >= bound_down:
+                start, end = up, min(up + SEARCH_BLOCK, high)
+                up = end
+            else:
+                start, end = max(down - SEARCH_BLOCK, low), down
+                down = start
+
+            block = np.asarray(self.fingerprints[start:end])
+            counts = self.counts[start:end].astype(np.int32)
+            common = popcount_rows(block & fingerprint)
+            union = query_count + counts - common
+            scores = (common / np.maximum(union, 1)).astype(np.float32)
+            keep = np.flatnonzero(scores >= floor)
+            if keep.size == 0:
+                continue
+
+            best_rows = np.concatenate([best_rows, keep + start])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+            if len(best_scores) > k:
+                top = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+            if len(best_scores) == k:
+                floor = max(threshold, float(best_scores.min()))
+
+        order = np.lexsort((best_rows, -best_scores))
+        return best_rows[order], best_scores[order]
+
+    def info(self) -> Dict[str, Any]:
+        return dict(self.meta, size=len(self), path=self.path)
+
+
+def _iter_fingerprint_chunks(ligands: Iterable[Dict[str, str]], meta: Dict[str, Any],
+                             processes: int) -> Iterator[Tuple[np.ndarray, List[str], List[str], int]]:
+    options = {key: meta[key] for key in ('kind', 'n_bits', 'radius', 'max_length') if key in meta}
+
+    def tasks():
+        chunk: List[Tuple[str, str]] = []
+        for ligand in ligands:
+            chunk.append((ligand.get('name', ''), ligand.get('smiles', '')))
+            if len(chunk) >= BUILD_CHUNK:
+                yield chunk, options
+                chunk = []
+        if chunk:
+            yield chunk, options
+
+    if processes <= 1:
+        for task in tasks():
+            yield _fingerprint_chunk(task)
+        return
+    with Pool(processes) as pool:
+        yield from bounded_imap(pool, _fingerprint_chunk, ((task,) for task in tasks()))
+
+
+def build_index(ligands: Iterable[Dict[str, str]], directory: str, kind: str = 'circular',
+                n_bits: int = DEFAULT_BITS, radius: int = DEFAULT_RADIUS,
+                max_length: int = DEFAULT_PATH_LENGTH, processes: int = 1) -> SimilarityIndex:
+    """
+    Build an index on disk without holding all fingerprints in memory
+
+    Fingerprints are appended to a scratch file chunk by chunk, then copied
+    into popcount order block by block.
+
+    Returns:
+        The saved index, memory-mapped
+    """
+    meta = SimilarityIndex.make_meta(kind, n_bits, radius, max_length)
+    os.makedirs(directory, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='fingerprints_', dir=directory)
+    try:
+        raw_path = os.path.join(scratch, 'raw.u64')
+        counts_chunks, names, smiles, invalid = [], [], [], 0
+        with open(raw_path, 'wb') as raw:
+            for packed, chunk_names, chunk_smiles, chunk_invalid in _iter_fingerprint_chunks(ligands, meta, processes):
+                raw.write(np.ascontiguousarray(packed).tobytes())
+                counts_chunks.append(popcount_rows(packed).astype(np.int16))
+                names.extend(chunk_names)
+                smiles.extend(chunk_smiles)
+                invalid += chunk_invalid
+
+        counts = np.concatenate(counts_chunks) if counts_chunks else np.zeros(0, dtype=np.int16)
+        order = np.argsort(counts, kind='stable')
+        words = n_bits // 64
+
+        output = np.lib.format.open_memmap(os.path.join(directory, FINGERPRINT_FILE), mode='w+',
+                                           dtype=np.uint64, shape=(len(order), words))
+        if len(order):
+            source = np.memmap(raw_path, dtype=np.uint64, mode='r', shape=(len(order), words))
+            for start in range(0, len(order), SEARCH_BLOCK):
+                output[start:start + SEARCH_BLOCK] = source[order[start:start + SEARCH_BLOCK]]
+            del source
+        output.flush()
+        del output
+
+        np.save(os.path.join(directory, COUNTS_FILE), counts[order])
+        np.save(os.path.join(directory, NAMES_FILE), np.array(names, dtype=str)[order] if names else np.array([], dtype=str))
+        np.save(os.path.join(directory, SMILES_FILE), np.array(smiles, dtype=str)[order] if smiles else np.array([], dtype=str))
+        meta.update({'size': len(order), 'invalid': invalid})
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump(meta, f)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return SimilarityIndex.load(directory)
+
+
+class SimilarityIndexStore:
+    """Saved similarity indexes under one root directory, opened lazily and kept open"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root: Index directory (default: $GENEINSIGHT_FINGERPRINT_DIR or ~/.cache/geneinsight/fingerprints)
+        """
+        self.root = root or os.environ.get('GENEINSIGHT_FINGERPRINT_DIR', DEFAULT_INDEX_DIR)
+        os.makedirs(self.root, exist_ok=True)
+        self._open: Dict[str, SimilarityIndex] = {}
+
+    def create(self, ligands: Iterable[Dict[str, str]], name: Optional[str] = None, **options) -> SimilarityIndex:
+        """Build and save a new index; options are passed to build_index"""
+        index_id = f"fp-{uuid.uuid4().hex[:12]}"
+        index = build_index(ligands, os.path.join(self.root, index_id), **options)
+        index.meta.update({'index_id': index_id, 'name': name or index_id})
+        with open(os.path.join(index.path, META_FILE), 'w') as f:
+            json.dump(index.meta, f)
+        self._open[index_id] = index
+        return index
+
+    def get(self, index_id: str) -> Optional[SimilarityIndex]:
+        if index_id in self._open:
+            return self._open[index_id]
+        directory = os.path.join(self.root, os.path.basename(index_id))
+        if not index_id.startswith('fp-') or not os.path.exists(os.path.join(directory, META_FILE)):
+            return None
+        self._open[index_id] = SimilarityIndex.load(directory)
+        return self._open[index_id]
+
+    def list(self) -> List[Dict[str, Any]]:
+        indexes = []
+        for entry in sorted(os.listdir(self.root)):
+            meta_path = os.path.join(self.root, entry, META_FILE)
+            if entry.startswith('fp-') and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    indexes.append(json.load(f))
+        return indexes
+
+    def delete(self, index_id: str) -> bool:
+        self._open.pop(index_id, None)
+        directory = os.path.join(self.root, os.path.basename(index_id))
+        if not index_id.startswith('fp-') or not os.path.isdir(directory):
+            return False
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
@@ -0,0 +1,136 @@
+"""
+AutoDock Vina Discovery
+
+This module finds the Vina executable without slowing down service startup:
+- Explicit override through the VINA_EXECUTABLE environment variable
+- PATH lookup with shutil.which before any fixed install locations
+- Resolved path and version cached on disk and validated by file metadata,
+  so the version probe runs once per installation rather than per worker
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+VINA_ENV_VAR = 'VINA_EXECUTABLE'
+VINA_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'geneinsight', 'vina.json')
+
+# Tried in order after the environment override
+VINA_CANDIDATES = ['vina', 'autodock_vina', '/usr/local/bin/vina', '/opt/vina/bin/vina']
+
+VERSION_PROBE_TIMEOUT = 10
+
+_VERSION_PATTERN = re.compile(r'v?(\d+\.\d+(?:\.\d+)?)')
+
+_lock = threading.Lock()
+_resolved: Dict[str, Any] = {}
+
+
+def _resolve_candidate(candidate: str) -> Optional[str]:
+    path = shutil.which(candidate)
+    return os.path.realpath(path) if path else None
+
+
+def _file_signature(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _read_cache(cache_file: str) -> Dict[str, Any]:
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache_file: str, entries: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        logger.debug(f"Could not write Vina cache: {e}")
+
+
+def probe_vina_version(path: str) -> Optional[str]:
+    """Run `vina --version` once; None when the executable cannot be run"""
+    try:
+        result = subprocess.run([path, '--version'], capture_output=True, text=True,
+                                timeout=VERSION_PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    output = f"{result.stdout}\n{result.stderr}"
+    match = _VERSION_PATTERN.search(output)
+    return match.group(1) if match else 'unknown'
+
+
+def locate_vina(refresh: bool = False, cache_file: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Find the Vina executable and its version
+
+    The first call per process resolves the path (environment override,
+    then PATH, then fixed locations) and reuses the on-disk cached version
+    when the executable is unchanged; only a new or modified binary is
+    probed with a subprocess.
+
+    Args:
+        refresh: Ignore both the in-process and on-disk caches
+        cache_file: Override the cache location
+
+    Returns:
+        {'path', 'version', 'source'} or None when Vina is not installed
+    """
+    cache_file = cache_file or VINA_CACHE_FILE
+    with _lock:
+        if not refresh and cache_file in _resolved:
+            return _resolved[cache_file]
+
+        override = os.environ.get(VINA_ENV_VAR)
+        if override:
+            path = _resolve_candidate(override)
+            if path is None:
+                logger.warning(f"{VINA_ENV_VAR}={override} is not an executable; searching defaults")
+            candidates = [(path, 'environment')] if path else []
+        else:
+            candidates = []
+        candidates += [(_resolve_candidate(c), 'search') for c in VINA_CANDIDATES]
+
+        info = None
+        entries = {} if refresh else _read_cache(cache_file)
+        for path, source in candidates:
+            if path is None:
+                continue
+            signature = _file_signature(path)
+            cached = entries.get(path)
+            if cached and cached.get('signature') == signature:
+                info = {'path': path, 'version': cached['version'], 'source': source}
+                break
+
+            version = probe_vina_version(path)
+            if version is None:
+                continue
+            entries[path] = {'version': version, 'signature': signature}
+            _write_cache(cache_file, entries)
+            info = {'path': path, 'version': version, 'source': source}
+            break
+
+        if info:
+            logger.info(f"Found Vina executable: {info['path']} (version {info['version']})")
+        else:
+            logger.warning("AutoDock Vina not found. Using mock docking.")
+        _resolved[cache_file] = info
+        return info
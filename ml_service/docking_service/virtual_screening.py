@@ -0,0 +1,371 @@
+"""
+Virtual Screening for Molecular Docking
+
+This module docks a ligand library against a single receptor:
+- SMILES, SDF and MOL2 library parsing
+- Duplicate compounds (same canonical SMILES) dropped before docking
+- Bounded process pool with a configurable CPU split between jobs and Vina
+- Results streamed back as each ligand finishes
+- Running top-K of the best binders
+"""
+
+import atexit
+import heapq
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Iterable, Iterator
+
+from utils.molfile import iter_molecules, ligand_entry
+from .results_store import write_blob
+from .deduplication import iter_unique
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 10
+
+# Futures kept in flight per worker; bounds memory for very large libraries
+INFLIGHT_PER_WORKER = 2
+
+# Ligands canonicalized per deduplication chunk before their jobs are submitted
+DEDUPE_CHUNK_SIZE = 256
+
+# Duplicate groups listed in the screen summary
+SUMMARY_DUPLICATE_GROUPS = 20
+
+# Ranking options and the per-ligand field each one reads
+RANK_KEYS = {'affinity': 'best_affinity', 'rescored_affinity': 'best_rescored_affinity'}
+
+# Accepted library_format values
+LIBRARY_FORMATS = ('smi', 'smiles', 'sdf', 'mol2')
+
+_worker_engine = None
+_worker_cancel = None
+
+
+def parse_ligand_library(library: Any, library_format: str = 'smi') -> Iterator[Dict[str, str]]:
+    """
+    Yield {'name', 'smiles'} entries from a ligand library
+
+    SDF records use their SMILES data field when present; otherwise, as for
+    MOL2, the SMILES is derived from the connection table.
+
+    Args:
+        library: List of SMILES strings / {'smiles', 'name'} dicts, file
+            content in SMILES ('SMILES name' per line), SDF or MOL2 format,
+            or an open text file in any of these (read line by line)
+        library_format: 'smi', 'sdf' or 'mol2' when library is file content
+
+    Yields:
+        Ligand dictionaries in library order
+    """
+    if isinstance(library, (list, tuple)):
+        for i, entry in enumerate(library):
+            if isinstance(entry, dict):
+                yield {'name': entry.get('name') or f'ligand_{i + 1}', 'smiles': entry.get('smiles', '')}
+            else:
+                yield {'name': f'ligand_{i + 1}', 'smiles': str(entry)}
+        return
+
+    lines = library.splitlines() if isinstance(library, str) else library
+
+    if library_format.lower() in ('smi', 'smiles'):
+        count = 0
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            count += 1
+            parts = line.split(None, 1)
+            yield {'name': parts[1].strip() if len(parts) > 1 else f'ligand_{count}', 'smiles': parts[0]}
+
+    elif library_format.lower() in ('sdf', 'mol2'):
+        for index, item in enumerate(iter_molecules(lines, library_format.lower()), 1):
+            entry = ligand_entry(item)
+            yield {'name': entry['name'] or f'ligand_{index}', 'smiles': entry['smiles']}
+
+    else:
+        raise ValueError(f"Unsupported library format: {library_format}")
+
+
+def _init_worker(vina_executable: Optional[str], cancel_event=None):
+    """Create one DockingEngine per worker process; cancel_event stops running Vina jobs"""
+    global _worker_engine, _worker_cancel
+    from .docking_engine import DockingEngine
+    _worker_engine = DockingEngine(vina_executable)
+    _worker_cancel = cancel_event
+    atexit.register(_worker_engine.cleanup)
+
+
+def _dock_ligand(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare and dock a single ligand inside a worker process"""
+    start = time.perf_counter()
+    ligand = task['ligand']
+    summary = {'index': task['index'], 'name': ligand['name'], 'smiles': ligand['smiles']}
+
+    prepared = _worker_engine.prepare_ligand(ligand['smiles'], ligand['name'])
+    if not prepared['success']:
+        summary.update({'success': False, 'error': prepared['error'],
+                        'elapsed': round(time.perf_counter() - start, 4)})
+        return summary
+
+    workspace_id = prepared['workspace_id']
+    workspace = _worker_engine.workspaces.get(workspace_id)
+    if task.get('receptor_file'):
+        workspace.register_file('protein_file', task['receptor_file'])
+    if task.get('receptor_id'):
+        workspace.metadata['receptor_id'] = task['receptor_id']
+    try:
+        docked = _worker_engine.perform_docking(
+            task['receptor_pdbqt'], None, task['binding_site'], task['exhaustiveness'],
+            workspace_id=workspace_id, cpu=task['cpu'], cancel_event=_worker_cancel
+        )
+        output_file = docked.get('output_file')
+        if docked['success'] and task.get('blob_dir') and output_file and os.path.exists(output_file):
+            # Poses are archived from the worker before its workspace is removed
+            with open(output_file, 'rb') as f:
+                summary['pose_blob'] = write_blob(task['blob_dir'], f.read())
+    finally:
+        _worker_engine.release_workspace(workspace_id)
+
+    if not docked['success']:
+        summary.update({'success': False, 'error': docked['error']})
+    else:
+        results = docked.get('results', [])
+        rescored = [r['rescored_affinity'] for r in results if 'rescored_affinity' in r]
+        summary.update({
+            'success': True,
+            'best_affinity': min((r['affinity'] for r in results), default=None),
+            'best_rescored_affinity': min(rescored) if rescored else None,
+            'results': results,
+            'properties': prepared.get('properties', {}),
+            'mock': docked.get('mock', False)
+        })
+    summary['elapsed'] = round(time.perf_counter() - start, 4)
+    return summary
+
+
+class VirtualScreener:
+    """Dock a ligand library against one receptor across a process pool"""
+
+    def __init__(self, docking_engine, max_workers: Optional[int] = None, cpu_per_job: int = 1,
+                 total_cpus: Optional[int] = None, top_k: int = DEFAULT_TOP_K,
+                 rank_by: str = 'affinity'):
+        """
+        Args:
+            docking_engine: DockingEngine used for receptor preparation
+            max_workers: Concurrent Vina jobs, at most (and by default)
+                total_cpus // cpu_per_job
+            cpu_per_job: Value passed to Vina's --cpu for each job (at most total_cpus)
+            total_cpus: CPU budget for the whole screen (default: all cores)
+            top_k: Number of best hits kept in the running leaderboard
+            rank_by: 'affinity' (Vina) or 'rescored_affinity' (in-process
+                Vina-like rescoring, falling back to Vina when unavailable)
+        """
+        if rank_by not in RANK_KEYS:
+            raise ValueError(f"rank_by must be one of {sorted(RANK_KEYS)}")
+        self.engine = docking_engine
+        self.total_cpus = max(1, int(total_cpus or os.cpu_count() or 1))
+        self.cpu_per_job = min(max(1, int(cpu_per_job)), self.total_cpus)
+        # Workers times Vina threads never exceeds the CPU budget
+        worker_budget = max(1, self.total_cpus // self.cpu_per_job)
+        self.max_workers = min(max(1, int(max_workers or worker_budget)), worker_budget)
+        self.top_k = max(1, int(top_k))
+        self.rank_by = rank_by
+
+    def screen(self, ligands: Iterable[Dict[str, str]], binding_site: Dict[str, float],
+               receptor_data: Optional[str] = None, workspace_id: Optional[str] = None,
+               exhaustiveness: int = 8, release_workspace: bool = False,
+               store=None, campaign_name: Optional[str] = None,
+               deduplicate: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Dock every ligand and yield results as they complete
+
+        Args:
+            ligands: Iterable of {'name', 'smiles'} dicts (see parse_ligand_library)
+                or plain SMILES strings
+            binding_site: Vina search box
+            receptor_data: Receptor PDB content (prepared once for the screen)
+            workspace_id: Workspace of an already prepared receptor
+            exhaustiveness: Vina exhaustiveness per ligand
+            release_workspace: Release the given receptor workspace handle
+                when the screen finishes
+            store: ResultsStore that archives the screen as a campaign
+                (results inserted in batches, poses stored as blobs)
+            campaign_name: Optional label for the stored campaign
+            deduplicate: Skip ligands whose canonical SMILES repeats an
+                earlier ligand; results keep their library index
+
+        Yields:
+            {'type': 'result', ...} per ligand in completion order, then a
+            final {'type': 'summary', ...} with the top-K hits
+        """
+        start = time.perf_counter()
+        own_workspace = release_workspace or workspace_id is None
+        if workspace_id is None:
+            if not receptor_data:
+                raise ValueError("Receptor data or a prepared receptor workspace is required")
+            receptor = self.engine.prepare_protein(receptor_data)
+            if not receptor['success']:
+                raise ValueError(f"Receptor preparation failed: {receptor['error']}")
+            workspace_id = receptor['workspace_id']
+
+        workspace = self.engine.workspaces.acquire(workspace_id)
+        receptor_pdbqt = workspace.files.get('protein_pdbqt')
+        receptor_file = workspace.files.get('protein_file')
+        receptor_id = workspace.metadata.get('receptor_id')
+
+        campaign_id = None
+        if store is not None:
+            receptor_hash = receptor_id
+            if receptor_hash is None:
+                with open(receptor_file or receptor_pdbqt, 'r') as f:
+                    receptor_hash = self.engine.receptor_cache.receptor_id(f.read())
+            campaign_id = store.begin_campaign(
+                receptor_hash, binding_site, exhaustiveness, campaign_name,
+                {'rank_by': self.rank_by, 'workers': self.max_workers, 'cpu_per_job': self.cpu_per_job}
+            )
+
+        top_hits: List[Any] = []
+        completed = failed = 0
+        # Set when the screen ends early (client gone, job cancelled or timed
+        # out) so workers kill Vina runs already in progress
+        cancel_event = multiprocessing.Event()
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                       initargs=(self.engine.vina_executable, cancel_event))
+        try:
+            # Future -> its ligand's index, name and SMILES for failure reports
+            pending: Dict[Any, Dict[str, Any]] = {}
+            duplicate_stats: Dict[str, int] = {}
+            duplicate_groups: List[Dict[str, Any]] = []
+            if deduplicate:
+                ligand_iter = iter_unique(ligands, chunk_size=DEDUPE_CHUNK_SIZE, stats=duplicate_stats,
+                                          groups=duplicate_groups, max_groups=SUMMARY_DUPLICATE_GROUPS)
+            else:
+                ligand_iter = enumerate(ligands)
+            exhausted = False
+
+            while pending or not exhausted:
+                # Keep a bounded number of submissions in flight
+                while not exhausted and len(pending) < self.max_workers * INFLIGHT_PER_WORKER:
+                    try:
+                        index, ligand = next(ligand_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if not isinstance(ligand, dict):
+                        ligand = {'name': f'ligand_{index + 1}', 'smiles': str(ligand)}
+                    identity = {'index': index, 'name': ligand.get('name'), 'smiles': ligand.get('smiles')}
+                    task = {
+                        'index': index,
+                        'ligand': ligand,
+                        'receptor_pdbqt': receptor_pdbqt,
+                        'receptor_file': receptor_file,
+                        'receptor_id': receptor_id,
+                        'binding_site': binding_site,
+                        'exhaustiveness': exhaustiveness,
+                        'cpu': self.cpu_per_job,
+                        'blob_dir': store.blob_dir if store is not None else None
+                    }
+                    try:
+                        pending[executor.submit(_dock_ligand, task)] = identity
+                        continue
+                    except BrokenProcessPool as e:
+                        # A worker died and broke the pool; futures already in
+                        # flight fail with it, later ligands go to a fresh pool
+                        logger.error(f"Screening pool failed, restarting workers: {e}")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                       initargs=(self.engine.vina_executable, cancel_event))
+                    try:
+                        pending[executor.submit(_dock_ligand, task)] = identity
+                    except BrokenProcessPool as e:
+                        failed += 1
+                        failure = dict(identity, success=False, error=f'Worker pool failed: {e}')
+                        if campaign_id:
+                            store.add_campaign_results(campaign_id, [failure])
+                        failure['type'] = 'result'
+                        yield failure
+
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    identity = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = dict(identity, success=False, error=str(e))
+
+                    if result.get('success') and result.get('best_affinity') is not None:
+                        completed += 1
+                        self._push_hit(top_hits, result)
+                    else:
+                        failed += 1
+
+                    if campaign_id:
+                        store.add_campaign_results(campaign_id, [result])
+                    result['type'] = 'result'
+                    yield result
+
+            yield {
+                'type': 'summary',
+                'ligands_docked': completed,
+                'ligands_failed': failed,
+                'duplicates_skipped': duplicate_stats.get('duplicates', 0),
+                'duplicate_groups': duplicate_groups,
+                'top_hits': self._ranked(top_hits),
+                'rank_by': self.rank_by,
+                'campaign_id': campaign_id,
+                'workers': self.max_workers,
+                'cpu_per_job': self.cpu_per_job,
+                'elapsed': round(time.perf_counter() - start, 3)
+            }
+
+        finally:
+            cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            if campaign_id:
+                store.finish_campaign(campaign_id)
+            self.engine.workspaces.release(workspace_id)
+            if own_workspace:
+                self.engine.release_workspace(workspace_id)
+
+    def run(self, *args, **kwargs) -> Dict[str, Any]:
+        """Run a screen to completion and return the summary with all results"""
+        results = []
+        summary = {}
+        for item in self.screen(*args, **kwargs):
+            if item['type'] == 'result':
+                results.append(item)
+            else:
+                summary = item
+        summary['results'] = sorted(results, key=lambda r: r.get('index', 0))
+        return summary
+
+    def _push_hit(self, heap: List[Any], result: Dict[str, Any]):
+        """Keep the top_k most negative scores in a bounded heap"""
+        hit = {
+            'index': result['index'],
+            'name': result['name'],
+            'smiles': result['smiles'],
+            'best_affinity': result['best_affinity'],
+            'best_rescored_affinity': result.get('best_rescored_affinity')
+        }
+        score = result.get(RANK_KEYS[self.rank_by])
+        if score is None:
+            score = result['best_affinity']
+        # heapq is a min-heap: the weakest binder (highest score) sits on top
+        entry = (-score, -result['index'], hit)
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    @staticmethod
+    def _ranked(heap: List[Any]) -> List[Dict[str, Any]]:
+        return [entry[2] for entry in sorted(heap, reverse=True)]
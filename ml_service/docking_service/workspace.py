@@ -0,0 +1,187 @@
+"""
+Job-isolated Docking Workspaces
+
+This module gives every docking job its own directory so concurrent
+requests never share file names:
+- Unique workspace IDs handed back to callers as handles
+- Reference counting so files outlive every operation that uses them
+- Idle expiry for handles that are never released
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Handles that are not released explicitly are dropped after this many seconds
+DEFAULT_WORKSPACE_TTL = 3600
+
+_UNSAFE_NAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def safe_filename(name: str, default: str = 'ligand') -> str:
+    """Reduce a user-supplied name to a file name that stays inside a directory"""
+    cleaned = _UNSAFE_NAME_CHARS.sub('_', name or '').strip('._')
+    return cleaned[:100] or default
+
+
+class DockingWorkspace:
+    """Directory and file registry for a single docking job"""
+
+    def __init__(self, workspace_id: str, path: str, ttl: float):
+        self.workspace_id = workspace_id
+        self.path = path
+        self.ttl = ttl
+        self.files: Dict[str, str] = {}
+        self.metadata: Dict[str, Any] = {}
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        # One reference belongs to the caller's handle; operations add their own
+        self.refcount = 1
+        self.pinned = True
+
+    def file_path(self, name: str) -> str:
+        """Absolute path for a file inside this workspace"""
+        return os.path.join(self.path, safe_filename(name, 'file'))
+
+    def register_file(self, key: str, path: str) -> str:
+        """Record a produced file under a logical key (e.g. 'protein_pdbqt')"""
+        self.files[key] = path
+        return path
+
+    def to_handle(self) -> Dict[str, Any]:
+        """Serializable handle returned to API callers"""
+        return {
+            'workspace_id': self.workspace_id,
+            'files': dict(self.files),
+            'expires_in': max(0, int(self.last_used + self.ttl - time.time()))
+        }
+
+
+class WorkspaceManager:
+    """Creates, reference-counts and removes docking workspaces"""
+
+    def __init__(self, root_dir: Optional[str] = None, ttl: float = DEFAULT_WORKSPACE_TTL):
+        self.root_dir = root_dir or tempfile.mkdtemp(prefix="geneinsight_docking_")
+        os.makedirs(self.root_dir, exist_ok=True)
+        self.ttl = ttl
+        self._workspaces: Dict[str, DockingWorkspace] = {}
+        self._lock = threading.Lock()
+
+    def create(self, prefix: str = 'job') -> DockingWorkspace:
+        """Create a new workspace holding one reference for the caller's handle"""
+        self.expire_idle()
+        workspace_id = f"{safe_filename(prefix, 'job')}-{uuid.uuid4().hex}"
+        path = os.path.join(self.root_dir, workspace_id)
+        os.makedirs(path)
+
+        workspace = DockingWorkspace(workspace_id, path, self.ttl)
+        with self._lock:
+            self._workspaces[workspace_id] = workspace
+        return workspace
+
+    @contextmanager
+    def session(self, workspace_id: Optional[str] = None, prefix: str = 'job') -> Iterator[DockingWorkspace]:
+        """
+        Hold a workspace reference for the duration of an operation
+
+        Uses the existing workspace when an ID is given, otherwise creates a
+        new one whose handle reference is dropped again if the operation fails.
+        """
+        created = workspace_id is None
+        if created:
+            workspace = self.create(prefix)
+            workspace_id = workspace.workspace_id
+            self.acquire(workspace_id)
+        else:
+            workspace = self.acquire(workspace_id)
+
+        try:
+            yield workspace
+        except Exception:
+            if created:
+                self.unpin(workspace_id)
+            raise
+        finally:
+            self.release(workspace_id)
+
+    def get(self, workspace_id: str) -> Optional[DockingWorkspace]:
+        """Look up a live workspace without changing its reference count"""
+        with self._lock:
+            return self._workspaces.get(workspace_id)
+
+    def acquire(self, workspace_id: str) -> DockingWorkspace:
+        """Take a reference to an existing workspace for the duration of an operation"""
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                raise KeyError(f"Unknown or expired docking workspace: {workspace_id}")
+            workspace.refcount += 1
+            workspace.last_used = time.time()
+            return workspace
+
+    def release(self, workspace_id: str):
+        """Drop an operation reference; the workspace is removed when none remain"""
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                return
+            workspace.refcount -= 1
+            workspace.last_used = time.time()
+            remove = workspace.refcount <= 0
+            if remove:
+                del self._workspaces[workspace_id]
+
+        if remove:
+            self._remove_directory(workspace)
+
+    def unpin(self, workspace_id: str):
+        """Release the caller's handle reference (idempotent)"""
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None or not workspace.pinned:
+                return
+            workspace.pinned = False
+        self.release(workspace_id)
+
+    def expire_idle(self):
+        """Unpin handles that have not been used within their TTL"""
+        now = time.time()
+        with self._lock:
+            expired = [w.workspace_id for w in self._workspaces.values()
+                       if w.pinned and now - w.last_used > w.ttl]
+        for workspace_id in expired:
+            logger.info(f"Docking workspace {workspace_id} expired")
+            self.unpin(workspace_id)
+
+    def active_workspaces(self) -> List[Dict[str, Any]]:
+        """Summary of live workspaces"""
+        with self._lock:
+            return [{
+                'workspace_id': w.workspace_id,
+                'refcount': w.refcount,
+                'pinned': w.pinned,
+                'age_seconds': round(time.time() - w.created_at, 1)
+            } for w in self._workspaces.values()]
+
+    def cleanup_all(self):
+        """Remove every workspace and the root directory"""
+        with self._lock:
+            self._workspaces.clear()
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+    def _remove_directory(self, workspace: DockingWorkspace):
+        try:
+            shutil.rmtree(workspace.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to remove docking workspace {workspace.workspace_id}: {e}")
@@ -353,13 +353,17 @@ class LightweightMolecularAnalyzer:
             
             analysis = {
                 'binding_analysis': self._analyze_binding_affinity(best_result['affinity']),
-                'interaction_prediction': self._predict_interactions(protein_info, ligand_info),
+                'interaction_prediction': self._predict_interactions(protein_info, ligand_info,
+                                                                     docking_results.get('buried_surface')),
                 'drug_likeness': self._assess_drug_likeness(ligand_info),
                 'optimization_suggestions': self._suggest_optimizations(best_result, ligand_info),
                 'confidence': 0.8,
                 'timestamp': datetime.now().isoformat()
             }
             
+            if docking_results.get('buried_surface'):
+                analysis['buried_surface'] = docking_results['buried_surface']
+            
             return analysis
             
         except Exception as e:
@@ -387,7 +391,8 @@ class LightweightMolecularAnalyzer:
             'interpretation': interpretation
         }
     
-    def _predict_interactions(self, protein_info: Dict[str, Any], ligand_info: Dict[str, Any]) -> List[str]:
+    def _predict_interactions(self, protein_info: Dict[str, Any], ligand_info: Dict[str, Any],
+                              buried_surface: Optional[Dict[str, Any]] = None) -> List[str]:
         """Predict molecular interactions"""
         interactions = [
             "Hydrogen bonding with polar residues",
@@ -398,6 +403,17 @@ class LightweightMolecularAnalyzer:
         # Add specific predictions based on ligand properties
         if ligand_info.get('properties', {}).get('hbd', 0) > 2:
             interactions.append("Multiple hydrogen bond donors enhance binding")
+        
+        # Add buried surface information when SASA was computed for the pose
+        if buried_surface and 'delta_sasa' in buried_surface:
+            fraction = buried_surface.get('ligand_buried_fraction', 0.0)
+            interactions.append(
+                f"Binding buries {buried_surface['delta_sasa']:.0f} Å² of surface "
+                f"({fraction * 100:.0f}% of the ligand is solvent-shielded)"
+            )
+            contacts = [f"{r['residue_name']}{r['residue_number']}" for r in buried_surface.get('interface_residues', [])[:5]]
+            if contacts:
+                interactions.append(f"Main interface residues: {', '.join(contacts)}")
             
         return interactions
     
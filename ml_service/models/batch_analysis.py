@@ -0,0 +1,313 @@
+"""
+Parallel Batch Sequence Analysis
+
+This module runs batches of sequence analyses across a process pool:
+- Sequences cleaned and validated up front; invalid items never reach a worker
+- Identical sequences analyzed once and the result shared
+- Work units chunked by total sequence length, longest first, so a few
+  long sequences do not leave the other workers idle
+- One set of models per worker process, loaded on first use and kept
+  for later batches
+- Per-batch concurrency budget (chunks in flight), results in request
+  order with per-item errors, or streamed as they finish with the input
+  read in windows so memory stays flat for arbitrarily large batches
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+from utils.sequence_utils import validate_sequence, clean_sequence
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_TYPES = ('comprehensive', 'structure', 'disease')
+
+# Sequence type assumed when the request gives none
+DEFAULT_SEQUENCE_TYPES = {'comprehensive': 'DNA', 'structure': 'PROTEIN', 'disease': 'DNA'}
+
+# Residues per work unit, and the most items one unit may hold
+DEFAULT_CHUNK_RESIDUES = 20000
+MAX_CHUNK_ITEMS = 64
+
+# Chunks kept in flight per worker within one batch
+INFLIGHT_PER_WORKER = 2
+
+_worker_models: Dict[str, Any] = {}
+
+
+def _create_model(analysis_type: str):
+    if analysis_type == 'structure':
+        from models.structure_predictor import StructurePredictor
+        return StructurePredictor()
+    if analysis_type == 'disease':
+        from models.disease_predictor import DiseasePredictor
+        return DiseasePredictor()
+    from models.sequence_analyzer import SequenceAnalyzer
+    return SequenceAnalyzer()
+
+
+def _run_model(model: Any, analysis_type: str, sequence: str) -> Dict[str, Any]:
+    return model.analyze(sequence) if analysis_type == 'comprehensive' else model.predict(sequence)
+
+
+def _analyze_items(models: Dict[str, Any], analysis_type: str,
+                   items: List[Tuple[int, str]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Analyze (key, sequence) items, catching errors per item"""
+    model = models.get(analysis_type)
+    if model is None:
+        model = models[analysis_type] = _create_model(analysis_type)
+    results = []
+    for key, sequence in items:
+        try:
+            results.append((key, {'success': True, 'data': _run_model(model, analysis_type, sequence)}))
+        except Exception as e:
+            logger.error(f"Batch item analysis error: {e}")
+            results.append((key, {'success': False, 'error': str(e)}))
+    return results
+
+
+def _analyze_chunk(task: Tuple[str, List[Tuple[int, str]]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Worker entry point: models are created once per process and reused"""
+    analysis_type, items = task
+    return _analyze_items(_worker_models, analysis_type, items)
+
+
+def chunk_by_length(items: List[Tuple[int, str]], chunk_residues: int = DEFAULT_CHUNK_RESIDUES,
+                    max_items: int = MAX_CHUNK_ITEMS) -> List[List[Tuple[int, str]]]:
+    """
+    Group (key, sequence) items into work units of about chunk_residues
+
+    Items are taken longest first, so long sequences start early and short
+    ones fill the remaining work units; a sequence longer than
+    chunk_residues gets a unit of its own.
+    """
+    chunks: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    residues = 0
+    for key, sequence in sorted(items, key=lambda item: -len(item[1])):
+        if current and (residues + len(sequence) > chunk_residues or len(current) >= max_items):
+            chunks.append(current)
+            current, residues = [], 0
+        current.append((key, sequence))
+        residues += len(sequence)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BatchAnalyzer:
+    """Analyze sequence batches across a shared process pool"""
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_residues: int = DEFAULT_CHUNK_RESIDUES,
+                 local_models: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            max_workers: Pool size (default: $BATCH_WORKERS or all cores)
+            chunk_residues: Residues per work unit
+            local_models: Already loaded models by analysis type, used when a
+                batch runs in-process (one unique sequence or one worker)
+        """
+        self.max_workers = max(1, int(max_workers or os.environ.get('BATCH_WORKERS') or os.cpu_count() or 1))
+        self.chunk_residues = max(1, int(chunk_residues))
+        self.local_models = dict(local_models or {})
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                atexit.register(self.shutdown)
+            return self._executor
+
+    def _discard_pool(self, executor: ProcessPoolExecutor):
+        """Drop a pool whose worker died so the next submission starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, analysis_type: str, chunk: List[Tuple[int, str]]):
+        """Submit a chunk, replacing a broken pool once; returns (future, pool)"""
+        for attempt in range(2):
+            executor = self._pool()
+            try:
+                return executor.submit(_analyze_chunk, (analysis_type, chunk)), executor
+            except BrokenProcessPool:
+                self._discard_pool(executor)
+                if attempt:
+                    raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def iter_results(self, items: Iterable[Any], analysis_type: str = 'comprehensive',
+                     sequence_type: Optional[str] = None,
+                     max_concurrency: Optional[int] = None,
+                     stats: Optional[Dict[str, Any]] = None,
+                     window: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze a batch and yield per-item results as their chunks complete
+
+        Args:
+            items: {'sequence', optional 'sequence_type' / 'id'} dicts or
+                plain sequences
+            analysis_type: 'comprehensive', 'structure' or 'disease'
+            sequence_type: Default sequence type for validation ('DNA',
+                'RNA', 'PROTEIN'); PROTEIN for structure analysis otherwise DNA
+            max_concurrency: Chunks of this batch in flight at once (capped
+                at the pool size)
+            stats: Optional dictionary kept up to date with item, unique,
+                chunk, success and failure counts
+            window: Items read, deduplicated and chunked at a time. None
+                reads the whole batch first; with a window the input is
+                consumed lazily and no more work is submitted while the
+                caller is not reading results, so memory stays bounded
+                (duplicates are then only collapsed within a window)
+
+        Yields:
+            {'index', 'success', 'data'} or {'index', 'success': False,
+            'error'} per item ('id' copied from the item when present);
+            invalid items as they are read, the rest in completion order
+        """
+        if analysis_type not in ANALYSIS_TYPES:
+            raise ValueError(f"analysis_type must be one of {list(ANALYSIS_TYPES)}")
+        default_type = sequence_type or DEFAULT_SEQUENCE_TYPES[analysis_type]
+        workers = min(self.max_workers, max(1, int(max_concurrency or self.max_workers)))
+        # An explicit max_concurrency is a hard cap on chunks in flight;
+        # otherwise each worker gets one queued chunk behind its running one
+        inflight_limit = workers if max_concurrency else workers * INFLIGHT_PER_WORKER
+        counts = stats if stats is not None else {}
+        counts.update({'items': 0, 'valid': 0, 'unique': 0, 'chunks': 0, 'succeeded': 0, 'failed': 0,
+                       'workers': workers if self.max_workers > 1 else 0})
+
+        def emit(result: Dict[str, Any]) -> Dict[str, Any]:
+            counts['succeeded' if result['success'] else 'failed'] += 1
+            return result
+
+        def expand(results: List[Tuple[int, Dict[str, Any]]], fan_out: List[List[Tuple[int, Any]]]):
+            for key, result in results:
+                for index, item_id in fan_out[key]:
+                    yield emit(dict(result, index=index) if item_id is None else dict(result, index=index, id=item_id))
+
+        steps = self._work_units(items, default_type, window, counts)
+        pending: Dict[Any, Tuple[List[Tuple[int, str]], List[List[Tuple[int, Any]]], ProcessPoolExecutor]] = {}
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < inflight_limit:
+                    step = next(steps, None)
+                    if step is None:
+                        exhausted = True
+                        break
+                    if step[0] == 'invalid':
+                        yield emit(step[1])
+                        continue
+                    _, chunk, fan_out, local = step
+                    if local or self.max_workers == 1:
+                        # Not worth a round trip to the pool
+                        yield from expand(_analyze_items(self.local_models, analysis_type, chunk), fan_out)
+                        continue
+                    try:
+                        future, executor = self._submit(analysis_type, chunk)
+                    except BrokenProcessPool as e:
+                        logger.error(f"Batch pool unavailable: {e}")
+                        yield from expand([(key, {'success': False, 'error': f'Worker pool failed: {e}'})
+                                           for key, _ in chunk], fan_out)
+                        continue
+                    pending[future] = (chunk, fan_out, executor)
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, fan_out, executor = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. out of memory): fail this chunk, rebuild the pool
+                        logger.error(f"Batch worker process died: {e}")
+                        self._discard_pool(executor)
+                        results = [(key, {'success': False, 'error': f'Worker process failed: {e}'})
+                                   for key, _ in chunk]
+                    except Exception as e:
+                        logger.error(f"Batch chunk failed: {e}")
+                        results = [(key, {'success': False, 'error': str(e)}) for key, _ in chunk]
+                    yield from expand(results, fan_out)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _work_units(self, items: Iterable[Any], default_type: str, window: Optional[int],
+                    counts: Dict[str, Any]) -> Iterator[Tuple[Any, ...]]:
+        """
+        ('invalid', result) per rejected item and ('chunk', items, fan_out,
+        local) per work unit, reading window items at a time
+        """
+        numbered = enumerate(items)
+        first = True
+        while True:
+            # Unique sequence -> key; fan_out[key] lists (request index, item id)
+            keys: Dict[str, int] = {}
+            unique: List[Tuple[int, str]] = []
+            fan_out: List[List[Tuple[int, Any]]] = []
+            taken = 0
+            exhausted = True
+            for index, item in numbered:
+                counts['items'] += 1
+                taken += 1
+                if not isinstance(item, dict):
+                    item = {'sequence': item}
+                seq_type = str(item.get('sequence_type') or default_type)
+                raw = item.get('sequence', '')
+                sequence = clean_sequence(raw, seq_type) if isinstance(raw, str) else ''
+                validation = validate_sequence(sequence, seq_type)
+                if not validation['valid']:
+                    result = {'index': index, 'success': False, 'error': f"Invalid sequence: {validation['error']}"}
+                    if item.get('id') is not None:
+                        result['id'] = item['id']
+                    yield 'invalid', result
+                else:
+                    key = keys.get(sequence)
+                    if key is None:
+                        key = keys[sequence] = len(unique)
+                        unique.append((key, sequence))
+                        fan_out.append([])
+                    fan_out[key].append((index, item.get('id')))
+                if window and taken >= window:
+                    exhausted = False
+                    break
+
+            chunks = chunk_by_length(unique, self.chunk_residues)
+            counts['valid'] += sum(len(indices) for indices in fan_out)
+            counts['unique'] += len(unique)
+            counts['chunks'] += len(chunks)
+            local = first and exhausted and len(unique) == 1
+            for chunk in chunks:
+                yield 'chunk', chunk, fan_out, local
+            if exhausted:
+                return
+            first = False
+
+    def analyze(self, items: List[Any], analysis_type: str = 'comprehensive',
+                sequence_type: Optional[str] = None,
+                max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Analyze a batch and return all results in request order
+
+        Returns:
+            {'results': [...], 'stats': {...}, 'elapsed': seconds}
+        """
+        start = time.perf_counter()
+        stats: Dict[str, Any] = {}
+        results = sorted(self.iter_results(items, analysis_type, sequence_type, max_concurrency, stats),
+                         key=lambda result: result['index'])
+        return {'results': results, 'stats': stats, 'elapsed': round(time.perf_counter() - start, 4)}
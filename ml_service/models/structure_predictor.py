@@ -12,8 +12,20 @@ import numpy as np
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from utils.file_utils import parse_pdb
+from utils.structure_alignment import (
+    kabsch_rmsd, tm_score, pairwise_rmsd_matrix, structural_differences
+)
+
 logger = logging.getLogger(__name__)
 
+THREE_LETTER_CODES = {
+    'A': 'ALA', 'R': 'ARG', 'N': 'ASN', 'D': 'ASP', 'C': 'CYS',
+    'Q': 'GLN', 'E': 'GLU', 'G': 'GLY', 'H': 'HIS', 'I': 'ILE',
+    'L': 'LEU', 'K': 'LYS', 'M': 'MET', 'F': 'PHE', 'P': 'PRO',
+    'S': 'SER', 'T': 'THR', 'W': 'TRP', 'Y': 'TYR', 'V': 'VAL'
+}
+
 class StructurePredictor:
     """Protein structure prediction using ML models"""
     
@@ -142,7 +154,8 @@ class StructurePredictor:
         pdb_lines.append("REMARK   Generated by GeneInsight Structure Predictor")
         
         for i, (aa, coord) in enumerate(zip(sequence, coordinates)):
-            atom_line = f"ATOM  {i+1:5d}  CA  {aa} A{i+1:4d}    {coord[0]:8.3f}{coord[1]:8.3f}{coord[2]:8.3f}  1.00 50.00           C"
+            residue = THREE_LETTER_CODES.get(aa, 'UNK')
+            atom_line = f"ATOM  {i+1:5d}  CA  {residue} A{i+1:4d}    {coord[0]:8.3f}{coord[1]:8.3f}{coord[2]:8.3f}  1.00 50.00           C"
             pdb_lines.append(atom_line)
         
         pdb_lines.append("END")
@@ -208,17 +221,84 @@ class StructurePredictor:
         }
     
     def compare_structures(self, structure1: Dict[str, Any], structure2: Dict[str, Any]) -> Dict[str, Any]:
-        """Compare two predicted structures"""
-        # Mock structure comparison
+        """
+        Compare two structures by optimal (Kabsch) superposition of their CA atoms
+
+        Args:
+            structure1: Prediction result or dict with 'coordinates' or 'pdb_string'
+            structure2: Reference structure in the same form
+
+        Returns:
+            Dictionary with RMSD, TM-score and deviating regions
+        """
+        coords1 = self._extract_ca_coordinates(structure1)
+        coords2 = self._extract_ca_coordinates(structure2)
+
+        if len(coords1) < 3 or len(coords2) < 3:
+            return {'error': 'At least 3 CA atoms are required in each structure'}
+
+        # Residues are matched by position; the longer structure is truncated
+        aligned_length = min(len(coords1), len(coords2))
+        mobile = coords1[:aligned_length]
+        target = coords2[:aligned_length]
+
+        score = tm_score(mobile, target, target_length=len(coords2))
+        differences = structural_differences(mobile, target)
+
         return {
-            'rmsd': np.random.uniform(1.0, 5.0),
-            'similarity_score': np.random.uniform(0.6, 0.95),
+            'rmsd': round(kabsch_rmsd(mobile, target), 3),
+            'tm_score': round(score, 4),
+            'similarity_score': round(score, 4),
+            'aligned_length': aligned_length,
+            'length_mismatch': len(coords1) != len(coords2),
             'structural_differences': [
-                'Minor differences in loop regions',
-                'Similar secondary structure content',
-                'Conserved active site geometry'
-            ]
+                f"Residues {region['start'] + 1}-{region['end']} deviate by up to {region['max_deviation']} Å"
+                for region in differences
+            ] or ['No regions deviate by more than 3 Å after superposition'],
+            'deviating_regions': differences
         }
+
+    def compare_ensemble(self, structures: List[Dict[str, Any]], n_jobs: Optional[int] = None) -> Dict[str, Any]:
+        """
+        All-vs-all RMSD matrix for an ensemble of models with identical residue numbering
+
+        Args:
+            structures: List of prediction results, docking poses or coordinate dicts
+            n_jobs: Worker processes for large ensembles (None picks automatically)
+
+        Returns:
+            Dictionary with the pairwise RMSD matrix and the medoid model index
+        """
+        ensemble = [self._extract_ca_coordinates(structure) for structure in structures]
+        if len(ensemble) < 2:
+            return {'error': 'At least two structures are required'}
+
+        lengths = {len(coords) for coords in ensemble}
+        if len(lengths) != 1:
+            return {'error': f'All structures must have the same number of CA atoms, got {sorted(lengths)}'}
+
+        matrix = pairwise_rmsd_matrix(np.stack(ensemble), n_jobs=n_jobs)
+
+        return {
+            'rmsd_matrix': np.round(matrix, 3).tolist(),
+            'num_structures': len(ensemble),
+            'num_atoms': lengths.pop(),
+            'medoid_index': int(np.argmin(matrix.sum(axis=1))),
+            'mean_rmsd': float(matrix[np.triu_indices(len(ensemble), 1)].mean())
+        }
+
+    def _extract_ca_coordinates(self, structure: Dict[str, Any]) -> np.ndarray:
+        """Get CA coordinates from a prediction result, PDB string or raw coordinates"""
+        if isinstance(structure, dict) and structure.get('coordinates') is not None:
+            return np.asarray(structure['coordinates'], dtype=np.float64).reshape(-1, 3)
+
+        if isinstance(structure, dict) and structure.get('pdb_string'):
+            atoms = parse_pdb(structure['pdb_string'])['atoms']
+            ca_atoms = [atom for atom in atoms if atom['atom_name'] == 'CA']
+            return np.array([[atom['x'], atom['y'], atom['z']] for atom in ca_atoms],
+                            dtype=np.float64).reshape(-1, 3)
+
+        return np.asarray(structure, dtype=np.float64).reshape(-1, 3)
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about loaded models"""
@@ -229,7 +309,8 @@ class StructurePredictor:
                 '3d_structure_prediction',
                 'secondary_structure_prediction',
                 'confidence_scoring',
-                'binding_site_prediction'
+                'binding_site_prediction',
+                'structure_comparison'
             ],
             'accuracy_metrics': {
                 'structure_prediction': 0.87,
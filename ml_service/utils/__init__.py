@@ -4,5 +4,27 @@ Utility functions for the ML service
 
 from .sequence_utils import validate_sequence, clean_sequence
 from .file_utils import parse_fasta, parse_pdb
+from .structure_alignment import kabsch, kabsch_rmsd, tm_score, pairwise_rmsd_matrix
+from .spatial_index import SpatialIndex, get_spatial_index, coordinates_from_pdb
+from .sasa import compute_sasa, delta_sasa_batch
+from .voxel_grid import occupancy_grid
+from .cavity_detection import detect_pockets
+from .smiles import SmilesError, MolGraph, tokenize_smiles, parse_smiles, parse_smiles_batch
+from .canonical import canonical_smiles
+from .conformers import ConformerSet, embed_molecule, embed_batch
+from .molfile import MolRecord, MoleculeWriter, read_molecules, write_molecules
+from .mol_properties import molecular_properties, compute_descriptors
+from .fingerprints import fingerprints, popcount_rows, tanimoto
+from .parallel import bounded_imap
 
-__all__ = ['validate_sequence', 'clean_sequence', 'parse_fasta', 'parse_pdb']
+__all__ = [
+    'validate_sequence', 'clean_sequence', 'parse_fasta', 'parse_pdb',
+    'kabsch', 'kabsch_rmsd', 'tm_score', 'pairwise_rmsd_matrix',
+    'SpatialIndex', 'get_spatial_index', 'coordinates_from_pdb',
+    'compute_sasa', 'delta_sasa_batch', 'occupancy_grid', 'detect_pockets',
+    'SmilesError', 'MolGraph', 'tokenize_smiles', 'parse_smiles', 'parse_smiles_batch', 'canonical_smiles',
+    'ConformerSet', 'embed_molecule', 'embed_batch',
+    'MolRecord', 'MoleculeWriter', 'read_molecules', 'write_molecules',
+    'molecular_properties', 'compute_descriptors', 'fingerprints', 'popcount_rows', 'tanimoto',
+    'bounded_imap'
+]
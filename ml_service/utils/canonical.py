@@ -0,0 +1,555 @@
+"""
+Canonical SMILES from SMILES graphs
+
+This module writes one SMILES spelling per compound so differently written
+copies of a molecule compare equal:
+- Explicit hydrogen atoms folded into their heavy neighbor
+- Aromaticity perceived on Kekule rings (Hückel 4n+2 over the smallest ring
+  through each ring bond, sizes 5-7), so "C1=CC=CC=C1" and "c1ccccc1" agree
+- Canonical atom ranks by iterative refinement of atom invariants with
+  neighbor ranks and bond orders, breaking remaining ties one atom at a time
+- Depth-first writer visiting neighbors in rank order, with tetrahedral
+  centers (@/@@) and double-bond geometry (/ and \\) re-expressed for the
+  new atom order
+
+Known limits, shared with most lightweight canonicalizers: stereo on ring
+double bonds is not kept, and tie-breaking assumes refinement-equivalent
+atoms are symmetric.
+"""
+
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+from .smiles import (MolGraph, SmilesError, parse_smiles, SYMBOLS, ORGANIC_SUBSET, BOND_VALENCE,
+                     SINGLE, DOUBLE, TRIPLE, QUADRUPLE, AROMATIC, CHIRAL_CW, _implicit_hydrogens)
+
+AROMATIC_RING_SIZES = (5, 6, 7)
+LONE_PAIR_DONORS = {7, 8, 15, 16, 34}
+AROMATIC_WRITABLE = {'b', 'c', 'n', 'o', 'p', 's', 'se', 'as', 'te'}
+BOND_SYMBOL = {SINGLE: '', DOUBLE: '=', TRIPLE: '#', QUADRUPLE: '$', AROMATIC: ''}
+FLIP = {'/': '\\', '\\': '/'}
+STEREO_SEARCH_LIMIT = 64
+
+
+class _Molecule:
+    """Mutable per-molecule lists the canonicalizer works on"""
+
+    def __init__(self, graph: MolGraph):
+        self.z = graph.atomic_num.tolist()
+        self.charge = graph.charge.tolist()
+        self.hydrogens = graph.hydrogens.tolist()
+        self.isotope = graph.isotope.tolist()
+        self.aromatic = graph.aromatic.tolist()
+        self.bonds = graph.bond_atoms.tolist()
+        self.order = graph.bond_order.tolist()
+        self.stereo = graph.bond_stereo.tolist()
+        self.ring_bond = graph.ring_bond.tolist()
+        self.chiral = {row[0]: row[1:] for row in graph.chiral_centers.tolist()}
+        self.chiral_code = graph.chiral.tolist()
+        self.alive = [True] * len(self.z)
+        self.replacement: Dict[int, int] = {}
+        self._fold_hydrogens()
+
+        self.neighbors: List[List[Tuple[int, int]]] = [[] for _ in self.z]
+        for index, (a, b) in enumerate(self.bonds):
+            if self.alive[a] and self.alive[b]:
+                self.neighbors[a].append((b, index))
+                self.neighbors[b].append((a, index))
+
+    def _fold_hydrogens(self):
+        """Turn plain [H] atoms on a heavy neighbor into hydrogen counts"""
+        degree = Counter(atom for pair in self.bonds for atom in pair)
+        for index, (a, b) in enumerate(self.bonds):
+            for h, heavy in ((a, b), (b, a)):
+                if (self.z[h] == 1 and self.z[heavy] > 1 and degree[h] == 1 and self.isotope[h] == 0
+                        and self.charge[h] == 0 and self.order[index] == SINGLE):
+                    self.alive[h] = False
+                    self.hydrogens[heavy] += 1
+                    self.replacement[h] = -1
+
+
+def smallest_rings(bonds: List[List[int]], neighbors: List[List[Tuple[int, int]]], ring_bond: List[bool],
+                   max_size: int) -> List[Tuple[List[int], List[int]]]:
+    """
+    Smallest ring (atoms, bonds) through each ring bond, without duplicates
+
+    Args:
+        bonds: (a, b) atom pairs
+        neighbors: Per atom (neighbor, bond index) pairs
+        ring_bond: Per bond ring membership (MolGraph.ring_bond)
+        max_size: Largest ring size searched
+    """
+    rings, seen = [], set()
+    for bond, (u, v) in enumerate(bonds):
+        if not ring_bond[bond]:
+            continue
+        previous = {u: (-1, -1)}
+        frontier, found = [u], False
+        for _ in range(max_size - 1):
+            following = []
+            for x in frontier:
+                for y, edge in neighbors[x]:
+                    if edge == bond or not ring_bond[edge] or y in previous:
+                        continue
+                    previous[y] = (x, edge)
+                    if y == v:
+                        found = True
+                        break
+                    following.append(y)
+                if found:
+                    break
+            if found or not following:
+                break
+            frontier = following
+        if not found:
+            continue
+        atoms, edges, x = [v], [bond], v
+        while x != u:
+            x, edge = previous[x]
+            edges.append(edge)
+            atoms.append(x)
+        key = frozenset(edges)
+        if key not in seen:
+            seen.add(key)
+            rings.append((atoms, edges))
+    return rings
+
+
+def _perceive_aromaticity(mol: _Molecule):
+    """Mark Kekule rings with 4n+2 pi electrons as aromatic"""
+    # Candidates need a ring double bond, or a ring bond from an aromatic atom
+    # into a Kekule one: the pyrimidinedione ring of a mixed caffeine spelling
+    # O=C1N(C)C(=O)c2c(ncn2C)N1C has only exocyclic C=O but is fused to an
+    # aromatic imidazole
+    if not any(ring and (order == DOUBLE or mol.aromatic[a] != mol.aromatic[b])
+               for (a, b), order, ring in zip(mol.bonds, mol.order, mol.ring_bond)):
+        return
+
+    doubles: List[List[Tuple[int, int]]] = [[] for _ in mol.z]
+    has_triple = [False] * len(mol.z)
+    for index, (a, b) in enumerate(mol.bonds):
+        if mol.order[index] == DOUBLE:
+            doubles[a].append((b, index))
+            doubles[b].append((a, index))
+        elif mol.order[index] == TRIPLE:
+            has_triple[a] = has_triple[b] = True
+
+    def electrons(atom: int, ring_atoms: set) -> Optional[int]:
+        z = mol.z[atom]
+        if mol.aromatic[atom]:
+            if z == 6:
+                return 1
+            if z in (7, 15):
+                heavy = len(mol.neighbors[atom])
+                return 2 if mol.charge[atom] == 0 and (mol.hydrogens[atom] > 0 or heavy == 3) else 1
+            return 2 if z in (8, 16, 34) else None
+        if len(doubles[atom]) == 1:
+            partner, bond = doubles[atom][0]
+            # Endocyclic, or shared with a fused ring
+            if partner in ring_atoms or mol.ring_bond[bond]:
+                return 1
+            # Exocyclic C=O / C=N / C=S leaves the ring carbon empty (2-pyridone, caffeine)
+            return 0 if z == 6 and mol.z[partner] in (7, 8, 16) else None
+        if doubles[atom] or has_triple[atom]:
+            return None
+        if z in LONE_PAIR_DONORS and mol.charge[atom] == 0 and len(mol.neighbors[atom]) + mol.hydrogens[atom] <= 3:
+            return 2
+        if z == 6 and mol.charge[atom] == -1:
+            return 2
+        return None
+
+    aromatic_rings = []
+    # Folded hydrogens are terminal, so their bonds never carry ring_bond
+    for atoms, bonds in smallest_rings(mol.bonds, mol.neighbors, mol.ring_bond, max(AROMATIC_RING_SIZES)):
+        if len(atoms) not in AROMATIC_RING_SIZES or all(mol.aromatic[a] for a in atoms):
+            continue
+        ring_atoms = set(atoms)
+        counts = [electrons(atom, ring_atoms) for atom in atoms]
+        if None not in counts and sum(counts) % 4 == 2:
+            aromatic_rings.append((atoms, bonds))
+
+    for atoms, bonds in aromatic_rings:
+        for atom in atoms:
+            mol.aromatic[atom] = True
+        for bond in bonds:
+            mol.order[bond] = AROMATIC
+            mol.stereo[bond] = 0
+
+
+def _dense_rank(keys: List[Any]) -> List[int]:
+    lookup = {key: rank for rank, key in enumerate(sorted(set(keys)))}
+    return [lookup[key] for key in keys]
+
+
+class _Ranking:
+    """Initial atom classes plus neighbor refinement for one molecule"""
+
+    def __init__(self, mol: _Molecule, isomeric: bool):
+        n = len(mol.z)
+        self.n = n
+        self.neighbors = [[(j, mol.order[b]) for j, b in mol.neighbors[i]] for i in range(n)]
+        invariants = [
+            # Degree first so strings start at a terminal atom and short branches come first
+            (0 if mol.alive[i] else 1, len(mol.neighbors[i]), mol.z[i], mol.isotope[i] if isomeric else 0,
+             mol.aromatic[i], mol.charge[i], mol.hydrogens[i], sum(mol.ring_bond[b] for _, b in mol.neighbors[i]))
+            for i in range(n)
+        ]
+        self.initial = self.refine(_dense_rank(invariants))
+
+    def refine(self, ranks: List[int]) -> List[int]:
+        classes = len(set(ranks))
+        while True:
+            keys = [(ranks[i], tuple(sorted((ranks[j], order) for j, order in self.neighbors[i])))
+                    for i in range(self.n)]
+            ranks = _dense_rank(keys)
+            refined = len(set(ranks))
+            if refined == classes:
+                return ranks
+            classes = refined
+
+    def tied_class(self, ranks: List[int]) -> List[int]:
+        """Atoms of the lowest rank shared by several atoms (empty once ranks are distinct)"""
+        counts = Counter(ranks)
+        tied = [rank for rank, count in counts.items() if count > 1]
+        if not tied:
+            return []
+        lowest = min(tied)
+        return [i for i in range(self.n) if ranks[i] == lowest]
+
+    def break_tie(self, ranks: List[int], chosen: int) -> List[int]:
+        ranks = [2 * rank for rank in ranks]
+        ranks[chosen] -= 1
+        return self.refine(ranks)
+
+
+def canonical_ranks(mol: _Molecule, isomeric: bool = True) -> List[int]:
+    """Distinct canonical rank of every live atom (dead atoms rank last)"""
+    ranking = _Ranking(mol, isomeric)
+    ranks = ranking.initial
+    tied = ranking.tied_class(ranks)
+    while tied:
+        ranks = ranking.break_tie(ranks, tied[0])
+        tied = ranking.tied_class(ranks)
+    return ranks
+
+
+def _permutation_parity(source: List[int], target: List[int]) -> int:
+    """0 if target is an even permutation of source, 1 if odd"""
+    position = {value: index for index, value in enumerate(source)}
+    perm = [position[value] for value in target]
+    parity = 0
+    for i in range(len(perm)):
+        for j in range(i + 1, len(perm)):
+            if perm[i] > perm[j]:
+                parity ^= 1
+    return parity
+
+
+def _double_bond_stereo(mol: _Molecule, ranks: List[int]) -> List[Tuple[int, int, int, int, bool]]:
+    """
+    (x, y, reference neighbor of x, reference neighbor of y, trans) for each
+    specified double bond, ordered by canonical rank with rank[x] < rank[y]
+    """
+
+    def normalized(bond: int, first: int, second: int) -> str:
+        # Direction symbol as if the bond were written "first <symbol> second"
+        symbol = '/' if mol.stereo[bond] == 1 else '\\'
+        return symbol if mol.bonds[bond] == [first, second] else FLIP[symbol]
+
+    result = []
+    for index, (x, y) in enumerate(mol.bonds):
+        if mol.order[index] != DOUBLE or mol.ring_bond[index] or not (mol.alive[x] and mol.alive[y]):
+            continue
+        ends = []
+        for end, other in ((x, y), (y, x)):
+            directed = [(j, b) for j, b in mol.neighbors[end] if j != other and mol.stereo[b]]
+            ends.append(directed[0] if directed else None)
+        if ends[0] is None or ends[1] is None:
+            continue
+        (n_x, b_x), (n_y, b_y) = ends
+        trans = normalized(b_x, n_x, x) == normalized(b_y, y, n_y)
+        if ranks[x] > ranks[y]:
+            x, y, n_x, n_y = y, x, n_y, n_x
+        result.append((x, y, n_x, n_y, trans))
+    return sorted(result, key=lambda item: (ranks[item[0]], ranks[item[1]]))
+
+
+class _Writer:
+    """Rank-ordered depth-first SMILES writer"""
+
+    def __init__(self, mol: _Molecule, ranks: List[int], isomeric: bool):
+        self.mol = mol
+        self.ranks = ranks
+        self.isomeric = isomeric
+        n = len(mol.z)
+        self.parent = [-1] * n
+        self.children: List[List[int]] = [[] for _ in range(n)]
+        self.ring_open: List[List[int]] = [[] for _ in range(n)]
+        self.ring_close: List[List[int]] = [[] for _ in range(n)]
+        self.written: Dict[int, Tuple[int, int]] = {}
+        self.directions: Dict[int, str] = {}
+        self.roots: List[int] = []
+        self._spanning_forest()
+        if isomeric:
+            self._assign_directions()
+
+    def _sorted_neighbors(self, atom: int) -> List[Tuple[int, int]]:
+        return sorted(self.mol.neighbors[atom], key=lambda item: self.ranks[item[0]])
+
+    def _spanning_forest(self):
+        mol, n = self.mol, len(self.mol.z)
+        visited = [False] * n
+        used = set()
+        for start in sorted((i for i in range(n) if mol.alive[i]), key=lambda i: self.ranks[i]):
+            if visited[start]:
+                continue
+            self.roots.append(start)
+            visited[start] = True
+            stack = [(start, iter(self._sorted_neighbors(start)))]
+            while stack:
+                atom, remaining = stack[-1]
+                for neighbor, bond in remaining:
+                    if bond in used:
+                        continue
+                    used.add(bond)
+                    if visited[neighbor]:
+                        # Back edge to an ancestor: ring closure opened there, closed here
+                        self.ring_open[neighbor].append(bond)
+                        self.ring_close[atom].append(bond)
+                        self.written[bond] = (neighbor, atom)
+                        continue
+                    visited[neighbor] = True
+                    self.parent[neighbor] = atom
+                    self.children[atom].append(neighbor)
+                    self.written[bond] = (atom, neighbor)
+                    stack.append((neighbor, iter(self._sorted_neighbors(neighbor))))
+                    break
+                else:
+                    stack.pop()
+
+    def _other(self, bond: int, atom: int) -> int:
+        a, b = self.mol.bonds[bond]
+        return b if a == atom else a
+
+    def _output_neighbors(self, atom: int) -> List[int]:
+        """Neighbors of an atom in the order the output SMILES lists them"""
+        order = [self.parent[atom]] if self.parent[atom] >= 0 else []
+        if self.mol.hydrogens[atom] > 0:
+            order.append(-1)
+        order += [self._other(bond, atom) for bond in self.ring_close[atom] + self.ring_open[atom]]
+        order += self.children[atom]
+        if len(order) == 3 and -1 not in order:
+            order.insert(1 if self.parent[atom] >= 0 else 0, -1)
+        return order
+
+    def _assign_directions(self):
+        """Choose / and \\ on written single bonds to express each double bond's geometry"""
+        mol = self.mol
+        for x, y, n_x, n_y, trans in _double_bond_stereo(mol, self.ranks):
+            choices = []
+            for end, other, reference in ((x, y, n_x), (y, x, n_y)):
+                candidates = [(j, b) for j, b in mol.neighbors[end]
+                              if j != other and mol.order[b] in (SINGLE, AROMATIC)]
+                if not candidates:
+                    break
+                # Reuse a bond that already carries a direction (conjugated systems)
+                candidates.sort(key=lambda item: (item[1] not in self.directions, self.ranks[item[0]]))
+                choices.append(candidates[0])
+                if candidates[0][0] != reference:
+                    trans = not trans
+            if len(choices) != 2:
+                continue
+            (n1, b1), (n2, b2) = choices
+
+            def as_written(bond: int, first: int, second: int, symbol: str) -> str:
+                return symbol if self.written[bond] == (first, second) else FLIP[symbol]
+
+            # Normalized forms: "n1 s1 x" and "y s2 n2"; equal symbols mean trans
+            if b1 in self.directions:
+                s1 = as_written(b1, n1, x, self.directions[b1])
+            else:
+                # Unconstrained: write '/' on the first bond
+                s1 = as_written(b1, n1, x, '/')
+                if b2 in self.directions:
+                    s2_fixed = as_written(b2, y, n2, self.directions[b2])
+                    s1 = s2_fixed if trans else FLIP[s2_fixed]
+            s2 = s1 if trans else FLIP[s1]
+            if b2 in self.directions and as_written(b2, y, n2, self.directions[b2]) != s2:
+                continue
+            self.directions[b1] = as_written(b1, n1, x, s1)
+            self.directions[b2] = as_written(b2, y, n2, s2)
+
+    def _bond_symbol(self, bond: int) -> str:
+        if bond in self.directions:
+            return self.directions[bond]
+        mol = self.mol
+        order = mol.order[bond]
+        a, b = mol.bonds[bond]
+        both_aromatic = mol.aromatic[a] and mol.aromatic[b]
+        if order == SINGLE:
+            return '-' if both_aromatic else ''
+        if order == AROMATIC:
+            return '' if both_aromatic else ':'
+        return BOND_SYMBOL[order]
+
+    def _atom_token(self, atom: int) -> str:
+        mol = self.mol
+        z = mol.z[atom]
+        symbol = SYMBOLS[z]
+        aromatic = mol.aromatic[atom] and symbol.lower() in AROMATIC_WRITABLE
+        if aromatic:
+            symbol = symbol.lower()
+        hydrogens = mol.hydrogens[atom]
+        isotope = mol.isotope[atom] if self.isomeric else 0
+
+        chirality = ''
+        if self.isomeric and atom in mol.chiral and hydrogens <= 1:
+            written = [mol.replacement.get(j, j) for j in mol.chiral[atom]]
+            output = self._output_neighbors(atom)
+            if sorted(written) == sorted(output) and len(set(output)) == 4:
+                clockwise = (mol.chiral_code[atom] == CHIRAL_CW) ^ bool(_permutation_parity(written, output))
+                chirality = '@@' if clockwise else '@'
+
+        used = sum(BOND_VALENCE[mol.order[b]] for _, b in mol.neighbors[atom])
+        if (SYMBOLS[z] in ORGANIC_SUBSET and mol.charge[atom] == 0 and not isotope and not chirality
+                and (aromatic or not mol.aromatic[atom])
+                and hydrogens == _implicit_hydrogens(z, mol.aromatic[atom], used)):
+            return symbol
+        if z == 0 and not (mol.charge[atom] or isotope or hydrogens or chirality):
+            return '*'
+
+        charge = mol.charge[atom]
+        charge_text = '' if not charge else ('+' if charge > 0 else '-') + (str(abs(charge)) if abs(charge) > 1 else '')
+        hydrogen_text = '' if not hydrogens else 'H' + (str(hydrogens) if hydrogens > 1 else '')
+        return f"[{isotope or ''}{symbol}{chirality}{hydrogen_text}{charge_text}]"
+
+    def write(self) -> str:
+        parts: List[str] = []
+        free_digits: List[int] = []
+        next_digit = 1
+        digits: Dict[int, int] = {}
+
+        def digit_text(digit: int) -> str:
+            return str(digit) if digit < 10 else f"%{digit}"
+
+        for root in self.roots:
+            if parts:
+                parts.append('.')
+            # Explicit stack of atoms to write and parentheses to emit
+            stack: List[Any] = [(root, None)]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, str):
+                    parts.append(item)
+                    continue
+                atom, bond = item
+                if bond is not None:
+                    parts.append(self._bond_symbol(bond))
+                parts.append(self._atom_token(atom))
+
+                closed = []
+                for ring in self.ring_close[atom]:
+                    digit = digits.pop(ring)
+                    parts.append(digit_text(digit))
+                    closed.append(digit)
+                for ring in self.ring_open[atom]:
+                    if free_digits:
+                        free_digits.sort()
+                        digit = free_digits.pop(0)
+                    else:
+                        digit = next_digit
+                        next_digit += 1
+                    digits[ring] = digit
+                    parts.append(self._bond_symbol(ring) + digit_text(digit))
+                free_digits.extend(closed)
+
+                children = self.children[atom]
+                bonds = {j: b for j, b in self.mol.neighbors[atom]}
+                for index, child in enumerate(reversed(children)):
+                    if index == 0:
+                        stack.append((child, bonds[child]))
+                    else:
+                        stack.append(')')
+                        stack.append((child, bonds[child]))
+                        stack.append('(')
+        return ''.join(parts)
+
+
+def perceive_aromaticity(graph: MolGraph) -> Tuple[List[bool], List[int]]:
+    """
+    Per-atom aromatic flags and per-bond orders of a graph after Hückel
+    perception, so Kekule and aromatic spellings give the same result
+    """
+    mol = _Molecule(graph)
+    _perceive_aromaticity(mol)
+    return mol.aromatic, mol.order
+
+
+def double_bond_stereo(graph: MolGraph) -> List[Tuple[int, int, int, int, bool]]:
+    """
+    Specified double-bond geometry of a graph
+
+    Returns:
+        (x, y, neighbor of x, neighbor of y, trans) per acyclic double bond
+        with '/' or '\\' bonds on both ends
+    """
+    mol = _Molecule(graph)
+    return _double_bond_stereo(mol, list(range(len(mol.z))))
+
+
+def symmetry_classes(graph: MolGraph) -> List[int]:
+    """
+    Constitutional symmetry class of every atom of a graph (equal values for
+    topologically equivalent atoms; plain [H] atoms share the last class)
+    """
+    return _Ranking(_Molecule(graph), isomeric=False).initial
+
+
+def canonical_smiles(source: Union[str, MolGraph], isomeric: bool = True) -> str:
+    """
+    Canonical SMILES of a SMILES string or parsed graph
+
+    Args:
+        source: SMILES string or MolGraph
+        isomeric: Keep isotopes, tetrahedral centers and double-bond geometry
+
+    Raises:
+        SmilesError: If a SMILES string cannot be parsed
+    """
+    graph = parse_smiles(source) if isinstance(source, str) else source
+    mol = _Molecule(graph)
+    _perceive_aromaticity(mol)
+    stereo_elements = len(mol.chiral) + len(_double_bond_stereo(mol, [0] * len(mol.z))) if isomeric else 0
+    if stereo_elements < 2:
+        return _Writer(mol, canonical_ranks(mol, isomeric), isomeric).write()
+
+    # Atoms equivalent by constitution can differ by their stereo relation to
+    # another stereo element (cis/trans ring substituents), so every choice of
+    # tied atom is tried and the smallest string kept, within a bounded
+    # number of complete orderings
+    ranking = _Ranking(mol, isomeric)
+    budget = [STEREO_SEARCH_LIMIT]
+
+    def smallest(ranks: List[int]) -> str:
+        tied = ranking.tied_class(ranks)
+        if not tied:
+            budget[0] -= 1
+            return _Writer(mol, ranks, isomeric).write()
+        best = None
+        for index, atom in enumerate(tied):
+            if index and budget[0] <= 0:
+                break
+            candidate = smallest(ranking.break_tie(ranks, atom))
+            if best is None or candidate < best:
+                best = candidate
+        return best
+
+    return smallest(ranking.initial)
+
+
+def try_canonical_smiles(smiles: str, isomeric: bool = True) -> Tuple[Optional[str], Optional[str]]:
+    """canonical_smiles returning (canonical, None) or (None, error message)"""
+    try:
+        return canonical_smiles(smiles, isomeric), None
+    except SmilesError as e:
+        return None, str(e)
@@ -0,0 +1,226 @@
+"""
+Grid-based cavity (pocket) detection
+
+This module finds candidate ligand binding sites on a receptor:
+- Protein voxelized on a regular grid (see voxel_grid)
+- Buriedness of each probe-accessible voxel from vectorized ray casts
+  along 14 directions
+- Buried voxels clustered with connected-component labelling
+- Pockets ranked by volume and buriedness with tight docking boxes
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from .sasa import structure_arrays
+from .voxel_grid import occupancy_grid, grid_centers, DEFAULT_GRID_SPACING
+
+try:
+    from scipy import ndimage
+    SCIPY_AVAILABLE = True
+except ImportError:
+    ndimage = None
+    SCIPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Rays longer than this (Å) that hit nothing count as open to solvent
+RAY_LENGTH = 10.0
+
+# Fraction of rays that must hit protein for a voxel to count as buried
+BURIEDNESS_THRESHOLD = 0.7
+
+# Pocket voxels must be at least this far (Å) from every atom surface, so
+# packing defects too small for a ligand atom are ignored
+PROBE_RADIUS = 1.4
+
+GRID_PADDING = 4.0
+
+# Smallest pocket reported (Å^3)
+MIN_POCKET_VOLUME = 20.0
+
+# Margin added around pocket voxels when building docking boxes (Å)
+BOX_MARGIN = 4.0
+MIN_BOX_SIZE = 10.0
+MAX_BOX_SIZE = 30.0
+
+# 6 face and 8 corner directions of a cube
+_RAY_DIRECTIONS = np.array(
+    [d for d in np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij')).reshape(3, -1).T
+     if np.abs(d).sum() in (1, 3)],
+    dtype=np.float64
+)
+_RAY_DIRECTIONS /= np.linalg.norm(_RAY_DIRECTIONS, axis=1, keepdims=True)
+
+_FACE_NEIGHBORS = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+
+
+def buriedness(occupied: np.ndarray, voxels: np.ndarray, spacing: float = DEFAULT_GRID_SPACING,
+               ray_length: float = RAY_LENGTH) -> np.ndarray:
+    """
+    Fraction of 14 rays from each voxel that hit an occupied voxel
+
+    Args:
+        occupied: Boolean protein occupancy grid
+        voxels: (M, 3) integer indices of voxels to test
+        spacing: Voxel edge length in Å
+        ray_length: Ray length in Å
+
+    Returns:
+        (M,) float array in [0, 1]
+    """
+    voxels = np.asarray(voxels, dtype=np.int64).reshape(-1, 3)
+    reach = int(np.ceil(ray_length / spacing))
+    # Pad with empty space so every ray sample is a valid flat index
+    padded = np.pad(occupied, reach, mode='constant', constant_values=False)
+    shape = np.array(padded.shape)
+    strides = np.array([shape[1] * shape[2], shape[2], 1])
+    flat = padded.reshape(-1)
+    origins = (voxels + reach) @ strides
+
+    steps = np.arange(1, reach + 1, dtype=np.float64)
+    hit_count = np.zeros(len(voxels), dtype=np.int32)
+    for direction in _RAY_DIRECTIONS:
+        offsets = np.unique(np.rint(direction[None, :] * steps[:, None]).astype(np.int64) @ strides)
+        hit = np.zeros(len(voxels), dtype=bool)
+        for offset in offsets:
+            hit |= flat[origins + offset]
+        hit_count += hit
+    return hit_count / len(_RAY_DIRECTIONS)
+
+
+def _label_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Face-connected component labels of a boolean grid (0 = background)"""
+    if SCIPY_AVAILABLE:
+        return ndimage.label(mask)
+
+    # Label propagation with pointer jumping over the voxel adjacency list
+    shape = np.array(mask.shape)
+    voxels = np.argwhere(mask)
+    strides = np.array([shape[1] * shape[2], shape[2], 1])
+    linear = voxels @ strides
+    order = np.argsort(linear)
+    linear_sorted = linear[order]
+
+    sources, targets = [], []
+    for offset in _FACE_NEIGHBORS[::2]:
+        neighbor = voxels + offset
+        valid = np.all(neighbor < shape, axis=1)
+        keys = neighbor[valid] @ strides
+        pos = np.minimum(np.searchsorted(linear_sorted, keys), len(linear_sorted) - 1)
+        found = linear_sorted[pos] == keys
+        sources.append(np.nonzero(valid)[0][found])
+        targets.append(order[pos[found]])
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+
+    labels = np.arange(len(voxels))
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, sources, labels[targets])
+        np.minimum.at(labels, targets, labels[sources])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+
+    _, dense = np.unique(labels, return_inverse=True)
+    grid = np.zeros(mask.shape, dtype=np.int32)
+    grid[tuple(voxels.T)] = dense + 1
+    return grid, int(dense.max() + 1) if len(dense) else 0
+
+
+def _docking_box(points: np.ndarray, margin: float) -> Dict[str, float]:
+    lower = points.min(axis=0)
+    upper = points.max(axis=0)
+    center = (lower + upper) / 2.0
+    size = np.clip(upper - lower + 2.0 * margin, MIN_BOX_SIZE, MAX_BOX_SIZE)
+    return {
+        'x': round(float(center[0]), 3), 'y': round(float(center[1]), 3), 'z': round(float(center[2]), 3),
+        'size_x': round(float(size[0]), 1), 'size_y': round(float(size[1]), 1), 'size_z': round(float(size[2]), 1)
+    }
+
+
+def detect_pockets(coords: Any, radii: Any, spacing: float = DEFAULT_GRID_SPACING,
+                   threshold: float = BURIEDNESS_THRESHOLD, ray_length: float = RAY_LENGTH,
+                   min_volume: float = MIN_POCKET_VOLUME, max_pockets: int = 10,
+                   probe: float = PROBE_RADIUS, grid: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Find buried empty regions of a receptor and describe them as docking boxes
+
+    Args:
+        coords: (N, 3) heavy-atom coordinates
+        radii: (N,) van der Waals radii
+        spacing: Grid spacing in Å
+        threshold: Minimum buriedness of pocket voxels
+        ray_length: Ray length for buriedness in Å
+        min_volume: Smallest pocket volume in Å^3
+        max_pockets: Maximum number of pockets returned
+        probe: Minimum clearance (Å) between pocket voxels and atom surfaces
+        grid: Precomputed occupancy_grid result to reuse
+
+    Returns:
+        Pockets sorted best first, each with a Vina box, volume and buriedness
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=np.float64)
+    if len(coords) == 0:
+        return []
+
+    if grid is None or abs(grid['spacing'] - spacing) > 1e-9:
+        grid = occupancy_grid(coords, radii, spacing=spacing, padding=GRID_PADDING)
+    occupied = grid['occupied']
+
+    # Candidates: voxels with room for a probe sphere
+    excluded = occupancy_grid(coords, radii + probe, geometry=grid)['occupied']
+    candidates = np.argwhere(~excluded)
+    if len(candidates) == 0:
+        return []
+
+    scores = buriedness(occupied, candidates, grid['spacing'], ray_length)
+    keep = scores >= threshold
+    buried_voxels = candidates[keep]
+    buried_scores = scores[keep]
+
+    mask = np.zeros(occupied.shape, dtype=bool)
+    mask[tuple(buried_voxels.T)] = True
+    labels, count = _label_components(mask)
+    if count == 0:
+        return []
+
+    voxel_labels = labels[tuple(buried_voxels.T)]
+    voxel_volume = grid['spacing'] ** 3
+    sizes = np.bincount(voxel_labels, minlength=count + 1)
+    mean_buriedness = np.bincount(voxel_labels, weights=buried_scores, minlength=count + 1) / np.maximum(sizes, 1)
+
+    pockets = []
+    for label in np.nonzero(sizes * voxel_volume >= min_volume)[0]:
+        if label == 0:
+            continue
+        points = grid_centers(grid, buried_voxels[voxel_labels == label])
+        volume = float(sizes[label] * voxel_volume)
+        pocket = {
+            'volume': round(volume, 1),
+            'buriedness': round(float(mean_buriedness[label]), 3),
+            'num_voxels': int(sizes[label]),
+            'center_of_mass': np.round(points.mean(axis=0), 3).tolist()
+        }
+        pocket.update(_docking_box(points, BOX_MARGIN))
+        pocket['score'] = round(volume * float(mean_buriedness[label]) ** 2, 2)
+        pockets.append(pocket)
+
+    pockets.sort(key=lambda p: p['score'], reverse=True)
+    pockets = pockets[:max_pockets]
+    top_score = pockets[0]['score'] if pockets else 1.0
+    for rank, pocket in enumerate(pockets, start=1):
+        pocket['name'] = f'pocket_{rank}'
+        pocket['rank'] = rank
+        pocket['confidence'] = round(pocket['buriedness'] * (pocket['score'] / top_score) ** 0.25, 3)
+    return pockets
+
+
+def detect_pockets_in_pdb(pdb_data: Any, **kwargs) -> List[Dict[str, Any]]:
+    """detect_pockets for PDB/PDBQT content or a parse_pdb result"""
+    coords, radii, _ = structure_arrays(pdb_data)
+    return detect_pockets(coords, radii, **kwargs)
@@ -0,0 +1,1055 @@
+"""
+3D Conformer Generation by Distance Geometry
+
+This module builds 3D ligand structures from SMILES graphs without external
+chemistry toolkits:
+- Explicit hydrogens added to the parsed graph
+- Bounds matrix from covalent radii, hybridization angles, planar ring and
+  double-bond geometry and van der Waals contacts, triangle-smoothed
+- Many conformers per molecule embedded at once from random distance
+  matrices (stacked metric-matrix eigendecompositions)
+- Batched refinement against the bounds and tetrahedral chiral volumes,
+  then under a small force field (bond, angle, planarity, out-of-plane,
+  repulsion and chirality terms) with analytic NumPy gradients and FIRE minimization
+- Conformers trapped in strained minima or with steric clashes re-embedded
+- Process pool over molecules
+- SDF (Kekule bonds) and AutoDock PDBQT (Gasteiger charges, merged
+  nonpolar hydrogens, rotatable-bond torsion tree) writers
+
+Energies are those of the internal force field; they rank conformers of
+one molecule but are not comparable with MMFF or UFF energies.
+"""
+
+import hashlib
+import logging
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Tuple, Union
+
+import numpy as np
+
+from .smiles import (MolGraph, SmilesError, parse_smiles, SYMBOLS, SINGLE, DOUBLE, TRIPLE, AROMATIC,
+                     CHIRAL_CCW, CHIRAL_CW)
+from .canonical import perceive_aromaticity, double_bond_stereo, smallest_rings
+from .structure_alignment import pairwise_rmsd_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFORMERS = 10
+
+COVALENT_RADII = {1: 0.32, 5: 0.84, 6: 0.76, 7: 0.71, 8: 0.66, 9: 0.57, 14: 1.11, 15: 1.07,
+                  16: 1.05, 17: 1.02, 34: 1.20, 35: 1.20, 53: 1.39}
+VDW_RADII = {1: 1.10, 5: 1.92, 6: 1.70, 7: 1.55, 8: 1.52, 9: 1.47, 14: 2.10, 15: 1.80,
+             16: 1.80, 17: 1.75, 34: 1.90, 35: 1.85, 53: 1.98}
+DEFAULT_COVALENT_RADIUS = 1.30
+DEFAULT_VDW_RADIUS = 2.00
+
+# Bond length relative to the sum of single-bond covalent radii
+BOND_ORDER_SCALE = {SINGLE: 1.0, DOUBLE: 0.87, TRIPLE: 0.78, AROMATIC: 0.91}
+
+# Ideal angles (degrees) by hybridization, and inside small rings
+HYBRID_ANGLES = {'sp': 180.0, 'sp2': 120.0, 'sp3': 109.47, 'sp3d': 90.0}
+RING_ANGLES = {3: 60.0, 4: 90.0, 5: 108.0}
+
+# Bounds tolerances (Å) and contact scales
+BOND_TOLERANCE = 0.01
+ANGLE_TOLERANCE = 0.04
+PLANAR_TOLERANCE = 0.06
+CONTACT_SCALE = 0.7          # bounds lower limit for atoms 4+ bonds apart
+REPULSION_SCALE = 0.8        # force-field contact distance, atoms 4+ bonds apart
+REPULSION_SCALE_14 = 0.65    # same for atoms 3 bonds apart
+UNBOUNDED = 1000.0
+
+# Force constants (energy per Å^2) and chiral volume floor (Å^3)
+K_BOND = 300.0
+K_ANGLE = 60.0
+K_PLANAR = 30.0
+K_FLAT = 5.0
+K_REPULSION = 10.0
+K_CHIRAL = 50.0
+CHIRAL_VOLUME = 0.5
+
+# Minimizer settings: iterations, convergence on max atom force
+EMBED_ITERATIONS = 400
+EMBED_ATTEMPTS = 5
+FORCE_FIELD_ITERATIONS = 800
+FORCE_TOLERANCE = 0.1
+MAX_STEP = 0.2
+
+# Minimized conformers re-embedded (up to EMBED_ATTEMPTS rounds, then dropped)
+# when trapped in a strained minimum or left with a steric clash
+ENERGY_WINDOW = 10.0         # above the lowest energy of the molecule
+CLASH_FRACTION = 0.85        # of the repulsion contact distance, atoms 3+ bonds apart
+
+# Gasteiger-Marsili (a, b, c) parameters by element and hybridization
+GASTEIGER_PARAMETERS = {
+    (1, 'sp3'): (7.17, 6.24, -0.56),
+    (6, 'sp3'): (7.98, 9.18, 1.88), (6, 'sp2'): (8.79, 9.32, 1.51), (6, 'sp'): (10.39, 9.45, 0.73),
+    (7, 'sp3'): (11.54, 10.82, 1.36), (7, 'sp2'): (12.87, 11.15, 0.85), (7, 'sp'): (15.68, 11.70, -0.27),
+    (8, 'sp3'): (14.18, 12.92, 1.39), (8, 'sp2'): (17.07, 13.79, 0.47),
+    (9, 'sp3'): (14.66, 13.85, 2.31), (15, 'sp3'): (8.90, 8.24, 0.96), (16, 'sp3'): (10.14, 9.13, 1.38),
+    (17, 'sp3'): (11.00, 9.69, 1.35), (35, 'sp3'): (10.08, 8.47, 1.16), (53, 'sp3'): (9.90, 7.96, 0.96)
+}
+GASTEIGER_ITERATIONS = 6
+HYDROGEN_CATION_ELECTRONEGATIVITY = 20.02
+
+# AutoDock types for elements without special cases
+AUTODOCK_TYPES = {6: 'C', 9: 'F', 15: 'P', 17: 'Cl', 35: 'Br', 53: 'I', 34: 'Se', 14: 'Si', 5: 'B'}
+
+
+class _Topology:
+    """Hydrogen-complete molecular graph with the geometry terms derived from it"""
+
+    def __init__(self, graph: MolGraph):
+        aromatic, order = perceive_aromaticity(graph)
+        heavy = graph.num_atoms
+        z = graph.atomic_num.tolist()
+        bonds = graph.bond_atoms.tolist()
+        order = list(order)
+
+        # Implicit and bracket hydrogens become atoms after the heavy atoms
+        owner: Dict[int, List[int]] = {}
+        for atom, count in enumerate(graph.hydrogens.tolist()):
+            for _ in range(count):
+                owner.setdefault(atom, []).append(len(z))
+                bonds.append([atom, len(z)])
+                order.append(SINGLE)
+                z.append(1)
+
+        n = len(z)
+        self.num_heavy = heavy
+        self.atomic_num = np.array(z, dtype=np.int16)
+        self.charge = np.concatenate([graph.charge, np.zeros(n - heavy, dtype=graph.charge.dtype)])
+        self.aromatic = np.array(list(aromatic) + [False] * (n - heavy), dtype=bool)
+        self.bonds = np.array(bonds, dtype=np.int64).reshape(-1, 2)
+        self.order = np.array(order, dtype=np.int8)
+        self.ring_bond = np.concatenate([graph.ring_bond, np.zeros(len(bonds) - graph.num_bonds, dtype=bool)])
+
+        self.neighbors: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+        for index, (a, b) in enumerate(bonds):
+            self.neighbors[a].append((b, index))
+            self.neighbors[b].append((a, index))
+        self.rings = [set(atoms) for atoms, _ in
+                      smallest_rings(bonds, self.neighbors, self.ring_bond.tolist(), max_size=8)]
+        self.hybridization = [self._hybridization(i) for i in range(n)]
+        self.bond_length = np.array([self._bond_length(a, b, order[k]) for k, (a, b) in enumerate(bonds)])
+        self.chirality = self._chiral_constraints(graph, owner)
+
+    @property
+    def num_atoms(self) -> int:
+        return len(self.atomic_num)
+
+    def _hybridization(self, atom: int) -> str:
+        orders = [self.order[b] for _, b in self.neighbors[atom]]
+        degree = len(orders)
+        if degree >= 5:
+            return 'sp3d'
+        if degree == 4 or self.atomic_num[atom] == 1:
+            return 'sp3'
+        if orders.count(TRIPLE) or orders.count(DOUBLE) >= 2:
+            return 'sp'
+        if self.aromatic[atom] or DOUBLE in orders:
+            return 'sp2'
+        # Amide / aniline nitrogen conjugated with a neighboring pi system
+        if self.atomic_num[atom] == 7 and degree == 3:
+            for neighbor, _ in self.neighbors[atom]:
+                if self.aromatic[neighbor] or any(self.order[b] == DOUBLE for _, b in self.neighbors[neighbor]):
+                    return 'sp2'
+        return 'sp3'
+
+    def _bond_length(self, a: int, b: int, order: int) -> float:
+        radii = (COVALENT_RADII.get(int(self.atomic_num[a]), DEFAULT_COVALENT_RADIUS)
+                 + COVALENT_RADII.get(int(self.atomic_num[b]), DEFAULT_COVALENT_RADIUS))
+        return radii * BOND_ORDER_SCALE.get(order, 1.0)
+
+    def _chiral_constraints(self, graph: MolGraph, owner: Dict[int, List[int]]) -> List[Tuple[int, int, int, int, float]]:
+        """
+        (apex, a, b, c, sign) volume constraints of tetrahedral centers:
+        sign * volume of (a, b, c) seen from the apex must be positive
+        """
+        constraints = []
+        codes = graph.chiral.tolist()
+        for row in graph.chiral_centers.tolist():
+            center, order = row[0], row[1:]
+            # -1 is the center's hydrogen, or its lone pair when it has none
+            hydrogen = owner.get(center, [None])[0]
+            order = [hydrogen if j == -1 else j for j in order]
+            if len(set(order)) != 4:
+                continue
+            # Looking from the first neighbor, '@' lists the others anticlockwise: negative volume
+            sign = -1.0 if codes[center] == CHIRAL_CCW else 1.0
+            if codes[center] not in (CHIRAL_CCW, CHIRAL_CW):
+                continue
+            if None in order:
+                position = order.index(None)
+                if position:
+                    order[0], order[position] = order[position], order[0]
+                    sign = -sign
+            constraints.append((center, order[1], order[2], order[3], sign))
+            # The four neighbors' own tetrahedron has the same orientation;
+            # it stops the first neighbor folding in beside the other three
+            if order[0] is not None:
+                constraints.append((order[0], order[1], order[2], order[3], sign))
+        return constraints
+
+    def _ring_angle(self, i: int, j: int, k: int) -> Optional[float]:
+        sp2 = self.hybridization[j] == 'sp2'
+        for size in (3, 4, 5, 6):
+            if any(len(ring) == size and {i, j, k} <= ring for ring in self.rings):
+                if size == 5 and not sp2:
+                    return 105.0
+                if size == 6:
+                    return 120.0 if sp2 else None
+                return RING_ANGLES[size]
+        return None
+
+    def angle(self, i: int, j: int, k: int) -> float:
+        """Ideal i-j-k angle in radians"""
+        ring_angle = self._ring_angle(i, j, k)
+        if ring_angle is not None:
+            return np.radians(ring_angle)
+        around = [m for m, _ in self.neighbors[j]]
+        if self.hybridization[j] == 'sp2' and len(around) == 3:
+            # Trigonal centers on small rings: the other angles take up the rest of 360
+            m = next(a for a in around if a not in (i, k))
+            fixed = [self._ring_angle(i, j, m), self._ring_angle(k, j, m)]
+            if any(value is not None for value in fixed):
+                known = [value for value in fixed if value is not None]
+                return np.radians((360.0 - sum(known)) / (3 - len(known)))
+        return np.radians(HYBRID_ANGLES[self.hybridization[j]])
+
+    def bonded_length(self, a: int, b: int) -> float:
+        for neighbor, bond in self.neighbors[a]:
+            if neighbor == b:
+                return float(self.bond_length[bond])
+        raise KeyError((a, b))
+
+
+def _torsion_distance(a: float, b: float, c: float, theta1: float, theta2: float, phi: float) -> float:
+    """i-l distance for bonds i-j (a), j-k (b), k-l (c), angles at j and k, torsion phi"""
+    dx = b - c * np.cos(theta2) - a * np.cos(theta1)
+    dy = c * np.sin(theta2) * np.cos(phi) - a * np.sin(theta1)
+    dz = c * np.sin(theta2) * np.sin(phi)
+    return float(np.sqrt(dx * dx + dy * dy + dz * dz))
+
+
+def _planar_relations(topology: _Topology, graph: MolGraph) -> Dict[Tuple[int, int], bool]:
+    """
+    Fixed cis (True) / trans (False) relations of 1-4 pairs across planar
+    bonds: aromatic and double bonds, and bonds inside fully sp2 rings
+    """
+    relations: Dict[Tuple[int, int], bool] = {}
+    specified = {(x, y): (n_x, n_y, trans) for x, y, n_x, n_y, trans in double_bond_stereo(graph)}
+    planar_rings = [ring for ring in topology.rings
+                    if all(topology.hybridization[a] == 'sp2' for a in ring)]
+
+    for bond, (j, k) in enumerate(topology.bonds.tolist()):
+        order = topology.order[bond]
+        if topology.hybridization[j] != 'sp2' or topology.hybridization[k] != 'sp2':
+            continue
+        in_planar_ring = any({j, k} <= ring for ring in planar_rings)
+        if order not in (DOUBLE, AROMATIC) and not in_planar_ring:
+            continue
+        left = [i for i, _ in topology.neighbors[j] if i != k]
+        right = [l for l, _ in topology.neighbors[k] if l != j]
+        if not left or not right:
+            continue
+
+        if topology.ring_bond[bond]:
+            for i in left:
+                for l in right:
+                    i_ring = any({i, j, k} <= ring for ring in topology.rings)
+                    l_ring = any({j, k, l} <= ring for ring in topology.rings)
+                    together = any({i, j, k, l} <= ring for ring in topology.rings)
+                    relations[(i, l)] = together or not (i_ring or l_ring)
+            continue
+
+        # Acyclic double bond: geometry from '/' '\' when given, otherwise an arbitrary fixed one
+        if (j, k) in specified:
+            n_j, n_k, trans = specified[(j, k)]
+        elif (k, j) in specified:
+            n_k, n_j, trans = specified[(k, j)]
+        else:
+            n_j, n_k, trans = left[0], right[0], True
+        for i in left:
+            for l in right:
+                same_reference = (i == n_j) == (l == n_k)
+                relations[(i, l)] = not (trans if same_reference else not trans)
+    return relations
+
+
+def _topological_distances(topology: _Topology, limit: int = 4) -> np.ndarray:
+    """Bond counts between atom pairs, capped at limit"""
+    n = topology.num_atoms
+    adjacency = np.zeros((n, n), dtype=bool)
+    adjacency[topology.bonds[:, 0], topology.bonds[:, 1]] = True
+    adjacency[topology.bonds[:, 1], topology.bonds[:, 0]] = True
+    distance = np.full((n, n), limit, dtype=np.int8)
+    np.fill_diagonal(distance, 0)
+    reach = np.eye(n, dtype=bool)
+    for steps in range(1, limit):
+        reach = reach | (reach.astype(np.uint8) @ adjacency.astype(np.uint8) > 0)
+        distance[(distance == limit) & reach] = steps
+    return distance
+
+
+class _Terms:
+    """Bounds matrix and force-field pair lists of one molecule"""
+
+    def __init__(self, topology: _Topology, graph: MolGraph):
+        n = topology.num_atoms
+        self.n = n
+        lower = np.zeros((n, n))
+        upper = np.full((n, n), UNBOUNDED)
+        np.fill_diagonal(upper, 0.0)
+        distance = _topological_distances(topology)
+        vdw = np.array([VDW_RADII.get(int(z), DEFAULT_VDW_RADIUS) for z in topology.atomic_num])
+        contact = vdw[:, None] + vdw[None, :]
+
+        def fix(a: int, b: int, value: float, tolerance: float):
+            lower[a, b] = lower[b, a] = value - tolerance
+            upper[a, b] = upper[b, a] = value + tolerance
+
+        # 1-2
+        bond_pairs = topology.bonds
+        for (a, b), length in zip(bond_pairs.tolist(), topology.bond_length.tolist()):
+            fix(a, b, length, BOND_TOLERANCE)
+
+        # 1-3
+        angle_pairs, angle_targets = [], []
+        for j in range(n):
+            around = [i for i, _ in topology.neighbors[j]]
+            for x in range(len(around)):
+                for y in range(x + 1, len(around)):
+                    i, k = around[x], around[y]
+                    if distance[i, k] != 2:
+                        continue
+                    a, c = topology.bonded_length(j, i), topology.bonded_length(j, k)
+                    target = float(np.sqrt(a * a + c * c - 2 * a * c * np.cos(topology.angle(i, j, k))))
+                    fix(i, k, target, ANGLE_TOLERANCE)
+                    angle_pairs.append((i, k))
+                    angle_targets.append(target)
+
+        # 1-4: fixed across planar bonds, cis..trans range across free ones
+        relations = _planar_relations(topology, graph)
+        planar_pairs, planar_targets = [], []
+        # Coplanar quadruples: trigonal centers with their neighbors, and planar torsions
+        flat = [[j] + [i for i, _ in topology.neighbors[j]] for j in range(n)
+                if topology.hybridization[j] == 'sp2' and len(topology.neighbors[j]) == 3]
+        for (j, k) in bond_pairs.tolist():
+            for i, _ in topology.neighbors[j]:
+                for l, _ in topology.neighbors[k]:
+                    if i == k or l == j or i == l or distance[i, l] != 3:
+                        continue
+                    a, b, c = topology.bonded_length(i, j), topology.bonded_length(j, k), topology.bonded_length(k, l)
+                    theta1, theta2 = topology.angle(i, j, k), topology.angle(j, k, l)
+                    cis = _torsion_distance(a, b, c, theta1, theta2, 0.0)
+                    trans = _torsion_distance(a, b, c, theta1, theta2, np.pi)
+                    relation = relations.get((i, l), relations.get((l, i)))
+                    if relation is None:
+                        lower[i, l] = lower[l, i] = max(lower[i, l], cis)
+                        upper[i, l] = upper[l, i] = max(upper[i, l] if upper[i, l] < UNBOUNDED else 0.0, trans)
+                    else:
+                        target = cis if relation else trans
+                        fix(i, l, target, PLANAR_TOLERANCE)
+                        planar_pairs.append((i, l))
+                        planar_targets.append(target)
+                        flat.append([i, j, k, l])
+
+        # Contacts between atoms further apart
+        far = distance >= 4
+        lower[far] = np.maximum(lower[far], CONTACT_SCALE * contact[far])
+
+        self.lower, self.upper = _triangle_smooth(lower, upper)
+
+        rows, cols = np.triu_indices(n, 1)
+        self.pair_i, self.pair_j = rows, cols
+        self.pair_lower = self.lower[rows, cols]
+        self.pair_upper = self.upper[rows, cols]
+
+        self.bond_i, self.bond_j = bond_pairs[:, 0], bond_pairs[:, 1]
+        self.bond_target = topology.bond_length
+        self.angle_i, self.angle_j, self.angle_target = _pair_arrays(angle_pairs, angle_targets)
+        self.planar_i, self.planar_j, self.planar_target = _pair_arrays(planar_pairs, planar_targets)
+
+        repel = distance[rows, cols] >= 3
+        self.repel_i, self.repel_j = rows[repel], cols[repel]
+        scale = np.where(distance[rows, cols][repel] == 3, REPULSION_SCALE_14, REPULSION_SCALE)
+        self.repel_target = scale * contact[self.repel_i, self.repel_j]
+
+        chirality = np.array(topology.chirality, dtype=np.float64).reshape(-1, 5)
+        self.chiral_atoms = chirality[:, :4].astype(np.int64)
+        self.chiral_sign = chirality[:, 4]
+
+        self.incidence = {name: _incidence(n, getattr(self, f'{name}_i'), getattr(self, f'{name}_j'))
+                          for name in ('pair', 'bond', 'angle', 'planar', 'repel')}
+        self.chiral_incidence = [_incidence(n, self.chiral_atoms[:, role]) for role in range(4)]
+
+        self.flat_atoms = np.array(flat, dtype=np.int64).reshape(-1, 4)
+        self.flat_incidence = [_incidence(n, self.flat_atoms[:, role]) for role in range(4)]
+
+
+def _pair_arrays(pairs: List[Tuple[int, int]], targets: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return array[:, 0], array[:, 1], np.array(targets, dtype=np.float64)
+
+
+def _incidence(n: int, first: np.ndarray, second: Optional[np.ndarray] = None) -> np.ndarray:
+    """(n, P) matrix scattering per-pair vectors onto atoms (+1 first atom, -1 second)"""
+    matrix = np.zeros((n, len(first)))
+    matrix[first, np.arange(len(first))] = 1.0
+    if second is not None:
+        matrix[second, np.arange(len(second))] = -1.0
+    return matrix
+
+
+def _triangle_smooth(lower: np.ndarray, upper: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Floyd-Warshall tightening of distance bounds with triangle inequalities"""
+    lower, upper = lower.copy(), upper.copy()
+    for k in range(len(lower)):
+        upper = np.minimum(upper, upper[:, k:k + 1] + upper[k:k + 1, :])
+        lower = np.maximum(lower, np.maximum(lower[:, k:k + 1] - upper[k:k + 1, :],
+                                             lower[k:k + 1, :] - upper[:, k:k + 1]))
+    # Contradictory bounds (strained rings) collapse onto the upper limit
+    return np.minimum(lower, upper), upper
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Cross product over the last axis (np.cross without its axis bookkeeping)"""
+    ux, uy, uz = u[..., 0], u[..., 1], u[..., 2]
+    vx, vy, vz = v[..., 0], v[..., 1], v[..., 2]
+    return np.stack([uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx], axis=-1)
+
+
+def _pair_vectors(x: np.ndarray, i: np.ndarray, j: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    d = x[:, i] - x[:, j]
+    return d, np.sqrt(np.maximum((d * d).sum(axis=2), 1e-12))
+
+
+def _harmonic(x: np.ndarray, i: np.ndarray, j: np.ndarray, target: np.ndarray, k: float,
+              incidence: np.ndarray, repulsive_only: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """k (r - target)^2 summed per conformer, and its gradient"""
+    if not len(i):
+        return np.zeros(len(x)), np.zeros_like(x)
+    d, r = _pair_vectors(x, i, j)
+    diff = r - target
+    if repulsive_only:
+        diff = np.minimum(diff, 0.0)
+    energy = k * (diff * diff).sum(axis=1)
+    gradient = np.matmul(incidence, (2.0 * k * diff / r)[..., None] * d)
+    return energy, gradient
+
+
+def _volume_term(x: np.ndarray, atoms: np.ndarray, incidence: List[np.ndarray],
+                 penalty) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Energy of signed volumes of (apex, a, b, c) quadruples and its gradient
+
+    Args:
+        penalty: Function volumes (C, K) -> (energies (C, K), dE/dV (C, K))
+    """
+    if not len(atoms):
+        return np.zeros(len(x)), np.zeros_like(x)
+    apex, a, b, c = (x[:, atoms[:, role]] for role in range(4))
+    va, vb, vc = a - apex, b - apex, c - apex
+    volume = (va * _cross(vb, vc)).sum(axis=2)
+    energy, slope = penalty(volume)
+    slope = slope[..., None]
+    da, db, dc = _cross(vb, vc) * slope, _cross(vc, va) * slope, _cross(va, vb) * slope
+    gradient = (np.matmul(incidence[0], -(da + db + dc)) + np.matmul(incidence[1], da)
+                + np.matmul(incidence[2], db) + np.matmul(incidence[3], dc))
+    return energy.sum(axis=1), gradient
+
+
+def _chiral(x: np.ndarray, terms: _Terms, k: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Penalty on tetrahedral centers whose signed volume falls below CHIRAL_VOLUME"""
+    def penalty(volume):
+        shortfall = np.minimum(terms.chiral_sign * volume - CHIRAL_VOLUME, 0.0)
+        return k * shortfall * shortfall, 2.0 * k * shortfall * terms.chiral_sign
+    return _volume_term(x, terms.chiral_atoms, terms.chiral_incidence, penalty)
+
+
+def _flatness(x: np.ndarray, terms: _Terms, k: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Out-of-plane penalty on quadruples that should be coplanar"""
+    return _volume_term(x, terms.flat_atoms, terms.flat_incidence,
+                        lambda volume: (k * volume * volume, 2.0 * k * volume))
+
+
+def _bounds_error(x: np.ndarray, terms: _Terms) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance-geometry error: squared violations of the bounds plus chiral volumes"""
+    d, r = _pair_vectors(x, terms.pair_i, terms.pair_j)
+    r2 = r * r
+    upper2, lower2 = terms.pair_upper ** 2, np.maximum(terms.pair_lower, 1e-3) ** 2
+    above = np.maximum(r2 / upper2 - 1.0, 0.0)
+    below_ratio = 2.0 * lower2 / (lower2 + r2) - 1.0
+    below = np.where(r2 < lower2, below_ratio, 0.0)
+    energy = (above * above + below * below).sum(axis=1)
+    # d(energy)/d(r^2), then chain rule through r^2 = |d|^2
+    slope = 2.0 * above / upper2 - 2.0 * below * 2.0 * lower2 / (lower2 + r2) ** 2
+    gradient = np.matmul(terms.incidence['pair'], (2.0 * slope)[..., None] * d)
+    chiral_energy, chiral_gradient = _chiral(x, terms, 1.0)
+    return energy + chiral_energy, gradient + chiral_gradient
+
+
+def force_field_energy(x: np.ndarray, terms: _Terms) -> Tuple[np.ndarray, np.ndarray]:
+    """Force-field energy per conformer and gradient for (C, N, 3) coordinates"""
+    energy = np.zeros(len(x))
+    gradient = np.zeros_like(x)
+    for part in (
+        _harmonic(x, terms.bond_i, terms.bond_j, terms.bond_target, K_BOND, terms.incidence['bond']),
+        _harmonic(x, terms.angle_i, terms.angle_j, terms.angle_target, K_ANGLE, terms.incidence['angle']),
+        _harmonic(x, terms.planar_i, terms.planar_j, terms.planar_target, K_PLANAR, terms.incidence['planar']),
+        _harmonic(x, terms.repel_i, terms.repel_j, terms.repel_target, K_REPULSION, terms.incidence['repel'],
+                  repulsive_only=True),
+        _flatness(x, terms, K_FLAT),
+        _chiral(x, terms, K_CHIRAL),
+    ):
+        energy += part[0]
+        gradient += part[1]
+    return energy, gradient
+
+
+def fire_minimize(objective, x: np.ndarray, max_iterations: int, tolerance: float = FORCE_TOLERANCE,
+                  dt_start: float = 0.02, dt_max: float = 0.1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    FIRE minimization of a batch of conformers, each with its own time step
+
+    Args:
+        objective: Function (C, N, 3) -> (energies (C,), gradient (C, N, 3))
+        x: Starting coordinates
+        max_iterations: Iteration limit
+        tolerance: Converged when the largest atom force is below this
+
+    Returns:
+        (coordinates, energies, converged mask, iterations run)
+    """
+    x = x.copy()
+    count = len(x)
+    velocity = np.zeros_like(x)
+    dt = np.full(count, dt_start)
+    alpha = np.full(count, 0.1)
+    positive_steps = np.zeros(count, dtype=np.int64)
+    energy, gradient = objective(x)
+    converged = np.zeros(count, dtype=bool)
+
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        force = -gradient
+        converged = np.sqrt((force * force).sum(axis=2)).max(axis=1) < tolerance
+        if converged.all():
+            break
+        power = (force * velocity).sum(axis=(1, 2))
+        force_norm = np.sqrt((force * force).sum(axis=(1, 2)))
+        velocity_norm = np.sqrt((velocity * velocity).sum(axis=(1, 2)))
+        mix = (alpha * velocity_norm / np.maximum(force_norm, 1e-12))[:, None, None]
+        velocity = (1.0 - alpha)[:, None, None] * velocity + mix * force
+
+        downhill = power > 0
+        positive_steps = np.where(downhill, positive_steps + 1, 0)
+        speed_up = downhill & (positive_steps > 5)
+        dt = np.where(speed_up, np.minimum(dt * 1.1, dt_max), dt)
+        alpha = np.where(speed_up, alpha * 0.99, alpha)
+        dt = np.where(downhill, dt, dt * 0.5)
+        alpha = np.where(downhill, alpha, 0.1)
+        velocity[~downhill] = 0.0
+        velocity[converged] = 0.0
+
+        velocity += force * dt[:, None, None]
+        step = velocity * dt[:, None, None]
+        length = np.sqrt((step * step).sum(axis=2, keepdims=True))
+        step *= np.minimum(1.0, MAX_STEP / np.maximum(length, 1e-12))
+        step[converged] = 0.0
+        x += step
+        energy, gradient = objective(x)
+    return x, energy, converged, iteration
+
+
+def _embed_coordinates(terms: _Terms, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Random distance matrices within the bounds, embedded by metric-matrix eigendecomposition"""
+    n = terms.n
+    fraction = rng.random((count, n, n))
+    fraction = np.triu(fraction, 1) + np.transpose(np.triu(fraction, 1), (0, 2, 1))
+    distances = terms.lower + fraction * (terms.upper - terms.lower)
+    squared = distances * distances
+    # Metric matrix G = -1/2 J D^2 J with J the centering projector
+    centered = squared - squared.mean(axis=1, keepdims=True) - squared.mean(axis=2, keepdims=True) \
+        + squared.mean(axis=(1, 2), keepdims=True)
+    metric = -0.5 * centered
+    values, vectors = np.linalg.eigh(metric)
+    top = np.maximum(values[:, -3:], 1e-6)
+    coords = vectors[:, :, -3:] * np.sqrt(top)[:, None, :]
+    # Tiny noise keeps atoms apart when the embedding collapses a dimension
+    return coords + rng.normal(scale=0.01, size=coords.shape)
+
+
+def _chiral_signs(x: np.ndarray, terms: _Terms) -> np.ndarray:
+    """(C, K) signed chiral volumes, positive when a center has the requested handedness"""
+    center, a, b, c = (x[:, terms.chiral_atoms[:, role]] for role in range(4))
+    return terms.chiral_sign * ((a - center) * _cross(b - center, c - center)).sum(axis=2)
+
+
+def _fix_handedness(x: np.ndarray, terms: _Terms) -> np.ndarray:
+    """Mirror conformers in which most chiral centers came out inverted"""
+    if not len(terms.chiral_sign):
+        return x
+    wrong = (_chiral_signs(x, terms) < 0).sum(axis=1) * 2 > len(terms.chiral_sign)
+    x[wrong, :, 0] *= -1.0
+    return x
+
+
+def _embed_refined(terms: _Terms, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Embed and refine against the bounds, re-embedding conformers that end
+    with an inverted center (up to EMBED_ATTEMPTS rounds); the last round
+    fills any shortfall regardless
+    """
+    accepted: List[np.ndarray] = []
+    needed = count
+    for attempt in range(EMBED_ATTEMPTS):
+        x = _fix_handedness(_embed_coordinates(terms, needed, rng), terms)
+        x, _, _, _ = fire_minimize(lambda coords: _bounds_error(coords, terms), x, EMBED_ITERATIONS,
+                                   tolerance=1e-3, dt_start=0.1, dt_max=1.0)
+        x = _fix_handedness(x, terms)
+        if len(terms.chiral_sign) and attempt < EMBED_ATTEMPTS - 1:
+            x = x[(_chiral_signs(x, terms) > 0).all(axis=1)]
+        accepted.append(x)
+        needed -= len(x)
+        if needed <= 0:
+            break
+    return np.concatenate(accepted)[:count]
+
+
+class ConformerSet:
+    """
+    Embedded conformers of one molecule
+
+    Atoms are the SMILES heavy atoms in input order followed by the added
+    hydrogens. Attributes: smiles, name, atomic_num, charge, aromatic,
+    bond_atoms, bond_order (aromatic bonds as AROMATIC), coordinates
+    (C, N, 3), energies (C,), converged (C,), num_heavy, and
+    initial_energies (C,) / iterations of the force-field minimization.
+    """
+
+    def __init__(self, smiles: str, name: str, topology: _Topology, coordinates: np.ndarray,
+                 energies: np.ndarray, converged: np.ndarray):
+        self.smiles = smiles
+        self.name = name
+        self.atomic_num = topology.atomic_num
+        self.charge = np.asarray(topology.charge, dtype=np.int8)
+        self.aromatic = topology.aromatic
+        self.bond_atoms = topology.bonds
+        self.bond_order = topology.order
+        self.ring_bond = topology.ring_bond
+        self.hybridization = list(topology.hybridization)
+        self.num_heavy = topology.num_heavy
+        self.coordinates = coordinates
+        self.energies = energies
+        self.converged = converged
+        self.initial_energies = energies
+        self.iterations = 0
+
+    def __len__(self) -> int:
+        return len(self.energies)
+
+    @property
+    def num_atoms(self) -> int:
+        return len(self.atomic_num)
+
+    def best(self) -> int:
+        """Index of the lowest-energy conformer"""
+        return int(np.argmin(self.energies))
+
+    def rmsd_to_best(self) -> np.ndarray:
+        """Heavy-atom RMSD of every conformer to the lowest-energy one, after superposition"""
+        heavy = self.coordinates[:, :self.num_heavy]
+        return pairwise_rmsd_matrix(heavy, n_jobs=1)[self.best()]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        rmsd = self.rmsd_to_best()
+        return [{'id': i + 1, 'energy': round(float(self.energies[i]), 4), 'rmsd': round(float(rmsd[i]), 3),
+                 'converged': bool(self.converged[i])} for i in np.argsort(self.energies).tolist()]
+
+    def to_sdf(self, indices: Optional[Iterable[int]] = None) -> str:
+        """SDF records (V2000, Kekule bonds) for the given conformers, all by default in energy order"""
+        if indices is None:
+            indices = np.argsort(self.energies).tolist()
+        return ''.join(_molblock(self, int(i)) for i in indices)
+
+    def to_pdbqt(self, index: Optional[int] = None) -> str:
+        """AutoDock PDBQT of one conformer (lowest energy by default)"""
+        return _pdbqt(self, self.best() if index is None else int(index))
+
+
+def _strained(x: np.ndarray, energies: np.ndarray, terms: _Terms) -> np.ndarray:
+    """Conformers above the energy window or with a contact well inside the repulsion distance"""
+    high = energies > energies.min() + ENERGY_WINDOW
+    if not len(terms.repel_i):
+        return high
+    distance = np.linalg.norm(x[:, terms.repel_i] - x[:, terms.repel_j], axis=2)
+    return high | (distance < CLASH_FRACTION * terms.repel_target).any(axis=1)
+
+
+def _embed_minimized(terms: _Terms, count: int,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+    """Embed and minimize count conformers: (coordinates, initial energies, energies, converged, iterations)"""
+    x = _embed_refined(terms, count, rng)
+    initial, _ = force_field_energy(x, terms)
+    x, energies, converged, iterations = fire_minimize(lambda coords: force_field_energy(coords, terms), x,
+                                                       FORCE_FIELD_ITERATIONS)
+    return x, initial, energies, converged, iterations
+
+
+def embed_molecule(source: Union[str, MolGraph], num_conformers: int = DEFAULT_CONFORMERS,
+                   seed: Optional[int] = None, name: str = 'ligand',
+                   prune_rmsd: Optional[float] = None) -> ConformerSet:
+    """
+    Generate 3D conformers of one molecule
+
+    Args:
+        source: SMILES string or MolGraph
+        num_conformers: Conformers embedded and minimized together
+        seed: Random seed for reproducible coordinates
+        name: Title written to SDF and PDBQT output
+        prune_rmsd: Drop conformers within this heavy-atom RMSD of a
+            lower-energy one (no pruning when None)
+
+    Conformers left strained or clashing after minimization are re-embedded
+    and dropped if they still are, so fewer than num_conformers may return.
+
+    Raises:
+        SmilesError: If a SMILES string cannot be parsed
+    """
+    graph = parse_smiles(source) if isinstance(source, str) else source
+    if graph.num_atoms == 0:
+        raise SmilesError("Molecule has no atoms", graph.smiles)
+    topology = _Topology(graph)
+    terms = _Terms(topology, graph)
+    rng = np.random.default_rng(seed)
+    count = max(1, int(num_conformers))
+
+    x, initial, energies, converged, iterations = _embed_minimized(terms, count, rng)
+    for _ in range(EMBED_ATTEMPTS - 1):
+        redo = np.flatnonzero(_strained(x, energies, terms))
+        if not len(redo):
+            break
+        retry = _embed_minimized(terms, len(redo), rng)
+        x[redo], initial[redo], energies[redo], converged[redo] = retry[:4]
+        iterations = max(iterations, retry[4])
+    keep = ~_strained(x, energies, terms)
+    keep[int(np.argmin(energies))] = True
+    if not keep.all():
+        x, initial, energies, converged = x[keep], initial[keep], energies[keep], converged[keep]
+    x -= x.mean(axis=1, keepdims=True)
+
+    conformers = ConformerSet(graph.smiles, name, topology, x, energies, converged)
+    conformers.initial_energies = initial
+    conformers.iterations = iterations
+    if prune_rmsd and len(conformers) > 1:
+        keep = _prune(conformers, prune_rmsd)
+        conformers.coordinates, conformers.energies = x[keep], energies[keep]
+        conformers.converged, conformers.initial_energies = converged[keep], initial[keep]
+    return conformers
+
+
+def smiles_seed(smiles: str) -> int:
+    """Stable embedding seed for a SMILES string, so repeated preparations give the same coordinates"""
+    return int.from_bytes(hashlib.blake2b(smiles.encode(), digest_size=4).digest(), 'little')
+
+
+def _prune(conformers: ConformerSet, threshold: float) -> np.ndarray:
+    """Greedy in energy order: keep conformers further than threshold from every kept one"""
+    rmsd = pairwise_rmsd_matrix(conformers.coordinates[:, :conformers.num_heavy], n_jobs=1)
+    kept: List[int] = []
+    for index in np.argsort(conformers.energies).tolist():
+        if all(rmsd[index, other] > threshold for other in kept):
+            kept.append(index)
+    return np.array(sorted(kept), dtype=np.int64)
+
+
+def _embed_task(task: Tuple[str, str, int, Optional[int], Optional[float]]) -> Tuple[Optional[ConformerSet], Optional[str]]:
+    smiles, name, count, seed, prune_rmsd = task
+    try:
+        return embed_molecule(smiles, count, seed=seed, name=name, prune_rmsd=prune_rmsd), None
+    except (SmilesError, np.linalg.LinAlgError) as e:
+        return None, str(e)
+
+
+def embed_batch(molecules: Iterable[Union[str, Dict[str, str]]], num_conformers: int = DEFAULT_CONFORMERS,
+                processes: int = 1, seed: Optional[int] = None,
+                prune_rmsd: Optional[float] = None) -> List[Tuple[Optional[ConformerSet], Optional[str]]]:
+    """
+    Embed many molecules, in parallel across a process pool
+
+    Args:
+        molecules: SMILES strings or {'name', 'smiles'} dictionaries
+        num_conformers, prune_rmsd: See embed_molecule
+        processes: Worker processes; 1 embeds in the calling process
+        seed: Base seed; molecule i uses seed + i
+
+    Returns:
+        (ConformerSet, None) or (None, error message) per molecule, in input order
+    """
+    tasks = []
+    for index, molecule in enumerate(molecules):
+        if isinstance(molecule, dict):
+            smiles, name = molecule.get('smiles', ''), molecule.get('name', f'ligand_{index + 1}')
+        else:
+            smiles, name = str(molecule), f'ligand_{index + 1}'
+        tasks.append((smiles, name, num_conformers, None if seed is None else seed + index, prune_rmsd))
+
+    if processes <= 1 or len(tasks) < 2:
+        return [_embed_task(task) for task in tasks]
+    with Pool(processes) as pool:
+        return pool.map(_embed_task, tasks, chunksize=max(1, len(tasks) // (4 * processes)))
+
+
+def kekulize(atomic_num: np.ndarray, aromatic: np.ndarray, charge: np.ndarray, bonds: np.ndarray,
+             order: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Single/double assignment of aromatic bonds (augmenting-path matching)
+
+    Returns:
+        Bond orders with every aromatic bond SINGLE or DOUBLE, or None when
+        no assignment exists
+    """
+    order = order.copy()
+    aromatic_bonds = np.flatnonzero(order == AROMATIC)
+    if not len(aromatic_bonds):
+        return order
+    n = len(atomic_num)
+    degree = np.bincount(bonds.ravel(), minlength=n)
+    has_double = np.zeros(n, dtype=bool)
+    has_double[bonds[order == DOUBLE].ravel()] = True
+
+    def needs_double(atom: int) -> bool:
+        if not aromatic[atom] or has_double[atom]:
+            return False
+        z, q = int(atomic_num[atom]), int(charge[atom])
+        if z == 6:
+            return q == 0
+        if z in (7, 15):
+            return (degree[atom] == 2 and q == 0) or (degree[atom] == 3 and q == 1)
+        return False
+
+    partners: Dict[int, List[Tuple[int, int]]] = {}
+    for bond in aromatic_bonds.tolist():
+        a, b = bonds[bond]
+        if needs_double(a) and needs_double(b):
+            partners.setdefault(a, []).append((b, bond))
+            partners.setdefault(b, []).append((a, bond))
+    match: Dict[int, Tuple[int, int]] = {}
+
+    def augment(atom: int, visited: set) -> bool:
+        for other, bond in partners.get(atom, []):
+            if other in visited:
+                continue
+            visited.add(other)
+            if other not in match or augment(match[other][0], visited):
+                match[atom] = (other, bond)
+                match[other] = (atom, bond)
+                return True
+        return False
+
+    for atom in [a for a in range(n) if needs_double(a)]:
+        if atom not in match and not augment(atom, {atom}):
+            return None
+    order[aromatic_bonds] = SINGLE
+    for other, bond in match.values():
+        order[bond] = DOUBLE
+    return order
+
+
+def _molblock(conformers: ConformerSet, index: int) -> str:
+    n, coords = conformers.num_atoms, conformers.coordinates[index]
+    orders = kekulize(conformers.atomic_num, conformers.aromatic, conformers.charge,
+                      conformers.bond_atoms, conformers.bond_order)
+    if orders is None:
+        orders = conformers.bond_order   # V2000 type 4 (aromatic)
+    lines = [conformers.name, '  GeneInsight 3D', '',
+             f"{n:3d}{len(orders):3d}  0  0  0  0  0  0  0  0999 V2000"]
+    for atom in range(n):
+        x, y, z = coords[atom]
+        lines.append(f"{x:10.4f}{y:10.4f}{z:10.4f} {SYMBOLS[int(conformers.atomic_num[atom])]:<3s} 0  0"
+                     "  0  0  0  0  0  0  0  0  0  0")
+    for (a, b), order in zip(conformers.bond_atoms.tolist(), orders.tolist()):
+        lines.append(f"{a + 1:3d}{b + 1:3d}{min(order, 4):3d}  0  0  0  0")
+    charged = np.flatnonzero(conformers.charge)
+    for start in range(0, len(charged), 8):
+        block = charged[start:start + 8]
+        lines.append(f"M  CHG{len(block):3d}" + ''.join(f" {a + 1:3d} {int(conformers.charge[a]):3d}" for a in block))
+    lines.append('M  END')
+    for key, value in (('SMILES', conformers.smiles), ('CONFORMER_ID', index + 1),
+                       ('ENERGY', f"{conformers.energies[index]:.4f}")):
+        lines += [f"> <{key}>", str(value), '']
+    lines.append('$$$$')
+    return '\n'.join(lines) + '\n'
+
+
+def gasteiger_charges(atomic_num: np.ndarray, hybridization: List[str], charge: np.ndarray,
+                      bonds: np.ndarray) -> np.ndarray:
+    """Gasteiger-Marsili partial charges (PEOE), all bonds updated per iteration"""
+    n = len(atomic_num)
+    params = np.array([GASTEIGER_PARAMETERS.get(
+        (int(z), 'sp3' if h == 'sp3d' else h),
+        GASTEIGER_PARAMETERS.get((int(z), 'sp3'), (7.98, 9.18, 1.88))) for z, h in zip(atomic_num, hybridization)])
+    a, b, c = params[:, 0], params[:, 1], params[:, 2]
+    cation = np.where(atomic_num == 1, HYDROGEN_CATION_ELECTRONEGATIVITY, a + b + c)
+    q = charge.astype(np.float64).copy()
+    first, second = bonds[:, 0], bonds[:, 1]
+    damping = 1.0
+    for _ in range(GASTEIGER_ITERATIONS):
+        damping *= 0.5
+        chi = a + b * q + c * q * q
+        # Electrons flow to the more electronegative atom, scaled by the donor's cation electronegativity
+        donor_is_first = chi[first] < chi[second]
+        denominator = np.where(donor_is_first, cation[first], cation[second])
+        transfer = damping * (chi[second] - chi[first]) / denominator
+        q += np.bincount(first, weights=transfer, minlength=n) - np.bincount(second, weights=transfer, minlength=n)
+    return q
+
+
+def _autodock_types(conformers: ConformerSet) -> List[str]:
+    n = conformers.num_atoms
+    z = conformers.atomic_num
+    neighbors: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+    for bond, (a, b) in enumerate(conformers.bond_atoms.tolist()):
+        neighbors[a].append((b, bond))
+        neighbors[b].append((a, bond))
+    types = []
+    for atom in range(n):
+        element = int(z[atom])
+        if element == 1:
+            polar = any(z[j] in (7, 8) for j, _ in neighbors[atom])
+            types.append('HD' if polar else 'H')
+        elif element == 6:
+            types.append('A' if conformers.aromatic[atom] else 'C')
+        elif element == 7:
+            has_h = any(z[j] == 1 for j, _ in neighbors[atom])
+            orders = [conformers.bond_order[b] for _, b in neighbors[atom]]
+            if conformers.charge[atom] > 0:
+                types.append('N')
+            elif conformers.aromatic[atom]:
+                types.append('NA' if len(orders) == 2 and not has_h else 'N')
+            elif DOUBLE in orders or TRIPLE in orders:
+                types.append('NA')
+            else:
+                # Amide and aniline nitrogens donate their lone pair to the pi system
+                types.append('N' if conformers.hybridization[atom] == 'sp2' else 'NA')
+        elif element == 8:
+            types.append('OA')
+        elif element == 16:
+            types.append('SA')
+        else:
+            types.append(AUTODOCK_TYPES.get(element, SYMBOLS[element]))
+    return types
+
+
+def _rotatable_bonds(conformers: ConformerSet, kept: np.ndarray) -> List[int]:
+    """Acyclic single bonds between atoms that both carry other written atoms (amides excluded)"""
+    z, orders = conformers.atomic_num, conformers.bond_order
+    degree = np.zeros(conformers.num_atoms, dtype=np.int64)
+    bonds = conformers.bond_atoms
+    both_kept = kept[bonds[:, 0]] & kept[bonds[:, 1]]
+    np.add.at(degree, bonds[both_kept].ravel(), 1)
+    carbonyl = np.zeros(conformers.num_atoms, dtype=bool)
+    linear = np.zeros(conformers.num_atoms, dtype=bool)
+    for (a, b), order in zip(bonds.tolist(), orders.tolist()):
+        if order == DOUBLE and {int(z[a]), int(z[b])} in ({6, 8}, {6, 16}):
+            carbonyl[a if z[a] == 6 else b] = True
+        if order == TRIPLE:
+            linear[a] = linear[b] = True
+
+    rotatable = []
+    for bond, ((a, b), order) in enumerate(zip(bonds.tolist(), orders.tolist())):
+        if order != SINGLE or conformers.ring_bond[bond] or not both_kept[bond]:
+            continue
+        if degree[a] < 2 or degree[b] < 2 or linear[a] or linear[b]:
+            continue
+        if (carbonyl[a] and z[b] == 7) or (carbonyl[b] and z[a] == 7):
+            continue
+        rotatable.append(bond)
+    return rotatable
+
+
+def _pdbqt(conformers: ConformerSet, index: int) -> str:
+    """PDBQT with nonpolar hydrogens merged into their carbons and a ROOT/BRANCH torsion tree"""
+    n, z = conformers.num_atoms, conformers.atomic_num
+    coords = conformers.coordinates[index]
+    charges = gasteiger_charges(z, conformers.hybridization, conformers.charge, conformers.bond_atoms)
+    types = _autodock_types(conformers)
+
+    kept = np.array([t != 'H' for t in types])
+    bonds = conformers.bond_atoms
+    for a, b in bonds.tolist():
+        for h, heavy in ((a, b), (b, a)):
+            if not kept[h]:
+                charges[heavy] += charges[h]
+
+    rotatable = set(_rotatable_bonds(conformers, kept))
+    # Rigid fragments: components joined by non-rotatable bonds
+    parent = list(range(n))
+
+    def find(atom: int) -> int:
+        while parent[atom] != atom:
+            parent[atom] = parent[parent[atom]]
+            atom = parent[atom]
+        return atom
+
+    links: Dict[int, List[Tuple[int, int]]] = {}
+    for bond, (a, b) in enumerate(bonds.tolist()):
+        if not (kept[a] and kept[b]):
+            continue
+        if bond in rotatable:
+            links.setdefault(a, []).append((b, bond))
+            links.setdefault(b, []).append((a, bond))
+        else:
+            parent[find(a)] = find(b)
+    fragments: Dict[int, List[int]] = {}
+    for atom in range(n):
+        if kept[atom]:
+            fragments.setdefault(find(atom), []).append(atom)
+    root = max(fragments, key=lambda key: (len(fragments[key]), -min(fragments[key])))
+
+    element_count: Dict[str, int] = {}
+    names: Dict[int, str] = {}
+    for atom in range(n):
+        if kept[atom]:
+            symbol = SYMBOLS[int(z[atom])]
+            element_count[symbol] = element_count.get(symbol, 0) + 1
+            names[atom] = f"{symbol}{element_count[symbol]}"[:4]
+
+    serial: Dict[int, int] = {}
+    body: List[str] = []
+
+    def write_atom(atom: int):
+        serial[atom] = len(serial) + 1
+        x, y, w = coords[atom]
+        body.append(f"ATOM  {serial[atom]:5d} {names[atom]:<4s} UNL     1    {x:8.3f}{y:8.3f}{w:8.3f}"
+                    f"  1.00  0.00    {charges[atom]:6.3f} {types[atom]:<2s}")
+
+    def write_fragment(key: int, first: Optional[int], came_from: Optional[int]):
+        atoms = fragments[key]
+        for atom in ([first] if first is not None else []) + [a for a in atoms if a != first]:
+            write_atom(atom)
+        if first is None:
+            body.append('ENDROOT')
+        for atom in atoms:
+            for other, bond in sorted(links.get(atom, [])):
+                if bond == came_from:
+                    continue
+                child = find(other)
+                # Each rotatable bond is crossed once, away from the root
+                if other in serial:
+                    continue
+                body.append(f"BRANCH {serial[atom]:3d} {len(serial) + 1:3d}")
+                write_fragment(child, other, bond)
+                body.append(f"ENDBRANCH {serial[atom]:3d} {serial[other]:3d}")
+
+    body.append('ROOT')
+    write_fragment(root, None, None)
+
+    header = [f"REMARK  Name = {conformers.name}", f"REMARK  SMILES {conformers.smiles}",
+              f"REMARK  {len(rotatable)} active torsions:"]
+    for number, bond in enumerate(sorted(rotatable, key=lambda b: sorted(serial[a] for a in bonds[b])), 1):
+        a, b = sorted(bonds[bond].tolist(), key=lambda atom: serial[atom])
+        header.append(f"REMARK  {number:3d}  A    between atoms: {names[a]}_{serial[a]}  and  {names[b]}_{serial[b]}")
+    return '\n'.join(header + body + [f"TORSDOF {len(rotatable)}"]) + '\n'
@@ -0,0 +1,256 @@
+"""
+Residue contact maps and distance matrices
+
+This module computes residue-level geometry without materialising dense
+N x N float64 matrices:
+- Sparse contact lists at a distance cutoff (via the spatial index)
+- Bit-packed contact maps for transport
+- Blockwise float32 distance tiles and downsampled matrices for visualization
+"""
+
+import base64
+import logging
+from typing import Dict, List, Any, Tuple, Iterator
+
+import numpy as np
+
+from .file_utils import parse_pdb
+from .spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTACT_CUTOFF = 8.0
+DEFAULT_BLOCK_SIZE = 1024
+MAX_MATRIX_SIZE = 1024
+
+
+def residue_coordinates(pdb_data: Any, atom: str = 'CA') -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    One representative coordinate per residue
+
+    Args:
+        pdb_data: PDB file content or the dictionary returned by parse_pdb
+        atom: 'CA' or 'CB' (glycine and residues without CB fall back to CA)
+
+    Returns:
+        Tuple of (N, 3) coordinates and per-residue labels
+    """
+    parsed = parse_pdb(pdb_data) if isinstance(pdb_data, str) else pdb_data
+    atom = atom.upper()
+    if atom not in ('CA', 'CB'):
+        raise ValueError(f"Unsupported representative atom: {atom}")
+
+    residues = {}
+    order = []
+    for record in parsed.get('atoms', []):
+        if record['record_type'] != 'ATOM' or record['atom_name'] not in ('CA', 'CB'):
+            continue
+        key = (record['chain_id'], record['residue_number'])
+        if key not in residues:
+            residues[key] = {'residue_name': record['residue_name']}
+            order.append(key)
+        residues[key][record['atom_name']] = (record['x'], record['y'], record['z'])
+
+    coords = []
+    labels = []
+    for key in order:
+        entry = residues[key]
+        point = entry.get(atom) or entry.get('CA')
+        if point is None:
+            continue
+        coords.append(point)
+        labels.append({'chain': key[0], 'residue_number': key[1], 'residue_name': entry['residue_name']})
+
+    return np.array(coords, dtype=np.float64).reshape(-1, 3), labels
+
+
+def distance_blocks(coords: Any, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Yield float32 distance tiles of the full matrix row block by row block
+
+    Yields:
+        (row_start, row_stop, tile) where tile has shape (row_stop - row_start, N)
+    """
+    points = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    sq_norms = np.einsum('ij,ij->i', points, points)
+
+    for start in range(0, len(points), block_size):
+        stop = min(start + block_size, len(points))
+        rows = points[start:stop]
+        tile = sq_norms[start:stop, None] + sq_norms[None, :] - 2.0 * (rows @ points.T)
+        np.maximum(tile, 0.0, out=tile)
+        np.sqrt(tile, out=tile)
+        yield start, stop, tile
+
+
+def contact_list(coords: Any, cutoff: float = DEFAULT_CONTACT_CUTOFF,
+                 min_separation: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Sparse list of residue pairs (i < j) closer than cutoff
+
+    Args:
+        coords: (N, 3) residue coordinates
+        cutoff: Contact distance in Å
+        min_separation: Minimum |i - j| in sequence index to report
+
+    Returns:
+        Dictionary with 'i', 'j' and 'distance' arrays
+    """
+    index = SpatialIndex(coords, cell_size=max(cutoff, 1.0))
+    i, j, distance = index.pairs_within(cutoff, return_distances=True)
+    if min_separation > 0:
+        keep = (j - i) >= min_separation
+        i, j, distance = i[keep], j[keep], distance[keep]
+    return {'i': i, 'j': j, 'distance': distance}
+
+
+def pack_contact_map(i: np.ndarray, j: np.ndarray, size: int,
+                     block_size: int = DEFAULT_BLOCK_SIZE) -> bytes:
+    """
+    Bit-pack a symmetric contact map built from a pair list
+
+    Rows are materialised and packed block_size at a time, so the dense
+    working set stays at block_size x N bytes regardless of N; only the
+    packed output (N^2 / 8 bytes) is held in full.
+
+    Returns:
+        Row-major packed bits (np.packbits, big-endian bit order) of the N x N map
+    """
+    # Whole rows per block must fill whole bytes so blocks pack independently
+    block_size = -(-max(1, block_size) // 8) * 8
+    rows = np.concatenate([i, j])
+    cols = np.concatenate([j, i])
+    order = np.argsort(rows, kind='stable')
+    rows, cols = rows[order], cols[order]
+    bounds = np.searchsorted(rows, np.arange(0, size + block_size, block_size))
+
+    packed = []
+    for block, start in enumerate(range(0, size, block_size)):
+        stop = min(start + block_size, size)
+        dense = np.zeros((stop - start, size), dtype=bool)
+        lo, hi = bounds[block], bounds[block + 1]
+        dense[rows[lo:hi] - start, cols[lo:hi]] = True
+        packed.append(np.packbits(dense.reshape(-1)).tobytes())
+
+    return b''.join(packed)
+
+
+def unpack_contact_map(packed: bytes, size: int) -> np.ndarray:
+    """Inverse of pack_contact_map"""
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=size * size)
+    return bits.reshape(size, size).astype(bool)
+
+
+def downsampled_distance_matrix(coords: Any, max_size: int = 256, reduce: str = 'mean',
+                                block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    """
+    Distance matrix reduced to at most max_size x max_size bins
+
+    Each bin aggregates a contiguous range of residues. Distances are
+    computed tile by tile so memory is bounded by block_size x N.
+
+    Args:
+        coords: (N, 3) residue coordinates
+        max_size: Maximum output dimension
+        reduce: 'mean' or 'min' over the residues in each bin
+
+    Returns:
+        float32 matrix of shape (B, B) with B = min(N, max_size)
+    """
+    points = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    n = len(points)
+    if n == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    if reduce not in ('mean', 'min'):
+        raise ValueError(f"Unsupported reduction: {reduce}")
+
+    bins = min(n, max_size)
+    edges = np.linspace(0, n, bins + 1).astype(np.int64)
+    bin_of = np.repeat(np.arange(bins), np.diff(edges))
+    counts = np.diff(edges).astype(np.float32)
+
+    if reduce == 'mean':
+        out = np.zeros((bins, bins), dtype=np.float64)
+    else:
+        out = np.full((bins, bins), np.inf, dtype=np.float32)
+
+    for start, stop, tile in distance_blocks(points, max(1, block_size)):
+        col_reduced = (np.add.reduceat(tile, edges[:-1], axis=1) if reduce == 'mean'
+                       else np.minimum.reduceat(tile, edges[:-1], axis=1))
+        row_bins = bin_of[start:stop]
+        if reduce == 'mean':
+            np.add.at(out, row_bins, col_reduced)
+        else:
+            np.minimum.at(out, row_bins, col_reduced)
+
+    if reduce == 'mean':
+        out /= counts[:, None] * counts[None, :]
+    return out.astype(np.float32)
+
+
+def compute_contact_map(pdb_data: Any, cutoff: float = DEFAULT_CONTACT_CUTOFF, atom: str = 'CA',
+                        min_separation: int = 0, output_format: str = 'list',
+                        include_matrix: bool = False, matrix_size: int = 256,
+                        matrix_reduce: str = 'mean') -> Dict[str, Any]:
+    """
+    Residue contact map for a structure in a JSON-friendly form
+
+    Args:
+        pdb_data: PDB content or parse_pdb result
+        cutoff: Contact distance in Å
+        atom: Representative atom ('CA' or 'CB')
+        min_separation: Minimum sequence separation for reported contacts
+        output_format: 'list' for sparse [i, j, distance] triples, 'bitmap'
+            for a base64 bit-packed N x N map
+        include_matrix: Also return a downsampled distance matrix
+        matrix_size: Maximum dimension of the downsampled matrix
+        matrix_reduce: 'mean' or 'min' aggregation for the downsampled matrix
+
+    Returns:
+        Dictionary with residues, contacts and optional matrix
+    """
+    if output_format not in ('list', 'bitmap'):
+        raise ValueError(f"Unsupported contact map format: {output_format}")
+
+    coords, labels = residue_coordinates(pdb_data, atom)
+    n = len(coords)
+    if n == 0:
+        raise ValueError("No CA atoms found in structure")
+
+    contacts = contact_list(coords, cutoff, min_separation)
+    result = {
+        'num_residues': n,
+        'cutoff': cutoff,
+        'atom': atom.upper(),
+        'min_separation': min_separation,
+        'num_contacts': int(len(contacts['i'])),
+        'residues': labels,
+        'format': output_format
+    }
+
+    if output_format == 'list':
+        result['contacts'] = np.column_stack([
+            contacts['i'], contacts['j'], np.round(contacts['distance'], 2)
+        ]).tolist()
+        for contact in result['contacts']:
+            contact[0], contact[1] = int(contact[0]), int(contact[1])
+    else:
+        packed = pack_contact_map(contacts['i'], contacts['j'], n)
+        result['bitmap'] = {
+            'encoding': 'base64',
+            'bit_order': 'big',
+            'shape': [n, n],
+            'data': base64.b64encode(packed).decode('ascii')
+        }
+
+    if include_matrix:
+        size = max(1, min(int(matrix_size), MAX_MATRIX_SIZE))
+        matrix = downsampled_distance_matrix(coords, size, matrix_reduce)
+        result['distance_matrix'] = {
+            'shape': list(matrix.shape),
+            'residues_per_bin': round(n / matrix.shape[0], 3),
+            'reduce': matrix_reduce,
+            'values': np.round(matrix, 2).tolist()
+        }
+
+    return result
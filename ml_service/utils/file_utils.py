@@ -3,7 +3,7 @@ File utility functions for parsing biological file formats
 """
 
 import re
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator
 
 def parse_fasta(file_content: str) -> List[Dict[str, str]]:
     """
@@ -15,13 +15,21 @@ def parse_fasta(file_content: str) -> List[Dict[str, str]]:
     Returns:
         List of dictionaries with 'id', 'description', and 'sequence' keys
     """
-    sequences = []
-    
     if not file_content:
-        return sequences
+        return []
+    return list(iter_fasta(file_content.strip().split('\n')))
+
+def iter_fasta(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    Stream FASTA records from lines (e.g. an open text file), holding only
+    the record being read
     
-    # Split by lines and process
-    lines = file_content.strip().split('\n')
+    Args:
+        lines: FASTA lines
+        
+    Yields:
+        Dictionaries with 'id', 'description', and 'sequence' keys
+    """
     current_sequence = None
     current_seq_lines = []
     
@@ -29,10 +37,10 @@ def parse_fasta(file_content: str) -> List[Dict[str, str]]:
         line = line.strip()
         
         if line.startswith('>'):
-            # Save previous sequence if exists
+            # Emit previous sequence if exists
             if current_sequence is not None:
                 current_sequence['sequence'] = ''.join(current_seq_lines)
-                sequences.append(current_sequence)
+                yield current_sequence
             
             # Start new sequence
             header = line[1:]  # Remove '>'
@@ -54,9 +62,7 @@ def parse_fasta(file_content: str) -> List[Dict[str, str]]:
     # Don't forget the last sequence
     if current_sequence is not None:
         current_sequence['sequence'] = ''.join(current_seq_lines)
-        sequences.append(current_sequence)
-    
-    return sequences
+        yield current_sequence
 
 def parse_pdb(file_content: str) -> Dict[str, Any]:
     """
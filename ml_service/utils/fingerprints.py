@@ -0,0 +1,212 @@
+"""
+Hashed molecular fingerprints packed into uint64 words
+
+This module generates bit fingerprints from SMILES graphs:
+- Circular (Morgan/ECFP-like) fingerprints, computed with NumPy over
+  concatenated graphs so whole chunks hash in a few array operations
+- Linear path fingerprints (Daylight-like) from a bounded depth-first walk
+- Packing of set bits into (N, n_bits / 64) uint64 rows
+- Row popcounts and Tanimoto similarity on packed rows
+"""
+
+import zlib
+from typing import Dict, List, Any, Sequence
+
+import numpy as np
+
+from .smiles import MolGraph
+from .mol_properties import concatenate_graphs
+
+DEFAULT_BITS = 2048
+DEFAULT_RADIUS = 2
+DEFAULT_PATH_LENGTH = 5
+FINGERPRINT_KINDS = ('circular', 'path')
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+# numpy >= 2.0 has a native popcount ufunc; older releases look up 16-bit
+# lanes in a 64 KiB table (cache resident, half the lookups of a byte table)
+_BITWISE_COUNT = getattr(np, 'bitwise_count', None)
+_WORD16_POPCOUNT = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+
+def mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)"""
+    x = np.asarray(values, dtype=np.uint64) + _GOLDEN
+    x = (x ^ (x >> np.uint64(30))) * _M1
+    x = (x ^ (x >> np.uint64(27))) * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Number of set bits in each row of a (N, W) uint64 array"""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    if _BITWISE_COUNT is not None:
+        return _BITWISE_COUNT(words).sum(axis=-1, dtype=np.int32)
+    counts = _WORD16_POPCOUNT[words.view(np.uint16)]
+    return counts.reshape(words.shape[:-1] + (-1,)).sum(axis=-1, dtype=np.int32)
+
+
+def tanimoto(query: np.ndarray, fingerprints: np.ndarray, query_count: int = None,
+             counts: np.ndarray = None) -> np.ndarray:
+    """
+    Tanimoto similarity between one packed fingerprint and (N, W) packed rows
+
+    Args:
+        query: (W,) uint64 packed fingerprint
+        fingerprints: (N, W) uint64 packed fingerprints
+        query_count, counts: Precomputed popcounts, computed if omitted
+
+    Returns:
+        (N,) float32 similarities; two empty fingerprints score 0
+    """
+    if query_count is None:
+        query_count = int(popcount_rows(query[None, :])[0])
+    if counts is None:
+        counts = popcount_rows(fingerprints)
+    common = popcount_rows(fingerprints & query)
+    union = query_count + counts.astype(np.int32) - common
+    return np.where(union > 0, common / np.maximum(union, 1), 0.0).astype(np.float32)
+
+
+def _pack(bits: np.ndarray, rows: np.ndarray, num_rows: int, n_bits: int) -> np.ndarray:
+    """OR bit positions into (num_rows, n_bits / 64) uint64 words"""
+    words = n_bits // 64
+    packed = np.zeros(num_rows * words, dtype=np.uint64)
+    bits = bits.astype(np.uint64) % np.uint64(n_bits)
+    np.bitwise_or.at(packed, rows.astype(np.int64) * words + (bits >> np.uint64(6)).astype(np.int64),
+                     np.uint64(1) << (bits & np.uint64(63)))
+    return packed.reshape(num_rows, words)
+
+
+def _check_bits(n_bits: int):
+    if n_bits <= 0 or n_bits % 64:
+        raise ValueError(f"n_bits must be a positive multiple of 64, got {n_bits}")
+
+
+def circular_fingerprints(graphs: Sequence[MolGraph], radius: int = DEFAULT_RADIUS,
+                          n_bits: int = DEFAULT_BITS) -> np.ndarray:
+    """
+    Morgan-style circular fingerprints for many graphs at once
+
+    Atom identifiers start from (element, charge, hydrogens, heavy degree,
+    aromaticity, ring membership) and are updated radius times from the
+    neighbor identifiers and bond orders; every identifier sets one bit.
+
+    Returns:
+        (len(graphs), n_bits / 64) uint64 packed fingerprints
+    """
+    _check_bits(n_bits)
+    arrays = concatenate_graphs(graphs)
+    z = arrays['atomic_num'].astype(np.uint64)
+    n = len(z)
+    a = arrays['bond_atoms'][:, 0]
+    b = arrays['bond_atoms'][:, 1]
+    order = arrays['bond_order'].astype(np.uint64)
+
+    heavy = arrays['atomic_num'] > 1
+    degree = np.bincount(a[heavy[b]], minlength=n) + np.bincount(b[heavy[a]], minlength=n)
+    in_ring = np.zeros(n, dtype=bool)
+    in_ring[a[arrays['ring_bond']]] = True
+    in_ring[b[arrays['ring_bond']]] = True
+
+    invariant = (z | ((arrays['charge'].astype(np.int64) + 8).astype(np.uint64) << np.uint64(8))
+                 | (arrays['hydrogens'].astype(np.uint64) << np.uint64(16))
+                 | (degree.astype(np.uint64) << np.uint64(24))
+                 | (arrays['aromatic'].astype(np.uint64) << np.uint64(32))
+                 | (in_ring.astype(np.uint64) << np.uint64(33)))
+    identifiers = [mix64(invariant)]
+
+    # Directed edges (both directions of every bond)
+    source = np.concatenate([a, b])
+    target = np.concatenate([b, a])
+    edge_order = np.concatenate([order, order]) * _M2
+    for iteration in range(1, radius + 1):
+        previous = identifiers[-1]
+        # Sum over neighbors is order-independent, so no per-atom sorting is needed
+        neighborhood = np.zeros(n, dtype=np.uint64)
+        np.add.at(neighborhood, source, mix64(previous[target] ^ edge_order))
+        identifiers.append(mix64(previous * _M1 ^ neighborhood ^ np.uint64(iteration)))
+
+    bits = np.concatenate(identifiers)
+    rows = np.tile(arrays['atom_mol'], radius + 1)
+    return _pack(bits, rows, len(graphs), n_bits)
+
+
+def _path_hashes(graph: MolGraph, max_length: int) -> List[int]:
+    """
+    Hashes of all simple paths with up to max_length bonds, direction-independent
+
+    Labels (2 * atomic number + aromatic, and bond order codes) all fit in a
+    byte, so paths hash as CRC-32 of their bytes, stable across processes
+    and Python versions.
+    """
+    offsets, neighbors, bond_index = graph.adjacency()
+    atom_label = (graph.atomic_num.astype(np.int64) * 2 + graph.aromatic).tolist()
+    bond_order = graph.bond_order.tolist()
+    offsets = offsets.tolist()
+    neighbors = neighbors.tolist()
+    bond_index = bond_index.tolist()
+
+    hashes = []
+    for start in range(graph.num_atoms):
+        hashes.append(zlib.crc32(bytes((atom_label[start],))))
+        stack = [(start, (atom_label[start],), (start,))]
+        while stack:
+            atom, labels, visited = stack.pop()
+            if len(visited) > max_length:
+                continue
+            for k in range(offsets[atom], offsets[atom + 1]):
+                neighbor = neighbors[k]
+                if neighbor in visited:
+                    continue
+                path = labels + (bond_order[bond_index[k]], atom_label[neighbor])
+                # Each path is found from both ends; keep it once
+                if start < neighbor:
+                    hashes.append(zlib.crc32(bytes(min(path, path[::-1]))))
+                stack.append((neighbor, path, visited + (neighbor,)))
+    return hashes
+
+
+def path_fingerprints(graphs: Sequence[MolGraph], max_length: int = DEFAULT_PATH_LENGTH,
+                      n_bits: int = DEFAULT_BITS) -> np.ndarray:
+    """
+    Linear path fingerprints: every atom and every simple path of up to
+    max_length bonds (atom labels plus bond orders) sets one bit
+
+    Returns:
+        (len(graphs), n_bits / 64) uint64 packed fingerprints
+    """
+    _check_bits(n_bits)
+    bits: List[int] = []
+    rows: List[int] = []
+    for row, graph in enumerate(graphs):
+        hashes = _path_hashes(graph, max_length)
+        bits.extend(hashes)
+        rows.extend([row] * len(hashes))
+    hashed = mix64(np.array(bits, dtype=np.uint64))
+    return _pack(hashed, np.array(rows, dtype=np.int64), len(graphs), n_bits)
+
+
+def fingerprints(graphs: Sequence[MolGraph], kind: str = 'circular', n_bits: int = DEFAULT_BITS,
+                 radius: int = DEFAULT_RADIUS, max_length: int = DEFAULT_PATH_LENGTH) -> np.ndarray:
+    """Packed fingerprints of the requested kind ('circular' or 'path')"""
+    if kind == 'circular':
+        return circular_fingerprints(graphs, radius=radius, n_bits=n_bits)
+    if kind == 'path':
+        return path_fingerprints(graphs, max_length=max_length, n_bits=n_bits)
+    raise ValueError(f"Unknown fingerprint kind: {kind}")
+
+
+def fingerprint_bits(packed: np.ndarray) -> List[int]:
+    """Indices of the set bits of one packed fingerprint"""
+    bits = np.unpackbits(np.ascontiguousarray(packed, dtype=np.uint64).view(np.uint8), bitorder='little')
+    return np.flatnonzero(bits).tolist()
+
+
+def fingerprint_info(packed: np.ndarray, kind: str, n_bits: int) -> Dict[str, Any]:
+    """JSON-friendly summary of one packed fingerprint"""
+    bits = fingerprint_bits(packed)
+    return {'kind': kind, 'n_bits': n_bits, 'num_on_bits': len(bits), 'on_bits': bits}
@@ -0,0 +1,659 @@
+"""
+Asynchronous job queue
+
+This module runs long operations off the request thread:
+- SQLite-backed job records that survive service restarts and can be
+  shared by several worker processes: each job records its owning
+  process and a heartbeat, and cancellation is requested through the
+  database so it reaches the process running the job
+- Bounded worker pool with a cap on queued jobs
+- Cooperative cancellation and deadlines, with subprocesses killed on
+  cancel or timeout
+- Per-job result TTL and timing breakdowns (queue wait, run time and
+  named phases recorded by the job)
+- Bounded, TTL-evicted in-memory registry for recent results
+"""
+
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DB = os.path.join(os.path.expanduser('~'), '.cache', 'geneinsight', 'jobs.sqlite3')
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_PENDING = 100
+DEFAULT_JOB_TIMEOUT = 600
+DEFAULT_RETENTION = 7 * 24 * 3600
+
+# How often a waiting subprocess checks for cancellation (seconds)
+POLL_INTERVAL = 0.1
+
+# Minimum seconds between sweeps for expired jobs
+PURGE_INTERVAL = 30
+
+# How often a queue picks up cancel requests for its running jobs (seconds)
+CANCEL_POLL_INTERVAL = 0.5
+
+# How often a queue refreshes the heartbeat of the jobs it owns, and how
+# old a heartbeat may get before the owning process is presumed gone
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 30
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timed_out'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+
+class JobTimeout(Exception):
+    """Raised inside a job when its deadline has passed"""
+
+
+class QueueFull(Exception):
+    """Raised by submit when the pending-job limit is reached"""
+
+
+def _kill_process_group(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+
+
+def run_cancellable(cmd: List[str], timeout: Optional[float] = None,
+                    cancel_event: Optional[threading.Event] = None,
+                    poll_interval: float = POLL_INTERVAL) -> subprocess.CompletedProcess:
+    """
+    subprocess.run replacement that kills the whole process group on
+    timeout or when cancel_event is set
+
+    Raises:
+        subprocess.TimeoutExpired: The command ran past timeout
+        JobCancelled: cancel_event was set while the command ran
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, start_new_session=True)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    while True:
+        wait = poll_interval
+        if deadline is not None:
+            wait = max(0.0, min(wait, deadline - time.monotonic()))
+        try:
+            stdout, stderr = process.communicate(timeout=wait)
+            return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            pass
+
+        if cancel_event is not None and cancel_event.is_set():
+            _kill_process_group(process)
+            process.communicate()
+            raise JobCancelled(f"Command cancelled: {cmd[0]}")
+        if deadline is not None and time.monotonic() >= deadline:
+            _kill_process_group(process)
+            process.communicate()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+class TTLRegistry:
+    """Thread-safe mapping bounded by size, with entries expiring after ttl seconds"""
+
+    def __init__(self, max_items: int = 256, ttl: float = 3600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            self._evict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            self._evict()
+            entry = self._items.get(key)
+            return default if entry is None else entry[1]
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._evict()
+            return list(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict()
+            return len(self._items)
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._items:
+            key, (stored_at, _) = next(iter(self._items.items()))
+            if stored_at >= cutoff and len(self._items) <= self.max_items:
+                break
+            del self._items[key]
+
+
+class JobContext:
+    """Handle passed to a running job for cancellation, deadlines and progress"""
+
+    def __init__(self, queue: 'JobQueue', job_id: str, timeout: Optional[float]):
+        self.queue = queue
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None when unbounded)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise if the job has been cancelled or has run out of time"""
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise JobTimeout(f"Job {self.job_id} exceeded its time limit")
+
+    def run(self, cmd: List[str], timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+        """Run a subprocess bounded by both timeout and the job deadline"""
+        self.check()
+        remaining = self.remaining()
+        limits = [t for t in (timeout, remaining) if t is not None]
+        limit = min(limits) if limits else None
+        try:
+            return run_cancellable(cmd, limit, self.cancel_event)
+        except subprocess.TimeoutExpired:
+            if remaining is not None and limit == remaining:
+                raise JobTimeout(f"Job {self.job_id} exceeded its time limit")
+            raise
+
+    def set_progress(self, progress: float, message: Optional[str] = None):
+        """Record progress as a fraction in [0, 1]"""
+        self.queue.store.update(self.job_id, progress=max(0.0, min(1.0, float(progress))),
+                                message=message)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a named step of the job; seconds accumulate per name and are
+        reported in the job's timing breakdown
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - start, 4)
+            self.queue.store.update(self.job_id, timings=self.timings)
+
+
+class JobStore:
+    """SQLite persistence for job records"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get('GENEINSIGHT_JOB_DB', DEFAULT_JOB_DB)
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    timeout REAL,
+                    ttl REAL,
+                    timings TEXT,
+                    owner TEXT,
+                    heartbeat REAL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+            # Databases created before these columns existed
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            for column, definition in (('ttl', 'REAL'), ('timings', 'TEXT'), ('owner', 'TEXT'),
+                                       ('heartbeat', 'REAL'),
+                                       ('cancel_requested', 'INTEGER NOT NULL DEFAULT 0')):
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+
+    def insert(self, job_id: str, kind: str, params: Dict[str, Any], timeout: Optional[float],
+               ttl: Optional[float] = None, owner: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (job_id, kind, status, params, timeout, ttl, owner, heartbeat, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, QUEUED, json.dumps(params), timeout, ttl, owner, now, now)
+            )
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]):
+        for key in ('result', 'timings'):
+            if fields.get(key) is not None:
+                fields[key] = json.dumps(fields[key])
+
+    def update(self, job_id: str, **fields):
+        self._encode(fields)
+        fields = {key: value for key, value in fields.items() if value is not None or key == 'message'}
+        if not fields:
+            return
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?',
+                               (*fields.values(), job_id))
+
+    def transition(self, job_id: str, from_states: tuple, to_state: str,
+                   expected_owner: Optional[str] = None, **fields) -> bool:
+        """
+        Atomically move a job between states; False if it was not in
+        from_states (or, when expected_owner is given, no longer had that owner)
+        """
+        self._encode(fields)
+        fields['status'] = to_state
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        placeholders = ', '.join('?' for _ in from_states)
+        condition = f'job_id = ? AND status IN ({placeholders})'
+        values = [*fields.values(), job_id, *from_states]
+        if expected_owner is not None:
+            condition += ' AND owner IS ?'
+            values.append(expected_owner)
+        with self._lock:
+            cursor = self._conn.execute(f'UPDATE jobs SET {assignments} WHERE {condition}', values)
+            return cursor.rowcount > 0
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Flag a running job for cancellation; False if it is not running"""
+        with self._lock:
+            cursor = self._conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?',
+                                        (job_id, RUNNING))
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        """Those of job_ids whose cancellation has been requested"""
+        if not job_ids:
+            return []
+        placeholders = ', '.join('?' for _ in job_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({placeholders})', job_ids
+            ).fetchall()
+        return [row['job_id'] for row in rows]
+
+    def heartbeat(self, owner: str, now: Optional[float] = None) -> int:
+        """Refresh the heartbeat of an owner's queued and running jobs"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)',
+                (time.time() if now is None else now, owner, QUEUED, RUNNING)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['timings'] = json.loads(job['timings']) if job['timings'] else {}
+        return job
+
+    def with_status(self, *states: str) -> List[Dict[str, Any]]:
+        placeholders = ', '.join('?' for _ in states)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT job_id, kind, params, timeout, owner, heartbeat FROM jobs '
+                f'WHERE status IN ({placeholders}) ORDER BY created_at',
+                states
+            ).fetchall()
+        return [{'job_id': r['job_id'], 'kind': r['kind'], 'params': json.loads(r['params']),
+                 'timeout': r['timeout'], 'owner': r['owner'], 'heartbeat': r['heartbeat']} for r in rows]
+
+    def count(self, *states: str) -> int:
+        placeholders = ', '.join('?' for _ in states)
+        with self._lock:
+            return self._conn.execute(
+                f'SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})', states
+            ).fetchone()[0]
+
+    def purge(self, older_than: float, now: Optional[float] = None) -> int:
+        """
+        Delete finished jobs that completed before older_than, or whose own
+        result TTL had run out by now
+        """
+        now = time.time() if now is None else now
+        placeholders = ', '.join('?' for _ in FINISHED_STATES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f'DELETE FROM jobs WHERE status IN ({placeholders}) '
+                f'AND (finished_at < ? OR (ttl IS NOT NULL AND finished_at + ttl < ?))',
+                (*FINISHED_STATES, older_than, now)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _owner_id() -> str:
+    """Identity of this queue: host, process and a per-instance suffix"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Bounded worker pool running registered job kinds
+
+    Several queues (worker processes or replicas) may share one database.
+    Each claims the jobs it runs, keeps their heartbeat fresh and fails or
+    adopts the jobs of queues whose process has gone away.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING, default_timeout: float = DEFAULT_JOB_TIMEOUT,
+                 retention: float = DEFAULT_RETENTION, result_ttl: Optional[float] = None):
+        """
+        Args:
+            db_path: SQLite file (default: $GENEINSIGHT_JOB_DB or ~/.cache/geneinsight/jobs.sqlite3)
+            max_workers: Jobs executed concurrently
+            max_pending: Queued plus running jobs accepted before submit refuses
+            default_timeout: Per-job time limit in seconds when none is given
+            retention: Seconds finished jobs are kept in the database
+            result_ttl: Default seconds a finished job's result stays available
+                when submit gives none (None keeps it for the full retention)
+        """
+        self.store = JobStore(db_path)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.retention = retention
+        self.result_ttl = result_ttl
+        self._last_purge = 0.0
+        self._handlers: Dict[str, Callable[[Dict[str, Any], JobContext], Dict[str, Any]]] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.owner = _owner_id()
+        self._stop = threading.Event()
+        self._monitor_thread = threading.Thread(target=self._monitor, name='job-monitor', daemon=True)
+        self._monitor_thread.start()
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any], JobContext], Dict[str, Any]]):
+        """Register the function executing jobs of a kind: handler(params, context) -> result"""
+        self._handlers[kind] = handler
+
+    def recover(self) -> Dict[str, int]:
+        """
+        Resume after a restart: jobs left by processes that are gone are
+        taken over, queued ones scheduled here and running ones marked
+        failed. Jobs of live sibling processes sharing the database are
+        left alone. The same sweep then repeats every heartbeat.
+        """
+        return self._reap_orphans()
+
+    def submit(self, kind: str, params: Dict[str, Any], timeout: Optional[float] = None,
+               ttl: Optional[float] = None) -> str:
+        """
+        Queue a job and return its ID
+
+        Args:
+            kind: Registered job kind
+            params: JSON-serializable handler parameters
+            timeout: Time limit in seconds (default: default_timeout)
+            ttl: Seconds the job and its result are kept once finished
+                (default: result_ttl, capped by retention)
+
+        Raises:
+            ValueError: Unknown job kind
+            QueueFull: Too many jobs are already queued or running
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.store.count(QUEUED, RUNNING) >= self.max_pending:
+            raise QueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+
+        self._purge(force=True)
+        job_id = f"{kind}-{uuid.uuid4().hex}"
+        timeout = float(timeout or self.default_timeout)
+        ttl = ttl if ttl is not None else self.result_ttl
+        self.store.insert(job_id, kind, params, timeout, float(ttl) if ttl is not None else None, self.owner)
+        self._schedule(job_id, kind, params, timeout)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record without params or result payload"""
+        self._purge()
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return self._summary(job)
+
+    def _summary(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        queue_wait = (job['started_at'] - job['created_at']) if job['started_at'] else None
+        expires_at = job['finished_at'] + job['ttl'] if job['finished_at'] and job['ttl'] is not None else None
+        return {
+            'job_id': job['job_id'],
+            'kind': job['kind'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'message': job['message'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'elapsed': self._elapsed(job),
+            'queue_wait': queue_wait,
+            'expires_at': expires_at,
+            'cancel_requested': bool(job['cancel_requested']),
+            'timings': dict(job['timings'],
+                            queue_wait=round(queue_wait, 4) if queue_wait is not None else None,
+                            run=self._elapsed(job))
+        }
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Full job record including the result, with its status summary under 'job'"""
+        self._purge()
+        job = self.store.get(job_id)
+        if job is not None:
+            job['job'] = self._summary(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a queued or running job
+
+        A running job is flagged in the database, so the request reaches
+        it whichever process runs it; it records its cancellation once its
+        owner has noticed the flag and killed its subprocess.
+
+        Returns:
+            Resulting status, or None for an unknown job
+        """
+        if self.store.transition(job_id, (QUEUED,), CANCELLED, finished_at=time.time()):
+            return CANCELLED
+
+        requested = self.store.request_cancel(job_id)
+        with self._lock:
+            context = self._contexts.get(job_id)
+        if requested and context is not None:
+            context.cancel_event.set()
+
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return CANCELLED if requested else job['status']
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'queued': self.store.count(QUEUED),
+            'running': self.store.count(RUNNING)
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Cancel running jobs and stop the worker pool"""
+        self._stop.set()
+        with self._lock:
+            contexts = list(self._contexts.values())
+        for context in contexts:
+            context.cancel_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _schedule(self, job_id: str, kind: str, params: Dict[str, Any], timeout: Optional[float]):
+        self._executor.submit(self._execute, job_id, kind, params, timeout)
+
+    def _execute(self, job_id: str, kind: str, params: Dict[str, Any], timeout: Optional[float]):
+        # Cancelled while still queued, or claimed by another process
+        now = time.time()
+        if not self.store.transition(job_id, (QUEUED,), RUNNING, started_at=now,
+                                     owner=self.owner, heartbeat=now):
+            return
+
+        context = JobContext(self, job_id, timeout)
+        with self._lock:
+            self._contexts[job_id] = context
+
+        try:
+            result = self._handlers[kind](params, context)
+            if self.store.cancel_requested([job_id]):
+                context.cancel_event.set()
+            context.check()
+            self.store.transition(job_id, (RUNNING,), SUCCEEDED, result=result, progress=1.0,
+                                  timings=context.timings, finished_at=time.time())
+        except JobCancelled:
+            self.store.transition(job_id, (RUNNING,), CANCELLED, timings=context.timings,
+                                  finished_at=time.time())
+        except JobTimeout as e:
+            self.store.transition(job_id, (RUNNING,), TIMED_OUT, error=str(e), timings=context.timings,
+                                  finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.transition(job_id, (RUNNING,), FAILED, error=str(e), timings=context.timings,
+                                  finished_at=time.time())
+        finally:
+            with self._lock:
+                self._contexts.pop(job_id, None)
+
+    def _monitor(self):
+        """Deliver cancel requests to local jobs, refresh heartbeats and reap orphaned jobs"""
+        last_beat = 0.0
+        while not self._stop.wait(CANCEL_POLL_INTERVAL):
+            try:
+                with self._lock:
+                    contexts = dict(self._contexts)
+                for job_id in self.store.cancel_requested(list(contexts)):
+                    contexts[job_id].cancel_event.set()
+
+                now = time.time()
+                if now - last_beat >= HEARTBEAT_INTERVAL:
+                    last_beat = now
+                    self.store.heartbeat(self.owner, now)
+                    self._reap_orphans(now)
+            except Exception as e:
+                logger.warning(f"Job monitor error: {e}")
+
+    def _owner_alive(self, owner: Optional[str], heartbeat: Optional[float], now: float) -> bool:
+        if owner == self.owner:
+            return True
+        if not owner or heartbeat is None or now - heartbeat > HEARTBEAT_TIMEOUT:
+            return False
+        host, pid = (owner.rsplit(':', 2) + ['', ''])[:2]
+        # A recent heartbeat from a process that no longer exists on this host
+        if host == socket.gethostname() and pid.isdigit():
+            return _process_alive(int(pid))
+        return True
+
+    def _reap_orphans(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Fail running jobs and adopt queued jobs whose owning process is gone"""
+        now = time.time() if now is None else now
+        interrupted = 0
+        for job in self.store.with_status(RUNNING):
+            if not self._owner_alive(job['owner'], job['heartbeat'], now):
+                if self.store.transition(job['job_id'], (RUNNING,), FAILED, expected_owner=job['owner'],
+                                         error='Interrupted: the worker process running the job stopped',
+                                         finished_at=now):
+                    interrupted += 1
+
+        requeued = 0
+        for job in self.store.with_status(QUEUED):
+            if job['kind'] in self._handlers and not self._owner_alive(job['owner'], job['heartbeat'], now):
+                # Take ownership first so only one surviving process schedules it
+                if self.store.transition(job['job_id'], (QUEUED,), QUEUED, expected_owner=job['owner'],
+                                         owner=self.owner, heartbeat=now):
+                    self._schedule(job['job_id'], job['kind'], job['params'], job['timeout'])
+                    requeued += 1
+        return {'requeued': requeued, 'interrupted': interrupted}
+
+    def _purge(self, force: bool = False):
+        """Drop jobs past retention or their result TTL, at most every PURGE_INTERVAL seconds"""
+        now = time.time()
+        if not force and now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self.store.purge(now - self.retention, now)
+
+    @staticmethod
+    def _elapsed(job: Dict[str, Any]) -> Optional[float]:
+        if not job['started_at']:
+            return None
+        end = job['finished_at'] or time.time()
+        return round(end - job['started_at'], 3)
@@ -0,0 +1,254 @@
+"""
+Molecular descriptors from SMILES graphs
+
+Descriptors are computed with NumPy over atom and bond arrays, either for a
+single MolGraph or for many graphs concatenated into one set of arrays
+(molecule index per atom and per bond), so whole library chunks are
+processed with a handful of array operations:
+- Molecular weight, formal charge, heavy atom count
+- logP from atom contributions (Wildman & Crippen, J. Chem. Inf. Comput.
+  Sci. 1999), reduced to the most common atom environments
+- Topological polar surface area from N and O contributions (Ertl et al.,
+  J. Med. Chem. 2000)
+- H-bond donors (N/O carrying H) and acceptors (N + O)
+- Rotatable bonds, ring count, aromatic ring count
+- Lipinski rule-of-five violations
+"""
+
+from typing import Dict, List, Any, Sequence
+
+import numpy as np
+
+from .smiles import MolGraph, ATOMIC_WEIGHTS, SINGLE, DOUBLE, TRIPLE, AROMATIC
+
+HETEROATOMS = np.zeros(len(ATOMIC_WEIGHTS), dtype=bool)
+HETEROATOMS[[7, 8, 9, 15, 16, 17, 35, 53]] = True
+
+# Crippen contributions for atoms that are not C, N, O or H
+_LOGP_ELEMENT = np.zeros(len(ATOMIC_WEIGHTS), dtype=np.float64)
+_LOGP_ELEMENT[[9, 15, 16, 17, 35, 53]] = [0.4202, 0.8612, 0.6482, 0.6895, 0.8456, 0.8857]
+LOGP_AROMATIC_S = 0.6237
+LOGP_H_ON_C = 0.1230
+LOGP_H_ON_N = 0.2142
+LOGP_H_ON_O = -0.2677
+
+# Ertl TPSA contributions keyed by
+# (element, aromatic, charge, hydrogens, single, double, triple, aromatic bonds)
+_TPSA_CONTRIBUTIONS = {
+    (7, False, 0, 0, 3, 0, 0, 0): 3.24, (7, False, 0, 0, 1, 1, 0, 0): 12.36,
+    (7, False, 0, 0, 0, 0, 1, 0): 23.79, (7, False, 0, 0, 1, 2, 0, 0): 11.68,
+    (7, False, 0, 0, 0, 1, 1, 0): 13.60, (7, False, 0, 1, 2, 0, 0, 0): 12.03,
+    (7, False, 0, 1, 0, 1, 0, 0): 23.85, (7, False, 0, 2, 1, 0, 0, 0): 26.02,
+    (7, False, 1, 0, 4, 0, 0, 0): 0.00, (7, False, 1, 0, 2, 1, 0, 0): 3.01,
+    (7, False, 1, 0, 1, 0, 1, 0): 4.36, (7, False, 1, 1, 3, 0, 0, 0): 4.44,
+    (7, False, 1, 1, 1, 1, 0, 0): 13.97, (7, False, 1, 2, 2, 0, 0, 0): 16.61,
+    (7, False, 1, 2, 0, 1, 0, 0): 25.59, (7, False, 1, 3, 1, 0, 0, 0): 27.64,
+    (7, True, 0, 0, 0, 0, 0, 2): 12.89, (7, True, 0, 0, 0, 0, 0, 3): 4.41,
+    (7, True, 0, 0, 1, 0, 0, 2): 4.93, (7, True, 0, 0, 0, 1, 0, 2): 8.39,
+    (7, True, 0, 1, 0, 0, 0, 2): 15.79, (7, True, 1, 0, 0, 0, 0, 3): 4.10,
+    (7, True, 1, 0, 1, 0, 0, 2): 3.88, (7, True, 1, 1, 0, 0, 0, 2): 14.14,
+    (8, False, 0, 0, 2, 0, 0, 0): 9.23, (8, False, 0, 0, 0, 1, 0, 0): 17.07,
+    (8, False, 0, 1, 1, 0, 0, 0): 20.23, (8, False, -1, 0, 1, 0, 0, 0): 23.06,
+    (8, True, 0, 0, 0, 0, 0, 2): 13.14,
+}
+
+# Dense lookup table over the same key (charge offset by 1, counts clipped)
+_TPSA_SHAPE = (2, 2, 3, 4, 5, 3, 2, 4)
+_TPSA_TABLE = np.full(_TPSA_SHAPE, np.nan, dtype=np.float64)
+for (_element, _aromatic, _charge, _h, _s, _d, _t, _a), _value in _TPSA_CONTRIBUTIONS.items():
+    _TPSA_TABLE[_element - 7, int(_aromatic), _charge + 1, _h, _s, _d, _t, _a] = _value
+
+LIPINSKI_LIMITS = {'molecular_weight': 500.0, 'logp': 5.0, 'hbd': 5, 'hba': 10}
+
+DESCRIPTOR_NAMES = ['molecular_weight', 'logp', 'tpsa', 'hbd', 'hba', 'rotatable_bonds', 'ring_count',
+                    'aromatic_rings', 'atom_count', 'formal_charge', 'lipinski_violations']
+
+
+def concatenate_graphs(graphs: Sequence[MolGraph]) -> Dict[str, np.ndarray]:
+    """
+    Stack the arrays of several graphs, offsetting bond atom indices
+
+    Returns:
+        Dictionary of concatenated atom/bond arrays plus atom_mol and
+        bond_mol (molecule index of every atom and bond) and num_mols
+    """
+    atom_counts = np.array([g.num_atoms for g in graphs], dtype=np.int64)
+    bond_counts = np.array([g.num_bonds for g in graphs], dtype=np.int64)
+    offsets = np.zeros(len(graphs), dtype=np.int64)
+    if len(graphs) > 1:
+        np.cumsum(atom_counts[:-1], out=offsets[1:])
+
+    def stack(name, dtype, shape=(0,)):
+        if not graphs:
+            return np.zeros(shape, dtype=dtype)
+        return np.concatenate([getattr(g, name) for g in graphs])
+
+    bond_atoms = stack('bond_atoms', np.int32, (0, 2)).astype(np.int64)
+    bond_mol = np.repeat(np.arange(len(graphs)), bond_counts)
+    bond_atoms += offsets[bond_mol][:, None]
+
+    return {
+        'atomic_num': stack('atomic_num', np.int16),
+        'charge': stack('charge', np.int8),
+        'hydrogens': stack('hydrogens', np.int8),
+        'aromatic': stack('aromatic', bool),
+        'bond_atoms': bond_atoms,
+        'bond_order': stack('bond_order', np.int8),
+        'ring_bond': stack('ring_bond', bool),
+        'ring_closure': stack('ring_closure', bool),
+        'aromatic_cycle': stack('aromatic_cycle', bool),
+        'atom_mol': np.repeat(np.arange(len(graphs)), atom_counts),
+        'bond_mol': bond_mol,
+        'num_mols': len(graphs)
+    }
+
+
+def _endpoint_counts(n: int, a: np.ndarray, b: np.ndarray, mask_a: np.ndarray, mask_b: np.ndarray) -> np.ndarray:
+    """Per-atom count of bonds where the atom is one endpoint and the mask holds for that side"""
+    return (np.bincount(a[mask_a], minlength=n) + np.bincount(b[mask_b], minlength=n))
+
+
+def compute_descriptors(arrays: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Compute descriptors for every molecule in concatenated graph arrays
+
+    Args:
+        arrays: Output of concatenate_graphs (or the same keys built by hand)
+
+    Returns:
+        Dictionary of DESCRIPTOR_NAMES -> array with one value per molecule
+    """
+    z = arrays['atomic_num'].astype(np.int64)
+    charge = arrays['charge'].astype(np.int64)
+    hydrogens = arrays['hydrogens'].astype(np.int64)
+    aromatic = arrays['aromatic']
+    order = arrays['bond_order']
+    ring_bond = arrays['ring_bond']
+    atom_mol = arrays['atom_mol']
+    bond_mol = arrays['bond_mol']
+    num_mols = arrays['num_mols']
+    n = len(z)
+    a = arrays['bond_atoms'][:, 0]
+    b = arrays['bond_atoms'][:, 1]
+
+    def per_mol(values, mask=None):
+        if mask is not None:
+            return np.bincount(atom_mol[mask], minlength=num_mols)
+        return np.bincount(atom_mol, weights=values, minlength=num_mols)
+
+    heavy = z > 1
+    is_c, is_n, is_o = z == 6, z == 7, z == 8
+    hetero = HETEROATOMS[z]
+
+    # Per-atom bond environment
+    single = _endpoint_counts(n, a, b, order == SINGLE, order == SINGLE)
+    double = _endpoint_counts(n, a, b, order == DOUBLE, order == DOUBLE)
+    triple = _endpoint_counts(n, a, b, order == TRIPLE, order == TRIPLE)
+    arom_bonds = _endpoint_counts(n, a, b, order == AROMATIC, order == AROMATIC)
+    heavy_degree = _endpoint_counts(n, a, b, heavy[b], heavy[a])
+    hetero_neighbors = _endpoint_counts(n, a, b, hetero[b], hetero[a])
+    double_to_hetero = _endpoint_counts(n, a, b, (order == DOUBLE) & hetero[b], (order == DOUBLE) & hetero[a])
+    single_to_hetero = _endpoint_counts(n, a, b, (order != AROMATIC) & hetero[b], (order != AROMATIC) & hetero[a])
+
+    # logP: carbon classes
+    logp = _LOGP_ELEMENT[z].copy()
+    logp[(z == 16) & aromatic] = LOGP_AROMATIC_S
+    aliphatic_c = is_c & ~aromatic
+    carbon = np.where(hydrogens >= 2, 0.1441, 0.0)
+    carbon = np.where(hetero_neighbors > 0, np.where(hetero_neighbors + hydrogens >= 3, -0.2035, -0.2051), carbon)
+    carbon = np.where(triple > 0, 0.0017, carbon)
+    carbon = np.where((double > 0) & (double_to_hetero == 0), 0.1551, carbon)
+    carbon = np.where(double_to_hetero > 0, -0.2783, carbon)
+    logp[aliphatic_c] = carbon[aliphatic_c]
+    aromatic_c = is_c & aromatic
+    logp[aromatic_c] = np.where(arom_bonds[aromatic_c] >= 3, 0.2955,
+                                np.where(single_to_hetero[aromatic_c] > 0, 0.1360, 0.1581))
+
+    # logP: nitrogen and oxygen classes
+    nitrogen = np.where(hydrogens >= 2, -1.0190, np.where(hydrogens == 1, -0.7096, -0.3187))
+    nitrogen = np.where(aromatic, -0.4806, nitrogen)
+    logp[is_n] = nitrogen[is_n]
+    oxygen = np.where(hydrogens > 0, -0.2893, -0.0684)
+    oxygen = np.where(double > 0, -0.1526, oxygen)
+    oxygen = np.where(charge < 0, -1.3260, oxygen)
+    oxygen = np.where(aromatic, 0.1552, oxygen)
+    logp[is_o] = oxygen[is_o]
+
+    h_logp = np.where(is_o, LOGP_H_ON_O, np.where(is_n, LOGP_H_ON_N, LOGP_H_ON_C))
+    logp = logp + hydrogens * h_logp
+
+    # TPSA from N and O environments
+    polar = (is_n | is_o) & (np.abs(charge) <= 1)
+    tpsa_atoms = np.zeros(n, dtype=np.float64)
+    if polar.any():
+        index = (
+            z[polar] - 7, aromatic[polar].astype(np.int64), charge[polar] + 1,
+            np.minimum(hydrogens[polar], 3), np.minimum(single[polar], 4), np.minimum(double[polar], 2),
+            np.minimum(triple[polar], 1), np.minimum(arom_bonds[polar], 3)
+        )
+        values = _TPSA_TABLE[index]
+        # Environments missing from the table fall back to a neighbor-based estimate
+        missing = np.isnan(values)
+        if missing.any():
+            neighbors = heavy_degree[polar][missing]
+            h = hydrogens[polar][missing]
+            base = np.where(z[polar][missing] == 7, 30.5 - 8.2 * neighbors, 28.5 - 8.6 * neighbors)
+            values[missing] = np.maximum(base + 1.5 * h, 0.0)
+        tpsa_atoms[polar] = values
+
+    # Rotatable bonds: acyclic single bonds between non-terminal heavy atoms,
+    # excluding bonds next to triple bonds and amide C-N bonds
+    amide_c = is_c & (double_to_hetero > 0)
+    rotatable = ((order == SINGLE) & ~ring_bond & heavy[a] & heavy[b]
+                 & (heavy_degree[a] >= 2) & (heavy_degree[b] >= 2)
+                 & (triple[a] == 0) & (triple[b] == 0)
+                 & ~((amide_c[a] & is_n[b]) | (amide_c[b] & is_n[a])))
+
+    weights = ATOMIC_WEIGHTS[z] + hydrogens * ATOMIC_WEIGHTS[1]
+    descriptors = {
+        'molecular_weight': per_mol(weights),
+        'logp': per_mol(logp),
+        'tpsa': per_mol(tpsa_atoms),
+        'hbd': per_mol(None, (is_n | is_o) & (hydrogens > 0)),
+        'hba': per_mol(None, is_n | is_o),
+        'rotatable_bonds': np.bincount(bond_mol[rotatable], minlength=num_mols),
+        'ring_count': np.bincount(bond_mol[arrays['ring_closure']], minlength=num_mols),
+        'aromatic_rings': np.bincount(bond_mol[arrays['aromatic_cycle']], minlength=num_mols),
+        'atom_count': per_mol(None, heavy),
+        'formal_charge': np.bincount(atom_mol, weights=charge, minlength=num_mols).astype(np.int64),
+    }
+    descriptors['lipinski_violations'] = lipinski_violations(descriptors)
+    return descriptors
+
+
+def lipinski_violations(descriptors: Dict[str, np.ndarray]) -> np.ndarray:
+    """Count of rule-of-five limits exceeded, per molecule"""
+    return sum((np.asarray(descriptors[key]) > limit).astype(np.int64) for key, limit in LIPINSKI_LIMITS.items())
+
+
+def molecular_properties(graph: MolGraph, decimals: int = 2) -> Dict[str, Any]:
+    """
+    Descriptors for one molecule as plain Python values
+
+    Returns:
+        Dictionary with DESCRIPTOR_NAMES keys plus formula and num_components
+    """
+    return batch_properties([graph], decimals)[0]
+
+
+def batch_properties(graphs: List[MolGraph], decimals: int = 2) -> List[Dict[str, Any]]:
+    """molecular_properties for many graphs, computed in one vectorized pass"""
+    if not graphs:
+        return []
+    descriptors = compute_descriptors(concatenate_graphs(graphs))
+    results = []
+    for i, graph in enumerate(graphs):
+        properties: Dict[str, Any] = {}
+        for name in DESCRIPTOR_NAMES:
+            value = descriptors[name][i]
+            # Adding 0.0 turns a rounded -0.0 into 0.0
+            properties[name] = round(float(value), decimals) + 0.0 if value.dtype.kind == 'f' else int(value)
+        properties['formula'] = graph.formula()
+        properties['num_components'] = graph.num_components
+        results.append(properties)
+    return results
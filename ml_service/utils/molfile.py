@@ -0,0 +1,1013 @@
+"""
+Streaming SDF and MOL2 Molecule Files
+
+This module reads and writes multi-molecule structure files record by record:
+- MolRecord: atoms, coordinates, bonds and data fields as NumPy arrays
+- SDF (V2000 and V3000 connection tables, charges, isotopes, data items)
+  and Tripos MOL2 (atom types, partial charges) parsers over line streams,
+  so files of any size are read in constant memory
+- Gzip-compressed files read and written transparently
+- Parallel parsing of uncompressed files by byte ranges aligned to record
+  starts; workers read their own range and only parsed records travel back
+- SMILES from the connection table: implicit hydrogens by valence,
+  tetrahedral and double-bond stereo from 3D coordinates or 2D wedges
+- Streaming SDF / MOL2 writer
+"""
+
+import gzip
+import io
+import logging
+import os
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple, Callable, Union
+
+import numpy as np
+
+from .smiles import (MolGraph, ELEMENTS, SYMBOLS, DEFAULT_VALENCES, BOND_VALENCE, SINGLE, DOUBLE, TRIPLE,
+                     AROMATIC, CHIRAL_CCW, CHIRAL_CW, parse_smiles)
+from .canonical import canonical_smiles, symmetry_classes, perceive_aromaticity
+from .parallel import bounded_imap
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('sdf', 'mol2')
+FORMAT_EXTENSIONS = {'.sdf': 'sdf', '.sd': 'sdf', '.mol': 'sdf', '.mol2': 'mol2'}
+
+SDF_DELIMITER = '$$$$'
+MOL2_MOLECULE = '@<TRIPOS>MOLECULE'
+
+# Data fields read as a ready-made SMILES by record_smiles
+SMILES_FIELDS = ('smiles', 'canonical_smiles', 'isomeric_smiles', 'smiles_string')
+
+# Bytes per parallel parsing task, and tasks in flight per worker
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+INFLIGHT_PER_PROCESS = 2
+
+# V2000 atom-block charge codes
+V2000_CHARGES = {1: 3, 2: 2, 3: 1, 5: -1, 6: -2, 7: -3}
+
+# MOL2 bond types; 'ar' bonds outside rings are resolved per record
+MOL2_BOND_TYPES = {'1': SINGLE, '2': DOUBLE, '3': TRIPLE, 'am': SINGLE, 'ar': AROMATIC,
+                   'du': SINGLE, 'un': SINGLE, 'nc': 0}
+
+# Wedge flags: V2000 bond stereo 1 / 6, V3000 CFG=1 / CFG=3
+WEDGE_UP = 1
+WEDGE_DOWN = 6
+
+# Smallest signed volume (Å^3) / dihedral sine read as defined stereo
+STEREO_EPSILON = 1e-3
+
+_SYMBOL_LOOKUP = {symbol.lower(): number for symbol, (number, _) in ELEMENTS.items()}
+
+
+class MolFileError(ValueError):
+    """Malformed SDF or MOL2 record"""
+
+
+class MolRecord:
+    """
+    One molecule of an SDF or MOL2 file
+
+    Atoms:
+        atomic_num (int16, 0 for unknown / dummy atoms), charge (int8),
+        isotope (int16, mass number or 0), coordinates (N, 3) float64,
+        atom_names and atom_types (MOL2 only, lists of str),
+        partial_charges (MOL2 only, float64)
+    Bonds:
+        bond_atoms (M, 2) int32 zero-based, bond_order (int8, SINGLE..AROMATIC),
+        bond_stereo (int8 wedge flags, WEDGE_UP / WEDGE_DOWN from the first atom)
+    Other:
+        name, properties (SDF data items or MOL2 header fields), and
+        explicit_valence (int8, V2000 'vvv' column: -1 unset, 0 for 15)
+    """
+
+    __slots__ = ('name', 'atomic_num', 'charge', 'isotope', 'coordinates', 'bond_atoms', 'bond_order',
+                 'bond_stereo', 'explicit_valence', 'atom_names', 'atom_types', 'partial_charges',
+                 'properties', '_smiles')
+
+    def __init__(self, name: str, atomic_num, charge, coordinates, bond_atoms, bond_order,
+                 bond_stereo=None, isotope=None, explicit_valence=None, atom_names: Optional[List[str]] = None,
+                 atom_types: Optional[List[str]] = None, partial_charges=None,
+                 properties: Optional[Dict[str, str]] = None):
+        n = len(atomic_num)
+        self.name = name
+        self.atomic_num = np.asarray(atomic_num, dtype=np.int16)
+        self.charge = np.asarray(charge, dtype=np.int8)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(n, 3)
+        self.bond_atoms = np.asarray(bond_atoms, dtype=np.int32).reshape(-1, 2)
+        self.bond_order = np.asarray(bond_order, dtype=np.int8)
+        self.bond_stereo = (np.zeros(len(self.bond_order), dtype=np.int8) if bond_stereo is None
+                            else np.asarray(bond_stereo, dtype=np.int8))
+        self.isotope = np.zeros(n, dtype=np.int16) if isotope is None else np.asarray(isotope, dtype=np.int16)
+        self.explicit_valence = (np.full(n, -1, dtype=np.int8) if explicit_valence is None
+                                 else np.asarray(explicit_valence, dtype=np.int8))
+        self.atom_names = atom_names
+        self.atom_types = atom_types
+        self.partial_charges = None if partial_charges is None else np.asarray(partial_charges, dtype=np.float64)
+        self.properties = properties or {}
+        self._smiles: Optional[str] = None
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def __repr__(self) -> str:
+        return f"MolRecord({self.name!r}, atoms={self.num_atoms}, bonds={self.num_bonds})"
+
+    @property
+    def num_atoms(self) -> int:
+        return len(self.atomic_num)
+
+    @property
+    def num_bonds(self) -> int:
+        return len(self.bond_order)
+
+    @property
+    def smiles(self) -> str:
+        """
+        Canonical isomeric SMILES of the connection table (computed once)
+
+        Raises:
+            MolFileError: If the record has no atoms or unknown elements
+        """
+        if self._smiles is None:
+            self._smiles = canonical_smiles(self.to_molgraph())
+        return self._smiles
+
+    def to_molgraph(self) -> MolGraph:
+        """MolGraph in file atom order, with implicit hydrogens and perceived stereo"""
+        return _record_graph(self)
+
+    def to_graph(self) -> MolGraph:
+        """MolGraph parsed from the canonical SMILES (same layout as parse_smiles output)"""
+        return parse_smiles(self.smiles)
+
+    def to_sdf(self) -> str:
+        """V2000 SDF record, data items included"""
+        return _write_sdf(self)
+
+    def to_mol2(self) -> str:
+        """Tripos MOL2 record; SYBYL atom types are derived when the record has none"""
+        return _write_mol2(self)
+
+
+def record_smiles(record: MolRecord) -> str:
+    """SMILES of a record: its SMILES data field when present, else from the connection table"""
+    for key, value in record.properties.items():
+        if key.strip().lower() in SMILES_FIELDS and value.strip():
+            return value.strip().split()[0]
+    return record.smiles
+
+
+def ligand_entry(item: Tuple[Optional[MolRecord], Optional[str]]) -> Dict[str, str]:
+    """
+    {'name', 'smiles'} of a parsed (record, error) pair, for ligand libraries
+
+    Unreadable records give empty strings so that entries stay aligned with
+    the records of the file. Usable as the read_molecules transform.
+    """
+    record, _ = item
+    if record is None:
+        return {'name': '', 'smiles': ''}
+    try:
+        smiles = record_smiles(record)
+    except ValueError as e:
+        logger.debug(f"No SMILES for record {record.name!r}: {e}")
+        smiles = ''
+    return {'name': record.name, 'smiles': smiles}
+
+
+def _element(symbol: str) -> int:
+    number = _SYMBOL_LOOKUP.get(symbol.strip().lower())
+    if number is None:
+        if symbol.strip() in ('D', 'T'):
+            return 1
+        return 0   # R groups, dummies and query atoms
+    return number
+
+
+# ---------------------------------------------------------------------------
+# SDF parsing
+
+def _parse_v2000(lines: List[str], num_atoms: int, num_bonds: int) -> Dict[str, Any]:
+    atom_lines = lines[4:4 + num_atoms]
+    bond_lines = lines[4 + num_atoms:4 + num_atoms + num_bonds]
+    if len(atom_lines) < num_atoms or len(bond_lines) < num_bonds:
+        raise MolFileError("Connection table is shorter than its counts line")
+
+    coordinates = np.empty((num_atoms, 3))
+    atomic_num = np.zeros(num_atoms, dtype=np.int16)
+    charge = np.zeros(num_atoms, dtype=np.int8)
+    isotope = np.zeros(num_atoms, dtype=np.int16)
+    valence = np.full(num_atoms, -1, dtype=np.int8)
+    mass_diff = np.zeros(num_atoms, dtype=np.int16)
+    try:
+        for i, line in enumerate(atom_lines):
+            coordinates[i] = (float(line[0:10]), float(line[10:20]), float(line[20:30]))
+            symbol = line[31:34].strip()
+            atomic_num[i] = _element(symbol)
+            if symbol in ('D', 'T'):
+                isotope[i] = 2 if symbol == 'D' else 3
+            fields = line[34:51]
+            mass_diff[i] = int(fields[0:2] or 0)
+            charge[i] = V2000_CHARGES.get(int(fields[2:5] or 0), 0)
+            vvv = fields[14:17].strip()
+            if vvv and int(vvv):
+                valence[i] = 0 if int(vvv) == 15 else int(vvv)
+
+        bond_atoms = np.empty((num_bonds, 2), dtype=np.int32)
+        bond_order = np.empty(num_bonds, dtype=np.int8)
+        bond_stereo = np.zeros(num_bonds, dtype=np.int8)
+        for j, line in enumerate(bond_lines):
+            bond_atoms[j] = (int(line[0:3]) - 1, int(line[3:6]) - 1)
+            kind = int(line[6:9])
+            bond_order[j] = AROMATIC if kind == 4 else kind if kind in (1, 2, 3) else SINGLE
+            stereo = line[9:12].strip()
+            bond_stereo[j] = int(stereo) if stereo in ('1', '6') else 0
+    except ValueError as e:
+        raise MolFileError(f"Bad V2000 atom or bond line: {e}")
+
+    # Properties block; any M  CHG / M  ISO replaces the atom-block values
+    charge_block, isotope_block = {}, {}
+    for line in lines[4 + num_atoms + num_bonds:]:
+        if line.startswith('M  END'):
+            break
+        if line.startswith(('M  CHG', 'M  ISO')):
+            values = line[6:].split()
+            target = charge_block if line.startswith('M  CHG') else isotope_block
+            for k in range(1, 2 * int(values[0]) + 1, 2):
+                target[int(values[k]) - 1] = int(values[k + 1])
+    if charge_block:
+        charge[:] = 0
+        for atom, value in charge_block.items():
+            charge[atom] = value
+    if isotope_block:
+        for atom, value in isotope_block.items():
+            isotope[atom] = value
+    elif mass_diff.any():
+        for atom in np.flatnonzero(mass_diff):
+            symbol = SYMBOLS.get(int(atomic_num[atom]))
+            if symbol:
+                isotope[atom] = int(round(ELEMENTS[symbol][1])) + mass_diff[atom]
+
+    if bond_atoms.size and (bond_atoms.min() < 0 or bond_atoms.max() >= num_atoms):
+        raise MolFileError("Bond refers to a missing atom")
+    return {'atomic_num': atomic_num, 'charge': charge, 'isotope': isotope, 'coordinates': coordinates,
+            'bond_atoms': bond_atoms, 'bond_order': bond_order, 'bond_stereo': bond_stereo,
+            'explicit_valence': valence}
+
+
+def _v3000_lines(lines: List[str]) -> List[str]:
+    """'M  V30' payloads with '-' continuation lines joined"""
+    joined, pending = [], ''
+    for line in lines:
+        if not line.startswith('M  V30 '):
+            if line.startswith('M  END'):
+                break
+            continue
+        payload = pending + line[7:]
+        if payload.endswith('-'):
+            pending = payload[:-1]
+            continue
+        joined.append(payload.strip())
+        pending = ''
+    return joined
+
+
+def _parse_v3000(lines: List[str]) -> Dict[str, Any]:
+    atoms, bonds, block = [], [], None
+    index_of: Dict[int, int] = {}
+    for payload in _v3000_lines(lines[4:]):
+        upper = payload.upper()
+        if upper.startswith('BEGIN '):
+            block = upper.split()[1]
+            continue
+        if upper.startswith('END '):
+            block = None
+            continue
+        fields = payload.split()
+        if block == 'ATOM':
+            options = dict(item.split('=', 1) for item in fields[6:] if '=' in item)
+            index_of[int(fields[0])] = len(atoms)
+            atoms.append((fields[1], float(fields[2]), float(fields[3]), float(fields[4]),
+                          int(options.get('CHG', 0)), int(options.get('MASS', 0)), int(options.get('VAL', 0))))
+        elif block == 'BOND':
+            options = dict(item.split('=', 1) for item in fields[4:] if '=' in item)
+            bonds.append((int(fields[1]), int(fields[2]), int(fields[3]), int(options.get('CFG', 0))))
+
+    try:
+        bond_atoms = np.array([(index_of[a], index_of[b]) for _, a, b, _ in bonds], dtype=np.int32).reshape(-1, 2)
+    except KeyError as e:
+        raise MolFileError(f"Bond refers to a missing atom {e}")
+    return {
+        'atomic_num': np.array([_element(atom[0]) for atom in atoms], dtype=np.int16),
+        'charge': np.array([atom[4] for atom in atoms], dtype=np.int8),
+        'isotope': np.array([atom[5] for atom in atoms], dtype=np.int16),
+        'coordinates': np.array([atom[1:4] for atom in atoms], dtype=np.float64).reshape(-1, 3),
+        'explicit_valence': np.array([-1 if not atom[6] else 0 if atom[6] == -1 else atom[6] for atom in atoms],
+                                     dtype=np.int8),
+        'bond_atoms': bond_atoms,
+        'bond_order': np.array([AROMATIC if kind == 4 else kind if kind in (1, 2, 3) else SINGLE
+                                for kind, _, _, _ in bonds], dtype=np.int8),
+        'bond_stereo': np.array([WEDGE_UP if cfg == 1 else WEDGE_DOWN if cfg == 3 else 0 for *_, cfg in bonds],
+                                dtype=np.int8)
+    }
+
+
+def _data_items(lines: List[str]) -> Dict[str, str]:
+    """'> <FIELD>' data items after M  END"""
+    properties: Dict[str, str] = {}
+    key: Optional[str] = None
+    values: List[str] = []
+    for line in lines:
+        if line.startswith('>'):
+            if key is not None:
+                properties[key] = '\n'.join(values).strip()
+            key, values = None, []
+            if '<' in line and '>' in line[line.index('<'):]:
+                key = line[line.index('<') + 1:line.index('>', line.index('<'))].strip()
+        elif key is not None:
+            if not line.strip():
+                properties[key] = '\n'.join(values).strip()
+                key, values = None, []
+            else:
+                values.append(line)
+    if key is not None:
+        properties[key] = '\n'.join(values).strip()
+    return properties
+
+
+def parse_sdf_record(lines: List[str]) -> MolRecord:
+    """
+    Parse one SDF record (lines without the '$$$$' delimiter)
+
+    Raises:
+        MolFileError: On a missing or malformed connection table
+    """
+    if len(lines) < 4:
+        raise MolFileError("Record is shorter than a molfile header")
+    counts = lines[3]
+    end = next((i for i, line in enumerate(lines) if line.startswith('M  END')), len(lines))
+    if 'V3000' in counts:
+        table = _parse_v3000(lines[:end + 1])
+    else:
+        try:
+            num_atoms, num_bonds = int(counts[0:3]), int(counts[3:6])
+        except ValueError:
+            raise MolFileError(f"Bad counts line: {counts.strip()!r}")
+        table = _parse_v2000(lines[:end + 1], num_atoms, num_bonds)
+    return MolRecord(lines[0].strip(), properties=_data_items(lines[end + 1:]), **table)
+
+
+def iter_sdf_blocks(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Split a line stream into SDF records (delimiter dropped, blank records skipped)"""
+    record: List[str] = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith(SDF_DELIMITER):
+            if any(item.strip() for item in record):
+                yield record
+            record = []
+        else:
+            record.append(line)
+    if any(item.strip() for item in record):
+        yield record
+
+
+# ---------------------------------------------------------------------------
+# MOL2 parsing
+
+def parse_mol2_record(lines: List[str]) -> MolRecord:
+    """
+    Parse one MOL2 molecule (from its @<TRIPOS>MOLECULE line)
+
+    MOL2 has no formal charges: N.4 nitrogens become +1, and acyclic 'ar'
+    bonds (carboxylate, phosphate, amidinium) are written as one double bond
+    plus charged single bonds. When the molecule lists hydrogens they are
+    taken as complete and other valence gaps become charges.
+
+    Raises:
+        MolFileError: On missing sections or malformed atom / bond lines
+    """
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('@<TRIPOS>'):
+            current = stripped[9:].upper()
+            sections.setdefault(current, [])
+        elif current is not None and stripped and not stripped.startswith('#'):
+            sections[current].append(stripped)
+    header = sections.get('MOLECULE')
+    if not header or 'ATOM' not in sections:
+        raise MolFileError("MOL2 record without MOLECULE and ATOM sections")
+
+    names, types, coordinates, partial = [], [], [], []
+    index_of: Dict[int, int] = {}
+    try:
+        for line in sections['ATOM']:
+            fields = line.split()
+            index_of[int(fields[0])] = len(names)
+            names.append(fields[1])
+            coordinates.append((float(fields[2]), float(fields[3]), float(fields[4])))
+            types.append(fields[5])
+            partial.append(float(fields[8]) if len(fields) > 8 else 0.0)
+        bonds, kinds = [], []
+        for line in sections.get('BOND', []):
+            fields = line.split()
+            bonds.append((index_of[int(fields[1])], index_of[int(fields[2])]))
+            kinds.append(fields[3].lower())
+    except (ValueError, IndexError, KeyError) as e:
+        raise MolFileError(f"Bad MOL2 atom or bond line: {e}")
+
+    atomic_num = np.array([_element(atom_type.split('.')[0]) for atom_type in types], dtype=np.int16)
+    charge = np.array([1 if atom_type.upper() == 'N.4' else 0 for atom_type in types], dtype=np.int8)
+    bond_atoms = np.array(bonds, dtype=np.int32).reshape(-1, 2)
+    bond_order = np.array([MOL2_BOND_TYPES.get(kind, SINGLE) for kind in kinds], dtype=np.int8)
+    keep = bond_order > 0
+    bond_atoms, bond_order = bond_atoms[keep], bond_order[keep]
+    _resolve_mol2_charges(atomic_num, charge, types, bond_atoms, bond_order)
+
+    properties = {'mol_type': header[2] if len(header) > 2 else '',
+                  'charge_type': header[3] if len(header) > 3 else ''}
+    if len(header) > 5:
+        properties['comment'] = header[5]
+    return MolRecord(header[0].strip(), atomic_num, charge, coordinates, bond_atoms, bond_order,
+                     atom_names=names, atom_types=types, partial_charges=partial, properties=properties)
+
+
+def _resolve_mol2_charges(atomic_num: np.ndarray, charge: np.ndarray, types: List[str],
+                          bonds: np.ndarray, order: np.ndarray):
+    """Kekule-ize acyclic 'ar' groups and infer charges in place"""
+    ring = _ring_bonds(len(atomic_num), bonds)
+    groups: Dict[int, List[Tuple[int, int]]] = {}
+    for index in np.flatnonzero((order == AROMATIC) & ~ring):
+        a, b = bonds[index]
+        # The center is the atom that is not the terminal O.co2 / N.pl3 / N.am
+        center, terminal = (a, b) if types[b].upper() in ('O.CO2', 'N.PL3', 'N.AM', 'O.2') else (b, a)
+        groups.setdefault(int(center), []).append((int(index), int(terminal)))
+    for center, members in groups.items():
+        for position, (index, terminal) in enumerate(sorted(members, key=lambda item: item[1])):
+            order[index] = DOUBLE if position == 0 else SINGLE
+            if position:
+                charge[terminal] += -1 if atomic_num[terminal] in (8, 16) else 1 if atomic_num[terminal] == 7 else 0
+        if len(members) > 1 and atomic_num[members[0][1]] == 7:
+            # Amidinium / guanidinium: the positive charge sits on the double-bonded nitrogen
+            for index, terminal in members[1:]:
+                charge[terminal] -= 1
+            charge[sorted(members, key=lambda item: item[1])[0][1]] += 1
+
+    if not (atomic_num == 1).any():
+        return
+    # Hydrogens are explicit: valence gaps on N and O/S are charges
+    used = np.zeros(len(atomic_num), dtype=np.int64)
+    np.add.at(used, bonds.ravel(), np.repeat(BOND_VALENCE[order], 2))
+    aromatic = np.zeros(len(atomic_num), dtype=bool)
+    aromatic[bonds[order == AROMATIC].ravel()] = True
+    for atom in range(len(atomic_num)):
+        if charge[atom] or aromatic[atom]:
+            continue
+        if atomic_num[atom] == 7 and used[atom] == 4:
+            charge[atom] = 1
+        elif atomic_num[atom] in (8, 16) and used[atom] == 1:
+            charge[atom] = -1
+
+
+def iter_mol2_blocks(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Split a line stream into MOL2 molecules, each starting at its @<TRIPOS>MOLECULE line"""
+    record: List[str] = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith(MOL2_MOLECULE):
+            if record:
+                yield record
+            record = [line]
+        elif record:
+            record.append(line)
+    if record:
+        yield record
+
+
+# ---------------------------------------------------------------------------
+# Connection table -> MolGraph
+
+def _ring_bonds(n: int, bonds: np.ndarray) -> np.ndarray:
+    return _spanning_forest(n, bonds, np.zeros(n, dtype=bool))[0]
+
+
+def _spanning_forest(n: int, bonds: np.ndarray,
+                     aromatic: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    (ring_bond, ring_closure, aromatic_cycle, components) from a breadth-first
+    spanning forest: every non-tree bond closes one fundamental cycle, whose
+    tree path is walked to mark ring bonds (as parse_smiles does)
+    """
+    neighbors: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+    for index, (a, b) in enumerate(bonds.tolist()):
+        neighbors[a].append((b, index))
+        neighbors[b].append((a, index))
+    parent = [-1] * n
+    parent_bond = [-1] * n
+    depth = [-1] * n
+    closure = np.zeros(len(bonds), dtype=bool)
+    components = 0
+    for root in range(n):
+        if depth[root] >= 0:
+            continue
+        components += 1
+        depth[root] = 0
+        queue = deque([root])
+        while queue:
+            atom = queue.popleft()
+            for other, index in neighbors[atom]:
+                if depth[other] < 0:
+                    depth[other] = depth[atom] + 1
+                    parent[other], parent_bond[other] = atom, index
+                    queue.append(other)
+                elif index != parent_bond[atom] and index != parent_bond[other]:
+                    closure[index] = True
+
+    ring = closure.copy()
+    aromatic_cycle = np.zeros(len(bonds), dtype=bool)
+    for index in np.flatnonzero(closure).tolist():
+        x, y = bonds[index].tolist()
+        all_aromatic = aromatic[x] and aromatic[y]
+        while x != y:
+            if depth[x] >= depth[y]:
+                ring[parent_bond[x]] = True
+                x = parent[x]
+            else:
+                ring[parent_bond[y]] = True
+                y = parent[y]
+            all_aromatic = all_aromatic and aromatic[x] and aromatic[y]
+        aromatic_cycle[index] = all_aromatic
+    return ring, closure, aromatic_cycle, components
+
+
+def _shifted_valences(atomic_num: int, charge: int) -> Tuple[int, ...]:
+    """Default valences adjusted for a formal charge (N+ 4, O- 1, C+ 3, B- 4)"""
+    valences = DEFAULT_VALENCES.get(atomic_num, ())
+    if not charge:
+        return valences
+    if atomic_num == 5:
+        return tuple(v - charge for v in valences)
+    if atomic_num in (6, 14):
+        return tuple(v - abs(charge) for v in valences)
+    return tuple(v + charge for v in valences if v + charge >= 0)
+
+
+def _implicit_hydrogens(record: MolRecord, used: np.ndarray, aromatic: np.ndarray) -> np.ndarray:
+    hydrogens = np.zeros(record.num_atoms, dtype=np.int8)
+    for atom in range(record.num_atoms):
+        valence = int(record.explicit_valence[atom])
+        if valence >= 0:
+            hydrogens[atom] = max(valence - used[atom], 0)
+            continue
+        valences = _shifted_valences(int(record.atomic_num[atom]), int(record.charge[atom]))
+        if not valences:
+            continue
+        if aromatic[atom]:
+            hydrogens[atom] = max(valences[0] - used[atom] - 1, 0)
+            continue
+        hydrogens[atom] = next((v - used[atom] for v in valences if v >= used[atom]), 0)
+    return hydrogens
+
+
+def _stereo_coordinates(record: MolRecord) -> np.ndarray:
+    """Coordinates for stereo perception; flat 2D depictions get wedge ends lifted out of plane"""
+    coords = record.coordinates.copy()
+    if record.num_atoms and np.abs(coords[:, 2]).max() < STEREO_EPSILON:
+        for (a, b), flag in zip(record.bond_atoms.tolist(), record.bond_stereo.tolist()):
+            if flag == WEDGE_UP:
+                coords[b, 2] += 1.0
+            elif flag == WEDGE_DOWN:
+                coords[b, 2] -= 1.0
+    return coords
+
+
+def _signed_volume(apex: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> float:
+    return float(np.dot(a - apex, np.cross(b - apex, c - apex)))
+
+
+def _record_graph(record: MolRecord) -> MolGraph:
+    n = record.num_atoms
+    if n == 0:
+        raise MolFileError(f"Record {record.name!r} has no atoms")
+    unknown = np.flatnonzero(record.atomic_num == 0)
+    if len(unknown):
+        raise MolFileError(f"Record {record.name!r} has unknown or dummy atoms")
+    bonds, order = record.bond_atoms, record.bond_order
+    aromatic = np.zeros(n, dtype=bool)
+    aromatic[bonds[order == AROMATIC].ravel()] = True
+    ring, closure, aromatic_cycle, components = _spanning_forest(n, bonds, aromatic)
+
+    used = np.zeros(n, dtype=np.int64)
+    np.add.at(used, bonds.ravel(), np.repeat(BOND_VALENCE[order], 2))
+    hydrogens = _implicit_hydrogens(record, used, aromatic)
+
+    def build(chiral=None, centers=None, stereo=None) -> MolGraph:
+        return MolGraph(record.name, record.atomic_num, record.charge, hydrogens, aromatic, record.isotope,
+                        np.zeros(n, dtype=np.int8) if chiral is None else chiral, bonds, order,
+                        np.zeros(len(order), dtype=np.int8) if stereo is None else stereo, ring, closure,
+                        aromatic_cycle, components, chiral_centers=centers)
+
+    graph = build()
+    coords = _stereo_coordinates(record)
+    if not np.isfinite(coords).all() or np.abs(coords).max() == 0:
+        return graph
+    classes = symmetry_classes(graph)
+    chiral, centers = _tetrahedral_centers(record, coords, hydrogens, classes)
+    stereo = _double_bond_directions(record, coords, hydrogens, ring, classes)
+    if not centers and not stereo.any():
+        return graph
+    return build(chiral, centers, stereo)
+
+
+def _neighbor_lists(record: MolRecord) -> List[List[Tuple[int, int]]]:
+    neighbors: List[List[Tuple[int, int]]] = [[] for _ in range(record.num_atoms)]
+    for index, (a, b) in enumerate(record.bond_atoms.tolist()):
+        neighbors[a].append((b, index))
+        neighbors[b].append((a, index))
+    return neighbors
+
+
+def _tetrahedral_centers(record: MolRecord, coords: np.ndarray, hydrogens: np.ndarray,
+                         classes: List[int]) -> Tuple[np.ndarray, List[List[int]]]:
+    """
+    Chiral codes and chiral_centers rows for atoms with four constitutionally
+    distinct substituents (at most one of them hydrogen)
+    """
+    chiral = np.zeros(record.num_atoms, dtype=np.int8)
+    centers: List[List[int]] = []
+    z = record.atomic_num
+    for atom, around in enumerate(_neighbor_lists(record)):
+        if z[atom] not in (6, 7, 14, 15, 16) or len(around) + hydrogens[atom] != 4:
+            continue
+        if any(record.bond_order[b] in (TRIPLE, AROMATIC) for _, b in around):
+            continue
+        heavy = [j for j, _ in around if z[j] != 1]
+        explicit_h = [j for j, _ in around if z[j] == 1]
+        if len(explicit_h) + hydrogens[atom] > 1 or len({classes[j] for j in heavy}) != len(heavy):
+            continue
+        if z[atom] == 7 and record.charge[atom] <= 0:
+            continue   # amine nitrogens invert
+        if explicit_h:
+            order = explicit_h + heavy
+            volume = _signed_volume(*(coords[j] for j in order))
+        elif len(heavy) == 4:
+            order = heavy
+            volume = _signed_volume(*(coords[j] for j in order))
+        else:
+            order = [-1] + heavy
+            volume = _signed_volume(coords[atom], *(coords[j] for j in heavy))
+        if abs(volume) < STEREO_EPSILON:
+            continue
+        # Looking from the first neighbor, '@' lists the others anticlockwise: negative volume
+        chiral[atom] = CHIRAL_CCW if volume < 0 else CHIRAL_CW
+        centers.append([atom] + order)
+    return chiral, centers
+
+
+def _double_bond_directions(record: MolRecord, coords: np.ndarray, hydrogens: np.ndarray, ring: np.ndarray,
+                            classes: List[int]) -> np.ndarray:
+    """'/' '\\' bond_stereo codes (1 / 2) encoding the geometry of stereogenic acyclic double bonds"""
+    stereo = np.zeros(record.num_bonds, dtype=np.int8)
+    neighbors = _neighbor_lists(record)
+    bonds = record.bond_atoms
+    z = record.atomic_num
+
+    def direction(index: int, first: int) -> Optional[str]:
+        # Symbol of bond index when written "first <symbol> other"
+        if not stereo[index]:
+            return None
+        symbol = '/' if stereo[index] == 1 else '\\'
+        return symbol if bonds[index, 0] == first else ('\\' if symbol == '/' else '/')
+
+    def assign(index: int, first: int, symbol: str):
+        if bonds[index, 0] != first:
+            symbol = '\\' if symbol == '/' else '/'
+        stereo[index] = 1 if symbol == '/' else 2
+
+    for index in np.flatnonzero((record.bond_order == DOUBLE) & ~ring).tolist():
+        x, y = bonds[index].tolist()
+        ends = []
+        for end, other in ((x, y), (y, x)):
+            substituents = [(j, b) for j, b in neighbors[end] if j != other]
+            heavy = [(j, b) for j, b in substituents if z[j] != 1 and record.bond_order[b] == SINGLE]
+            if not heavy or len(substituents) + hydrogens[end] > 2 or \
+                    (len(heavy) == 2 and classes[heavy[0][0]] == classes[heavy[1][0]]):
+                break
+            # Prefer a substituent bond that already carries a direction (conjugated systems)
+            heavy.sort(key=lambda item: not stereo[item[1]])
+            ends.append(heavy[0])
+        if len(ends) != 2:
+            continue
+        (a, bond_a), (b, bond_b) = ends
+        torsion = _dihedral_cosine(coords[a], coords[x], coords[y], coords[b])
+        if torsion is None:
+            continue
+        trans = torsion < 0
+        # Trans: "a / x = y / b" (same symbols); cis: different symbols
+        first, second = direction(bond_a, a), direction(bond_b, y)
+        if first is None and second is None:
+            first = '/'
+            assign(bond_a, a, first)
+        if first is None:
+            first = second if trans else ('\\' if second == '/' else '/')
+            assign(bond_a, a, first)
+        elif second is None:
+            assign(bond_b, y, first if trans else ('\\' if first == '/' else '/'))
+        elif (first == second) != trans:
+            logger.debug(f"Conflicting double-bond directions in {record.name!r}; bond {index} left unspecified")
+    return stereo
+
+
+def _dihedral_cosine(a: np.ndarray, x: np.ndarray, y: np.ndarray, b: np.ndarray) -> Optional[float]:
+    """Cosine of the a-x-y-b dihedral (1 cis, -1 trans), None when (nearly) collinear"""
+    axis = y - x
+    u = np.cross(x - a, axis)
+    v = np.cross(axis, b - y)
+    norm = np.linalg.norm(u) * np.linalg.norm(v)
+    if norm < STEREO_EPSILON:
+        return None
+    return float(np.dot(u, v) / norm)
+
+
+# ---------------------------------------------------------------------------
+# Streaming readers
+
+def detect_format(path: str) -> str:
+    """'sdf' or 'mol2' from a file name (a trailing .gz is ignored)"""
+    stem = path[:-3] if path.lower().endswith('.gz') else path
+    file_format = FORMAT_EXTENSIONS.get(os.path.splitext(stem)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Cannot infer SDF / MOL2 format of {path}")
+    return file_format
+
+
+def _open_text(path: str, mode: str = 'rt'):
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8', errors='replace')
+    return open(path, mode.replace('t', ''), encoding='utf-8', errors='replace')
+
+
+def _parse_block(block: List[str], file_format: str) -> Tuple[Optional[MolRecord], Optional[str]]:
+    try:
+        record = parse_sdf_record(block) if file_format == 'sdf' else parse_mol2_record(block)
+        return record, None
+    except MolFileError as e:
+        return None, str(e)
+
+
+def iter_molecules(lines: Iterable[str], file_format: str) -> Iterator[Tuple[Optional[MolRecord], Optional[str]]]:
+    """
+    Parse SDF or MOL2 records from a line stream (open file, list or text.splitlines())
+
+    Yields:
+        (MolRecord, None) per record, or (None, error) for malformed records
+    """
+    file_format = file_format.lower()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported molecule file format: {file_format}")
+    blocks = iter_sdf_blocks(lines) if file_format == 'sdf' else iter_mol2_blocks(lines)
+    for block in blocks:
+        yield _parse_block(block, file_format)
+
+
+def _is_record_start(line: bytes, previous: Optional[bytes], file_format: str) -> bool:
+    if file_format == 'sdf':
+        return previous is not None and previous.rstrip(b'\r\n') == SDF_DELIMITER.encode()
+    return line.startswith(MOL2_MOLECULE.encode())
+
+
+def record_ranges(path: str, file_format: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Tuple[int, int]]:
+    """
+    Byte ranges of roughly chunk_bytes covering an uncompressed file, each
+    starting at a record boundary
+
+    Only the lines around each cut point are read, so the ranges of a
+    multi-GB file are found without scanning it.
+    """
+    size = os.path.getsize(path)
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            cut = start + max(int(chunk_bytes), 1)
+            if cut >= size:
+                yield start, size
+                return
+            f.seek(cut)
+            previous = f.readline()   # partial line: cannot start a record
+            boundary = size
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if _is_record_start(line, previous, file_format):
+                    boundary = position
+                    break
+                previous = line
+            yield start, boundary
+            start = boundary
+
+
+def _parse_range(task: Tuple[str, str, int, int, Optional[Callable]]) -> List[Any]:
+    path, file_format, start, end, transform = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+    parsed = iter_molecules(text.splitlines(), file_format)
+    return [transform(item) for item in parsed] if transform else list(parsed)
+
+
+def read_molecules(path: str, file_format: Optional[str] = None, processes: int = 1,
+                   chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                   transform: Optional[Callable[[Tuple[Optional[MolRecord], Optional[str]]], Any]] = None) -> Iterator[Any]:
+    """
+    Stream the records of an SDF or MOL2 file in file order
+
+    Args:
+        path: File path; '.gz' files are decompressed on the fly
+        file_format: 'sdf' or 'mol2'; inferred from the extension if omitted
+        processes: Worker processes parsing byte ranges of the file;
+            compressed files are always read serially
+        chunk_bytes: Size of each worker's byte range
+        transform: Optional picklable function applied to every
+            (record, error) pair in the worker, e.g. to return only names and
+            SMILES instead of whole records
+
+    Yields:
+        (MolRecord, None) or (None, error) pairs, or transform results
+    """
+    file_format = (file_format or detect_format(path)).lower()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported molecule file format: {file_format}")
+
+    if processes <= 1 or path.lower().endswith('.gz'):
+        with _open_text(path) as f:
+            for item in iter_molecules(f, file_format):
+                yield transform(item) if transform else item
+        return
+
+    tasks = (((path, file_format, start, end, transform),)
+             for start, end in record_ranges(path, file_format, chunk_bytes))
+    with Pool(processes) as pool:
+        for items in bounded_imap(pool, _parse_range, tasks, per_worker=INFLIGHT_PER_PROCESS):
+            yield from items
+
+
+# ---------------------------------------------------------------------------
+# Writers
+
+def _write_sdf(record: MolRecord) -> str:
+    n, m = record.num_atoms, record.num_bonds
+    if n > 999 or m > 999:
+        raise MolFileError("V2000 records are limited to 999 atoms and bonds")
+    lines = [record.name, '  GeneInsight', '', f"{n:3d}{m:3d}  0  0  0  0  0  0  0  0999 V2000"]
+    charge_codes = {value: code for code, value in V2000_CHARGES.items()}
+    for atom in range(n):
+        x, y, z = record.coordinates[atom]
+        symbol = SYMBOLS.get(int(record.atomic_num[atom]), '*')
+        code = charge_codes.get(int(record.charge[atom]), 0)
+        lines.append(f"{x:10.4f}{y:10.4f}{z:10.4f} {symbol:<3s} 0{code:3d}  0  0  0  0  0  0  0  0  0  0")
+    for (a, b), order, flag in zip(record.bond_atoms.tolist(), record.bond_order.tolist(),
+                                   record.bond_stereo.tolist()):
+        lines.append(f"{a + 1:3d}{b + 1:3d}{4 if order == AROMATIC else order:3d}{flag:3d}  0  0  0")
+    for label, values in (('CHG', record.charge), ('ISO', record.isotope)):
+        atoms = np.flatnonzero(values)
+        for start in range(0, len(atoms), 8):
+            block = atoms[start:start + 8]
+            lines.append(f"M  {label}{len(block):3d}" + ''.join(f" {a + 1:3d} {int(values[a]):3d}" for a in block))
+    lines.append('M  END')
+    for key, value in record.properties.items():
+        lines += [f"> <{key}>", str(value), '']
+    lines.append(SDF_DELIMITER)
+    return '\n'.join(lines) + '\n'
+
+
+def sybyl_types(record: MolRecord) -> List[str]:
+    """SYBYL atom types from elements, bond orders and aromaticity"""
+    neighbors = _neighbor_lists(record)
+    z = record.atomic_num
+    try:
+        aromatic, orders = perceive_aromaticity(record.to_molgraph())
+    except MolFileError:
+        aromatic, orders = [False] * record.num_atoms, record.bond_order.tolist()
+    carbonyl = [any(orders[b] == DOUBLE and z[j] in (8, 16) for j, b in neighbors[i]) for i in range(record.num_atoms)]
+    types = []
+    for atom in range(record.num_atoms):
+        element = SYMBOLS.get(int(z[atom]), 'Du')
+        bond_orders = [orders[b] for _, b in neighbors[atom]]
+        if element == 'C':
+            kind = ('ar' if aromatic[atom] else '1' if TRIPLE in bond_orders or bond_orders.count(DOUBLE) > 1
+                    else '2' if DOUBLE in bond_orders else '3')
+        elif element == 'N':
+            if aromatic[atom]:
+                kind = 'ar'
+            elif record.charge[atom] > 0 and DOUBLE not in bond_orders:
+                kind = '4'
+            elif TRIPLE in bond_orders:
+                kind = '1'
+            elif DOUBLE in bond_orders:
+                kind = '2' if len(bond_orders) < 3 else 'pl3'
+            elif any(carbonyl[j] for j, _ in neighbors[atom]):
+                kind = 'am'
+            elif any(aromatic[j] for j, _ in neighbors[atom]):
+                kind = 'pl3'
+            else:
+                kind = '3'
+        elif element == 'O':
+            center = neighbors[atom][0][0] if len(neighbors[atom]) == 1 else None
+            terminal_oxygens = 0 if center is None else sum(
+                1 for j, _ in neighbors[center] if z[j] == 8 and len(neighbors[j]) == 1)
+            if center is not None and terminal_oxygens >= 2 and z[center] in (6, 15) and \
+                    (record.charge[atom] < 0 or any(record.charge[j] < 0 for j, _ in neighbors[center])):
+                kind = 'co2'
+            else:
+                kind = '2' if DOUBLE in bond_orders else '3'
+        elif element == 'S':
+            oxygens = sum(1 for j, b in neighbors[atom] if z[j] == 8 and orders[b] == DOUBLE)
+            kind = 'O2' if oxygens >= 2 else 'O' if oxygens == 1 else '2' if DOUBLE in bond_orders else '3'
+        elif element == 'P':
+            kind = '3'
+        else:
+            types.append(element)
+            continue
+        types.append(f"{element}.{kind}")
+    return types
+
+
+def _write_mol2(record: MolRecord) -> str:
+    types = record.atom_types or sybyl_types(record)
+    names = record.atom_names or [f"{SYMBOLS.get(int(z), 'Du')}{i + 1}" for i, z in enumerate(record.atomic_num)]
+    partial = record.partial_charges if record.partial_charges is not None else np.zeros(record.num_atoms)
+    lines = [MOL2_MOLECULE, record.name or '*****',
+             f"{record.num_atoms:5d} {record.num_bonds:5d}     1     0     0",
+             record.properties.get('mol_type', 'SMALL'),
+             record.properties.get('charge_type', 'USER_CHARGES' if record.partial_charges is not None else 'NO_CHARGES'),
+             '', '@<TRIPOS>ATOM']
+    for atom in range(record.num_atoms):
+        x, y, z = record.coordinates[atom]
+        lines.append(f"{atom + 1:7d} {names[atom]:<8s}{x:10.4f}{y:10.4f}{z:10.4f} {types[atom]:<8s}"
+                     f"   1 UNL1      {partial[atom]:8.4f}")
+    lines.append('@<TRIPOS>BOND')
+    for index, ((a, b), order) in enumerate(zip(record.bond_atoms.tolist(), record.bond_order.tolist()), 1):
+        kind = 'ar' if order == AROMATIC else str(order)
+        if order == SINGLE and {types[a], types[b]} == {'N.am', 'C.2'}:
+            kind = 'am'
+        lines.append(f"{index:6d} {a + 1:5d} {b + 1:5d} {kind}")
+    return '\n'.join(lines) + '\n'
+
+
+class MoleculeWriter:
+    """
+    Streaming SDF / MOL2 writer
+
+    Usage:
+        with MoleculeWriter('out.sdf.gz') as writer:
+            for record in records:
+                writer.write(record)
+    """
+
+    def __init__(self, target: Union[str, io.TextIOBase], file_format: Optional[str] = None):
+        if isinstance(target, str):
+            self.file_format = (file_format or detect_format(target)).lower()
+            self._file = _open_text(target, 'wt')
+            self._owned = True
+        else:
+            if file_format is None:
+                raise ValueError("file_format is required when writing to an open file")
+            self.file_format = file_format.lower()
+            self._file = target
+            self._owned = False
+        if self.file_format not in FORMATS:
+            raise ValueError(f"Unsupported molecule file format: {self.file_format}")
+        self.count = 0
+
+    def write(self, record: MolRecord):
+        self._file.write(record.to_sdf() if self.file_format == 'sdf' else record.to_mol2())
+        self.count += 1
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+    def __enter__(self) -> 'MoleculeWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_molecules(records: Iterable[MolRecord], target: Union[str, io.TextIOBase],
+                    file_format: Optional[str] = None) -> int:
+    """Write records to an SDF / MOL2 file or open text file; returns the number written"""
+    with MoleculeWriter(target, file_format) as writer:
+        for record in records:
+            writer.write(record)
+        return writer.count
@@ -0,0 +1,38 @@
+"""
+Process pool helpers
+
+Pool.imap submits its whole input up front, which drains a streamed
+library into the task queue before the first result is read. The helper
+here keeps only a bounded number of tasks in flight instead.
+"""
+
+from collections import deque
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+# Tasks in flight per pool worker: one running, one queued behind it
+INFLIGHT_PER_WORKER = 2
+
+
+def bounded_imap(pool: Pool, fn: Callable[..., Any], tasks: Iterable[Tuple[Any, ...]],
+                 per_worker: int = INFLIGHT_PER_WORKER) -> Iterator[Any]:
+    """
+    Apply fn across a pool in input order with a bounded number of tasks in flight
+
+    Args:
+        pool: Running multiprocessing pool
+        fn: Picklable worker function
+        tasks: Argument tuples, one per call; consumed lazily
+        per_worker: Tasks in flight per pool process
+
+    Yields:
+        fn(*task) for each task, in input order
+    """
+    limit = max(1, per_worker * pool._processes)
+    inflight: deque = deque()
+    for args in tasks:
+        inflight.append(pool.apply_async(fn, args))
+        if len(inflight) >= limit:
+            yield inflight.popleft().get()
+    while inflight:
+        yield inflight.popleft().get()
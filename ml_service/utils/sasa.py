@@ -0,0 +1,265 @@
+"""
+Solvent accessible surface area (Shrake-Rupley)
+
+This module provides:
+- Per-atom and per-residue SASA from PDB/PDBQT content or raw arrays
+- Chunked evaluation over a neighbor list so memory stays bounded
+- Buried surface (delta SASA) for protein-ligand complexes, in batch
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .file_utils import parse_pdb
+from .spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+PROBE_RADIUS = 1.4
+DEFAULT_SPHERE_POINTS = 100
+DEFAULT_CHUNK_SIZE = 512
+
+# Bondi van der Waals radii (Å)
+VDW_RADII = {
+    'H': 1.10, 'C': 1.70, 'N': 1.55, 'O': 1.52, 'S': 1.80, 'P': 1.80,
+    'F': 1.47, 'CL': 1.75, 'BR': 1.85, 'I': 1.98, 'SE': 1.90,
+    'MG': 1.73, 'ZN': 1.39, 'FE': 1.94, 'CA': 2.31, 'NA': 2.27, 'K': 2.75
+}
+DEFAULT_RADIUS = 1.80
+
+# AutoDock atom types that do not name their element directly
+AUTODOCK_TYPES = {'A': 'C', 'OA': 'O', 'NA': 'N', 'NS': 'N', 'SA': 'S', 'HD': 'H', 'HS': 'H'}
+
+
+@lru_cache(maxsize=8)
+def sphere_points(n_points: int = DEFAULT_SPHERE_POINTS) -> np.ndarray:
+    """Quasi-uniform unit sphere points on a golden-section spiral"""
+    index = np.arange(n_points, dtype=np.float64) + 0.5
+    z = 1.0 - 2.0 * index / n_points
+    radius = np.sqrt(1.0 - z * z)
+    phi = np.pi * (3.0 - np.sqrt(5.0)) * index
+    points = np.column_stack([radius * np.cos(phi), radius * np.sin(phi), z])
+    points.setflags(write=False)
+    return points
+
+
+def atom_element(atom: Dict[str, Any]) -> str:
+    """Element symbol for a parse_pdb atom record"""
+    element = atom.get('element', '').strip().upper()
+    if element:
+        return AUTODOCK_TYPES.get(element, element)
+    name = atom.get('atom_name', '').strip().upper().lstrip('0123456789')
+    if atom.get('record_type') == 'HETATM' and name[:2] in VDW_RADII:
+        return name[:2]
+    return name[:1] or 'C'
+
+
+def atom_radii(elements: Sequence[str]) -> np.ndarray:
+    """van der Waals radii for a sequence of element symbols"""
+    return np.array([VDW_RADII.get(e.upper(), DEFAULT_RADIUS) for e in elements], dtype=np.float64)
+
+
+def structure_arrays(pdb_data: Any, include_hydrogens: bool = False) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+    """Coordinates, van der Waals radii and atom records for a structure"""
+    parsed = parse_pdb(pdb_data) if isinstance(pdb_data, str) else pdb_data
+    atoms = []
+    elements = []
+    for atom in parsed.get('atoms', []):
+        element = atom_element(atom)
+        if element == 'H' and not include_hydrogens:
+            continue
+        atoms.append(atom)
+        elements.append(element)
+    coords = np.array([[a['x'], a['y'], a['z']] for a in atoms], dtype=np.float64).reshape(-1, 3)
+    return coords, atom_radii(elements), atoms
+
+
+def _neighbor_csr(coords: np.ndarray, radii: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric neighbor lists (atoms whose expanded spheres overlap) in CSR form"""
+    n = len(coords)
+    max_radius = float(radii.max()) if n else 0.0
+    index = SpatialIndex(coords, cell_size=max(2.0 * max_radius, 1.0))
+    i, j, distance = index.pairs_within(2.0 * max_radius, return_distances=True)
+    overlap = distance < radii[i] + radii[j]
+    i, j = i[overlap], j[overlap]
+
+    rows = np.concatenate([i, j])
+    cols = np.concatenate([j, i])
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+    return offsets, cols[order]
+
+
+def shrake_rupley(coords: Any, vdw_radii: Any, probe: float = PROBE_RADIUS,
+                  n_points: int = DEFAULT_SPHERE_POINTS, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  atom_subset: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Per-atom solvent accessible surface area
+
+    Args:
+        coords: (N, 3) atom coordinates
+        vdw_radii: (N,) van der Waals radii
+        probe: Probe radius in Å
+        n_points: Test points per atom sphere
+        chunk_size: Atoms evaluated per vectorized chunk
+        atom_subset: Optional indices of atoms to evaluate (others report 0)
+
+    Returns:
+        (N,) SASA in Å^2
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    radii = np.asarray(vdw_radii, dtype=np.float64) + probe
+    n = len(coords)
+    sasa = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return sasa
+
+    sphere = sphere_points(n_points).astype(np.float32)
+    offsets, neighbors = _neighbor_csr(coords, radii)
+    coords32 = coords.astype(np.float32)
+    radii_sq = (radii * radii).astype(np.float32)
+    targets = np.arange(n) if atom_subset is None else np.asarray(atom_subset, dtype=np.int64)
+
+    for start in range(0, len(targets), chunk_size):
+        atoms = targets[start:start + chunk_size]
+        counts = offsets[atoms + 1] - offsets[atoms]
+        width = int(counts.max()) if len(counts) else 0
+
+        if width == 0:
+            sasa[atoms] = 4.0 * np.pi * radii[atoms] ** 2
+            continue
+
+        # Padded neighbor table: (chunk, K)
+        slot = np.arange(width)
+        valid = slot[None, :] < counts[:, None]
+        table = np.where(valid, offsets[atoms, None] + slot[None, :], 0)
+        nb = np.where(valid, neighbors[np.minimum(table, len(neighbors) - 1)], 0)
+
+        # A test point r_i * s on atom i is inside neighbor k (at c relative
+        # to i) when |r_i s - c|^2 < r_k^2, i.e. s.c > (r_i^2 + |c|^2 - r_k^2) / 2r_i.
+        # All s.c products for the chunk come from one matrix product.
+        rel = coords32[nb] - coords32[atoms, None, :]
+        r_i = radii[atoms, None].astype(np.float32)
+        threshold = (r_i * r_i + np.einsum('akx,akx->ak', rel, rel) - radii_sq[nb]) / (2.0 * r_i)
+        threshold = np.where(valid, threshold, np.inf).astype(np.float32)
+
+        dots = (rel.reshape(-1, 3) @ sphere.T).reshape(len(atoms), width, len(sphere))
+        buried = np.any(dots > threshold[:, :, None], axis=1)
+
+        accessible = 1.0 - buried.mean(axis=1)
+        sasa[atoms] = 4.0 * np.pi * radii[atoms] ** 2 * accessible
+
+    return sasa
+
+
+def residue_sasa(atoms: List[Dict[str, Any]], atom_sasa: np.ndarray) -> List[Dict[str, Any]]:
+    """Sum per-atom SASA into residues, preserving input order"""
+    keys = [(a['chain_id'], a['residue_number'], a['residue_name']) for a in atoms]
+    unique = list(dict.fromkeys(keys))
+    position = {key: i for i, key in enumerate(unique)}
+    totals = np.bincount([position[key] for key in keys], weights=atom_sasa, minlength=len(unique))
+    return [
+        {'chain': chain, 'residue_number': number, 'residue_name': name, 'sasa': round(float(total), 2)}
+        for (chain, number, name), total in zip(unique, totals)
+    ]
+
+
+def compute_sasa(pdb_data: Any, probe: float = PROBE_RADIUS, n_points: int = DEFAULT_SPHERE_POINTS,
+                 include_hydrogens: bool = False, per_residue: bool = True) -> Dict[str, Any]:
+    """
+    SASA for a structure given as PDB/PDBQT content or a parse_pdb result
+
+    Returns:
+        Dictionary with total SASA, per-atom array and optional per-residue list
+    """
+    coords, radii, atoms = structure_arrays(pdb_data, include_hydrogens)
+    atom_sasa = shrake_rupley(coords, radii, probe=probe, n_points=n_points)
+
+    result = {
+        'total_sasa': round(float(atom_sasa.sum()), 2),
+        'num_atoms': len(atoms),
+        'probe_radius': probe,
+        'sphere_points': n_points,
+        'atom_sasa': atom_sasa
+    }
+    if per_residue:
+        result['residues'] = residue_sasa(atoms, atom_sasa)
+    return result
+
+
+def delta_sasa_batch(receptor_pdb: Any, ligands: Sequence[Any], probe: float = PROBE_RADIUS,
+                     n_points: int = DEFAULT_SPHERE_POINTS,
+                     include_hydrogens: bool = False) -> List[Dict[str, Any]]:
+    """
+    Buried surface area for many ligands (or poses) against one receptor
+
+    The free receptor SASA is computed once. For each complex only receptor
+    atoms close enough to the ligand to be occluded are re-evaluated.
+
+    Args:
+        receptor_pdb: Receptor PDB/PDBQT content or parse_pdb result
+        ligands: Ligand PDB/PDBQT contents or parse_pdb results
+
+    Returns:
+        One dictionary per ligand with receptor/ligand buried area and
+        interface residues
+    """
+    r_coords, r_radii, r_atoms = structure_arrays(receptor_pdb, include_hydrogens)
+    r_free = shrake_rupley(r_coords, r_radii, probe=probe, n_points=n_points)
+    receptor_index = SpatialIndex(r_coords, cell_size=2.0 * (float(r_radii.max()) + probe) if len(r_radii) else 5.0)
+    residue_keys = [(a['chain_id'], a['residue_number'], a['residue_name']) for a in r_atoms]
+
+    results = []
+    for ligand in ligands:
+        l_coords, l_radii, _ = structure_arrays(ligand, include_hydrogens)
+        if len(l_coords) == 0:
+            results.append({'error': 'Ligand has no atoms'})
+            continue
+
+        l_free = shrake_rupley(l_coords, l_radii, probe=probe, n_points=n_points)
+
+        # Receptor atoms whose expanded spheres can touch the ligand, plus a
+        # second shell of receptor context that can still occlude them
+        reach = float(l_radii.max() + r_radii.max()) + 2.0 * probe
+        context_reach = reach + 2.0 * (float(r_radii.max()) + probe)
+        q_near, near = receptor_index.query_radius(l_coords, context_reach, return_distances=True)[:2]
+        distances = np.linalg.norm(r_coords[near] - l_coords[q_near], axis=1)
+        context = np.unique(near)
+        near = np.unique(near[distances <= reach])
+
+        coords = np.vstack([r_coords[context], l_coords])
+        radii = np.concatenate([r_radii[context], l_radii])
+        near_local = np.searchsorted(context, near)
+        ligand_local = len(context) + np.arange(len(l_coords))
+        complex_sasa = shrake_rupley(coords, radii, probe=probe, n_points=n_points,
+                                     atom_subset=np.concatenate([near_local, ligand_local]))
+
+        r_bound = complex_sasa[near_local]
+        l_bound = complex_sasa[ligand_local]
+        r_buried = r_free[near] - r_bound
+
+        interface = {}
+        for atom_idx, buried in zip(near, r_buried):
+            if buried > 0.0:
+                key = residue_keys[atom_idx]
+                interface[key] = interface.get(key, 0.0) + float(buried)
+
+        receptor_buried = float(r_buried.sum())
+        ligand_buried = float(l_free.sum() - l_bound.sum())
+        results.append({
+            'receptor_buried_sasa': round(receptor_buried, 2),
+            'ligand_buried_sasa': round(ligand_buried, 2),
+            'delta_sasa': round(receptor_buried + ligand_buried, 2),
+            'ligand_sasa_free': round(float(l_free.sum()), 2),
+            'ligand_buried_fraction': round(ligand_buried / float(l_free.sum()), 3) if l_free.sum() > 0 else 0.0,
+            'interface_residues': [
+                {'chain': chain, 'residue_number': number, 'residue_name': name, 'buried_sasa': round(area, 2)}
+                for (chain, number, name), area in sorted(interface.items(), key=lambda item: -item[1])
+            ]
+        })
+
+    return results
@@ -0,0 +1,548 @@
+"""
+SMILES tokenizer and molecular graph
+
+This module turns SMILES strings into compact array-backed graphs:
+- Single-pass regex tokenizer with error positions
+- Parser for the OpenSMILES grammar subset used by compound libraries:
+  organic and bracket atoms, isotopes, chirality, explicit hydrogens,
+  charges, branches, ring closures (including %nn), disconnected
+  components and bond symbols
+- Implicit hydrogens from default valences, aromatic flags and ring bond
+  membership derived during parsing (the parse tree is a spanning forest,
+  so each ring closure marks its fundamental cycle)
+- Batch parsing across processes for large libraries
+"""
+
+import re
+import logging
+from multiprocessing import Pool
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from .parallel import bounded_imap
+
+logger = logging.getLogger(__name__)
+
+# Bond order codes stored in MolGraph.bond_order
+SINGLE = 1
+DOUBLE = 2
+TRIPLE = 3
+QUADRUPLE = 4
+AROMATIC = 5
+
+BOND_SYMBOLS = {'-': SINGLE, '=': DOUBLE, '#': TRIPLE, '$': QUADRUPLE, ':': AROMATIC,
+                '/': SINGLE, '\\': SINGLE}
+
+# Valence used by each bond order when deriving implicit hydrogens
+BOND_VALENCE = np.array([0, 1, 2, 3, 4, 1], dtype=np.int8)
+
+# Symbol -> (atomic number, standard atomic weight)
+ELEMENTS = {
+    '*': (0, 0.0), 'H': (1, 1.008), 'He': (2, 4.003), 'Li': (3, 6.94), 'Be': (4, 9.012), 'B': (5, 10.81),
+    'C': (6, 12.011), 'N': (7, 14.007), 'O': (8, 15.999), 'F': (9, 18.998), 'Ne': (10, 20.18),
+    'Na': (11, 22.99), 'Mg': (12, 24.305), 'Al': (13, 26.982), 'Si': (14, 28.085), 'P': (15, 30.974),
+    'S': (16, 32.06), 'Cl': (17, 35.45), 'Ar': (18, 39.948), 'K': (19, 39.098), 'Ca': (20, 40.078),
+    'Ti': (22, 47.867), 'V': (23, 50.942), 'Cr': (24, 51.996), 'Mn': (25, 54.938), 'Fe': (26, 55.845),
+    'Co': (27, 58.933), 'Ni': (28, 58.693), 'Cu': (29, 63.546), 'Zn': (30, 65.38), 'Ga': (31, 69.723),
+    'Ge': (32, 72.63), 'As': (33, 74.922), 'Se': (34, 78.971), 'Br': (35, 79.904), 'Kr': (36, 83.798),
+    'Rb': (37, 85.468), 'Sr': (38, 87.62), 'Zr': (40, 91.224), 'Mo': (42, 95.95), 'Ru': (44, 101.07),
+    'Rh': (45, 102.91), 'Pd': (46, 106.42), 'Ag': (47, 107.87), 'Cd': (48, 112.41), 'In': (49, 114.82),
+    'Sn': (50, 118.71), 'Sb': (51, 121.76), 'Te': (52, 127.6), 'I': (53, 126.904), 'Xe': (54, 131.29),
+    'Cs': (55, 132.91), 'Ba': (56, 137.33), 'Gd': (64, 157.25), 'Pt': (78, 195.08), 'Au': (79, 196.97),
+    'Hg': (80, 200.59), 'Tl': (81, 204.38), 'Pb': (82, 207.2), 'Bi': (83, 208.98)
+}
+SYMBOLS = {number: symbol for symbol, (number, _) in ELEMENTS.items()}
+ATOMIC_WEIGHTS = np.zeros(max(SYMBOLS) + 1, dtype=np.float64)
+for _number, _symbol in SYMBOLS.items():
+    ATOMIC_WEIGHTS[_number] = ELEMENTS[_symbol][1]
+
+# Default valences of the organic subset (implicit hydrogens fill up to the
+# smallest valence that accommodates the explicit bonds)
+DEFAULT_VALENCES = {5: (3,), 6: (4,), 7: (3, 5), 8: (2,), 9: (1,), 15: (3, 5), 16: (2, 4, 6),
+                    17: (1,), 35: (1,), 53: (1,)}
+
+ORGANIC_SUBSET = {'B', 'C', 'N', 'O', 'P', 'S', 'F', 'Cl', 'Br', 'I'}
+
+# Unbracketed atom token -> (atomic number, aromatic)
+_ORGANIC_ATOMS = {symbol: (ELEMENTS[symbol][0], False) for symbol in ORGANIC_SUBSET}
+_ORGANIC_ATOMS.update({symbol: (ELEMENTS[symbol.upper()][0], True) for symbol in 'bcnops'})
+_ORGANIC_ATOMS['*'] = (0, False)
+
+_TOKEN = re.compile(r'\[[^\]]*\]|Br|Cl|[BCNOPSFI]|[bcnops]|\*|%\d\d|\d|[-=#$:/\\]|[().]')
+_BRACKET = re.compile(
+    r'\[(?P<isotope>\d+)?(?P<symbol>[A-Z][a-z]?|se|as|te|[bcnops]|\*)'
+    r'(?P<chiral>@(?:@|TH[12]|AL[12]|SP[123]|TB\d{1,2}|OH\d{1,2})?)?'
+    r'(?P<hcount>H\d?)?(?P<charge>\+\+?|--?|[+-]\d{1,2})?(?::(?P<atom_class>\d+))?\]$'
+)
+
+CHIRAL_NONE = 0
+CHIRAL_CCW = 1   # '@'
+CHIRAL_CW = 2    # '@@'
+CHIRAL_OTHER = 3
+
+
+class SmilesError(ValueError):
+    """Invalid SMILES, with the character position of the problem"""
+
+    def __init__(self, message: str, smiles: str = '', position: Optional[int] = None):
+        self.smiles = smiles
+        self.position = position
+        where = f" at position {position}" if position is not None else ''
+        super().__init__(f"{message}{where}")
+
+
+def tokenize_smiles(smiles: str) -> List[str]:
+    """
+    Split a SMILES string into atom, bond, branch and ring-closure tokens
+
+    Raises:
+        SmilesError: On characters that cannot start a token
+    """
+    tokens = _TOKEN.findall(smiles)
+    if sum(map(len, tokens)) == len(smiles):
+        return tokens
+
+    # Some characters were skipped; locate the first one for the error
+    position = 0
+    for match in _TOKEN.finditer(smiles):
+        if match.start() != position:
+            break
+        position = match.end()
+    raise SmilesError(f"Unexpected character {smiles[position]!r}", smiles, position)
+
+
+class MolGraph:
+    """
+    Molecular graph stored as NumPy arrays
+
+    Atoms:
+        atomic_num (int16), charge (int8), hydrogens (int8, implicit plus
+        bracket hydrogens), aromatic (bool), isotope (int16, 0 = natural),
+        chiral (int8, CHIRAL_* codes)
+    Bonds:
+        bond_atoms (M, 2) int32, bond_order (int8, SINGLE..AROMATIC codes),
+        bond_stereo (int8, 0 / 1 for '/' / 2 for '\\'), ring_bond (bool),
+        ring_closure (bool, bond written as a ring-closure digit) and
+        aromatic_cycle (bool, ring closure whose fundamental cycle is fully
+        aromatic)
+    Stereo:
+        bond_stereo directions read as "bond_atoms[i, 0] <symbol>
+        bond_atoms[i, 1]"; chiral_centers (K, 5) int32 rows of
+        [atom, neighbors in written order], with -1 for an implicit
+        hydrogen or lone pair and -2 as padding
+    """
+
+    __slots__ = ('smiles', 'atomic_num', 'charge', 'hydrogens', 'aromatic', 'isotope', 'chiral',
+                 'bond_atoms', 'bond_order', 'bond_stereo', 'ring_bond', 'ring_closure', 'aromatic_cycle',
+                 'chiral_centers', 'num_components', '_adjacency')
+
+    def __init__(self, smiles: str, atomic_num, charge, hydrogens, aromatic, isotope, chiral,
+                 bond_atoms, bond_order, bond_stereo, ring_bond, ring_closure, aromatic_cycle,
+                 num_components: int, chiral_centers=None):
+        self.smiles = smiles
+        self.atomic_num = np.asarray(atomic_num, dtype=np.int16)
+        self.charge = np.asarray(charge, dtype=np.int8)
+        self.hydrogens = np.asarray(hydrogens, dtype=np.int8)
+        self.aromatic = np.asarray(aromatic, dtype=bool)
+        self.isotope = np.asarray(isotope, dtype=np.int16)
+        self.chiral = np.asarray(chiral, dtype=np.int8)
+        self.bond_atoms = np.asarray(bond_atoms, dtype=np.int32).reshape(-1, 2)
+        self.bond_order = np.asarray(bond_order, dtype=np.int8)
+        self.bond_stereo = np.asarray(bond_stereo, dtype=np.int8)
+        self.ring_bond = np.asarray(ring_bond, dtype=bool)
+        self.ring_closure = np.asarray(ring_closure, dtype=bool)
+        self.aromatic_cycle = np.asarray(aromatic_cycle, dtype=bool)
+        self.chiral_centers = (np.zeros((0, 5), dtype=np.int32) if chiral_centers is None
+                               else np.asarray(chiral_centers, dtype=np.int32).reshape(-1, 5))
+        self.num_components = num_components
+        self._adjacency = None
+
+    # Pickled as two byte buffers: per-array pickling dominates the cost of
+    # returning graphs from worker processes
+    _ATOM_FIELDS = (('atomic_num', np.int16), ('charge', np.int8), ('hydrogens', np.int8),
+                    ('aromatic', bool), ('isotope', np.int16), ('chiral', np.int8))
+    _BOND_FIELDS = (('bond_atoms', np.int32), ('bond_order', np.int8), ('bond_stereo', np.int8),
+                    ('ring_bond', bool), ('ring_closure', bool), ('aromatic_cycle', bool))
+
+    def __getstate__(self):
+        atoms = b''.join(getattr(self, name).tobytes() for name, _ in self._ATOM_FIELDS)
+        bonds = b''.join(getattr(self, name).tobytes() for name, _ in self._BOND_FIELDS)
+        return (self.smiles, self.num_components, self.num_atoms, self.num_bonds, atoms, bonds,
+                self.chiral_centers.tobytes())
+
+    def __setstate__(self, state):
+        self.smiles, self.num_components, num_atoms, num_bonds, atoms, bonds, centers = state
+        self.chiral_centers = np.frombuffer(centers, dtype=np.int32).reshape(-1, 5)
+        for fields, buffer, count in ((self._ATOM_FIELDS, atoms, num_atoms), (self._BOND_FIELDS, bonds, num_bonds)):
+            offset = 0
+            for name, dtype in fields:
+                size = count * (2 if name == 'bond_atoms' else 1)
+                array = np.frombuffer(buffer, dtype=dtype, count=size, offset=offset)
+                offset += array.nbytes
+                setattr(self, name, array.reshape(-1, 2) if name == 'bond_atoms' else array)
+        self._adjacency = None
+
+    def __repr__(self) -> str:
+        return f"MolGraph({self.smiles!r}, atoms={self.num_atoms}, bonds={self.num_bonds})"
+
+    @property
+    def num_atoms(self) -> int:
+        return len(self.atomic_num)
+
+    @property
+    def num_bonds(self) -> int:
+        return len(self.bond_order)
+
+    @property
+    def num_rings(self) -> int:
+        """Cyclomatic number (size of the smallest set of smallest rings)"""
+        return int(self.ring_closure.sum())
+
+    @property
+    def symbols(self) -> List[str]:
+        return [SYMBOLS[int(z)] for z in self.atomic_num]
+
+    def adjacency(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Neighbor lists in CSR form
+
+        Returns:
+            (offsets (N+1,), neighbors (2M,), bond index of each neighbor entry (2M,))
+        """
+        if self._adjacency is None:
+            n = self.num_atoms
+            rows = np.concatenate([self.bond_atoms[:, 0], self.bond_atoms[:, 1]])
+            cols = np.concatenate([self.bond_atoms[:, 1], self.bond_atoms[:, 0]])
+            bonds = np.concatenate([np.arange(self.num_bonds)] * 2)
+            order = np.argsort(rows, kind='stable')
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+            self._adjacency = (offsets, cols[order], bonds[order])
+        return self._adjacency
+
+    def degree(self) -> np.ndarray:
+        """Number of explicit neighbors of each atom"""
+        return np.bincount(self.bond_atoms.reshape(-1), minlength=self.num_atoms)
+
+    def heavy_atoms(self) -> np.ndarray:
+        return self.atomic_num > 1
+
+    def formula(self) -> str:
+        """Molecular formula in Hill order"""
+        counts: Dict[str, int] = {}
+        for z, count in zip(*np.unique(self.atomic_num[self.atomic_num > 0], return_counts=True)):
+            counts[SYMBOLS[int(z)]] = int(count)
+        hydrogens = int(self.hydrogens.sum())
+        if hydrogens:
+            counts['H'] = counts.get('H', 0) + hydrogens
+
+        if 'C' in counts:
+            order = ['C'] + (['H'] if 'H' in counts else []) + sorted(k for k in counts if k not in ('C', 'H'))
+        else:
+            order = sorted(counts)
+        formula = ''.join(f"{symbol}{counts[symbol] if counts[symbol] > 1 else ''}" for symbol in order)
+        charge = int(self.charge.sum())
+        if charge:
+            formula += ('+' if charge > 0 else '-') + (str(abs(charge)) if abs(charge) > 1 else '')
+        return formula
+
+    def molecular_weight(self) -> float:
+        """Average molecular weight including implicit hydrogens"""
+        return float(ATOMIC_WEIGHTS[self.atomic_num].sum() + self.hydrogens.sum() * ATOMIC_WEIGHTS[1])
+
+
+def _parse_charge(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    sign = 1 if text[0] == '+' else -1
+    if len(text) > 1 and text[1].isdigit():
+        return sign * int(text[1:])
+    return sign * len(text)
+
+
+def _implicit_hydrogens(atomic_num: int, aromatic: bool, used_valence: int) -> int:
+    valences = DEFAULT_VALENCES.get(atomic_num)
+    if not valences:
+        return 0
+    if aromatic:
+        # One valence goes to the pi system; lone-pair donors (s, o, n-R) get none
+        return max(valences[0] - used_valence - 1, 0)
+    used = used_valence
+    for valence in valences:
+        if valence >= used:
+            return valence - used
+    return 0
+
+
+def parse_smiles(smiles: str) -> MolGraph:
+    """
+    Parse a SMILES string into a MolGraph in one pass over its tokens
+
+    Raises:
+        SmilesError: On syntax errors, unknown elements, unbalanced branches
+            or unclosed rings
+    """
+    if not isinstance(smiles, str) or not smiles.strip():
+        raise SmilesError("Empty SMILES string", str(smiles))
+    smiles = smiles.strip()
+
+    atomic_num: List[int] = []
+    charge: List[int] = []
+    bracket_h: List[int] = []   # -1 for organic-subset atoms (implicit hydrogens)
+    aromatic: List[bool] = []
+    isotope: List[int] = []
+    chiral: List[int] = []
+    parent: List[int] = []
+    parent_bond: List[int] = []
+    depth: List[int] = []
+
+    bond_a: List[int] = []
+    bond_b: List[int] = []
+    bond_order: List[int] = []
+    bond_stereo: List[int] = []
+    ring_bond: List[bool] = []
+    ring_closure: List[bool] = []
+    aromatic_cycle: List[bool] = []
+    implicit_aromatic: List[int] = []   # Unwritten bonds between two aromatic atoms
+    bond_lookup = set()
+
+    previous = -1
+    branches: List[int] = []
+    pending_bond: Optional[str] = None
+    open_rings: Dict[str, Tuple[int, Optional[str], int, int]] = {}
+    # Written neighbor order of chiral atoms (None marks a ring bond not yet closed)
+    chiral_order: Dict[int, List[Optional[int]]] = {}
+    components = 0
+    position = 0
+
+    def add_bond(a: int, b: int, symbol: Optional[str], at: int, reverse: bool = False) -> int:
+        if a == b:
+            raise SmilesError("Atom bonded to itself", smiles, at)
+        key = (a, b) if a < b else (b, a)
+        if key in bond_lookup:
+            raise SmilesError("Duplicate bond", smiles, at)
+        bond_lookup.add(key)
+        if symbol is None:
+            order = AROMATIC if aromatic[a] and aromatic[b] else SINGLE
+            if order == AROMATIC:
+                implicit_aromatic.append(len(bond_order))
+        else:
+            order = BOND_SYMBOLS[symbol]
+        bond_a.append(a)
+        bond_b.append(b)
+        bond_order.append(order)
+        direction = 1 if symbol == '/' else 2 if symbol == '\\' else 0
+        # Stored relative to a -> b; reverse when the symbol was written b -> a
+        bond_stereo.append(3 - direction if reverse and direction else direction)
+        ring_bond.append(False)
+        ring_closure.append(False)
+        aromatic_cycle.append(False)
+        return len(bond_order) - 1
+
+    for token in tokenize_smiles(smiles):
+        first = token[0]
+        if first == '[' or first.isalpha() or first == '*':
+            if first == '[':
+                match = _BRACKET.match(token)
+                if match is None:
+                    raise SmilesError(f"Invalid bracket atom {token}", smiles, position)
+                symbol = match.group('symbol')
+                is_aromatic = symbol.islower() and symbol != '*'
+                element = symbol.capitalize() if is_aromatic else symbol
+                if element not in ELEMENTS:
+                    raise SmilesError(f"Unknown element {symbol}", smiles, position)
+                hcount = match.group('hcount')
+                chiral_text = match.group('chiral')
+                atomic_num.append(ELEMENTS[element][0])
+                charge.append(_parse_charge(match.group('charge')))
+                bracket_h.append(0 if not hcount else int(hcount[1:] or 1))
+                isotope.append(int(match.group('isotope') or 0))
+                chiral.append(CHIRAL_NONE if not chiral_text else CHIRAL_CCW if chiral_text == '@'
+                              else CHIRAL_CW if chiral_text == '@@' else CHIRAL_OTHER)
+            else:
+                number, is_aromatic = _ORGANIC_ATOMS[token]
+                atomic_num.append(number)
+                charge.append(0)
+                bracket_h.append(-1)
+                isotope.append(0)
+                chiral.append(CHIRAL_NONE)
+            aromatic.append(is_aromatic)
+
+            atom = len(atomic_num) - 1
+            if chiral[atom] in (CHIRAL_CCW, CHIRAL_CW):
+                chiral_order[atom] = ([previous] if previous >= 0 else []) + ([-1] if bracket_h[atom] > 0 else [])
+            if previous >= 0:
+                if previous in chiral_order:
+                    chiral_order[previous].append(atom)
+                bond = add_bond(previous, atom, pending_bond, position)
+                parent.append(previous)
+                parent_bond.append(bond)
+                depth.append(depth[previous] + 1)
+            else:
+                if pending_bond is not None:
+                    raise SmilesError("Bond without a preceding atom", smiles, position)
+                components += 1
+                parent.append(-1)
+                parent_bond.append(-1)
+                depth.append(0)
+            pending_bond = None
+            previous = atom
+
+        elif first == '%' or first.isdigit():
+            if previous < 0:
+                raise SmilesError("Ring closure without a preceding atom", smiles, position)
+            label = token
+            if label in open_rings:
+                start, start_bond, _, slot = open_rings.pop(label)
+                if pending_bond and start_bond and BOND_SYMBOLS[pending_bond] != BOND_SYMBOLS[start_bond]:
+                    raise SmilesError("Conflicting ring-closure bond orders", smiles, position)
+                if start in chiral_order:
+                    chiral_order[start][slot] = previous
+                if previous in chiral_order:
+                    chiral_order[previous].append(start)
+                bond = add_bond(start, previous, start_bond or pending_bond, position,
+                                reverse=start_bond is None)
+                ring_closure[bond] = True
+                ring_bond[bond] = True
+
+                # Walk both ends up the parse tree to mark the fundamental cycle
+                x, y = start, previous
+                all_aromatic = aromatic[x] and aromatic[y]
+                while x != y:
+                    if depth[x] >= depth[y]:
+                        ring_bond[parent_bond[x]] = True
+                        x = parent[x]
+                    else:
+                        ring_bond[parent_bond[y]] = True
+                        y = parent[y]
+                    all_aromatic = all_aromatic and aromatic[x] and aromatic[y]
+                aromatic_cycle[bond] = all_aromatic
+            else:
+                slot = -1
+                if previous in chiral_order:
+                    chiral_order[previous].append(None)
+                    slot = len(chiral_order[previous]) - 1
+                open_rings[label] = (previous, pending_bond, position, slot)
+            pending_bond = None
+
+        elif first == '(':
+            if previous < 0:
+                raise SmilesError("Branch without a preceding atom", smiles, position)
+            branches.append(previous)
+        elif first == ')':
+            if not branches:
+                raise SmilesError("Unbalanced ')'", smiles, position)
+            if pending_bond is not None:
+                raise SmilesError("Bond at the end of a branch", smiles, position)
+            previous = branches.pop()
+        elif first == '.':
+            if pending_bond is not None:
+                raise SmilesError("Bond before '.'", smiles, position)
+            previous = -1
+        else:
+            if pending_bond is not None:
+                raise SmilesError("Consecutive bond symbols", smiles, position)
+            pending_bond = token
+        position += len(token)
+
+    if branches:
+        raise SmilesError("Unbalanced '('", smiles)
+    if open_rings:
+        label, (_, _, at, _) = next(iter(open_rings.items()))
+        raise SmilesError(f"Unclosed ring {label}", smiles, at)
+    if pending_bond is not None:
+        raise SmilesError("SMILES ends with a bond", smiles)
+    if not atomic_num:
+        raise SmilesError("SMILES has no atoms", smiles)
+
+    # An unwritten bond between aromatic atoms is aromatic only inside a
+    # ring; between rings (biphenyl c1ccccc1c1ccccc1) it is single
+    for bond in implicit_aromatic:
+        if not ring_bond[bond]:
+            bond_order[bond] = SINGLE
+
+    # Implicit hydrogens for organic-subset atoms
+    n = len(atomic_num)
+    used = [0] * n
+    for a, b, order in zip(bond_a, bond_b, bond_order):
+        valence = BOND_VALENCE[order]
+        used[a] += valence
+        used[b] += valence
+    hydrogens = [count if count >= 0 else _implicit_hydrogens(atomic_num[i], aromatic[i], used[i])
+                 for i, count in enumerate(bracket_h)]
+
+    # A lone pair on a three-coordinate center counts like an implicit H
+    centers = []
+    for atom, neighbors in chiral_order.items():
+        if len(neighbors) == 3 and -1 not in neighbors:
+            neighbors.insert(1 if parent[atom] >= 0 else 0, -1)
+        if len(neighbors) == 4:
+            centers.append([atom] + neighbors)
+
+    return MolGraph(
+        smiles, atomic_num, charge, hydrogens, aromatic, isotope, chiral,
+        list(zip(bond_a, bond_b)), bond_order, bond_stereo, ring_bond, ring_closure, aromatic_cycle,
+        components, chiral_centers=centers
+    )
+
+
+def try_parse_smiles(smiles: str) -> Tuple[Optional[MolGraph], Optional[str]]:
+    """parse_smiles that returns (graph, None) or (None, error message)"""
+    try:
+        return parse_smiles(smiles), None
+    except SmilesError as e:
+        return None, str(e)
+
+
+def _parse_chunk(chunk: List[str]) -> List[Tuple[Optional[MolGraph], Optional[str]]]:
+    return [try_parse_smiles(smiles) for smiles in chunk]
+
+
+def iter_parse_smiles(smiles: Iterable[str], processes: int = 1,
+                      chunk_size: int = 2000) -> Iterator[Tuple[Optional[MolGraph], Optional[str]]]:
+    """
+    Parse a stream of SMILES, in input order, optionally across processes
+
+    Input is consumed lazily in chunks, with at most two chunks per worker
+    in flight, so arbitrarily large libraries can be streamed.
+
+    Yields:
+        (graph, None) for each valid SMILES, (None, error) otherwise
+    """
+    def chunks() -> Iterator[List[str]]:
+        chunk: List[str] = []
+        for item in smiles:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if processes <= 1:
+        for chunk in chunks():
+            yield from _parse_chunk(chunk)
+        return
+
+    with Pool(processes) as pool:
+        for parsed in bounded_imap(pool, _parse_chunk, ((chunk,) for chunk in chunks())):
+            yield from parsed
+
+
+def parse_smiles_batch(smiles: Iterable[str], processes: int = 1,
+                       chunk_size: int = 2000) -> Dict[str, Any]:
+    """
+    Parse many SMILES at once
+
+    Returns:
+        {'graphs': list with a MolGraph or None per input,
+         'errors': {index: message} for the inputs that failed}
+    """
+    graphs: List[Optional[MolGraph]] = []
+    errors: Dict[int, str] = {}
+    for index, (graph, error) in enumerate(iter_parse_smiles(smiles, processes, chunk_size)):
+        graphs.append(graph)
+        if error is not None:
+            errors[index] = error
+    return {'graphs': graphs, 'errors': errors}
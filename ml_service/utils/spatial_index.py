@@ -0,0 +1,471 @@
+"""
+Spatial neighbor index over atomic coordinates
+
+This module answers neighborhood questions ("which atoms are within 5 Å of X")
+for parsed structures:
+- Uniform cell grid with sorted cell keys (works for sparse boxes)
+- KD-tree fallback via SciPy when available
+- Radius, k-nearest and all-pairs-within-cutoff queries returning NumPy arrays
+- Index builds cached by structure hash
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from .file_utils import parse_pdb
+
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    cKDTree = None
+    SCIPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CELL_SIZE = 5.0
+
+# Upper bound on candidate pairs materialised at once by grid queries
+MAX_CANDIDATES_PER_CHUNK = 4_000_000
+
+# Grid queries whose radius spans more cells than this go to the KD-tree
+MAX_GRID_SPAN = 2
+
+INDEX_CACHE_SIZE = 32
+
+# 21 bits per axis leaves room for boxes of 2M cells along each dimension
+_AXIS_BITS = 21
+_AXIS_MASK = (1 << _AXIS_BITS) - 1
+
+
+def coordinates_from_pdb(pdb_data: Any, atom_names: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Extract an (N, 3) coordinate array from PDB text or a parse_pdb result
+
+    Args:
+        pdb_data: PDB file content or the dictionary returned by parse_pdb
+        atom_names: Optional atom names to keep (e.g. ['CA'])
+
+    Returns:
+        float64 array of shape (N, 3)
+    """
+    parsed = parse_pdb(pdb_data) if isinstance(pdb_data, str) else pdb_data
+    atoms = parsed.get('atoms', [])
+    if atom_names is not None:
+        wanted = set(atom_names)
+        atoms = [atom for atom in atoms if atom['atom_name'] in wanted]
+    return np.array([[atom['x'], atom['y'], atom['z']] for atom in atoms],
+                    dtype=np.float64).reshape(-1, 3)
+
+
+def coordinates_hash(coords: np.ndarray) -> str:
+    """Stable content hash of a coordinate array"""
+    array = np.ascontiguousarray(coords, dtype=np.float64)
+    digest = hashlib.sha1(array.tobytes())
+    digest.update(str(array.shape).encode())
+    return digest.hexdigest()
+
+
+def _encode(cells: np.ndarray) -> np.ndarray:
+    return (cells[..., 0] << (2 * _AXIS_BITS)) | (cells[..., 1] << _AXIS_BITS) | cells[..., 2]
+
+
+def _offsets(span: int, half: bool = False) -> np.ndarray:
+    r = np.arange(-span, span + 1)
+    grid = np.stack(np.meshgrid(r, r, r, indexing='ij'), axis=-1).reshape(-1, 3)
+    if half:
+        # Keep (0,0,0) and one of each +/- offset pair
+        base = 2 * span + 1
+        code = grid[:, 0] * base * base + grid[:, 1] * base + grid[:, 2]
+        grid = grid[code >= 0]
+    return grid.astype(np.int64)
+
+
+class SpatialIndex:
+    """Neighbor search index over a fixed set of 3D points"""
+
+    def __init__(self, coords: Any, cell_size: float = DEFAULT_CELL_SIZE, method: str = 'auto'):
+        """
+        Build the index
+
+        Args:
+            coords: (N, 3) coordinates
+            cell_size: Grid cell edge in Å; queries with radius <= cell_size
+                visit only the 27 surrounding cells
+            method: 'grid', 'kdtree' or 'auto'
+        """
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        if self.cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        if method not in ('auto', 'grid', 'kdtree'):
+            raise ValueError(f"Unknown spatial index method: {method}")
+        if method == 'kdtree' and not SCIPY_AVAILABLE:
+            raise ImportError("scipy is required for the KD-tree spatial index")
+
+        self.method = method
+        self.size = len(self.coords)
+        self._tree = None
+        self._build_grid()
+
+    def _build_grid(self):
+        """Sort points by cell key and record where each occupied cell starts"""
+        if self.size == 0:
+            self.origin = np.zeros(3)
+            self.cell_keys = np.empty(0, dtype=np.int64)
+            self.cell_starts = np.empty(0, dtype=np.int64)
+            self.cell_counts = np.empty(0, dtype=np.int64)
+            self.order = np.empty(0, dtype=np.int64)
+            self.sorted_coords = self.coords
+            self._coords32 = self.coords.astype(np.float32)
+            return
+
+        # One cell of padding keeps neighbour offsets non-negative
+        self.origin = self.coords.min(axis=0) - self.cell_size
+        cells = self._cells_for(self.coords)
+        if cells.max() >= _AXIS_MASK:
+            raise ValueError("Structure extent is too large for the chosen cell size")
+
+        keys = _encode(cells)
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        self.sorted_coords = self.coords[self.order]
+        self._coords32 = self.sorted_coords.astype(np.float32)
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            sorted_keys, return_index=True, return_counts=True
+        )
+
+    def _cells_for(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    @property
+    def tree(self):
+        """Lazily built KD-tree (requires SciPy)"""
+        if self._tree is None:
+            if not SCIPY_AVAILABLE:
+                raise ImportError("scipy is required for the KD-tree spatial index")
+            self._tree = cKDTree(self.coords)
+        return self._tree
+
+    def _use_tree(self, radius: Optional[float]) -> bool:
+        if self.method == 'kdtree':
+            return True
+        if self.method == 'grid' or not SCIPY_AVAILABLE:
+            return False
+        return radius is None or np.ceil(radius / self.cell_size) > MAX_GRID_SPAN
+
+    def _lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Map cell keys to positions in the occupied-cell table"""
+        if len(self.cell_keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self.cell_keys, keys)
+        pos = np.minimum(pos, len(self.cell_keys) - 1)
+        return pos, self.cell_keys[pos] == keys
+
+    def _expand(self, owners: np.ndarray, cells: np.ndarray):
+        """
+        Expand (owner, occupied cell) pairs into (owner, sorted point) candidates
+
+        Yields chunks so that at most MAX_CANDIDATES_PER_CHUNK candidates are
+        materialised at a time.
+        """
+        counts = self.cell_counts[cells]
+        bounds = np.cumsum(counts)
+        start = 0
+        while start < len(owners):
+            base = bounds[start - 1] if start else 0
+            stop = int(np.searchsorted(bounds, base + MAX_CANDIDATES_PER_CHUNK, side='right'))
+            stop = max(stop, start + 1)
+
+            chunk_counts = counts[start:stop]
+            total = int(chunk_counts.sum())
+            owner_rep = np.repeat(owners[start:stop], chunk_counts)
+            first = np.repeat(self.cell_starts[cells[start:stop]], chunk_counts)
+            local = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            yield owner_rep, first + local
+            start = stop
+
+    def _grid_candidates(self, points: np.ndarray, radius: float):
+        """Yield (query index, sorted point index, squared distance) within radius"""
+        span = max(1, int(np.ceil(radius / self.cell_size)))
+        query_cells = self._cells_for(points)
+        r_sq = radius * radius
+
+        for offset in _offsets(span):
+            neighbour = query_cells + offset
+            valid = np.all((neighbour >= 0) & (neighbour < _AXIS_MASK), axis=1)
+            pos, found = self._lookup(_encode(np.where(valid[:, None], neighbour, 0)))
+            found &= valid
+            owners = np.flatnonzero(found)
+            if len(owners) == 0:
+                continue
+            for q, p in self._expand(owners, pos[owners]):
+                diff = self.sorted_coords[p] - points[q]
+                d_sq = np.einsum('ij,ij->i', diff, diff)
+                keep = d_sq <= r_sq
+                yield q[keep], p[keep], d_sq[keep]
+
+    def query_radius(self, points: Any, radius: float,
+                     return_distances: bool = False) -> Tuple[np.ndarray, ...]:
+        """
+        Find all indexed points within radius of each query point
+
+        Args:
+            points: (Q, 3) query coordinates (a single (3,) point is accepted)
+            radius: Search radius in Å
+            return_distances: Also return the distances
+
+        Returns:
+            (query_idx, point_idx[, distances]) flat arrays sorted by query index
+        """
+        queries = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        if self.size == 0 or len(queries) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, empty, np.empty(0)) if return_distances else (empty, empty)
+
+        if self._use_tree(radius):
+            neighbours = self.tree.query_ball_point(queries, radius)
+            lengths = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+            q_idx = np.repeat(np.arange(len(queries)), lengths)
+            p_idx = np.fromiter((i for n in neighbours for i in n), dtype=np.int64, count=int(lengths.sum()))
+            d_sq = np.sum((self.coords[p_idx] - queries[q_idx]) ** 2, axis=1)
+        else:
+            parts = list(self._grid_candidates(queries, radius))
+            q_idx = np.concatenate([part[0] for part in parts]) if parts else np.empty(0, dtype=np.int64)
+            p_idx = self.order[np.concatenate([part[1] for part in parts])] if parts else np.empty(0, dtype=np.int64)
+            d_sq = np.concatenate([part[2] for part in parts]) if parts else np.empty(0)
+
+        sort = np.lexsort((p_idx, q_idx))
+        result = (q_idx[sort], p_idx[sort])
+        if return_distances:
+            result += (np.sqrt(d_sq[sort]),)
+        return result
+
+    def neighbors_of(self, point: Any, radius: float) -> np.ndarray:
+        """Indices of indexed points within radius of a single point"""
+        return self.query_radius(point, radius)[1]
+
+    def query_knn(self, points: Any, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest indexed points for each query point
+
+        Returns:
+            (distances, indices) arrays of shape (Q, k); missing neighbours
+            (k larger than the index) are reported as inf / -1
+        """
+        queries = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        n_queries = len(queries)
+        distances = np.full((n_queries, k), np.inf)
+        indices = np.full((n_queries, k), -1, dtype=np.int64)
+        if self.size == 0 or n_queries == 0 or k <= 0:
+            return distances, indices
+
+        if self._use_tree(None):
+            dist, idx = self.tree.query(queries, k=k)
+            dist = dist.reshape(n_queries, -1)
+            idx = idx.reshape(n_queries, -1)
+            found = idx < self.size
+            distances[found] = dist[found]
+            indices[found] = idx[found]
+            return distances, indices
+
+        # Grow the search radius until every query has k neighbours; once k
+        # points lie within the radius they are guaranteed to be the nearest
+        k_eff = min(k, self.size)
+        pending = np.arange(n_queries)
+        radius = self.cell_size
+        while len(pending) and radius <= self.cell_size * MAX_GRID_SPAN:
+            q_idx, p_idx, dist = self.query_radius(queries[pending], radius, return_distances=True)
+            order = np.lexsort((dist, q_idx))
+            q_idx, p_idx, dist = q_idx[order], p_idx[order], dist[order]
+
+            counts = np.bincount(q_idx, minlength=len(pending))
+            done = counts >= k_eff
+            # Results beyond the current radius are only guaranteed once the
+            # k-th neighbour lies inside it, which query_radius ensures
+            starts = np.cumsum(counts) - counts
+            rank = np.arange(len(q_idx)) - np.repeat(starts, counts)
+            keep = done[q_idx] & (rank < k)
+            rows = pending[q_idx[keep]]
+            distances[rows, rank[keep]] = dist[keep]
+            indices[rows, rank[keep]] = p_idx[keep]
+
+            pending = pending[~done]
+            radius *= 2.0
+
+        # Queries far from the structure fall back to blockwise brute force
+        for start in range(0, len(pending), 256):
+            rows = pending[start:start + 256]
+            d_sq = np.sum((queries[rows, None, :] - self.coords[None, :, :]) ** 2, axis=2)
+            nearest = np.argpartition(d_sq, k_eff - 1, axis=1)[:, :k_eff]
+            nearest_d = np.take_along_axis(d_sq, nearest, axis=1)
+            order = np.argsort(nearest_d, axis=1)
+            indices[rows, :k_eff] = np.take_along_axis(nearest, order, axis=1)
+            distances[rows, :k_eff] = np.sqrt(np.take_along_axis(nearest_d, order, axis=1))
+
+        return distances, indices
+
+    def pairs_within(self, cutoff: float, return_distances: bool = False) -> Tuple[np.ndarray, ...]:
+        """
+        All unique index pairs (i < j) closer than cutoff
+
+        Returns:
+            (i, j[, distances]) flat arrays
+        """
+        if self.size < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, empty, np.empty(0)) if return_distances else (empty, empty)
+
+        if self._use_tree(cutoff):
+            pairs = self.tree.query_pairs(cutoff, output_type='ndarray')
+            i, j = pairs[:, 0].astype(np.int64), pairs[:, 1].astype(np.int64)
+            d_sq = np.sum((self.coords[i] - self.coords[j]) ** 2, axis=1)
+        else:
+            i, j, d_sq = self._grid_pairs(cutoff)
+
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        sort = np.argsort(lo * self.size + hi)
+        result = (lo[sort], hi[sort])
+        if return_distances:
+            result += (np.sqrt(d_sq[sort]),)
+        return result
+
+    def _grid_pairs(self, cutoff: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cell-pair enumeration over half the neighbour stencil"""
+        span = max(1, int(np.ceil(cutoff / self.cell_size)))
+        cutoff_sq = cutoff * cutoff
+        occupied = np.stack([
+            (self.cell_keys >> (2 * _AXIS_BITS)) & _AXIS_MASK,
+            (self.cell_keys >> _AXIS_BITS) & _AXIS_MASK,
+            self.cell_keys & _AXIS_MASK
+        ], axis=1)
+        # Point -> occupied cell position, in sorted order
+        point_cell = np.repeat(np.arange(len(self.cell_keys)), self.cell_counts)
+
+        out_i, out_j, out_d = [], [], []
+        for offset in _offsets(span, half=True):
+            neighbour = occupied + offset
+            valid = np.all((neighbour >= 0) & (neighbour < _AXIS_MASK), axis=1)
+            pos, found = self._lookup(_encode(np.where(valid[:, None], neighbour, 0)))
+            found &= valid
+            cells = np.flatnonzero(found)
+            if len(cells) == 0:
+                continue
+
+            # Owner is a sorted point in cell c, candidates are points in neighbour cell
+            self_offset = not offset.any()
+            point_mask = found[point_cell]
+            owners = np.flatnonzero(point_mask)
+            for a, b in self._expand(owners, pos[point_cell[owners]]):
+                if self_offset:
+                    keep = a < b
+                    a, b = a[keep], b[keep]
+                # Filter in float32 with a small margin, then recompute exactly
+                diff = self._coords32[a] - self._coords32[b]
+                keep = np.einsum('ij,ij->i', diff, diff) <= cutoff_sq * 1.0001 + 1e-4
+                a, b = a[keep], b[keep]
+                diff = self.sorted_coords[a] - self.sorted_coords[b]
+                d_sq = np.einsum('ij,ij->i', diff, diff)
+                keep = d_sq <= cutoff_sq
+                out_i.append(self.order[a[keep]])
+                out_j.append(self.order[b[keep]])
+                out_d.append(d_sq[keep])
+
+        if not out_i:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        return np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_d)
+
+    def pairs_with(self, other: Any, cutoff: float,
+                   return_distances: bool = False) -> Tuple[np.ndarray, ...]:
+        """
+        Pairs between another point set and this index closer than cutoff
+
+        Returns:
+            (other_idx, self_idx[, distances]) flat arrays
+        """
+        return self.query_radius(other, cutoff, return_distances=return_distances)
+
+    def get_info(self) -> Dict[str, Any]:
+        """Summary statistics about the index"""
+        return {
+            'num_points': self.size,
+            'cell_size': self.cell_size,
+            'occupied_cells': int(len(self.cell_keys)),
+            'max_points_per_cell': int(self.cell_counts.max()) if len(self.cell_counts) else 0,
+            'method': self.method,
+            'kdtree_available': SCIPY_AVAILABLE
+        }
+
+
+_index_cache: "OrderedDict[Tuple[str, float, str], SpatialIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def _cached_index(key: Tuple[str, float, str]) -> Optional[SpatialIndex]:
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+        return index
+
+
+def _store_index(key: Tuple[str, float, str], index: SpatialIndex):
+    with _index_cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def get_spatial_index(coords: Any, cell_size: float = DEFAULT_CELL_SIZE,
+                      method: str = 'auto', structure_hash: Optional[str] = None) -> SpatialIndex:
+    """
+    Return a cached SpatialIndex for the given coordinates
+
+    Args:
+        coords: (N, 3) coordinates
+        cell_size: Grid cell size in Å
+        method: 'grid', 'kdtree' or 'auto'
+        structure_hash: Precomputed structure hash (computed from coords if omitted)
+
+    Returns:
+        SpatialIndex shared by all callers with the same structure and settings
+    """
+    coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 3)
+    key = (structure_hash or coordinates_hash(coords), float(cell_size), method)
+
+    index = _cached_index(key)
+    if index is None:
+        index = SpatialIndex(coords, cell_size=cell_size, method=method)
+        _store_index(key, index)
+    return index
+
+
+def spatial_index_for_pdb(pdb_content: str, cell_size: float = DEFAULT_CELL_SIZE,
+                          atom_names: Optional[List[str]] = None,
+                          method: str = 'auto') -> SpatialIndex:
+    """Build (or fetch from cache) a spatial index for PDB file content"""
+    digest = hashlib.sha1(pdb_content.encode()).hexdigest()
+    if atom_names:
+        digest += ':' + ','.join(sorted(atom_names))
+    key = (digest, float(cell_size), method)
+
+    index = _cached_index(key)
+    if index is None:
+        coords = coordinates_from_pdb(pdb_content, atom_names)
+        index = SpatialIndex(coords, cell_size=cell_size, method=method)
+        _store_index(key, index)
+    return index
+
+
+def clear_spatial_index_cache():
+    """Drop all cached spatial indexes"""
+    with _index_cache_lock:
+        _index_cache.clear()
@@ -0,0 +1,244 @@
+"""
+Structure superposition and comparison utilities
+
+This module provides NumPy implementations of:
+- Optimal superposition with the Kabsch algorithm
+- RMSD and TM-score between two structures
+- Batched all-vs-all RMSD matrices for structure ensembles
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ensembles larger than this are split across a process pool
+PARALLEL_THRESHOLD = 512
+
+# Number of structures processed per row block of the RMSD matrix
+DEFAULT_BLOCK_SIZE = 64
+
+_pool_coords = None
+
+
+def _as_coordinates(coords: Any) -> np.ndarray:
+    """Convert a coordinate list or array to a float64 (N, 3) array"""
+    array = np.asarray(coords, dtype=np.float64)
+    if array.ndim != 2 or array.shape[1] != 3:
+        raise ValueError(f"Coordinates must have shape (N, 3), got {array.shape}")
+    if len(array) == 0:
+        raise ValueError("Coordinates must not be empty")
+    return array
+
+
+def kabsch(mobile: Any, target: Any, weights: Optional[Any] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the optimal rotation and translation superposing mobile onto target
+
+    Args:
+        mobile: (N, 3) coordinates to be moved
+        target: (N, 3) reference coordinates
+        weights: Optional per-point weights
+
+    Returns:
+        Tuple of (rotation, translation) such that mobile @ rotation.T + translation
+        is the least-squares fit onto target
+    """
+    P = _as_coordinates(mobile)
+    Q = _as_coordinates(target)
+    if P.shape != Q.shape:
+        raise ValueError(f"Coordinate shapes differ: {P.shape} vs {Q.shape}")
+
+    if weights is None:
+        w = np.full(len(P), 1.0 / len(P))
+    else:
+        w = np.asarray(weights, dtype=np.float64)
+        w = w / w.sum()
+
+    p_center = w @ P
+    q_center = w @ Q
+    H = (P - p_center).T @ ((Q - q_center) * w[:, None])
+
+    U, _, Vt = np.linalg.svd(H)
+    d = np.sign(np.linalg.det(Vt.T @ U.T))
+    D = np.diag([1.0, 1.0, d if d != 0 else 1.0])
+    rotation = Vt.T @ D @ U.T
+    translation = q_center - p_center @ rotation.T
+
+    return rotation, translation
+
+
+def superpose(mobile: Any, target: Any, weights: Optional[Any] = None) -> np.ndarray:
+    """Return mobile coordinates optimally superposed onto target"""
+    rotation, translation = kabsch(mobile, target, weights)
+    return _as_coordinates(mobile) @ rotation.T + translation
+
+
+def kabsch_rmsd(mobile: Any, target: Any) -> float:
+    """RMSD between two structures after optimal superposition"""
+    fitted = superpose(mobile, target)
+    diff = fitted - _as_coordinates(target)
+    return float(np.sqrt(np.mean(np.sum(diff * diff, axis=1))))
+
+
+def tm_d0(length: int) -> float:
+    """TM-score distance scale for a target of the given length"""
+    if length <= 21:
+        return 0.5
+    return max(0.5, 1.24 * (length - 15) ** (1.0 / 3.0) - 1.8)
+
+
+def tm_score(mobile: Any, target: Any, target_length: Optional[int] = None,
+             iterations: int = 5) -> float:
+    """
+    TM-score of mobile against target for a fixed residue correspondence
+
+    The superposition is refined iteratively on the subset of residues that lie
+    within d0 of the target, which is the usual TM-score heuristic for finding
+    a superposition that maximises the score rather than minimising RMSD.
+
+    Args:
+        mobile: (N, 3) coordinates (typically CA atoms)
+        target: (N, 3) reference coordinates
+        target_length: Length used for normalisation (defaults to N)
+        iterations: Number of refinement rounds
+
+    Returns:
+        TM-score in the range (0, 1]
+    """
+    P = _as_coordinates(mobile)
+    Q = _as_coordinates(target)
+    if P.shape != Q.shape:
+        raise ValueError(f"Coordinate shapes differ: {P.shape} vs {Q.shape}")
+
+    length = target_length or len(Q)
+    d0_sq = tm_d0(length) ** 2
+
+    best = 0.0
+    mask = np.ones(len(P), dtype=bool)
+    for _ in range(max(1, iterations)):
+        if mask.sum() < 3:
+            break
+        rotation, translation = kabsch(P[mask], Q[mask])
+        dist_sq = np.sum((P @ rotation.T + translation - Q) ** 2, axis=1)
+        score = float(np.sum(1.0 / (1.0 + dist_sq / d0_sq)) / length)
+        best = max(best, score)
+
+        new_mask = dist_sq < 4.0 * d0_sq
+        if np.array_equal(new_mask, mask):
+            break
+        mask = new_mask
+
+    return best
+
+
+def _center(coords: np.ndarray) -> np.ndarray:
+    return coords - coords.mean(axis=1, keepdims=True)
+
+
+def _rmsd_block(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    RMSD between every structure in rows and every structure in cols
+
+    Both inputs must be pre-centred stacks of shape (M, N, 3). All 3x3
+    covariance matrices for the block come from a single matrix product, and
+    the singular values are obtained with one stacked SVD call.
+    """
+    a, n, _ = rows.shape
+    b = cols.shape[0]
+
+    # (a*3, N) @ (N, b*3) -> (a, 3, b, 3) -> (a, b, 3, 3)
+    left = rows.transpose(0, 2, 1).reshape(a * 3, n)
+    right = cols.transpose(1, 0, 2).reshape(n, b * 3)
+    H = (left @ right).reshape(a, 3, b, 3).transpose(0, 2, 1, 3)
+
+    sigma = np.linalg.svd(H, compute_uv=False)
+    sigma[..., 2] *= np.where(np.linalg.det(H) < 0, -1.0, 1.0)
+
+    g_rows = np.einsum('ink,ink->i', rows, rows)
+    g_cols = np.einsum('ink,ink->i', cols, cols)
+    msd = (g_rows[:, None] + g_cols[None, :] - 2.0 * sigma.sum(axis=-1)) / n
+
+    return np.sqrt(np.maximum(msd, 0.0))
+
+
+def _init_pool(coords: np.ndarray):
+    global _pool_coords
+    _pool_coords = coords
+
+
+def _pool_rows(bounds: Tuple[int, int]) -> Tuple[int, np.ndarray]:
+    start, stop = bounds
+    return start, _rmsd_block(_pool_coords[start:stop], _pool_coords[start:])
+
+
+def pairwise_rmsd_matrix(ensemble: Any, block_size: int = DEFAULT_BLOCK_SIZE,
+                         n_jobs: Optional[int] = None) -> np.ndarray:
+    """
+    All-vs-all RMSD matrix after optimal superposition of every pair
+
+    Args:
+        ensemble: (M, N, 3) array or list of M (N, 3) coordinate arrays with
+            the same atom correspondence
+        block_size: Number of rows computed per stacked SVD call
+        n_jobs: Worker processes; defaults to the CPU count when M exceeds
+            PARALLEL_THRESHOLD and to serial execution otherwise
+
+    Returns:
+        Symmetric (M, M) float64 RMSD matrix
+    """
+    coords = np.asarray(ensemble, dtype=np.float64)
+    if coords.ndim != 3 or coords.shape[2] != 3:
+        raise ValueError(f"Ensemble must have shape (M, N, 3), got {coords.shape}")
+
+    m = coords.shape[0]
+    coords = _center(coords)
+    matrix = np.zeros((m, m), dtype=np.float64)
+    blocks = [(start, min(start + block_size, m)) for start in range(0, m, block_size)]
+
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if m > PARALLEL_THRESHOLD else 1
+
+    if n_jobs > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_pool,
+                                 initargs=(coords,)) as executor:
+            row_results = executor.map(_pool_rows, blocks)
+            for start, block in row_results:
+                matrix[start:start + block.shape[0], start:] = block
+    else:
+        for start, stop in blocks:
+            matrix[start:stop, start:] = _rmsd_block(coords[start:stop], coords[start:])
+
+    # Only the upper triangle (including the diagonal blocks) was filled
+    upper = np.triu(matrix)
+    matrix = upper + np.triu(upper, 1).T
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+def structural_differences(mobile: Any, target: Any, threshold: float = 3.0,
+                           min_length: int = 3) -> List[Dict[str, Any]]:
+    """
+    Find contiguous regions that deviate by more than threshold after superposition
+
+    Returns:
+        List of regions with start/end indices and maximum deviation
+    """
+    fitted = superpose(mobile, target)
+    deviation = np.linalg.norm(fitted - _as_coordinates(target), axis=1)
+    above = np.concatenate(([False], deviation > threshold, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+
+    regions = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start >= min_length:
+            regions.append({
+                'start': int(start),
+                'end': int(end),
+                'max_deviation': round(float(deviation[start:end].max()), 3)
+            })
+    return regions
@@ -0,0 +1,132 @@
+"""
+Voxel grids over atomic structures
+
+This module maps a structure onto a regular 3D grid:
+- Grid geometry (origin, spacing, shape) around a set of atoms
+- Occupancy of voxels whose centers fall inside an atom's van der Waals sphere
+- Compact storage for caching alongside prepared receptors
+"""
+
+import logging
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID_SPACING = 1.0
+DEFAULT_GRID_PADDING = 4.0
+
+# Upper bound on (atom, stencil voxel) pairs evaluated at once
+MAX_STENCIL_PAIRS = 4_000_000
+
+
+def grid_geometry(coords: Any, spacing: float = DEFAULT_GRID_SPACING,
+                  padding: float = DEFAULT_GRID_PADDING) -> Dict[str, Any]:
+    """
+    Axis-aligned grid enclosing the atoms plus padding
+
+    Returns:
+        Dictionary with 'origin' (3,), 'spacing' and integer 'shape' (3,)
+    """
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        raise ValueError("Cannot build a grid without atoms")
+    lower = points.min(axis=0) - padding
+    upper = points.max(axis=0) + padding
+    shape = np.ceil((upper - lower) / spacing).astype(np.int64) + 1
+    return {'origin': lower, 'spacing': float(spacing), 'shape': shape}
+
+
+def grid_centers(geometry: Dict[str, Any], indices: np.ndarray) -> np.ndarray:
+    """Cartesian centers of voxels given as (M, 3) integer indices"""
+    return geometry['origin'] + np.asarray(indices, dtype=np.float64) * geometry['spacing']
+
+
+def occupancy_grid(coords: Any, radii: Any, spacing: float = DEFAULT_GRID_SPACING,
+                   padding: float = DEFAULT_GRID_PADDING, scale: float = 1.0,
+                   geometry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Boolean grid marking voxels inside any atom
+
+    Each atom stamps a precomputed cube of neighboring voxels; only exact
+    center-to-atom distances within the (scaled) radius are kept, so the
+    cost is linear in the number of atoms.
+
+    Args:
+        coords: (N, 3) atom coordinates
+        radii: (N,) van der Waals radii
+        spacing: Voxel edge length in Å
+        padding: Margin around the atoms in Å
+        scale: Multiplier applied to every radius
+        geometry: Reuse an existing grid geometry instead of building one
+
+    Returns:
+        Grid geometry plus an 'occupied' bool array of the grid shape
+    """
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    atom_radii = np.asarray(radii, dtype=np.float64) * scale
+    geometry = dict(geometry or grid_geometry(points, spacing, padding))
+    shape = tuple(int(s) for s in geometry['shape'])
+    spacing = geometry['spacing']
+    origin = np.asarray(geometry['origin'], dtype=np.float64)
+
+    # Stamp into a grid padded by two stencil widths so no bounds checks are needed
+    max_reach = int(np.ceil(atom_radii.max() / spacing)) + 1 if len(points) else 0
+    pad = 2 * max_reach
+    padded_shape = tuple(s + 2 * pad for s in shape)
+    stamped = np.zeros(padded_shape, dtype=bool)
+    flat = stamped.reshape(-1)
+    strides = (padded_shape[1] * padded_shape[2], padded_shape[2], 1)
+
+    # Atoms far outside a reused geometry cannot touch it
+    relative = (points - origin) / spacing
+    inside_box = np.all((relative > -max_reach) & (relative < np.array(shape) + max_reach - 1), axis=1)
+
+    for radius in np.unique(atom_radii[inside_box]):
+        members = points[inside_box & (atom_radii == radius)]
+        reach = int(np.ceil(radius / spacing)) + 1
+        steps = np.arange(-reach, reach + 1)
+        width = len(steps)
+        base = np.floor((members - origin) / spacing).astype(np.int64)
+        chunk = max(1, MAX_STENCIL_PAIRS // width ** 3)
+
+        for start in range(0, len(members), chunk):
+            atoms = members[start:start + chunk]
+            # Distances are separable per axis: d^2 = dx^2 + dy^2 + dz^2
+            cells = base[start:start + chunk, :, None] + steps[None, None, :]
+            axis_sq = ((origin[None, :, None] + cells * spacing - atoms[:, :, None]) ** 2).astype(np.float32)
+            dist_sq = (axis_sq[:, 0, :, None, None] + axis_sq[:, 1, None, :, None]
+                       + axis_sq[:, 2, None, None, :])
+            atom_idx, i, j, k = np.nonzero(dist_sq <= np.float32(radius * radius))
+            padded_cells = cells + pad
+            flat[padded_cells[atom_idx, 0, i] * strides[0] + padded_cells[atom_idx, 1, j] * strides[1]
+                 + padded_cells[atom_idx, 2, k]] = True
+
+    geometry['occupied'] = np.ascontiguousarray(
+        stamped[pad:pad + shape[0], pad:pad + shape[1], pad:pad + shape[2]]
+    )
+    return geometry
+
+
+def pack_grid(grid: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Arrays suitable for np.savez with the occupancy bit-packed"""
+    return {
+        'grid_origin': np.asarray(grid['origin'], dtype=np.float64),
+        'grid_spacing': np.float64(grid['spacing']),
+        'grid_shape': np.asarray(grid['shape'], dtype=np.int64),
+        'grid_occupied': np.packbits(grid['occupied'].reshape(-1))
+    }
+
+
+def unpack_grid(arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Inverse of pack_grid"""
+    shape = tuple(int(s) for s in arrays['grid_shape'])
+    count = int(np.prod(shape))
+    occupied = np.unpackbits(arrays['grid_occupied'], count=count).astype(bool).reshape(shape)
+    return {
+        'origin': np.asarray(arrays['grid_origin'], dtype=np.float64),
+        'spacing': float(arrays['grid_spacing']),
+        'shape': np.asarray(shape, dtype=np.int64),
+        'occupied': occupied
+    }
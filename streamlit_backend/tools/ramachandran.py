@@ -1,13 +1,147 @@
 from langchain.tools import tool
 import numpy as np
 
+# Longest C(i)-N(i+1) distance still treated as a peptide bond (Å)
+PEPTIDE_BOND_CUTOFF = 2.0
+
+# Above this many residues only the binned histogram is returned
+MAX_POINTS = 5000
+
+HISTOGRAM_BINS = 72
+
+
+def _backbone_arrays(pdb_content: str):
+    """
+    Extract N/CA/C coordinates per residue from the first model of a PDB file.
+
+    Returns (chain_ids, residue_numbers, residue_names, N, CA, C) where the
+    coordinate arrays have shape (R, 3) and only residues with all three
+    backbone atoms are kept.
+    """
+    residues = {}
+    order = []
+    for line in pdb_content.splitlines():
+        record = line[:6]
+        if record.startswith("ENDMDL"):
+            break
+        if record != "ATOM  ":
+            continue
+        name = line[12:16].strip()
+        altloc = line[16:17]
+        if name not in ("N", "CA", "C") or altloc not in (" ", "", "A"):
+            continue
+        try:
+            key = (line[21:22], int(line[22:26]), line[26:27])
+            xyz = (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+        except ValueError:
+            continue
+        if key not in residues:
+            residues[key] = {"name": line[17:20].strip()}
+            order.append(key)
+        residues[key].setdefault(name, xyz)
+
+    complete = [key for key in order if all(atom in residues[key] for atom in ("N", "CA", "C"))]
+    chains = np.array([key[0] for key in complete])
+    numbers = np.array([key[1] for key in complete], dtype=np.int64)
+    names = [residues[key]["name"] for key in complete]
+    coords = {
+        atom: np.array([residues[key][atom] for key in complete], dtype=np.float64).reshape(-1, 3)
+        for atom in ("N", "CA", "C")
+    }
+    return chains, numbers, names, coords["N"], coords["CA"], coords["C"]
+
+
+def _dihedrals(p0, p1, p2, p3):
+    """Vectorized dihedral angles in degrees for stacked (M, 3) point arrays."""
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+    b1 /= np.linalg.norm(b1, axis=1, keepdims=True)
+    v = b0 - np.einsum("ij,ij->i", b0, b1)[:, None] * b1
+    w = b2 - np.einsum("ij,ij->i", b2, b1)[:, None] * b1
+    x = np.einsum("ij,ij->i", v, w)
+    y = np.einsum("ij,ij->i", np.cross(b1, v), w)
+    return np.degrees(np.arctan2(y, x))
+
+
+def compute_phi_psi(pdb_content: str) -> dict:
+    """
+    Compute backbone phi/psi angles for every residue of every chain.
+
+    A residue only has phi if the previous residue is in the same chain and
+    bonded (C-N within PEPTIDE_BOND_CUTOFF), and likewise for psi with the
+    next residue, so chain breaks and missing residues yield NaN instead of
+    spurious angles.
+    """
+    chains, numbers, names, N, CA, C = _backbone_arrays(pdb_content)
+    count = len(CA)
+    phi = np.full(count, np.nan)
+    psi = np.full(count, np.nan)
+
+    if count > 1:
+        same_chain = chains[1:] == chains[:-1]
+        bond = np.linalg.norm(N[1:] - C[:-1], axis=1)
+        linked = same_chain & (bond < PEPTIDE_BOND_CUTOFF)
+
+        # phi(i) = C(i-1), N(i), CA(i), C(i)
+        phi[1:][linked] = _dihedrals(C[:-1][linked], N[1:][linked], CA[1:][linked], C[1:][linked])
+        # psi(i) = N(i), CA(i), C(i), N(i+1)
+        psi[:-1][linked] = _dihedrals(N[:-1][linked], CA[:-1][linked], C[:-1][linked], N[1:][linked])
+
+    return {
+        "chains": chains,
+        "residue_numbers": numbers,
+        "residue_names": names,
+        "phi": phi,
+        "psi": psi,
+    }
+
+
+def ramachandran_data(pdb_content: str, max_points: int = MAX_POINTS, bins: int = HISTOGRAM_BINS) -> dict:
+    """
+    Build compact Ramachandran plot data.
+
+    Raw angles are rounded to 0.1 degree and omitted entirely above
+    max_points residues; a bins x bins histogram over [-180, 180) is always
+    included so large structures can be drawn as a heatmap.
+    """
+    angles = compute_phi_psi(pdb_content)
+    defined = ~np.isnan(angles["phi"]) & ~np.isnan(angles["psi"])
+    phi = angles["phi"][defined]
+    psi = angles["psi"][defined]
+
+    edges = np.linspace(-180.0, 180.0, bins + 1)
+    counts, _, _ = np.histogram2d(phi, psi, bins=[edges, edges])
+
+    result = {
+        "num_residues": int(len(angles["phi"])),
+        "num_points": int(defined.sum()),
+        "chains": sorted(set(angles["chains"].tolist())),
+        "histogram": {
+            "bin_width": 360.0 / bins,
+            "edges": edges.tolist(),
+            "counts": counts.astype(np.int32).tolist(),
+        },
+        "points_included": bool(defined.sum() <= max_points),
+    }
+
+    if result["points_included"]:
+        result["phi"] = np.round(phi, 1).tolist()
+        result["psi"] = np.round(psi, 1).tolist()
+        result["residues"] = [
+            f"{chain}:{name}{number}"
+            for chain, name, number, keep in zip(
+                angles["chains"], angles["residue_names"], angles["residue_numbers"], defined
+            )
+            if keep
+        ]
+
+    return result
+
+
 @tool
 def generate_ramachandran_plot(pdb_content: str) -> dict:
     """
     Generates the data for a Ramachandran plot from a protein structure in PDB format.
     """
-    # This is a mock implementation. In a real application, you would use a library
-    # like Biopython to parse the PDB file and calculate the phi and psi angles.
-    phi = np.random.uniform(-180, 180, 100).tolist()
-    psi = np.random.uniform(-180, 180, 100).tolist()
-    return {"phi": phi, "psi": psi}
\ No newline at end of file
+    return ramachandran_data(pdb_content)
@@ -16,14 +16,36 @@ if pdb_file is not None:
                 response = requests.post("http://127.0.0.1:8000/api/advanced-analysis", json={"tool": "ramachandran-plot", "data": {"pdb_content": pdb_content}})
                 if response.ok:
                     data = response.json()["data"]
-                    df = pd.DataFrame(data)
-                    st.vega_lite_chart(df, {
-                        "mark": {"type": "point", "tooltip": True},
-                        "encoding": {
-                            "x": {"field": "phi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
-                            "y": {"field": "psi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
-                        },
-                    })
+                    st.caption(f"{data['num_points']} residues with defined phi/psi across chains {', '.join(data['chains'])}")
+                    if data.get("points_included"):
+                        df = pd.DataFrame({"phi": data["phi"], "psi": data["psi"], "residue": data["residues"]})
+                        st.vega_lite_chart(df, {
+                            "mark": {"type": "point", "tooltip": True},
+                            "encoding": {
+                                "x": {"field": "phi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
+                                "y": {"field": "psi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
+                            },
+                        })
+                    else:
+                        # Large structures only ship the pre-binned histogram
+                        histogram = data["histogram"]
+                        edges = histogram["edges"]
+                        cells = [
+                            {"phi": edges[i], "phi_end": edges[i + 1], "psi": edges[j], "psi_end": edges[j + 1], "count": count}
+                            for i, row in enumerate(histogram["counts"])
+                            for j, count in enumerate(row)
+                            if count
+                        ]
+                        st.vega_lite_chart(pd.DataFrame(cells), {
+                            "mark": {"type": "rect", "tooltip": True},
+                            "encoding": {
+                                "x": {"field": "phi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
+                                "x2": {"field": "phi_end"},
+                                "y": {"field": "psi", "type": "quantitative", "scale": {"domain": [-180, 180]}},
+                                "y2": {"field": "psi_end"},
+                                "color": {"field": "count", "type": "quantitative", "scale": {"type": "log"}},
+                            },
+                        })
                 else:
                     st.error("Failed to generate plot.")
             except requests.exceptions.RequestException as e: